@@ -3,13 +3,13 @@
 
 import sys
 import os
-sys.path.append(os.path.join(os.path.dirname(__file__), 'cybercorp_node'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cybercorp_node', 'src'))
 
 import json
 import time
 import numpy as np
 import cv2
-from utils.vision_model import UIVisionModel
+from vision.vision_model import UIVisionModel
 
 def create_test_scenarios():
     """Create various test scenarios to evaluate comprehensively"""
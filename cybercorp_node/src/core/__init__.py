@@ -7,10 +7,14 @@ from .cybercorp_client import CyberCorpClient
 from .client_manager import ClientManager
 from .command_forwarder import CommandForwarder
 from .data_persistence import DataPersistence
-from .vscode_ui_analyzer import VSCodeUIAnalyzer
-from .vscode_automation import VSCodeAutomation
 from .response_handler import ResponseHandler
 
+# VSCode helpers are optional too
+try:
+    from .vscode_automation import VSCodeAutomation
+except ImportError:
+    VSCodeAutomation = None
+
 # Import new backend modules if they exist
 try:
     from .win32_backend import Win32Backend
@@ -0,0 +1,227 @@
+"""
+Batch command execution on the node
+
+A `batch` command carries a list of steps that the node runs locally and
+answers with a single command_result, so a multi-step interaction costs one
+round trip instead of one per step.
+
+Step format:
+
+    {'command': 'send_keys', 'params': {'keys': 'hello'}, 'timeout': 5}
+    {'command': 'wait', 'seconds': 0.5}
+    {'command': 'get_windows', 'barrier': True}
+
+In sequential mode steps run strictly in order. In pipelined mode the steps
+between two barriers (a `wait` step or a step with `barrier: true`) are
+independent of each other and may be in flight concurrently, while barriers
+run on their own. Results are always reported in step order.
+"""
+
+import asyncio
+import time
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+WAIT_COMMAND = 'wait'
+BATCH_COMMAND = 'batch'
+MODES = ('sequential', 'pipelined')
+
+DEFAULT_STEP_TIMEOUT = 30.0
+DEFAULT_MAX_IN_FLIGHT = 8
+
+
+def _wait_seconds(step: Dict[str, Any]) -> float:
+    return float(step.get('seconds', (step.get('params') or {}).get('seconds', 0)))
+
+
+def step_timeout(step: Dict[str, Any], default: float = DEFAULT_STEP_TIMEOUT) -> float:
+    """Timeout for one step: step-level, then params-level, then default"""
+    timeout = step.get('timeout', (step.get('params') or {}).get('timeout', default))
+    return float(timeout)
+
+
+def make_step(command: str, params: Optional[Dict[str, Any]] = None,
+              timeout: Optional[float] = None, barrier: bool = False) -> Dict[str, Any]:
+    """Build one batch step"""
+    params = dict(params or {})
+    if command == WAIT_COMMAND:
+        return {'command': WAIT_COMMAND, 'seconds': float(params.get('seconds', 0))}
+    step = {'command': command, 'params': params}
+    if timeout is not None:
+        step['timeout'] = timeout
+    if barrier:
+        step['barrier'] = True
+    return step
+
+
+def batch_unsupported(error: Any) -> bool:
+    """Whether an error says the node predates the batch command"""
+    return f"Unknown command: {BATCH_COMMAND}" in str(error)
+
+
+def normalize_steps(steps: Any) -> List[Dict[str, Any]]:
+    """Validate batch steps, raises ValueError on malformed input"""
+    if not isinstance(steps, list) or not steps:
+        raise ValueError("Batch 'steps' must be a non-empty list")
+
+    normalized = []
+    for index, step in enumerate(steps):
+        if not isinstance(step, dict) or not isinstance(step.get('command'), str):
+            raise ValueError(f"Batch step {index} must be a dict with a 'command'")
+        if step['command'] == BATCH_COMMAND:
+            raise ValueError(f"Batch step {index}: nested batches are not supported")
+        if step['command'] == WAIT_COMMAND and _wait_seconds(step) < 0:
+            raise ValueError(f"Batch step {index}: wait seconds must not be negative")
+        normalized.append(step)
+    return normalized
+
+
+def split_segments(steps: List[Dict[str, Any]]) -> List[List[int]]:
+    """Group step indexes into runs that may execute concurrently
+
+    `wait` steps and steps marked as barriers get a segment of their own:
+    they start after everything before them finished and complete before
+    anything after them starts.
+    """
+    segments = []
+    current = []
+    for index, step in enumerate(steps):
+        if step['command'] == WAIT_COMMAND or step.get('barrier'):
+            if current:
+                segments.append(current)
+                current = []
+            segments.append([index])
+        else:
+            current.append(index)
+    if current:
+        segments.append(current)
+    return segments
+
+
+def batch_timeout(steps: Any, mode: str = 'sequential',
+                  default_step_timeout: float = DEFAULT_STEP_TIMEOUT) -> float:
+    """Upper bound on how long a batch can take, used as its overall timeout"""
+    try:
+        steps = normalize_steps(steps)
+    except ValueError:
+        return default_step_timeout
+
+    def cost(step):
+        if step['command'] == WAIT_COMMAND:
+            return _wait_seconds(step)
+        return step_timeout(step, default_step_timeout)
+
+    if mode != 'pipelined':
+        return sum(cost(step) for step in steps)
+    return sum(max(cost(steps[i]) for i in segment) for segment in split_segments(steps))
+
+
+def _default_format(command, step_id, params, result, error, execution_time):
+    if error:
+        return {'success': False, 'error': {'message': error}, 'data': None}
+    return {'success': True, 'error': None, 'data': result}
+
+
+class BatchRunner:
+    """Run batch steps through a node's command implementation
+
+    Args:
+        execute: Coroutine (command, params, step_id) -> raw result, the same
+            signature as the node's single-command implementation
+        format_result: Callable (command, step_id, params, result, error,
+            execution_time) -> formatted result with a 'success' field
+        max_in_flight: Concurrent steps allowed in pipelined mode
+        default_step_timeout: Timeout for steps that do not set one
+    """
+
+    def __init__(self, execute: Callable[[str, dict, Optional[str]], Awaitable[Any]],
+                 format_result: Optional[Callable[..., Dict[str, Any]]] = None,
+                 max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+                 default_step_timeout: float = DEFAULT_STEP_TIMEOUT):
+        self.execute = execute
+        self.format_result = format_result or _default_format
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.default_step_timeout = default_step_timeout
+
+    async def run(self, steps: Any, stop_on_error: bool = True, mode: str = 'sequential',
+                  command_id: Optional[str] = None) -> Dict[str, Any]:
+        """Execute a batch and collect every step result
+
+        Returns:
+            Dict with 'results' (one entry per executed step, in step order),
+            'completed', 'failed', 'skipped', 'stopped' and 'execution_time'
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown batch mode: {mode}")
+        steps = normalize_steps(steps)
+        start_time = time.time()
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(steps)
+        stopped = False
+
+        if mode == 'sequential':
+            for index, step in enumerate(steps):
+                results[index] = await self._run_step(index, step, command_id)
+                if stop_on_error and not results[index]['success']:
+                    stopped = index < len(steps) - 1
+                    break
+        else:
+            semaphore = asyncio.Semaphore(self.max_in_flight)
+
+            async def limited(index):
+                async with semaphore:
+                    results[index] = await self._run_step(index, steps[index], command_id)
+
+            segments = split_segments(steps)
+            for number, segment in enumerate(segments):
+                await asyncio.gather(*(limited(index) for index in segment))
+                if stop_on_error and any(not results[i]['success'] for i in segment):
+                    stopped = number < len(segments) - 1
+                    break
+
+        executed = [r for r in results if r is not None]
+        return {
+            'mode': mode,
+            'results': executed,
+            'completed': sum(1 for r in executed if r['success']),
+            'failed': sum(1 for r in executed if not r['success']),
+            'skipped': len(steps) - len(executed),
+            'stopped': stopped,
+            'execution_time': time.time() - start_time
+        }
+
+    async def _run_step(self, index: int, step: Dict[str, Any],
+                        command_id: Optional[str]) -> Dict[str, Any]:
+        command = step['command']
+        params = step.get('params') or {}
+        start_time = time.time()
+
+        if command == WAIT_COMMAND:
+            seconds = _wait_seconds(step)
+            await asyncio.sleep(seconds)
+            return {'index': index, 'command': command, 'success': True,
+                    'result': {'waited': seconds}, 'execution_time': time.time() - start_time}
+
+        timeout = step_timeout(step, self.default_step_timeout)
+        result = None
+        error = None
+        try:
+            result = await asyncio.wait_for(self.execute(command, params, command_id), timeout=timeout)
+        except asyncio.TimeoutError:
+            error = f"Step {index} '{command}' timed out after {timeout} seconds"
+        except Exception as e:
+            error = str(e)
+        if error:
+            logger.warning(f"Batch step {index} '{command}' failed: {error}")
+
+        execution_time = time.time() - start_time
+        formatted = self.format_result(command, command_id, params, result, error, execution_time)
+        return {
+            'index': index,
+            'command': command,
+            'success': bool(formatted.get('success', error is None)),
+            'result': formatted,
+            'execution_time': execution_time
+        }
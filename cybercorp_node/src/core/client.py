@@ -3,6 +3,11 @@ CyberCorp Control Client - Stable Version
 Runs in target user session with VSCode, connects to control server
 """
 
+from startup_profile import StartupTimer, profile_imports, format_import_report
+
+startup = StartupTimer()
+
+import argparse
 import asyncio
 import websockets
 import json
@@ -16,18 +21,26 @@ import subprocess
 import base64
 import configparser
 
-# Windows-specific imports
+from lazy_imports import lazy_import
+
+
+def _configure_pyautogui(module):
+    module.FAILSAFE = False  # Allow control even at screen edges
+    module.PAUSE = 0.1  # Small delay between actions
+
+
+# Windows-specific imports, loaded on first use so a restarted client
+# reconnects before paying for them
 if platform.system() == 'Windows':
-    import win32api
-    import win32con
-    import win32gui
-    import win32process
-    import psutil
-    import pyautogui
-    from PIL import ImageGrab
-    import pywinauto
-    from pywinauto import Desktop, Application
-    from pywinauto.keyboard import send_keys
+    win32api = lazy_import('win32api')
+    win32con = lazy_import('win32con')
+    win32gui = lazy_import('win32gui')
+    win32process = lazy_import('win32process')
+    psutil = lazy_import('psutil')
+    pyautogui = lazy_import('pyautogui', on_load=_configure_pyautogui)
+    ImageGrab = lazy_import('PIL.ImageGrab')
+    pywinauto = lazy_import('pywinauto')
+    pywinauto_keyboard = lazy_import('pywinauto.keyboard')
     
     # Import new backends
     import sys
@@ -37,8 +50,18 @@ if platform.system() == 'Windows':
     OCRBackend = None
 
 # Setup logging with enhanced log manager
-from utils.log_manager import setup_logging, get_log_manager
-from utils.response_formatter import ResponseFormatter, format_success, format_error
+from log_manager import setup_logging, get_log_manager
+from response_formatter import ResponseFormatter, format_success, format_error
+from wire_codec import LEGACY_CODEC, codec_from_ack, decode_message, make_offer
+from batch_runner import BatchRunner, DEFAULT_STEP_TIMEOUT, batch_timeout
+from uia_snapshot import UIASnapshotService, DEFAULT_DEPTH
+from command_scheduler import CommandRegistry, CommandScheduler, ResourceClass
+import cpu_jobs
+
+startup.mark('imports')
+
+# cybercorp_node/config.ini
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'config.ini')
 
 # Initialize enhanced logging
 log_manager = setup_logging(app_name='CyberCorpClient')
@@ -54,7 +77,7 @@ class VSCodeController:
     def find_vscode_window(self):
         """Find VSCode window in current session"""
         try:
-            desktop = Desktop(backend="uia")
+            desktop = pywinauto.Desktop(backend="uia")
             
             for window in desktop.windows():
                 try:
@@ -72,7 +95,7 @@ class VSCodeController:
                         
                         if 'code' in process.name().lower():
                             self.vscode_window = window
-                            self.app = Application(backend="uia").connect(handle=hwnd)
+                            self.app = pywinauto.Application(backend="uia").connect(handle=hwnd)
                             logger.info(f"Found VSCode: {title}")
                             return True
                             
@@ -216,7 +239,7 @@ class VSCodeController:
             time.sleep(0.05)
             
             # Send keys with small delays for reliability
-            send_keys(keys, pause=0.01, with_spaces=True)
+            pywinauto_keyboard.send_keys(keys, pause=0.01, with_spaces=True)
             
             # Small delay after sending keys
             time.sleep(0.05)
@@ -278,7 +301,7 @@ class VSCodeController:
             time.sleep(0.7)
             
             # Clear any existing text
-            send_keys('^a')
+            pywinauto_keyboard.send_keys('^a')
             time.sleep(0.05)
             
             # Type command
@@ -296,10 +319,10 @@ class VSCodeController:
             return False
 
 class CyberCorpClient:
-    def __init__(self, server_url=None):
+    def __init__(self, server_url=None, profile_startup=False, config_path=None):
         # Load configuration
         self.config = configparser.ConfigParser()
-        config_path = os.path.join(os.path.dirname(__file__), 'config.ini')
+        config_path = config_path or CONFIG_PATH
         
         if os.path.exists(config_path):
             self.config.read(config_path)
@@ -313,8 +336,11 @@ class CyberCorpClient:
         self.server_url = server_url or os.environ.get('CYBERCORP_SERVER', f'ws://{server_host}:{server_port}')
         self.reconnect_delay = self.config.getint('client', 'reconnect_interval', fallback=5)
         self.heartbeat_interval = self.config.getint('client', 'heartbeat_interval', fallback=30)
+        self.batch_max_in_flight = self.config.getint('client', 'batch_max_in_flight', fallback=8)
+        self.max_in_flight_commands = max(1, self.config.getint('client', 'max_in_flight_commands', fallback=64))
         self.client_id = None
         self.ws = None
+        self.codec = LEGACY_CODEC
         self.running = True
         self.vscode_controller = VSCodeController()
         self.start_time = datetime.now()
@@ -328,10 +354,29 @@ class CyberCorpClient:
         self.hot_reload = None
         self.enable_hot_reload = self.config.getboolean('client', 'enable_hot_reload', fallback=True)
         
+        # Commands run in per-resource lanes (input, cpu, io, inline)
+        self.scheduler = CommandScheduler(
+            io_workers=self.config.getint('client', 'io_workers', fallback=8),
+            cpu_workers=self.config.getint('client', 'cpu_workers', fallback=2),
+            use_processes=self.config.getboolean('client', 'cpu_process_pool', fallback=True)
+        )
+        self.commands = self._build_command_registry()
+        
+        # Commands started from the message loop and not yet answered
+        self._command_tasks = set()
+        self._command_slots = None
+        
+        # Cached UIA trees per window (created on first use)
+        self.uia_snapshots = None
+        
         # Health monitoring
         self.health_monitor = None
         self.enable_health_monitor = self.config.getboolean('client', 'enable_health_monitor', fallback=True)
         
+        # Report startup phases and exit once registered
+        self.profile_startup = profile_startup
+        startup.mark('init')
+        
     async def connect(self):
         """Connect to control server with auto-reconnect and exponential backoff"""
         while self.running:
@@ -351,13 +396,23 @@ class CyberCorpClient:
                 )
                 
                 logger.info("Connected to control server")
+                startup.mark('connected')
                 
                 # Reset reconnection parameters on successful connection
                 self.reconnect_attempts = 0
+                self.codec = LEGACY_CODEC
                 current_delay = self.reconnect_delay
                 
                 # Register with server
                 await self._register()
+                if 'registered' not in startup.marks:
+                    logger.info(f"Registered {startup.mark('registered'):.2f}s after start")
+                
+                if self.profile_startup:
+                    print(startup.report())
+                    self.running = False
+                    await self.ws.close()
+                    break
                 
                 # Start hot reload if enabled
                 if self.enable_hot_reload and self.hot_reload is None:
@@ -381,7 +436,9 @@ class CyberCorpClient:
                     logger.error(f"Connection error: {e}")
                 except Exception as e:
                     logger.error(f"Unexpected error in message handling: {e}")
-                    
+                
+                # Results could not be delivered on the closed connection
+                await self._cancel_commands()
                 heartbeat_task.cancel()
                 try:
                     await heartbeat_task
@@ -393,6 +450,11 @@ class CyberCorpClient:
             except Exception as e:
                 logger.error(f"Connection error: {e}")
                 
+            if self.profile_startup:
+                print(startup.report())
+                print("Not connected; startup profile is incomplete")
+                break
+                
             if self.running:
                 # Calculate exponential backoff with jitter
                 current_delay = min(
@@ -427,10 +489,14 @@ class CyberCorpClient:
                 'platform': platform.system(),
                 'hostname': platform.node(),
                 'python_version': platform.python_version()
-            }
+            },
+            'wire': make_offer(
+                compression=self.config.getboolean('client', 'wire_compression', fallback=True),
+                threshold=self.config.getint('client', 'compression_threshold', fallback=4096)
+            )
         }
         
-        await self.ws.send(json.dumps(registration))
+        await self._send(registration)
         logger.info(f"Registered as user: {registration['user_session']}")
     
     async def _heartbeat_loop(self):
@@ -441,10 +507,10 @@ class CyberCorpClient:
                 
                 # Record heartbeat time for latency measurement
                 heartbeat_time = time.time()
-                await self.ws.send(json.dumps({
+                await self._send({
                     'type': 'heartbeat',
                     'timestamp': heartbeat_time
-                }))
+                })
                 
                 # Update health monitor
                 if self.health_monitor:
@@ -456,15 +522,19 @@ class CyberCorpClient:
     async def _handle_message(self, message: str):
         """Handle incoming messages from server"""
         try:
-            data = json.loads(message)
+            data = decode_message(message)
             msg_type = data.get('type')
             
             if msg_type == 'welcome':
                 self.client_id = data.get('client_id')
                 logger.info(f"Assigned client ID: {self.client_id}")
                 
+            elif msg_type == 'wire_ack':
+                self.codec = codec_from_ack(data)
+                logger.info(f"Wire codec: {self.codec.name}, compression={self.codec.compression}")
+                
             elif msg_type == 'command':
-                await self._execute_command(data)
+                await self._start_command(data)
                 
             elif msg_type == 'heartbeat_ack':
                 # Calculate heartbeat latency
@@ -472,11 +542,43 @@ class CyberCorpClient:
                     latency = time.time() - data['timestamp']
                     self.health_monitor.update_heartbeat(latency)
                 
-        except json.JSONDecodeError:
-            logger.error("Invalid JSON received")
+        except ValueError as e:
+            logger.error(f"Invalid message received: {e}")
         except Exception as e:
             logger.error(f"Error handling message: {e}")
     
+    async def _start_command(self, command_data: dict):
+        """Run a command as a task so the message loop keeps reading
+        
+        Commands overlap as far as their scheduler lanes allow; input commands
+        still queue in arrival order. Once max_in_flight_commands are running,
+        reading waits for one to finish.
+        """
+        if self._command_slots is None:
+            self._command_slots = asyncio.Semaphore(self.max_in_flight_commands)
+        await self._command_slots.acquire()
+        
+        task = asyncio.create_task(self._execute_command(command_data))
+        self._command_tasks.add(task)
+        
+        def finished(task):
+            self._command_tasks.discard(task)
+            self._command_slots.release()
+            if not task.cancelled() and task.exception() is not None:
+                logger.error(f"Command task failed: {task.exception()}")
+        
+        task.add_done_callback(finished)
+    
+    async def _cancel_commands(self):
+        """Cancel commands still running and wait until they have stopped"""
+        tasks = list(self._command_tasks)
+        if not tasks:
+            return
+        logger.info(f"Cancelling {len(tasks)} running command(s)")
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
     async def _execute_command(self, command_data: dict):
         """Execute command from server"""
         global Win32Backend, OCRBackend
@@ -495,6 +597,10 @@ class CyberCorpClient:
         
         # Get timeout from params or use default
         timeout = params.get('timeout', 30.0)  # Default 30 seconds
+        if command == 'batch' and 'timeout' not in params:
+            # A batch may take as long as all of its steps together
+            timeout = batch_timeout(params.get('steps'), params.get('mode', 'sequential'),
+                                    params.get('step_timeout', DEFAULT_STEP_TIMEOUT))
         start_time = time.time()
         
         # Track command start in health monitor
@@ -503,7 +609,7 @@ class CyberCorpClient:
         
         try:
             # Create a task for the actual command execution
-            exec_task = asyncio.create_task(self._execute_command_impl(command, params))
+            exec_task = asyncio.create_task(self._execute_command_impl(command, params, command_id))
             
             # Wait for completion with timeout
             try:
@@ -528,32 +634,7 @@ class CyberCorpClient:
         exec_time = time.time() - start_time
         
         # Format response using unified formatter
-        if error:
-            # Command failed
-            formatted_result = format_error(
-                error,
-                error_code='COMMAND_EXECUTION_ERROR',
-                details={
-                    'command': command,
-                    'command_id': command_id,
-                    'execution_time': exec_time,
-                    'params': params
-                }
-            )
-        else:
-            # Command succeeded - normalize result
-            if isinstance(result, dict) and ResponseFormatter.validate_response(result):
-                # Result is already in unified format
-                formatted_result = result
-            else:
-                # Convert to unified format
-                formatted_result = ResponseFormatter.normalize_legacy_response(result, command)
-                # Add execution metadata
-                formatted_result['metadata'] = {
-                    'command': command,
-                    'command_id': command_id,
-                    'execution_time': exec_time
-                }
+        formatted_result = self._format_command_result(command, command_id, params, result, error, exec_time)
         
         # Create final response for server
         response = {
@@ -576,138 +657,145 @@ class CyberCorpClient:
                 result_log = result_log[:300] + "... (truncated)"
             logger.info(f"Command '{command}' completed in {exec_time:.2f}s | Result: {result_log}")
         
-        await self.ws.send(json.dumps(response))
+        await self._send(response)
     
-    async def _execute_command_impl(self, command: str, params: dict):
+    def _format_command_result(self, command: str, command_id: str, params: dict,
+                               result: Any, error: Optional[str], exec_time: float) -> dict:
+        """Convert a command's raw result or error into the unified response format"""
+        if error:
+            # Command failed
+            return format_error(
+                error,
+                error_code='COMMAND_EXECUTION_ERROR',
+                details={
+                    'command': command,
+                    'command_id': command_id,
+                    'execution_time': exec_time,
+                    'params': params
+                }
+            )
+        
+        # Command succeeded - normalize result
+        if isinstance(result, dict) and ResponseFormatter.validate_response(result):
+            # Result is already in unified format
+            return result
+        
+        # Convert to unified format
+        formatted_result = ResponseFormatter.normalize_legacy_response(result, command)
+        # Add execution metadata
+        formatted_result['metadata'] = {
+            'command': command,
+            'command_id': command_id,
+            'execution_time': exec_time
+        }
+        return formatted_result
+    
+    async def _send(self, message: dict):
+        """Send a protocol message using the negotiated wire codec"""
+        await self.ws.send(self.codec.encode(message))
+    
+    async def _execute_command_impl(self, command: str, params: dict, command_id: str = None):
         """Actual command implementation (separated for timeout handling)"""
-        global Win32Backend, OCRBackend
+        spec = self.commands.get(command)
+        if spec is None:
+            raise ValueError(f"Unknown command: {command}")
+        return await self.scheduler.run(spec, params, command_id)
+    
+    def _build_command_registry(self) -> CommandRegistry:
+        """Register every command with the resource class it runs under"""
+        INPUT, CPU, IO, INLINE = ResourceClass.INPUT, ResourceClass.CPU, ResourceClass.IO, ResourceClass.INLINE
+        vscode = self.vscode_controller
+        commands = CommandRegistry()
+        register = commands.register
         
-        # Make synchronous operations async-friendly
-        loop = asyncio.get_event_loop()
+        # Window operations
+        register('get_windows', lambda p: self._get_windows(), IO)
+        register('find_cursor_windows', lambda p: self._find_cursor_windows(), IO)
+        register('get_window_content', lambda p: vscode.get_window_content(), IO)
+        register('activate_window', lambda p: vscode.activate_window(), INPUT)
         
-        try:
-            # Window operations
-            if command == 'get_windows':
-                return await loop.run_in_executor(None, self._get_windows)
-                
-            elif command == 'find_cursor_windows':
-                return await loop.run_in_executor(None, self._find_cursor_windows)
-                
-            elif command == 'get_window_content':
-                return await loop.run_in_executor(None, self.vscode_controller.get_window_content)
-                
-            elif command == 'activate_window':
-                return await loop.run_in_executor(None, self.vscode_controller.activate_window)
-                
-            # Input operations
-            elif command == 'send_keys':
-                keys = params.get('keys', '')
-                return await loop.run_in_executor(None, self.vscode_controller.send_keys_to_vscode, keys)
-                
-            elif command == 'send_mouse_click':
-                x = params.get('x', 0)
-                y = params.get('y', 0)
-                await loop.run_in_executor(None, pyautogui.click, x, y)
-                return True
-                
-            # Screen operations
-            elif command == 'take_screenshot':
-                return await loop.run_in_executor(None, self._take_screenshot)
-                
-            elif command == 'get_screen_size':
-                size = await loop.run_in_executor(None, pyautogui.size)
-                return {'width': size[0], 'height': size[1]}
-                
-            # System operations
-            elif command == 'get_processes':
-                return await loop.run_in_executor(None, self._get_processes)
-                
-            elif command == 'get_system_info':
-                return await loop.run_in_executor(None, self._get_system_info)
-                
-            # VSCode specific
-            elif command == 'vscode_get_content':
-                return await loop.run_in_executor(None, self.vscode_controller.get_window_content)
-                
-            elif command == 'vscode_send_command':
-                vscode_cmd = params.get('command', '')
-                return await loop.run_in_executor(None, self.vscode_controller.send_command, vscode_cmd)
-                
-            elif command == 'vscode_type_text':
-                text = params.get('text', '')
-                return await loop.run_in_executor(None, self.vscode_controller.type_text, text)
-                
-            # Background operations (no window activation)
-            elif command == 'background_input':
-                element_name = params.get('element_name', '')
-                text = params.get('text', '')
-                return await loop.run_in_executor(None, self._handle_background_input, element_name, text)
-                    
-            elif command == 'background_click':
-                element_name = params.get('element_name', '')
-                return await loop.run_in_executor(None, self._handle_background_click, element_name)
-                    
-            # Mouse drag operations
-            elif command == 'mouse_drag':
-                return await loop.run_in_executor(None, self._handle_mouse_drag, params)
-                    
-            # OCR operations
-            elif command == 'ocr_screen':
-                return await loop.run_in_executor(None, self._handle_ocr_screen, params)
-                    
-            elif command == 'ocr_window':
-                return await loop.run_in_executor(None, self._handle_ocr_window, params)
-                    
-            # Win32 API operations
-            elif command == 'win32_find_window':
-                return await loop.run_in_executor(None, self._handle_win32_find_window, params)
-                    
-            elif command == 'win32_send_keys':
-                return await loop.run_in_executor(None, self._handle_win32_send_keys, params)
-            
-            elif command == 'screenshot':
-                return await loop.run_in_executor(None, self._handle_screenshot, params)
-                    
-            elif command == 'get_window_uia_structure':
-                hwnd = params.get('hwnd')
-                if hwnd:
-                    return await loop.run_in_executor(None, self._get_window_uia_structure, hwnd)
-                else:
-                    raise ValueError("Missing hwnd parameter")
-                
-            # Hot reload commands
-            elif command == 'hot_reload':
-                return await self._handle_hot_reload_command(params)
-                
-            # Health monitoring commands
-            elif command == 'health_status':
-                return self._get_health_status()
-                
-            # Logging commands
-            elif command == 'get_logs':
-                return self._handle_get_logs(params)
-                
-            elif command == 'set_log_level':
-                return self._handle_set_log_level(params)
-                
-            elif command == 'get_log_stats':
-                return self._handle_get_log_stats()
-                
-            # System control commands
-            elif command == 'restart_client':
-                return await self._handle_restart_client(params)
-                
-            elif command == 'execute_program':
-                return await self._handle_execute_program(params)
-                
-            elif command == 'execute_cursor_task':
-                return await self._handle_execute_cursor_task(params)
-                
-            else:
-                raise ValueError(f"Unknown command: {command}")
-                
-        except Exception as e:
-            raise
+        # Input operations
+        register('send_keys', lambda p: vscode.send_keys_to_vscode(p.get('keys', '')), INPUT)
+        register('send_mouse_click', self._handle_mouse_click, INPUT)
+        
+        # Screen operations
+        register('take_screenshot', lambda p: self._take_screenshot(), IO)
+        register('get_screen_size', self._handle_get_screen_size, INLINE)
+        register('screenshot', self._handle_screenshot_command, IO, wants_command_id=True)
+        
+        # System operations
+        register('get_processes', lambda p: self._get_processes(), IO)
+        register('get_system_info', lambda p: self._get_system_info(), IO)
+        register('execute_program', self._handle_execute_program, IO)
+        
+        # VSCode specific
+        register('vscode_get_content', lambda p: vscode.get_window_content(), IO)
+        register('vscode_send_command', lambda p: vscode.send_command(p.get('command', '')), INPUT)
+        register('vscode_type_text', lambda p: vscode.type_text(p.get('text', '')), INPUT)
+        
+        # Background operations (no window activation)
+        register('background_input', lambda p: self._handle_background_input(
+            p.get('element_name', ''), p.get('text', '')), INPUT)
+        register('background_click', lambda p: self._handle_background_click(
+            p.get('element_name', '')), INPUT)
+        register('mouse_drag', self._handle_mouse_drag, INPUT)
+        
+        # OCR operations (module-level so they can run in the CPU process pool)
+        register('ocr_screen', cpu_jobs.ocr_screen, CPU, process_safe=True)
+        register('ocr_window', cpu_jobs.ocr_window, CPU, process_safe=True)
+        
+        # Win32 API operations
+        register('win32_find_window', self._handle_win32_find_window, IO)
+        register('win32_send_keys', self._handle_win32_send_keys, INPUT)
+        
+        # UI Automation
+        register('get_window_uia_structure', self._handle_get_uia_structure, IO)
+        register('uia_snapshot', self._handle_uia_snapshot, IO)
+        register('uia_invalidate', self._handle_uia_invalidate, INLINE)
+        
+        # Client management
+        register('hot_reload', self._handle_hot_reload_command, INLINE)
+        register('health_status', lambda p: self._get_health_status(), INLINE)
+        register('get_logs', self._handle_get_logs, INLINE)
+        register('set_log_level', self._handle_set_log_level, INLINE)
+        register('get_log_stats', lambda p: self._handle_get_log_stats(), INLINE)
+        register('get_scheduler_stats', lambda p: self.scheduler.stats(), INLINE)
+        register('restart_client', self._handle_restart_client, INLINE)
+        register('execute_cursor_task', self._handle_execute_cursor_task, INLINE)
+        
+        # Multi-step batches, answered with one result. Inline because each
+        # step goes through its own lane.
+        register('batch', self._handle_batch, INLINE, wants_command_id=True)
+        
+        return commands
+    
+    def _handle_mouse_click(self, params: dict):
+        """Click at screen coordinates"""
+        pyautogui.click(params.get('x', 0), params.get('y', 0))
+        return True
+    
+    def _handle_get_screen_size(self, params: dict):
+        """Get primary screen size"""
+        size = pyautogui.size()
+        return {'width': size[0], 'height': size[1]}
+    
+    async def _handle_screenshot_command(self, params: dict, command_id: str = None):
+        """Route screenshots to the file or binary stream transport"""
+        if params.get('transport') == 'binary':
+            return await self._handle_binary_screenshot(params, command_id)
+        return await self.scheduler.offload(ResourceClass.IO, self._handle_screenshot, params)
+    
+    def _handle_get_uia_structure(self, params: dict):
+        """Full UIA structure of one window"""
+        hwnd = params.get('hwnd')
+        if not hwnd:
+            raise ValueError("Missing hwnd parameter")
+        return self._get_window_uia_structure(hwnd)
+    
+    def _handle_uia_invalidate(self, params: dict):
+        """Drop cached UIA trees for one window (or all)"""
+        self._get_uia_snapshots().invalidate(params.get('hwnd'))
+        return {'invalidated': params.get('hwnd', 'all')}
     
     def _get_windows(self):
         """Get list of all windows"""
@@ -938,6 +1026,27 @@ class CyberCorpClient:
             logger.error(f"Error getting UIA structure: {e}")
             return {"error": str(e)}
     
+    def _get_uia_snapshots(self) -> UIASnapshotService:
+        if self.uia_snapshots is None:
+            self.uia_snapshots = UIASnapshotService(
+                history=self.config.getint('client', 'uia_snapshot_history', fallback=8),
+                max_nodes=self.config.getint('client', 'uia_max_nodes', fallback=5000)
+            )
+        return self.uia_snapshots
+    
+    def _handle_uia_snapshot(self, params: dict):
+        """Read part of a window's UIA tree, or a diff against a held version"""
+        if not params.get('hwnd'):
+            raise ValueError("Missing hwnd parameter")
+        return self._get_uia_snapshots().snapshot(
+            params['hwnd'],
+            path=params.get('path'),
+            depth=params.get('depth', DEFAULT_DEPTH),
+            since=params.get('since'),
+            max_age=params.get('max_age', 0.0),
+            max_nodes=params.get('max_nodes')
+        )
+    
     def _handle_background_input(self, element_name: str, text: str):
         """Handle background input operation"""
         if self.vscode_controller.vscode_window:
@@ -951,7 +1060,7 @@ class CyberCorpClient:
                 else:
                     # If not found by exact name, try type_text without activation
                     escaped_text = text.replace('{', '{{').replace('}', '}}')
-                    send_keys(escaped_text)
+                    pywinauto_keyboard.send_keys(escaped_text)
                     return True
             except Exception as e:
                 logger.error(f"Background input error: {e}")
@@ -1000,75 +1109,6 @@ class CyberCorpClient:
             logger.error(f"Mouse drag error: {e}")
             return False
     
-    def _handle_ocr_screen(self, params: dict):
-        """Handle OCR screen operation"""
-        global OCRBackend
-        
-        x = params.get('x', 0)
-        y = params.get('y', 0)
-        width = params.get('width', 0)
-        height = params.get('height', 0)
-        engine = params.get('engine', None)  # None for auto-select
-        
-        try:
-            # Take screenshot of specified region
-            if width > 0 and height > 0:
-                screenshot = ImageGrab.grab(bbox=(x, y, x + width, y + height))
-            else:
-                screenshot = ImageGrab.grab()
-                
-            # Perform OCR
-            # Import on demand
-            if OCRBackend is None:
-                from utils.ocr_backend import OCRBackend
-            ocr_backend = OCRBackend()
-            detections = ocr_backend.detect_text(screenshot, engine=engine)
-            
-            # Format results
-            return {
-                'success': True,
-                'detections': detections,
-                'available_engines': list(ocr_backend.available_engines.keys())
-            }
-        except Exception as e:
-            logger.error(f"OCR error: {e}")
-            return {'success': False, 'error': str(e)}
-    
-    def _handle_ocr_window(self, params: dict):
-        """Handle OCR window operation"""
-        global Win32Backend, OCRBackend
-        
-        hwnd = params.get('hwnd', None)
-        engine = params.get('engine', None)
-        
-        try:
-            if hwnd:
-                # Capture specific window
-                # Import on demand
-                if Win32Backend is None:
-                    from utils.win32_backend import Win32Backend
-                win32_backend = Win32Backend()
-                image = win32_backend.capture_window(hwnd)
-                
-                if image is not None:
-                    # Perform OCR
-                    if OCRBackend is None:
-                        from utils.ocr_backend import OCRBackend
-                    ocr_backend = OCRBackend()
-                    detections = ocr_backend.detect_text(image, engine=engine)
-                    
-                    return {
-                        'success': True,
-                        'detections': detections
-                    }
-                else:
-                    return {'success': False, 'error': 'Failed to capture window'}
-            else:
-                return {'success': False, 'error': 'No window handle provided'}
-        except Exception as e:
-            logger.error(f"Window OCR error: {e}")
-            return {'success': False, 'error': str(e)}
-    
     def _handle_win32_find_window(self, params: dict):
         """Handle Win32 find window operation"""
         global Win32Backend
@@ -1182,6 +1222,70 @@ class CyberCorpClient:
             logger.error(f"Screenshot error: {e}")
             return {'success': False, 'error': str(e)}
     
+    async def _handle_binary_screenshot(self, params: dict, command_id: str):
+        """Stream a screenshot as binary WebSocket chunks ahead of the command result
+        
+        Params:
+            hwnd: Window to capture (default: whole desktop)
+            codec: 'raw' (BGRA), 'png' or 'jpeg' (default: 'jpeg')
+            quality: JPEG quality (default: 80)
+            chunk_size: Maximum payload bytes per chunk (default: 256 KiB)
+            source: 'synthetic' to stream generated frames instead of the desktop
+        """
+        from frame_transport import DEFAULT_CHUNK_SIZE
+        
+        if not command_id:
+            return format_error("Binary screenshots require a command_id", error_code='INVALID_PARAMS')
+        
+        codec = params.get('codec', 'jpeg')
+        chunk_size = int(params.get('chunk_size', DEFAULT_CHUNK_SIZE))
+        
+        try:
+            chunks, info = await self.scheduler.offload(
+                ResourceClass.IO, self._capture_frame_chunks, params, command_id, codec, chunk_size
+            )
+            
+            # Chunks go out before the command_result so the frame is complete when the result arrives
+            for chunk in chunks:
+                await self.ws.send(chunk)
+            
+            return format_success(
+                data=dict(info, transport='binary', chunks=len(chunks)),
+                message=f"Streamed {info['width']}x{info['height']} {codec} frame in {len(chunks)} chunks"
+            )
+        except Exception as e:
+            logger.error(f"Binary screenshot error: {e}")
+            return format_error(e, error_code='SCREENSHOT_FAILED')
+    
+    def _capture_frame_chunks(self, params: dict, command_id: str, codec: str, chunk_size: int):
+        """Capture bitmap bits and encode them into frame chunks (runs in executor)"""
+        from frame_transport import (
+            SyntheticFrameSource, capture_window_bits, encode_bitmap, split_frame
+        )
+        
+        start = time.time()
+        if params.get('source') == 'synthetic':
+            if not hasattr(self, '_synthetic_frames'):
+                self._synthetic_frames = SyntheticFrameSource(
+                    params.get('width', 1280), params.get('height', 720)
+                )
+            bits, width, height = self._synthetic_frames.capture()
+        else:
+            bits, width, height = capture_window_bits(params.get('hwnd'))
+        capture_time = time.time() - start
+        
+        payload = encode_bitmap(bits, width, height, codec, params.get('quality', 80))
+        chunks = split_frame(command_id, codec, width, height, payload, chunk_size)
+        
+        return chunks, {
+            'width': width,
+            'height': height,
+            'codec': codec,
+            'bytes': len(payload),
+            'capture_time': capture_time,
+            'encode_time': time.time() - start - capture_time
+        }
+    
     async def run(self):
         """Main client loop"""
         try:
@@ -1427,6 +1531,25 @@ class CyberCorpClient:
             logger.error(f"Error handling restart: {e}")
             return format_error(e, error_code='RESTART_ERROR')
     
+    async def _handle_batch(self, params: dict, command_id: str = None):
+        """Run a list of steps locally and return all of their results"""
+        runner = BatchRunner(
+            self._execute_command_impl,
+            self._format_command_result,
+            max_in_flight=params.get('max_in_flight', self.batch_max_in_flight),
+            default_step_timeout=params.get('step_timeout', DEFAULT_STEP_TIMEOUT)
+        )
+        summary = await runner.run(
+            params.get('steps'),
+            stop_on_error=params.get('stop_on_error', True),
+            mode=params.get('mode', 'sequential'),
+            command_id=command_id
+        )
+        return format_success(
+            data=summary,
+            message=f"Batch ran {len(summary['results'])} of {len(summary['results']) + summary['skipped']} steps"
+        )
+    
     async def _handle_execute_cursor_task(self, params: dict):
         """Execute a Cursor IDE automation task"""
         try:
@@ -1438,8 +1561,8 @@ class CyberCorpClient:
             from utils.response_formatter import format_error
             return format_error(str(e), error_code='CURSOR_TASK_ERROR')
     
-    async def _handle_execute_program(self, params: dict):
-        """Execute a program or command"""
+    def _handle_execute_program(self, params: dict):
+        """Execute a program or command (runs in the I/O pool)"""
         try:
             program = params.get('program')
             args = params.get('args', [])
@@ -1517,6 +1640,10 @@ class CyberCorpClient:
             except Exception as e:
                 logger.error(f"Error stopping health monitor: {e}")
         
+        # Stop running commands, then the command workers
+        await self._cancel_commands()
+        self.scheduler.shutdown()
+        
         # Close WebSocket connection
         if self.ws and not self.ws.closed:
             try:
@@ -1529,9 +1656,18 @@ class CyberCorpClient:
         logger.info("Client shutdown complete")
 
 if __name__ == "__main__":
-    # Configure pyautogui
-    pyautogui.FAILSAFE = False  # Allow control even at screen edges
-    pyautogui.PAUSE = 0.1  # Small delay between actions
+    parser = argparse.ArgumentParser(description='CyberCorp control client')
+    parser.add_argument('--server', help='Server URL (default: config or CYBERCORP_SERVER)')
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='Report per-module import times and startup phases, then exit')
+    args = parser.parse_args()
     
-    client = CyberCorpClient()
-    asyncio.run(client.run())
\ No newline at end of file
+    client = CyberCorpClient(server_url=args.server, profile_startup=args.profile_startup)
+    asyncio.run(client.run())
+    
+    if args.profile_startup:
+        # In a fresh interpreter, after the run so it does not skew the phases above
+        entries, error = profile_imports('client', cwd=os.path.dirname(os.path.abspath(__file__)))
+        print(format_import_report(entries))
+        if error:
+            print(f"Import failed:\n{error}")
@@ -24,13 +24,36 @@ class ClientManager:
         Raises:
             Exception: If request fails
         """
-        response = await self.client.send_request('request', 'list_clients')
+        response = await self.client.send_request('request', 'list_clients', reply_type='client_list')
         
-        if response.get('success'):
+        if response.get('type') == 'client_list' or response.get('success'):
             return response.get('clients', [])
         else:
             raise Exception(f"Failed to list clients: {response.get('error', 'Unknown error')}")
             
+    async def find_clients(self, hostname: Optional[str] = None,
+                           user_session: Optional[str] = None,
+                           capability: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Find clients matching all given criteria, filtered on the server
+        
+        Args:
+            hostname: Exact hostname
+            user_session: Exact user session
+            capability: Capability the client must have enabled
+            
+        Returns:
+            List of matching client information dictionaries
+        """
+        filters = {k: v for k, v in (('hostname', hostname), ('user_session', user_session),
+                                     ('capability', capability)) if v is not None}
+        response = await self.client.send_request('request', 'list_clients', {'filter': filters},
+                                                  reply_type='client_list')
+        
+        if response.get('type') == 'client_list' or response.get('success'):
+            return response.get('clients', [])
+        else:
+            raise Exception(f"Failed to find clients: {response.get('error', 'Unknown error')}")
+            
     async def find_client_by_username(self, username: str) -> Optional[Dict[str, Any]]:
         """Find specific client by username
         
@@ -0,0 +1,239 @@
+"""
+Connection registry for the control server
+
+Keeps connected clients indexed by hostname, user session and capability,
+maintains the `list_clients` answer incrementally, and tracks heartbeat
+deadlines in a hashed timing wheel so expiring idle connections costs time
+proportional to what actually expired, not to the number of clients.
+"""
+
+import itertools
+import time
+import logging
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class TimingWheel:
+    """Hashed timing wheel of deadlines
+
+    Keys hash into a slot by their deadline tick. Rescheduling only records
+    the new deadline; when the wheel reaches the old slot the key is moved to
+    its current slot instead of expiring. A heartbeat is therefore a dict
+    assignment and each tick only looks at the keys in one slot.
+
+    Args:
+        tick: Slot width in seconds (expiry granularity)
+        slots: Number of slots; deadlines further out than tick * slots
+            simply stay in their slot for extra rounds
+    """
+
+    def __init__(self, tick: float = 1.0, slots: int = 512):
+        self.tick = tick
+        self.slots = slots
+        self._wheel: List[Set[Any]] = [set() for _ in range(slots)]
+        self._deadlines: Dict[Any, float] = {}
+        self._slot_of: Dict[Any, int] = {}
+        self._current_tick = int(time.monotonic() / tick)
+
+    def _tick_of(self, deadline: float) -> int:
+        # Never place a key behind the cursor, it would wait a full round
+        return max(int(deadline / self.tick), self._current_tick + 1)
+
+    def schedule(self, key: Any, deadline: float):
+        """Set (or move) the deadline of key, in time.monotonic() seconds"""
+        previous = self._deadlines.get(key)
+        self._deadlines[key] = deadline
+        if previous is not None and deadline < previous:
+            # Moving a deadline earlier needs the key in an earlier slot
+            self._wheel[self._slot_of.pop(key)].discard(key)
+        if key not in self._slot_of:
+            slot = self._tick_of(deadline) % self.slots
+            self._wheel[slot].add(key)
+            self._slot_of[key] = slot
+
+    def cancel(self, key: Any):
+        """Forget key"""
+        self._deadlines.pop(key, None)
+        slot = self._slot_of.pop(key, None)
+        if slot is not None:
+            self._wheel[slot].discard(key)
+
+    def deadline(self, key: Any) -> Optional[float]:
+        return self._deadlines.get(key)
+
+    def advance(self, now: Optional[float] = None) -> List[Any]:
+        """Move the cursor to now and return (and forget) every expired key"""
+        now = time.monotonic() if now is None else now
+        target_tick = int(now / self.tick)
+        expired = []
+
+        # After a long stall visiting every slot once is enough
+        first_tick = max(self._current_tick + 1, target_tick - self.slots + 1)
+        for tick in range(first_tick, target_tick + 1):
+            slot = tick % self.slots
+            bucket = self._wheel[slot]
+            if not bucket:
+                continue
+            for key in list(bucket):
+                deadline = self._deadlines[key]
+                if deadline <= now:
+                    bucket.discard(key)
+                    del self._deadlines[key]
+                    del self._slot_of[key]
+                    expired.append(key)
+                else:
+                    new_slot = max(int(deadline / self.tick), target_tick + 1) % self.slots
+                    if new_slot != slot:
+                        bucket.discard(key)
+                        self._wheel[new_slot].add(key)
+                        self._slot_of[key] = new_slot
+
+        self._current_tick = max(self._current_tick, target_tick)
+        return expired
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self._deadlines
+
+
+class ClientRegistry(Mapping):
+    """Connected clients keyed by ID, with secondary indexes
+
+    Behaves as a read-only mapping of client ID to client, so existing code
+    can keep using `in`, `[]`, `.items()` and `len()`. Clients must have
+    `id`, `hostname`, `user_session` and `capabilities` attributes and a
+    `summary()` method returning their `list_clients` entry.
+
+    Args:
+        heartbeat_timeout: Seconds without a heartbeat before a client expires
+        tick: Expiry granularity in seconds
+    """
+
+    def __init__(self, heartbeat_timeout: float = 60.0, tick: float = 1.0):
+        self.heartbeat_timeout = heartbeat_timeout
+        self._clients: Dict[str, Any] = {}
+        self._by_hostname: Dict[str, Set[str]] = {}
+        self._by_session: Dict[str, Set[str]] = {}
+        self._by_capability: Dict[str, Set[str]] = {}
+        self._indexed: Dict[str, tuple] = {}  # Client ID -> (hostname, session, capabilities)
+        self._summaries: Dict[str, Dict[str, Any]] = {}
+        self._list_cache: Optional[List[Dict[str, Any]]] = None
+        self._counter = itertools.count()
+        self.version = 0  # Bumped whenever the client list changes
+        self.wheel = TimingWheel(tick=tick, slots=max(64, int(heartbeat_timeout / tick) * 2))
+
+    # Mapping interface
+    def __getitem__(self, client_id: str) -> Any:
+        return self._clients[client_id]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._clients)
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def __contains__(self, client_id: object) -> bool:
+        return client_id in self._clients
+
+    def next_id(self) -> str:
+        """Allocate a client ID"""
+        return f"client_{next(self._counter)}"
+
+    def add(self, client: Any):
+        """Register a new connection and start its heartbeat deadline"""
+        self._clients[client.id] = client
+        self._index(client)
+        self.touch(client.id)
+
+    def remove(self, client_id: str) -> Optional[Any]:
+        """Drop a connection and all of its index entries"""
+        client = self._clients.pop(client_id, None)
+        if client is None:
+            return None
+        self._unindex(client_id)
+        self.wheel.cancel(client_id)
+        self._summaries.pop(client_id, None)
+        self._changed()
+        return client
+
+    def update(self, client: Any):
+        """Re-index a client after its registration fields changed"""
+        if client.id not in self._clients:
+            return
+        self._unindex(client.id)
+        self._index(client)
+
+    def touch(self, client_id: str, now: Optional[float] = None):
+        """Record a heartbeat, pushing the client's deadline out"""
+        if client_id in self._clients:
+            now = time.monotonic() if now is None else now
+            self.wheel.schedule(client_id, now + self.heartbeat_timeout)
+
+    def expired(self, now: Optional[float] = None) -> List[str]:
+        """IDs of clients whose heartbeat deadline passed since the last call"""
+        return [cid for cid in self.wheel.advance(now) if cid in self._clients]
+
+    def find(self, hostname: Optional[str] = None, user_session: Optional[str] = None,
+             capability: Optional[str] = None) -> List[Any]:
+        """Clients matching every given criterion, via the indexes"""
+        candidates = []
+        if hostname is not None:
+            candidates.append(self._by_hostname.get(hostname, set()))
+        if user_session is not None:
+            candidates.append(self._by_session.get(user_session, set()))
+        if capability is not None:
+            candidates.append(self._by_capability.get(capability, set()))
+        if not candidates:
+            return list(self._clients.values())
+
+        candidates.sort(key=len)
+        ids = candidates[0].intersection(*candidates[1:])
+        return [self._clients[cid] for cid in ids]
+
+    def client_list(self) -> List[Dict[str, Any]]:
+        """The `list_clients` answer, rebuilt only after the registry changed"""
+        if self._list_cache is None:
+            self._list_cache = list(self._summaries.values())
+        return self._list_cache
+
+    def _index(self, client: Any):
+        capabilities = tuple(sorted(k for k, v in (client.capabilities or {}).items() if v))
+        key = (client.hostname, client.user_session, capabilities)
+        self._indexed[client.id] = key
+        if client.hostname is not None:
+            self._by_hostname.setdefault(client.hostname, set()).add(client.id)
+        if client.user_session is not None:
+            self._by_session.setdefault(client.user_session, set()).add(client.id)
+        for capability in capabilities:
+            self._by_capability.setdefault(capability, set()).add(client.id)
+        self._summaries[client.id] = client.summary()
+        self._changed()
+
+    def _unindex(self, client_id: str):
+        key = self._indexed.pop(client_id, None)
+        if key is None:
+            return
+        hostname, session, capabilities = key
+        self._discard(self._by_hostname, hostname, client_id)
+        self._discard(self._by_session, session, client_id)
+        for capability in capabilities:
+            self._discard(self._by_capability, capability, client_id)
+
+    @staticmethod
+    def _discard(index: Dict[str, Set[str]], value: Optional[str], client_id: str):
+        if value is None:
+            return
+        ids = index.get(value)
+        if ids is not None:
+            ids.discard(client_id)
+            if not ids:
+                del index[value]
+
+    def _changed(self):
+        self._list_cache = None
+        self.version += 1
@@ -3,6 +3,8 @@
 import asyncio
 from typing import Optional, Dict, Any, List, Tuple
 from .cybercorp_client import CyberCorpClient
+from .batch_runner import batch_timeout, batch_unsupported, make_step
+from .response_demux import ForwardError
 
 
 class CommandForwarder:
@@ -34,59 +36,82 @@ class CommandForwarder:
             asyncio.TimeoutError: If response times out
             Exception: If command fails
         """
-        # Build forward command request
-        forward_request = {
-            'type': 'forward_command',
-            'target_client': target_client_id,
-            'command': {
-                'type': 'command',
-                'command': command
-            }
-        }
-        
-        if params:
-            forward_request['command']['params'] = params
-            
-        # Send forward request
-        await self.client.send_raw(forward_request)
-        
-        # Wait for acknowledgment
-        ack = await self.client.receive_raw(timeout=timeout)
-        
-        if ack.get('type') == 'error':
-            raise Exception(f"Forward command failed: {ack.get('error', 'Unknown error')}")
-            
-        # Wait for actual result
+        # Many forwards may share the connection; the client's reader
+        # matches each result to its command ID
         try:
-            response = await self.client.receive_raw(timeout=timeout)
-            
-            if response.get('type') == 'command_result':
-                result = response.get('result', {})
-                if isinstance(result, dict) and result.get('success') is False:
-                    raise Exception(f"Command failed: {result.get('error', 'Unknown error')}")
-                return result
-            else:
-                raise Exception(f"Unexpected response type: {response.get('type')}")
-                
+            response = await self.client.forward(target_client_id, command, params, timeout=timeout)
+        except ForwardError as e:
+            raise Exception(f"Forward command failed: {e}")
         except asyncio.TimeoutError:
             raise asyncio.TimeoutError(f"Timeout waiting for result of command '{command}'")
             
+        result = response.get('result', {})
+        if isinstance(result, dict) and result.get('success') is False:
+            raise Exception(f"Command failed: {result.get('error', 'Unknown error')}")
+        return result
+            
     async def batch_forward(self, target_client_id: str, 
                            commands: List[Tuple[str, Optional[Dict[str, Any]]]], 
-                           stop_on_error: bool = False) -> List[Dict[str, Any]]:
-        """Forward multiple commands in sequence
+                           stop_on_error: bool = False,
+                           pipelined: bool = False,
+                           step_timeout: float = 5.0) -> List[Dict[str, Any]]:
+        """Forward multiple commands as one batch
+        
+        The node executes the commands locally and answers once, so the
+        whole list costs a single round trip. A ('wait', {'seconds': s})
+        entry pauses between commands.
         
         Args:
             target_client_id: ID of target client
             commands: List of (command, params) tuples
             stop_on_error: Whether to stop on first error
+            pipelined: Let the node run commands between waits concurrently
+            step_timeout: Timeout for each command on the node
             
         Returns:
-            List of results for each command
+            List of results for each executed command
         """
+        steps = [make_step(command, params) for command, params in commands]
+        mode = 'pipelined' if pipelined else 'sequential'
+        timeout = batch_timeout(steps, mode, step_timeout)
+        
+        try:
+            batch = await self.forward_command(target_client_id, 'batch', {
+                'steps': steps,
+                'mode': mode,
+                'stop_on_error': stop_on_error,
+                'step_timeout': step_timeout,
+                'timeout': timeout
+            }, timeout=timeout + 5.0)
+        except asyncio.TimeoutError:
+            raise
+        except Exception as e:
+            if not batch_unsupported(e):
+                raise
+            return await self._forward_each(target_client_id, commands, stop_on_error)
+        
+        results = []
+        for step in batch.get('data', {}).get('results', []):
+            result = step['result']
+            if step['success']:
+                results.append({'success': True, 'command': step['command'], 'result': result})
+            else:
+                error = result.get('error', 'Unknown error')
+                results.append({'success': False, 'command': step['command'], 'error': str(error)})
+                    
+        return results
+    
+    async def _forward_each(self, target_client_id: str,
+                            commands: List[Tuple[str, Optional[Dict[str, Any]]]],
+                            stop_on_error: bool = False) -> List[Dict[str, Any]]:
+        """Forward commands one round trip at a time (nodes without batch)"""
         results = []
         
         for command, params in commands:
+            if command == 'wait':
+                await asyncio.sleep((params or {}).get('seconds', 0))
+                results.append({'success': True, 'command': command, 'result': params})
+                continue
             try:
                 result = await self.forward_command(target_client_id, command, params)
                 results.append({'success': True, 'command': command, 'result': result})
@@ -144,21 +169,18 @@ class CommandForwarder:
         Returns:
             Dictionary mapping client_id to result
         """
-        results = {}
+        # All forwards go out at once, so this takes about one round trip
+        outcomes = await asyncio.gather(
+            *(self.forward_command(client_id, command, params, timeout) for client_id in client_ids),
+            return_exceptions=True
+        )
         
-        # Create tasks for parallel execution
-        tasks = []
-        for client_id in client_ids:
-            task = self.forward_command(client_id, command, params, timeout)
-            tasks.append((client_id, task))
-            
-        # Wait for all tasks to complete
-        for client_id, task in tasks:
-            try:
-                result = await task
-                results[client_id] = {'success': True, 'result': result}
-            except Exception as e:
-                results[client_id] = {'success': False, 'error': str(e)}
+        results = {}
+        for client_id, outcome in zip(client_ids, outcomes):
+            if isinstance(outcome, BaseException):
+                results[client_id] = {'success': False, 'error': str(outcome)}
+            else:
+                results[client_id] = {'success': True, 'result': outcome}
                 
         return results
         
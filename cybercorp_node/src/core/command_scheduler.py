@@ -0,0 +1,251 @@
+"""
+Command registry and resource-class scheduler for the node
+
+Every node command is registered with the kind of resource it needs, and
+each resource class gets its own lane with a concurrency limit, executor and
+queue metrics:
+
+    input   - mouse/keyboard/focus; one at a time, in arrival order, on a
+              dedicated thread
+    cpu     - vision/OCR; a process pool for process-safe (module-level)
+              handlers, a bounded thread pool otherwise
+    io      - window enumeration, UIA walks, process lists; a thread pool
+    inline  - cheap work run directly on the event loop, no limit
+
+A slow OCR job therefore only competes with other CPU work, and input never
+interleaves with other input.
+"""
+
+import asyncio
+import time
+import logging
+from collections import deque
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Callable, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ResourceClass(Enum):
+    INPUT = "input"
+    CPU = "cpu"
+    IO = "io"
+    INLINE = "inline"
+
+
+@dataclass
+class CommandSpec:
+    """A registered command
+
+    Args:
+        name: Command name as sent by the server
+        handler: Called with (params) or, if wants_command_id, with
+            (params, command_id); may be a coroutine function
+        resource: Resource class the command runs under
+        process_safe: Handler is a picklable module-level function that may
+            run in the CPU process pool
+        wants_command_id: Pass the command ID as second argument
+    """
+    name: str
+    handler: Callable[..., Any]
+    resource: ResourceClass
+    process_safe: bool = False
+    wants_command_id: bool = False
+
+    @property
+    def is_async(self) -> bool:
+        return asyncio.iscoroutinefunction(self.handler)
+
+
+class CommandRegistry:
+    """Command name -> CommandSpec"""
+
+    def __init__(self):
+        self._commands: Dict[str, CommandSpec] = {}
+
+    def register(self, name: str, handler: Callable[..., Any], resource: ResourceClass,
+                 process_safe: bool = False, wants_command_id: bool = False):
+        if name in self._commands:
+            raise ValueError(f"Command already registered: {name}")
+        self._commands[name] = CommandSpec(name, handler, resource, process_safe, wants_command_id)
+
+    def get(self, name: str) -> Optional[CommandSpec]:
+        return self._commands.get(name)
+
+    def names(self, resource: Optional[ResourceClass] = None):
+        return [n for n, s in self._commands.items() if resource is None or s.resource == resource]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._commands
+
+    def __len__(self) -> int:
+        return len(self._commands)
+
+
+class Lane:
+    """FIFO admission for one resource class, with metrics
+
+    Waiters are admitted strictly in arrival order, which is what keeps
+    input commands in the order the server sent them.
+    """
+
+    def __init__(self, resource: ResourceClass, limit: Optional[int]):
+        self.resource = resource
+        self.limit = limit
+        self.running = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.max_queued = 0
+        self._wait_total = 0.0
+        self._run_total = 0.0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self):
+        self.submitted += 1
+        if self.limit is None or (self.running < self.limit and not self._waiters):
+            self.running += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.max_queued = max(self.max_queued, len(self._waiters))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Slot was handed over just as we were cancelled; pass it on
+                self.release()
+            else:
+                self._waiters.remove(waiter)
+            raise
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)  # Hand the slot over, running stays the same
+                return
+        self.running -= 1
+
+    def record(self, waited: float, ran: float, ok: bool):
+        self._wait_total += waited
+        self._run_total += ran
+        if ok:
+            self.completed += 1
+        else:
+            self.failed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        finished = self.completed + self.failed
+        return {
+            'limit': self.limit,
+            'running': self.running,
+            'queued': self.queued,
+            'max_queued': self.max_queued,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'failed': self.failed,
+            'avg_wait_ms': round(self._wait_total / finished * 1000, 2) if finished else 0.0,
+            'avg_run_ms': round(self._run_total / finished * 1000, 2) if finished else 0.0
+        }
+
+
+class CommandScheduler:
+    """Run registered commands in their resource class lanes
+
+    Args:
+        io_workers: Threads (and concurrent commands) for I/O-bound work
+        cpu_workers: Processes (and concurrent commands) for CPU-heavy work
+        use_processes: Run process-safe CPU handlers in a process pool;
+            otherwise CPU work uses a thread pool of the same size
+    """
+
+    def __init__(self, io_workers: int = 8, cpu_workers: int = 2, use_processes: bool = True):
+        self.io_workers = max(1, io_workers)
+        self.cpu_workers = max(1, cpu_workers)
+        self.use_processes = use_processes
+        self.lanes = {
+            ResourceClass.INPUT: Lane(ResourceClass.INPUT, 1),
+            ResourceClass.CPU: Lane(ResourceClass.CPU, self.cpu_workers),
+            ResourceClass.IO: Lane(ResourceClass.IO, self.io_workers),
+            ResourceClass.INLINE: Lane(ResourceClass.INLINE, None),
+        }
+        self._executors: Dict[str, Executor] = {}
+
+    def _executor(self, resource: ResourceClass, process_safe: bool = False) -> Executor:
+        if resource == ResourceClass.CPU and process_safe and self.use_processes:
+            from concurrent.futures import ProcessPoolExecutor  # Pulls in multiprocessing
+            key, factory = 'cpu_process', lambda: ProcessPoolExecutor(max_workers=self.cpu_workers)
+        elif resource == ResourceClass.CPU:
+            key, factory = 'cpu_thread', lambda: ThreadPoolExecutor(self.cpu_workers, thread_name_prefix='node-cpu')
+        elif resource == ResourceClass.INPUT:
+            key, factory = 'input', lambda: ThreadPoolExecutor(1, thread_name_prefix='node-input')
+        else:
+            key, factory = 'io', lambda: ThreadPoolExecutor(self.io_workers, thread_name_prefix='node-io')
+        if key not in self._executors:
+            self._executors[key] = factory()
+        return self._executors[key]
+
+    async def offload(self, resource: ResourceClass, func: Callable[..., Any], *args) -> Any:
+        """Run blocking work on a class's executor from inside an async handler
+
+        The async handler already holds its lane slot, so this does not
+        queue again.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor(resource), func, *args)
+
+    async def run(self, spec: CommandSpec, params: dict, command_id: Optional[str] = None) -> Any:
+        """Run a command once its lane admits it"""
+        lane = self.lanes[spec.resource]
+        args = (params, command_id) if spec.wants_command_id else (params,)
+
+        queued_at = time.perf_counter()
+        await lane.acquire()
+        started = time.perf_counter()
+        ok = False
+        release_here = True
+        try:
+            if spec.is_async:
+                result = await spec.handler(*args)
+            elif spec.resource == ResourceClass.INLINE:
+                result = spec.handler(*args)
+            else:
+                # Keep the slot until the worker is really done, even if the
+                # caller times out and stops waiting for it
+                executor = self._executor(spec.resource, spec.process_safe)
+                future = executor.submit(spec.handler, *args)
+                loop = asyncio.get_running_loop()
+
+                def finish(_):
+                    try:
+                        loop.call_soon_threadsafe(lane.release)
+                    except RuntimeError:
+                        pass  # Loop already closed
+
+                future.add_done_callback(finish)
+                release_here = False
+                result = await asyncio.wrap_future(future)
+            ok = True
+            return result
+        finally:
+            lane.record(started - queued_at, time.perf_counter() - started, ok)
+            if release_here:
+                lane.release()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-class concurrency and queue metrics"""
+        return {resource.value: lane.stats() for resource, lane in self.lanes.items()}
+
+    def shutdown(self, wait: bool = False):
+        for executor in self._executors.values():
+            executor.shutdown(wait=wait, cancel_futures=True)
+        self._executors.clear()
@@ -0,0 +1,91 @@
+"""
+CPU-heavy node commands as module-level functions
+
+These run in the node's CPU process pool, so they must be picklable and must
+not touch client state: each takes the command params and returns a
+JSON-serializable result. Backends are created once per worker process and
+reused across jobs.
+"""
+
+import logging
+import os
+import sys
+
+# The backends live in src/vision and src/automation
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+logger = logging.getLogger(__name__)
+
+_ocr_backend = None
+_win32_backend = None
+
+
+def _get_ocr_backend():
+    global _ocr_backend
+    if _ocr_backend is None:
+        from vision.backends.ocr_backend import OCRBackend
+        _ocr_backend = OCRBackend()
+    return _ocr_backend
+
+
+def _get_win32_backend():
+    global _win32_backend
+    if _win32_backend is None:
+        from automation.windows import Win32Backend
+        _win32_backend = Win32Backend()
+    return _win32_backend
+
+
+def ocr_screen(params: dict):
+    """OCR the screen or a region of it"""
+    x = params.get('x', 0)
+    y = params.get('y', 0)
+    width = params.get('width', 0)
+    height = params.get('height', 0)
+    engine = params.get('engine', None)  # None for auto-select
+
+    try:
+        from PIL import ImageGrab
+
+        # Take screenshot of specified region
+        if width > 0 and height > 0:
+            screenshot = ImageGrab.grab(bbox=(x, y, x + width, y + height))
+        else:
+            screenshot = ImageGrab.grab()
+
+        ocr_backend = _get_ocr_backend()
+        detections = ocr_backend.detect_text(screenshot, engine=engine)
+
+        return {
+            'success': True,
+            'detections': detections,
+            'available_engines': list(ocr_backend.available_engines.keys())
+        }
+    except Exception as e:
+        logger.error(f"OCR error: {e}")
+        return {'success': False, 'error': str(e)}
+
+
+def ocr_window(params: dict):
+    """OCR a single window"""
+    hwnd = params.get('hwnd', None)
+    engine = params.get('engine', None)
+
+    if not hwnd:
+        return {'success': False, 'error': 'No window handle provided'}
+
+    try:
+        image = _get_win32_backend().capture_window(hwnd)
+        if image is None:
+            return {'success': False, 'error': 'Failed to capture window'}
+
+        detections = _get_ocr_backend().detect_text(image, engine=engine)
+        return {
+            'success': True,
+            'detections': detections
+        }
+    except Exception as e:
+        logger.error(f"Window OCR error: {e}")
+        return {'success': False, 'error': str(e)}
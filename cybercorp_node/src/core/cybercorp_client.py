@@ -8,21 +8,30 @@ import platform
 from datetime import datetime
 from typing import Optional, Dict, Any
 
+from .wire_codec import LEGACY_CODEC, codec_from_ack, decode_message, make_offer
+from .frame_transport import chunk_command_id
+from .response_demux import ResponseDemux, DEFAULT_MAX_IN_FLIGHT
+
 
 class CyberCorpClient:
     """Base WebSocket client for CyberCorp Node system
     
     Handles connection, registration, and basic communication with the server.
+    After connecting, a reader task routes replies, so several requests and
+    forwarded commands can be in flight at once.
     """
     
     def __init__(self, client_type: str = "controller", port: int = 9998, 
-                 user_session: Optional[str] = None):
+                 user_session: Optional[str] = None, negotiate_wire: bool = True,
+                 max_in_flight: int = DEFAULT_MAX_IN_FLIGHT):
         """Initialize CyberCorp client
         
         Args:
             client_type: Type of client ("controller", "worker", etc.)
             port: Server port (default: 9998)
             user_session: Custom user session name (default: auto-generated)
+            negotiate_wire: Offer faster codecs/compression during registration
+            max_in_flight: Forwarded commands waiting for results at once
         """
         self.server_url = f'ws://localhost:{port}'
         self.websocket: Optional[websockets.WebSocketClientProtocol] = None
@@ -30,6 +39,10 @@ class CyberCorpClient:
         self.client_type = client_type
         self.user_session = user_session or self._generate_session_name()
         self.is_connected = False
+        self.negotiate_wire = negotiate_wire
+        self.codec = LEGACY_CODEC
+        self.max_in_flight = max_in_flight
+        self.demux: Optional[ResponseDemux] = None
         
     def _generate_session_name(self) -> str:
         """Generate default session name based on username and client type"""
@@ -60,6 +73,7 @@ class CyberCorpClient:
         """
         try:
             self.websocket = await websockets.connect(self.server_url)
+            self.codec = LEGACY_CODEC
             
             # Default capabilities based on client type
             if capabilities is None:
@@ -82,16 +96,24 @@ class CyberCorpClient:
                 'capabilities': capabilities,
                 'system_info': self._get_system_info()
             }
+            if self.negotiate_wire:
+                registration['wire'] = make_offer()
             
             await self.websocket.send(json.dumps(registration))
             
             # Wait for welcome message
-            welcome_msg = await self.websocket.recv()
-            welcome_data = json.loads(welcome_msg)
+            welcome_data = await self._recv()
             
             if welcome_data.get('type') == 'welcome':
                 self.client_id = welcome_data.get('client_id')
                 self.is_connected = True
+                
+                # From here on only the reader task receives
+                self.demux = ResponseDemux(self.websocket, decode_message, chunk_command_id,
+                                           max_in_flight=self.max_in_flight)
+                self.demux.on('wire_ack', self._apply_wire_ack)
+                self.demux.on('heartbeat_ack', lambda data: None)
+                self.demux.start()
                 return welcome_data
             else:
                 raise Exception(f"Unexpected response: {welcome_data}")
@@ -102,6 +124,9 @@ class CyberCorpClient:
             
     async def disconnect(self):
         """Disconnect from server gracefully"""
+        if self.demux:
+            await self.demux.close()
+            self.demux = None
         if self.websocket and not self.websocket.closed:
             await self.websocket.close()
         self.is_connected = False
@@ -109,7 +134,7 @@ class CyberCorpClient:
         
     async def send_request(self, request_type: str, command: Optional[str] = None, 
                           params: Optional[Dict[str, Any]] = None, 
-                          timeout: float = 5.0) -> Dict[str, Any]:
+                          timeout: float = 5.0, reply_type: Optional[str] = None) -> Dict[str, Any]:
         """Send request and wait for response
         
         Args:
@@ -117,6 +142,8 @@ class CyberCorpClient:
             command: Command name (for 'request' type)
             params: Additional parameters
             timeout: Response timeout in seconds
+            reply_type: Wait for the next message of this type (e.g.
+                'client_list'); otherwise the next unrouted message is the reply
             
         Returns:
             Response data from server
@@ -135,13 +162,11 @@ class CyberCorpClient:
         if params:
             request.update(params)
             
-        # Send request
-        await self.websocket.send(json.dumps(request))
-        
-        # Wait for response with timeout
         try:
-            response = await asyncio.wait_for(self.websocket.recv(), timeout=timeout)
-            return json.loads(response)
+            if reply_type:
+                return await self.demux.request(self.send_raw, request, reply_type, timeout=timeout)
+            await self.send_raw(request)
+            return await self.demux.receive(timeout=timeout)
         except asyncio.TimeoutError:
             raise asyncio.TimeoutError(f"Timeout waiting for response to {request_type}")
             
@@ -157,7 +182,7 @@ class CyberCorpClient:
         if not self.is_connected or not self.websocket:
             raise Exception("Not connected to server")
             
-        await self.websocket.send(json.dumps(data))
+        await self.websocket.send(self.codec.encode(data))
         
     async def receive_raw(self, timeout: Optional[float] = None) -> Dict[str, Any]:
         """Receive raw data from server
@@ -175,12 +200,48 @@ class CyberCorpClient:
         if not self.is_connected or not self.websocket:
             raise Exception("Not connected to server")
             
-        if timeout:
-            response = await asyncio.wait_for(self.websocket.recv(), timeout=timeout)
-        else:
-            response = await self.websocket.recv()
+        return await self.demux.receive(timeout=timeout)
+        
+    async def forward(self, target_client_id: str, command: str,
+                      params: Optional[Dict[str, Any]] = None, timeout: float = 5.0,
+                      on_chunk=None) -> Dict[str, Any]:
+        """Forward a command to another client and wait for its command_result
+        
+        Safe to call concurrently; results are matched by command ID.
+        
+        Args:
+            target_client_id: ID of target client
+            command: Command to execute
+            params: Optional command parameters
+            timeout: Seconds to wait for the result
+            on_chunk: Called with binary frame chunks sent for this command
+            
+        Returns:
+            The command_result message
+            
+        Raises:
+            ForwardError: The server refused to forward the command
+            asyncio.TimeoutError: No result within timeout
+        """
+        if not self.is_connected or not self.demux:
+            raise Exception("Not connected to server")
+            
+        return await self.demux.forward(self.send_raw, target_client_id, command, params,
+                                        timeout=timeout, on_chunk=on_chunk)
+        
+    async def _recv(self) -> Dict[str, Any]:
+        """Receive and decode the next message, applying any wire_ack on the way
+        
+        Only used before the reader task starts.
+        """
+        while True:
+            data = decode_message(await self.websocket.recv())
+            if data.get('type') != 'wire_ack':
+                return data
+            self._apply_wire_ack(data)
             
-        return json.loads(response)
+    def _apply_wire_ack(self, data: Dict[str, Any]):
+        self.codec = codec_from_ack(data)
         
     async def heartbeat_loop(self, interval: float = 30.0):
         """Send periodic heartbeat to keep connection alive
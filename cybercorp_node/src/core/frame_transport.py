@@ -0,0 +1,240 @@
+"""
+Binary frame transport for screenshots over the node WebSocket
+
+Frames are sent as one or more binary WebSocket messages. Every chunk carries
+a fixed header followed by the command ID it belongs to and a slice of the
+encoded payload, so the server can relay chunks without decoding them and
+the receiver can reassemble them in any order.
+"""
+
+import io
+import struct
+import time
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'CCFR'
+VERSION = 1
+
+# magic, version, codec, width, height, chunk index, chunk count, payload size, command ID length
+HEADER = struct.Struct('!4sBBIIIIIH')
+
+CODECS = {'raw': 0, 'png': 1, 'jpeg': 2}
+CODEC_NAMES = {value: name for name, value in CODECS.items()}
+
+DEFAULT_CHUNK_SIZE = 256 * 1024
+
+
+@dataclass
+class Frame:
+    """A reassembled frame"""
+    command_id: str
+    codec: str
+    width: int
+    height: int
+    payload: bytes
+
+
+def is_frame_chunk(message) -> bool:
+    """Check whether a WebSocket message is a frame chunk"""
+    return isinstance(message, (bytes, bytearray)) and message[:4] == MAGIC
+
+
+def read_command_id(chunk: bytes) -> str:
+    """Read only the command ID of a chunk (used for relaying)"""
+    id_len = HEADER.unpack_from(chunk)[-1]
+    return bytes(chunk[HEADER.size:HEADER.size + id_len]).decode('utf-8')
+
+
+def chunk_command_id(message) -> Optional[str]:
+    """Command ID of a frame chunk, or None for any other message"""
+    return read_command_id(message) if is_frame_chunk(message) else None
+
+
+def encode_bitmap(bits: bytes, width: int, height: int, codec: str = 'raw',
+                  quality: int = 80) -> bytes:
+    """Encode top-down BGRA bitmap bits
+
+    Args:
+        bits: Raw bitmap bits, 4 bytes per pixel in BGRA/BGRX order
+        width: Bitmap width
+        height: Bitmap height
+        codec: 'raw' (bits as-is), 'png' or 'jpeg'
+        quality: JPEG quality (1-100)
+
+    Returns:
+        Encoded payload
+    """
+    if codec not in CODECS:
+        raise ValueError(f"Unknown frame codec: {codec}")
+    if len(bits) != width * height * 4:
+        raise ValueError(f"Bitmap size {len(bits)} does not match {width}x{height} BGRA")
+
+    if codec == 'raw':
+        return bytes(bits)
+
+    from PIL import Image
+
+    # Wrap the bitmap memory directly; PIL reads BGRX without copying it first
+    image = Image.frombuffer('RGB', (width, height), bits, 'raw', 'BGRX', 0, 1)
+    buffer = io.BytesIO()
+    if codec == 'png':
+        image.save(buffer, format='PNG', compress_level=1)
+    else:
+        image.save(buffer, format='JPEG', quality=int(quality))
+    return buffer.getvalue()
+
+
+def split_frame(command_id: str, codec: str, width: int, height: int, payload: bytes,
+                chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[bytes]:
+    """Split an encoded payload into self-describing binary chunks"""
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+
+    id_bytes = command_id.encode('utf-8')
+    view = memoryview(payload)
+    count = max(1, -(-len(payload) // chunk_size))
+
+    chunks = []
+    for index in range(count):
+        header = HEADER.pack(MAGIC, VERSION, CODECS[codec], width, height,
+                             index, count, len(payload), len(id_bytes))
+        chunks.append(header + id_bytes + view[index * chunk_size:(index + 1) * chunk_size])
+    return chunks
+
+
+class FrameAssembler:
+    """Reassemble frames from binary chunks
+
+    Incomplete transfers older than `max_age` seconds are dropped so a lost
+    chunk cannot pin memory forever.
+    """
+
+    def __init__(self, max_age: float = 60.0):
+        self.max_age = max_age
+        self._pending: Dict[str, dict] = {}
+
+    def feed(self, chunk: bytes) -> Optional[Frame]:
+        """Add a chunk, returns the frame once all of its chunks arrived"""
+        magic, version, codec, width, height, index, count, total, id_len = HEADER.unpack_from(chunk)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a frame chunk")
+
+        command_id = bytes(chunk[HEADER.size:HEADER.size + id_len]).decode('utf-8')
+        data = chunk[HEADER.size + id_len:]
+
+        if count == 1:
+            return Frame(command_id, CODEC_NAMES[codec], width, height, bytes(data))
+
+        self._expire()
+        transfer = self._pending.setdefault(command_id, {
+            'parts': [None] * count,
+            'received': 0,
+            'started': time.monotonic()
+        })
+        if transfer['parts'][index] is None:
+            transfer['parts'][index] = data
+            transfer['received'] += 1
+
+        if transfer['received'] < count:
+            return None
+
+        del self._pending[command_id]
+        payload = b''.join(transfer['parts'])
+        if len(payload) != total:
+            raise ValueError(f"Frame {command_id} size mismatch: {len(payload)} != {total}")
+        return Frame(command_id, CODEC_NAMES[codec], width, height, payload)
+
+    def pending(self) -> int:
+        """Number of incomplete transfers"""
+        return len(self._pending)
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.max_age
+        for command_id in [k for k, v in self._pending.items() if v['started'] < cutoff]:
+            logger.warning(f"Dropping incomplete frame {command_id}")
+            del self._pending[command_id]
+
+
+def decode_frame(frame: Frame):
+    """Decode a frame into a BGR numpy array (same layout as cv2.imread)"""
+    import numpy as np
+
+    if frame.codec == 'raw':
+        pixels = np.frombuffer(frame.payload, dtype=np.uint8)
+        return pixels.reshape(frame.height, frame.width, 4)[:, :, :3].copy()
+
+    import cv2
+    return cv2.imdecode(np.frombuffer(frame.payload, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def capture_window_bits(hwnd: Optional[int] = None) -> Tuple[bytes, int, int]:
+    """Capture a window (or the whole desktop) as top-down BGRX bitmap bits
+
+    Windows only. The bits come straight from the GDI bitmap, nothing is
+    written to disk.
+    """
+    import win32gui
+    import win32ui
+    import win32con
+
+    if not hwnd:
+        hwnd = win32gui.GetDesktopWindow()
+
+    left, top, right, bottom = win32gui.GetWindowRect(hwnd)
+    width = right - left
+    height = bottom - top
+
+    hwndDC = win32gui.GetWindowDC(hwnd)
+    mfcDC = win32ui.CreateDCFromHandle(hwndDC)
+    saveDC = mfcDC.CreateCompatibleDC()
+    saveBitMap = win32ui.CreateBitmap()
+
+    try:
+        saveBitMap.CreateCompatibleBitmap(mfcDC, width, height)
+        saveDC.SelectObject(saveBitMap)
+        saveDC.BitBlt((0, 0), (width, height), mfcDC, (0, 0), win32con.SRCCOPY)
+
+        bmpinfo = saveBitMap.GetInfo()
+        bits = saveBitMap.GetBitmapBits(True)
+        return bits, bmpinfo['bmWidth'], bmpinfo['bmHeight']
+    finally:
+        win32gui.DeleteObject(saveBitMap.GetHandle())
+        saveDC.DeleteDC()
+        mfcDC.DeleteDC()
+        win32gui.ReleaseDC(hwnd, hwndDC)
+
+
+class SyntheticFrameSource:
+    """Deterministic BGRA frames for testing the transport without a desktop
+
+    Draws horizontal colour bands with a block that moves one step per
+    captured frame, so consecutive frames differ in a small region.
+    """
+
+    def __init__(self, width: int = 1280, height: int = 720, block_size: int = 64):
+        self.width = width
+        self.height = height
+        self.block_size = block_size
+        self.frame_index = 0
+
+    def capture(self) -> Tuple[bytes, int, int]:
+        """Return (bits, width, height) for the next frame"""
+        width, height = self.width, self.height
+        block = min(self.block_size, width, height)
+        block_x = (self.frame_index * block) % (width - block + 1)
+        block_y = (height - block) // 2
+        self.frame_index += 1
+
+        rows = []
+        for y in range(height):
+            band = (y * 8 // max(1, height)) * 32
+            row = bytes((band, 255 - band, (band * 3) & 0xFF, 255)) * width
+            if block_y <= y < block_y + block:
+                start = block_x * 4
+                row = row[:start] + b'\xff\xff\xff\xff' * block + row[start + block * 4:]
+            rows.append(row)
+        return b''.join(rows), width, height
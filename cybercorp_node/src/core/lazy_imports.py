@@ -0,0 +1,66 @@
+"""
+Deferred imports for heavy optional modules
+
+The node client needs win32, pywinauto, pyautogui, PIL and psutil only once a
+command uses them. A LazyModule stands in for the module at import time and
+imports it on first attribute access, so a restarted client can reconnect
+before any of them are loaded.
+"""
+
+import importlib
+import threading
+import types
+from typing import Callable, Optional
+
+
+class LazyModule(types.ModuleType):
+    """Module proxy that imports `name` on first attribute access
+
+    Args:
+        name: Dotted module name
+        on_load: Called once with the real module after it is imported
+            (e.g. to apply settings)
+    """
+
+    def __init__(self, name: str, on_load: Optional[Callable[[types.ModuleType], None]] = None):
+        super().__init__(name)
+        self.__dict__['_lazy_on_load'] = on_load
+        self.__dict__['_lazy_module'] = None
+        self.__dict__['_lazy_lock'] = threading.Lock()
+
+    def _load(self) -> types.ModuleType:
+        module = self.__dict__['_lazy_module']
+        if module is not None:
+            return module
+        # Commands run on several worker threads; only one of them imports
+        with self.__dict__['_lazy_lock']:
+            module = self.__dict__['_lazy_module']
+            if module is None:
+                module = importlib.import_module(self.__name__)
+                on_load = self.__dict__['_lazy_on_load']
+                if on_load:
+                    on_load(module)
+                self.__dict__['_lazy_module'] = module
+        return module
+
+    @property
+    def loaded(self) -> bool:
+        return self.__dict__['_lazy_module'] is not None
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr: str, value):
+        setattr(self._load(), attr, value)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        state = 'loaded' if self.loaded else 'not loaded'
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+
+def lazy_import(name: str, on_load: Optional[Callable[[types.ModuleType], None]] = None) -> LazyModule:
+    """Return a LazyModule for `name`"""
+    return LazyModule(name, on_load)
@@ -7,6 +7,11 @@ import logging
 from typing import Dict, Any, Optional, List, Tuple
 from datetime import datetime
 from .window_cache import WindowCache
+from .frame_transport import FrameAssembler, chunk_command_id, decode_frame
+from .response_demux import ForwardError, ResponseDemux, DEFAULT_MAX_IN_FLIGHT
+from .wire_codec import decode_message
+from .batch_runner import batch_timeout, batch_unsupported, make_step
+from .uia_snapshot import apply_diff, get_subtree
 
 logger = logging.getLogger(__name__)
 
@@ -15,15 +20,22 @@ VisionWindowAnalyzer = None
 
 
 class RemoteController:
-    """High-level remote control interface"""
+    """High-level remote control interface
     
-    def __init__(self, server_url: str = 'ws://localhost:9998'):
+    Commands may be issued concurrently (up to max_in_flight); a reader task
+    matches each result to its command by ID.
+    """
+    
+    def __init__(self, server_url: str = 'ws://localhost:9998', max_in_flight: int = DEFAULT_MAX_IN_FLIGHT):
         self.server_url = server_url
         self.ws = None
+        self.max_in_flight = max_in_flight
+        self._demux: Optional[ResponseDemux] = None
         self.client_id = None
         self.target_client = None
         self.window_cache = WindowCache(ttl=120)  # 2 minutes cache
         self._vision_analyzer = None  # Lazy initialization
+        self._uia_trees: Dict[int, Tuple[int, Dict[str, Any]]] = {}  # hwnd -> (version, tree)
         
     async def connect(self, session_name: str = None):
         """Connect to server"""
@@ -44,15 +56,20 @@ class RemoteController:
         self.client_id = data.get('client_id')
         logger.info(f"Connected as: {self.client_id}")
         
+        # From here on only the reader task receives
+        self._demux = ResponseDemux(self.ws, decode_message, chunk_command_id,
+                                    max_in_flight=self.max_in_flight)
+        self._demux.start()
+        
+    async def _send(self, message: Dict[str, Any]):
+        await self.ws.send(json.dumps(message))
+        
     async def find_client(self, user_session: str) -> Optional[str]:
         """Find client by user session"""
-        await self.ws.send(json.dumps({
+        data = await self._demux.request(self._send, {
             'type': 'request',
             'command': 'list_clients'
-        }))
-        
-        response = await self.ws.recv()
-        data = json.loads(response)
+        }, 'client_list')
         
         for client in data.get('clients', []):
             if client.get('user_session') == user_session:
@@ -68,30 +85,13 @@ class RemoteController:
         if not self.target_client:
             raise RuntimeError("No target client set")
             
-        await self.ws.send(json.dumps({
-            'type': 'forward_command',
-            'target_client': self.target_client,
-            'command': {
-                'type': 'command',
-                'command': command,
-                'params': params or {}
-            }
-        }))
-        
-        # Get acknowledgment
-        ack = await self.ws.recv()
-        
-        # Get result with timeout
         try:
-            result = await asyncio.wait_for(self.ws.recv(), timeout=timeout)
-            data = json.loads(result)
-            
-            if data.get('type') == 'command_result':
-                return data.get('result', {})
-            else:
-                logger.warning(f"Unexpected response type: {data.get('type')}")
-                return {'success': False, 'error': 'Unexpected response'}
-                
+            data = await self._demux.forward(self._send, self.target_client, command,
+                                             params or {}, timeout=timeout)
+            return data.get('result', {})
+        except ForwardError as e:
+            logger.error(f"Forward failed: {e}")
+            return {'success': False, 'error': str(e)}
         except asyncio.TimeoutError:
             logger.error(f"Timeout waiting for command result")
             return {'success': False, 'error': 'Timeout'}
@@ -163,6 +163,56 @@ class RemoteController:
                 logger.error(f"Screenshot failed: {result.get('error')}")
         return None
             
+    async def screenshot_to_memory(self, hwnd: int = None, codec: str = 'jpeg',
+                                   quality: int = 80, timeout: float = 15.0):
+        """Take screenshot streamed as binary frames, decoded to a BGR numpy array
+        
+        Args:
+            hwnd: Window handle (default: whole desktop)
+            codec: 'raw', 'png' or 'jpeg'
+            quality: JPEG quality
+            timeout: Seconds to wait for the frame and result
+            
+        Returns:
+            BGR image array or None if failed
+        """
+        if not self.target_client:
+            raise RuntimeError("No target client set")
+            
+        params = {'transport': 'binary', 'codec': codec, 'quality': quality}
+        if hwnd:
+            params['hwnd'] = hwnd
+            
+        assembler = FrameAssembler()
+        frames = []
+        
+        def on_chunk(chunk: bytes):
+            frame = assembler.feed(chunk)
+            if frame is not None:
+                frames.append(frame)
+                
+        try:
+            data = await self._demux.forward(self._send, self.target_client, 'screenshot', params,
+                                             timeout=timeout, on_chunk=on_chunk)
+        except asyncio.TimeoutError:
+            logger.error("Timeout waiting for screenshot frame")
+            return None
+        except ForwardError as e:
+            logger.error(f"Screenshot failed: {e}")
+            return None
+            
+        result = data.get('result', {})
+        if not result.get('success'):
+            logger.error(f"Screenshot failed: {result.get('error')}")
+            return None
+            
+        frame = frames[-1] if frames else None
+        if frame is None:
+            logger.error("Screenshot result arrived without a frame")
+            return None
+            
+        return decode_frame(frame)
+            
     async def get_uia_structure(self, hwnd: int) -> Optional[Dict[str, Any]]:
         """Get UIA structure of window"""
         result = await self.execute_command('get_window_uia_structure', {'hwnd': hwnd}, timeout=30.0)
@@ -173,8 +223,52 @@ class RemoteController:
             logger.error(f"Failed to get UIA structure: {result}")
             return None
             
+    async def get_uia_tree(self, hwnd: int, path: List[str] = None, depth: int = 3,
+                           timeout: float = 30.0) -> Optional[Dict[str, Any]]:
+        """Get (part of) a window's UIA tree through the node's snapshot cache
+        
+        A local copy of the tree is kept per window. Later calls send the
+        version held, so the node only returns what changed.
+        
+        Args:
+            hwnd: Window handle
+            path: Child keys of the subtree to expand (default: root)
+            depth: Levels to read below the subtree
+            timeout: Response timeout in seconds
+            
+        Returns:
+            The subtree at path, or None on failure
+        """
+        held = self._uia_trees.get(hwnd)
+        params = {'hwnd': hwnd, 'depth': depth}
+        if path:
+            params['path'] = list(path)
+        if held:
+            params['since'] = held[0]
+            
+        result = await self.execute_command('uia_snapshot', params, timeout=timeout)
+        data = result.get('data') if isinstance(result, dict) and result.get('success') else None
+        if not data:
+            logger.error(f"Failed to get UIA snapshot: {result}")
+            return None
+            
+        if 'diff' in data:
+            tree = apply_diff(held[1], data['diff'])
+        elif not path:
+            tree = data['tree']
+        else:
+            # Only a subtree came back and there is no full copy to put it in
+            self._uia_trees.pop(hwnd, None)
+            return data['tree']
+            
+        self._uia_trees[hwnd] = (data['version'], tree)
+        return get_subtree(tree, path or [])
+            
     async def close(self):
         """Close connection"""
+        if self._demux:
+            await self._demux.close()
+            self._demux = None
         if self.ws:
             await self.ws.close()
             
@@ -186,7 +280,7 @@ class RemoteController:
         if self._vision_analyzer is None:
             if VisionWindowAnalyzer is None:
                 try:
-                    from .vision_integration import VisionWindowAnalyzer
+                    from vision.analyzer import VisionWindowAnalyzer
                 except ImportError:
                     logger.warning("Vision integration not available")
                     return None
@@ -215,11 +309,15 @@ class RemoteController:
             logger.error(f"Vision analysis failed: {e}")
             return None
             
-    async def find_clickable_elements_vision(self, hwnd: int) -> List[Dict[str, Any]]:
+    async def find_clickable_elements_vision(self, hwnd: int, at: Optional[Tuple[int, int]] = None,
+                                             region: Optional[Tuple[int, int, int, int]] = None
+                                             ) -> List[Dict[str, Any]]:
         """Find clickable elements using vision
         
         Args:
             hwnd: Window handle
+            at: Only elements containing this point, innermost first
+            region: Only elements inside this (x1, y1, x2, y2) rectangle
             
         Returns:
             List of clickable elements with coordinates
@@ -229,17 +327,21 @@ class RemoteController:
             return []
             
         try:
-            return await analyzer.find_clickable_elements(hwnd)
+            return await analyzer.find_clickable_elements(hwnd, at=at, region=region)
         except Exception as e:
             logger.error(f"Failed to find clickable elements: {e}")
             return []
             
-    async def smart_click(self, hwnd: int, element_type: str = 'button') -> bool:
+    async def smart_click(self, hwnd: int, element_type: str = 'button',
+                          at: Optional[Tuple[int, int]] = None,
+                          region: Optional[Tuple[int, int, int, int]] = None) -> bool:
         """Smart click using vision to find element
         
         Args:
             hwnd: Window handle
             element_type: Type of element to click ('button', 'input', etc.)
+            at: Click the innermost element of that type under this point
+            region: Only consider elements inside this (x1, y1, x2, y2) rectangle
             
         Returns:
             Success status
@@ -249,7 +351,7 @@ class RemoteController:
         await asyncio.sleep(0.5)
         
         # Find clickable elements
-        elements = await self.find_clickable_elements_vision(hwnd)
+        elements = await self.find_clickable_elements_vision(hwnd, at=at, region=region)
         
         # Find element of requested type
         target_element = None
@@ -397,39 +499,91 @@ class WindowController:
         
 
 class BatchExecutor:
-    """Execute commands in batch for efficiency"""
+    """Execute commands in batch for efficiency
+    
+    All steps are sent to the node as one `batch` command, so the whole
+    sequence costs a single round trip. With `pipelined=True` the node may run
+    steps concurrently up to the next wait or barrier step.
+    """
     
-    def __init__(self, controller: RemoteController):
+    def __init__(self, controller: RemoteController, stop_on_error: bool = False,
+                 pipelined: bool = False, step_timeout: float = 10.0):
         self.controller = controller
+        self.stop_on_error = stop_on_error
+        self.pipelined = pipelined
+        self.step_timeout = step_timeout
         self.commands = []
         
-    def add_command(self, command: str, params: Dict[str, Any] = None):
-        """Add command to batch"""
-        self.commands.append((command, params or {}))
+    def add_command(self, command: str, params: Dict[str, Any] = None,
+                    timeout: float = None, barrier: bool = False):
+        """Add command to batch
+        
+        Args:
+            command: Command to execute
+            params: Command parameters
+            timeout: Per-step timeout (defaults to the executor's step_timeout)
+            barrier: In pipelined mode, wait for all earlier steps first
+        """
+        self.commands.append(make_step(command, params, timeout, barrier))
         
     def add_click(self, x: int, y: int):
         """Add click command"""
-        self.add_command('send_mouse_click', {'x': x, 'y': y})
+        self.add_command('send_mouse_click', {'x': x, 'y': y}, barrier=True)
         
     def add_keys(self, keys: str, delay: float = 0.01):
         """Add send keys command"""
-        self.add_command('send_keys', {'keys': keys, 'delay': delay})
+        self.add_command('send_keys', {'keys': keys, 'delay': delay}, barrier=True)
         
     def add_wait(self, seconds: float):
         """Add wait between commands"""
-        self.commands.append(('wait', {'seconds': seconds}))
+        self.commands.append(make_step('wait', {'seconds': seconds}))
         
     async def execute(self) -> List[Dict[str, Any]]:
-        """Execute all commands in sequence"""
+        """Execute all commands on the node in a single round trip
+        
+        Returns one result per executed step: the command's result, or
+        {'success': True, 'waited': seconds} for wait steps. Falls back to one
+        round trip per command when the node does not support batches.
+        """
+        mode = 'pipelined' if self.pipelined else 'sequential'
+        timeout = batch_timeout(self.commands, mode, self.step_timeout)
+        
+        response = await self.controller.execute_command('batch', {
+            'steps': self.commands,
+            'mode': mode,
+            'stop_on_error': self.stop_on_error,
+            'step_timeout': self.step_timeout,
+            'timeout': timeout
+        }, timeout=timeout + 5.0)
+        
+        if not response.get('success') and batch_unsupported(response.get('error')):
+            logger.info("Node does not support batch commands, executing one by one")
+            return await self._execute_each()
+        if not response.get('success'):
+            return [response]
+        
+        results = []
+        for step in response.get('data', {}).get('results', []):
+            if step['command'] == 'wait':
+                results.append({'success': True, 'waited': step['result']['waited']})
+            else:
+                results.append(step['result'])
+        return results
+    
+    async def _execute_each(self) -> List[Dict[str, Any]]:
+        """Execute all commands in sequence, one round trip each"""
         results = []
         
-        for command, params in self.commands:
-            if command == 'wait':
-                await asyncio.sleep(params['seconds'])
-                results.append({'success': True, 'waited': params['seconds']})
+        for step in self.commands:
+            if step['command'] == 'wait':
+                await asyncio.sleep(step['seconds'])
+                results.append({'success': True, 'waited': step['seconds']})
             else:
-                result = await self.controller.execute_command(command, params)
+                result = await self.controller.execute_command(
+                    step['command'], step['params'], timeout=step.get('timeout', self.step_timeout))
                 results.append(result)
+                if self.stop_on_error and result.get('success') is False:
+                    break
                 
         return results
 
@@ -0,0 +1,268 @@
+"""
+Demultiplexing reader for controller connections
+
+One reader task owns the WebSocket's receive side and routes every incoming
+message:
+
+    forward_ack / error   -> the forwarded command it acknowledges (by
+                             command_id, or the oldest one still waiting for
+                             an ack when the reply carries no ID); an error
+                             after the ack fails the command's result
+    command_result        -> the forwarded command with that command_id
+    frame chunks          -> that command's chunk callback
+    replies with a waiter -> the oldest request() waiting for that type
+    anything else         -> the inbox, read with receive()
+
+Callers therefore never read the socket themselves, so any number of
+commands can be in flight on one connection (up to max_in_flight) and
+unrelated messages such as heartbeat acks no longer break the pairing.
+"""
+
+import asyncio
+import itertools
+import logging
+import uuid
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+import websockets
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_IN_FLIGHT = 32
+
+
+class ForwardError(Exception):
+    """The server refused to forward a command (unknown target, queue full)"""
+
+
+def forward_request(target_client: str, command: str, params: Optional[Dict[str, Any]],
+                    command_id: str) -> Dict[str, Any]:
+    """Build a forward_command message carrying our own command ID"""
+    command_data = {'type': 'command', 'command': command, 'command_id': command_id}
+    if params:
+        command_data['params'] = params
+    return {
+        'type': 'forward_command',
+        'target_client': target_client,
+        'command': command_data
+    }
+
+
+class _Pending:
+    __slots__ = ('command_id', 'ack', 'result', 'on_chunk')
+
+    def __init__(self, command_id: str, on_chunk: Optional[Callable[[bytes], None]]):
+        loop = asyncio.get_running_loop()
+        self.command_id = command_id
+        self.ack = loop.create_future()
+        self.result = loop.create_future()
+        self.on_chunk = on_chunk
+
+
+class ResponseDemux:
+    """Route replies on one WebSocket to whoever is waiting for them
+
+    Args:
+        ws: Connected WebSocket; nothing else may call recv() on it once
+            the reader is started
+        decode: Turns a text or binary message into a dict
+        chunk_id: Returns the command ID of a binary frame chunk, or None
+            for any other message
+        max_in_flight: Forwarded commands allowed to wait for results at once
+    """
+
+    def __init__(self, ws, decode: Callable[[Any], Dict[str, Any]],
+                 chunk_id: Optional[Callable[[Any], Optional[str]]] = None,
+                 max_in_flight: int = DEFAULT_MAX_IN_FLIGHT):
+        self.ws = ws
+        self.decode = decode
+        self.chunk_id = chunk_id
+        self.max_in_flight = max_in_flight
+        self.handlers: Dict[str, Callable[[Dict[str, Any]], None]] = {}
+
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._pending: Dict[str, _Pending] = {}
+        self._awaiting_ack: Deque[_Pending] = deque()
+        self._waiters: Dict[str, Deque[asyncio.Future]] = {}
+        self._inbox: asyncio.Queue = asyncio.Queue()
+        self._ids = itertools.count(1)
+        self._id_prefix = uuid.uuid4().hex[:8]
+        self._task: Optional[asyncio.Task] = None
+        self._closed_error: Optional[Exception] = None
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._pending)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed_error is not None
+
+    def on(self, msg_type: str, handler: Callable[[Dict[str, Any]], None]):
+        """Handle a message type in the reader itself (e.g. wire_ack)"""
+        self.handlers[msg_type] = handler
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._read_loop())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._fail_all(ConnectionError("Connection closed"))
+
+    def new_command_id(self) -> str:
+        return f"{self._id_prefix}_{next(self._ids)}"
+
+    async def forward(self, send: Callable[[Dict[str, Any]], Awaitable[None]], target_client: str,
+                      command: str, params: Optional[Dict[str, Any]] = None, timeout: float = 10.0,
+                      on_chunk: Optional[Callable[[bytes], None]] = None) -> Dict[str, Any]:
+        """Forward a command and wait for its command_result message
+
+        Args:
+            send: Coroutine function that sends one protocol message
+            on_chunk: Called with each binary frame chunk for this command
+
+        Raises:
+            ForwardError: The server refused the command
+            asyncio.TimeoutError: No result within timeout (ack included)
+            ConnectionError: The connection closed while waiting
+        """
+        async with self._slots:
+            if self._closed_error:
+                raise self._closed_error
+            command_id = self.new_command_id()
+            pending = _Pending(command_id, on_chunk)
+            self._pending[command_id] = pending
+            self._awaiting_ack.append(pending)
+            try:
+                await send(forward_request(target_client, command, params, command_id))
+                return await asyncio.wait_for(self._settle(pending), timeout=timeout)
+            finally:
+                self._pending.pop(command_id, None)
+                if pending in self._awaiting_ack:
+                    self._awaiting_ack.remove(pending)
+
+    @staticmethod
+    async def _settle(pending: _Pending) -> Dict[str, Any]:
+        await pending.ack
+        return await pending.result
+
+    async def request(self, send: Callable[[Dict[str, Any]], Awaitable[None]], message: Dict[str, Any],
+                      reply_type: str, timeout: float = 10.0) -> Dict[str, Any]:
+        """Send a message and wait for the next reply of reply_type"""
+        if self._closed_error:
+            raise self._closed_error
+        waiter = asyncio.get_running_loop().create_future()
+        waiters = self._waiters.setdefault(reply_type, deque())
+        waiters.append(waiter)
+        try:
+            await send(message)
+            return await asyncio.wait_for(waiter, timeout=timeout)
+        finally:
+            if waiter in waiters:
+                waiters.remove(waiter)
+
+    async def receive(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Next message nobody was waiting for"""
+        if self._closed_error and self._inbox.empty():
+            raise self._closed_error
+        if timeout:
+            message = await asyncio.wait_for(self._inbox.get(), timeout=timeout)
+        else:
+            message = await self._inbox.get()
+        if isinstance(message, Exception):
+            raise message
+        return message
+
+    def _handle(self, message):
+        command_id = self.chunk_id(message) if self.chunk_id else None
+        if command_id is not None:
+            pending = self._pending.get(command_id)
+            if pending and pending.on_chunk:
+                pending.on_chunk(message)
+            return
+        self.dispatch(self.decode(message))
+
+    async def _read_loop(self):
+        error: Exception = ConnectionError("Connection closed")
+        try:
+            async for message in self.ws:
+                # A malformed frame or failing chunk callback costs only that message
+                try:
+                    self._handle(message)
+                except Exception as e:
+                    logger.error(f"Dropped undecodable message: {e}")
+        except websockets.exceptions.ConnectionClosed as e:
+            error = ConnectionError(f"Connection closed: {e}")
+        finally:
+            self._fail_all(error)
+
+    def dispatch(self, data: Dict[str, Any]):
+        """Route one decoded message"""
+        msg_type = data.get('type')
+        command_id = data.get('command_id')
+
+        handler = self.handlers.get(msg_type)
+        if handler:
+            handler(data)
+            return
+
+        if msg_type in ('forward_ack', 'error'):
+            pending = self._pending.get(command_id) if command_id else None
+            if pending is None and not command_id and self._awaiting_ack:
+                # The server answers forwards in the order they were sent
+                pending = self._awaiting_ack[0]
+            if pending is not None and msg_type == 'error':
+                # Before the ack: refused; after it: e.g. the target node left
+                if pending in self._awaiting_ack:
+                    self._awaiting_ack.remove(pending)
+                error = ForwardError(data.get('message') or data.get('error') or 'Forward failed')
+                future = pending.result if pending.ack.done() else pending.ack
+                if not future.done():
+                    future.set_exception(error)
+                return
+            if pending is not None and not pending.ack.done():
+                if pending in self._awaiting_ack:
+                    self._awaiting_ack.remove(pending)
+                pending.ack.set_result(data)
+                return
+
+        elif msg_type == 'command_result' and command_id in self._pending:
+            pending = self._pending[command_id]
+            if not pending.ack.done():
+                pending.ack.set_result(None)  # Result overtook the ack
+            if not pending.result.done():
+                pending.result.set_result(data)
+            return
+
+        waiters = self._waiters.get(msg_type)
+        while waiters:
+            waiter = waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(data)
+                return
+
+        self._inbox.put_nowait(data)
+
+    def _fail_all(self, error: Exception):
+        if self._closed_error:
+            return
+        self._closed_error = error
+        for pending in list(self._pending.values()):
+            for future in (pending.ack, pending.result):
+                if not future.done():
+                    future.set_exception(error)
+                    future.exception()  # Mark retrieved; the caller may be gone
+        for waiters in self._waiters.values():
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_exception(error)
+                    waiter.exception()
+        self._inbox.put_nowait(error)
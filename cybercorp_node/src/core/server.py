@@ -5,16 +5,25 @@ Designed for cross-user session control of VSCode and development environments
 
 import asyncio
 import websockets
-import json
 import logging
+import math
 import time
+import uuid
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Union
 from dataclasses import dataclass, asdict
 from enum import Enum
 import os
 import configparser
 
+from frame_transport import is_frame_chunk, read_command_id
+from wire_codec import WireCodec, LEGACY_CODEC, decode_message, negotiate
+from client_registry import ClientRegistry
+
+# cybercorp_node/config.ini
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'config.ini')
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -44,6 +53,9 @@ class CommandType(Enum):
     VSCODE_GET_CONTENT = "vscode_get_content"
     VSCODE_SEND_COMMAND = "vscode_send_command"
     VSCODE_TYPE_TEXT = "vscode_type_text"
+    
+    # Multi-step batches executed on the node
+    BATCH = "batch"
 
 @dataclass
 class Client:
@@ -57,6 +69,7 @@ class Client:
     hostname: Optional[str] = None
     platform: Optional[str] = None
     client_start_time: Optional[datetime] = None
+    codec: WireCodec = LEGACY_CODEC
     
     def to_dict(self):
         return {
@@ -71,12 +84,86 @@ class Client:
             'client_start_time': self.client_start_time.isoformat() if self.client_start_time else None,
             'capabilities': self.capabilities or {}
         }
+    
+    def summary(self):
+        """Entry for this client in the list_clients answer"""
+        return {
+            'id': self.id,
+            'ip': self.ip,
+            'connected_at': self.connected_at.isoformat(),
+            'user_session': self.user_session,
+            'hostname': self.hostname,
+            'platform': self.platform,
+            'capabilities': self.capabilities or {},
+            'client_start_time': self.client_start_time.isoformat() if self.client_start_time else None
+        }
+
+class CommandFuture(asyncio.Future):
+    """Future resolved with the result of a dispatched command"""
+    
+    def __init__(self, command_id: str, client_id: str, *, loop=None):
+        super().__init__(loop=loop)
+        self.command_id = command_id
+        self.client_id = client_id
+        self.created_at = time.monotonic()
+
+class CommandQueueFull(Exception):
+    """Raised when a client's dispatch queue has reached its depth limit"""
+
+class ResultStore:
+    """Command results bounded by age and entry count
+    
+    Entries are kept in insertion order, so expired results are always at
+    the front and purging only touches what actually expired.
+    """
+    
+    def __init__(self, ttl: float = 300.0, max_entries: int = 1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+    
+    def put(self, command_id: str, result: Any):
+        """Store result, evicting expired and then oldest entries"""
+        self._entries.pop(command_id, None)
+        self._entries[command_id] = (time.monotonic(), result)
+        self.purge_expired()
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def get(self, command_id: str, default: Any = None) -> Any:
+        """Get stored result if it has not expired"""
+        entry = self._entries.get(command_id)
+        if entry is None:
+            return default
+        stored_at, result = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self._entries[command_id]
+            return default
+        return result
+    
+    def purge_expired(self) -> int:
+        """Drop expired results, returns number removed"""
+        cutoff = time.monotonic() - self.ttl
+        removed = 0
+        while self._entries:
+            command_id, (stored_at, _) = next(iter(self._entries.items()))
+            if stored_at >= cutoff:
+                break
+            del self._entries[command_id]
+            removed += 1
+        return removed
+    
+    def __contains__(self, command_id: str) -> bool:
+        return self.get(command_id, self) is not self
+    
+    def __len__(self) -> int:
+        return len(self._entries)
 
 class CyberCorpServer:
-    def __init__(self, host=None, port=None):
+    def __init__(self, host=None, port=None, config_path=None):
         # Load configuration
         self.config = configparser.ConfigParser()
-        config_path = os.path.join(os.path.dirname(__file__), 'config.ini')
+        config_path = config_path or CONFIG_PATH
         
         if os.path.exists(config_path):
             self.config.read(config_path)
@@ -87,10 +174,32 @@ class CyberCorpServer:
         # Server configuration with fallbacks
         self.host = host or self.config.get('server', 'host', fallback='0.0.0.0')
         self.port = port or self.config.getint('server', 'port', fallback=9998)  # Changed default port
-        self.clients: Dict[str, Client] = {}
-        self.client_counter = 0
-        self.command_queue: Dict[str, list] = {}  # Client ID -> Command queue
-        self.command_results: Dict[str, dict] = {}  # Command ID -> Result
+        # Connected clients, indexed and with heartbeat deadlines
+        self.heartbeat_timeout = self.config.getfloat('server', 'heartbeat_timeout', fallback=60.0)
+        self.clients = ClientRegistry(heartbeat_timeout=self.heartbeat_timeout)
+        self._client_list_payloads: Dict[tuple, Any] = {}  # Encoded list_clients, per codec
+        self._client_list_version = -1
+        
+        # Command dispatch configuration
+        self.queue_depth = self.config.getint('server', 'command_queue_depth', fallback=1000)
+        self.command_timeout = self.config.getfloat('server', 'command_timeout', fallback=60.0)
+        
+        self.command_queue: Dict[str, asyncio.Queue] = {}  # Client ID -> Command queue
+        self.pending_commands: Dict[str, CommandFuture] = {}  # Command ID -> Future
+        self.command_results = ResultStore(
+            ttl=self.config.getfloat('server', 'result_ttl', fallback=300.0),
+            max_entries=self.config.getint('server', 'max_stored_results', fallback=1000)
+        )
+        self._dispatch_tasks: Dict[str, asyncio.Task] = {}
+        
+        # Wire codecs this server accepts, and whether large messages may be deflated
+        self.wire_codecs = [c.strip() for c in self.config.get(
+            'server', 'wire_codecs', fallback='msgpack,orjson,json').split(',') if c.strip()]
+        self.wire_compression = self.config.getboolean('server', 'wire_compression', fallback=True)
+        
+        # Result routing
+        self.result_routes: Dict[str, str] = {}  # Command ID -> requesting client ID
+        self.observers: set = set()  # Client IDs subscribed to all command results
         
     async def start(self):
         """Start the WebSocket server"""
@@ -98,7 +207,6 @@ class CyberCorpServer:
         
         # Start maintenance tasks
         asyncio.create_task(self._heartbeat_monitor())
-        asyncio.create_task(self._command_processor())
         
         # Start WebSocket server with compatibility options
         async with websockets.serve(
@@ -114,8 +222,7 @@ class CyberCorpServer:
     
     async def handle_client(self, websocket, path):
         """Handle a new client connection"""
-        client_id = f"client_{self.client_counter}"
-        self.client_counter += 1
+        client_id = self.clients.next_id()
         
         client = Client(
             id=client_id,
@@ -125,8 +232,9 @@ class CyberCorpServer:
             last_heartbeat=datetime.now()
         )
         
-        self.clients[client_id] = client
-        self.command_queue[client_id] = []
+        self.clients.add(client)
+        self.command_queue[client_id] = asyncio.Queue(maxsize=self.queue_depth)
+        self._dispatch_tasks[client_id] = asyncio.create_task(self._command_dispatcher(client))
         
         logger.info(f"Client {client_id} connected from {client.ip}")
         
@@ -148,17 +256,35 @@ class CyberCorpServer:
             logger.error(f"Error handling client {client_id}: {e}")
         finally:
             # Cleanup
-            del self.clients[client_id]
+            self.clients.remove(client_id)
             del self.command_queue[client_id]
+            self._dispatch_tasks.pop(client_id).cancel()
+            orphaned = self._fail_pending(client_id, ConnectionError(f"Client {client_id} disconnected"))
+            self.observers.discard(client_id)
+            for command_id in [k for k, v in self.result_routes.items() if v == client_id]:
+                del self.result_routes[command_id]
+            # Controllers waiting on this node hear about it now, not at route expiry
+            for command_id, requester_id in orphaned.items():
+                if requester_id in self.clients:
+                    await self._send_message(self.clients[requester_id], {
+                        'type': 'error',
+                        'command_id': command_id,
+                        'message': f'Target client {client_id} disconnected'
+                    })
     
     async def _handle_message(self, client: Client, message: str):
         """Handle incoming message from client"""
+        if is_frame_chunk(message):
+            await self._relay_frame_chunk(client, message)
+            return
+        
         try:
-            data = json.loads(message)
+            data = decode_message(message)
             msg_type = data.get('type')
             
             if msg_type == 'heartbeat':
                 client.last_heartbeat = datetime.now()
+                self.clients.touch(client.id)
                 await self._send_message(client, {'type': 'heartbeat_ack'})
                 
             elif msg_type == 'register':
@@ -168,30 +294,64 @@ class CyberCorpServer:
                 client.hostname = data.get('system_info', {}).get('hostname')
                 client.platform = data.get('system_info', {}).get('platform')
                 client.client_start_time = datetime.fromisoformat(data.get('client_start_time')) if data.get('client_start_time') else None
+                self.clients.update(client)
                 logger.info(f"Client {client.id} registered: user={client.user_session}, host={client.hostname}")
                 
+                # Codec negotiation; clients without an offer stay on JSON text
+                if data.get('wire'):
+                    codec = negotiate(data['wire'], self.wire_codecs, self.wire_compression)
+                    await self._send_message(client, dict(codec.to_dict(), type='wire_ack'))
+                    client.codec = codec
+                    logger.info(f"Client {client.id} wire codec: {codec.name}, compression={codec.compression}")
+                
             elif msg_type == 'command_result':
                 # Store command result
                 command_id = data.get('command_id')
                 if command_id:
-                    self.command_results[command_id] = data.get('result')
+                    self.command_results.put(command_id, data.get('result'))
+                    future = self.pending_commands.pop(command_id, None)
+                    if future and not future.done():
+                        future.set_result(data.get('result'))
                     logger.info(f"Received result for command {command_id}")
                 
-                # Forward result back to requesting client if it was a forwarded command
-                # Check if there's a from_client field in the original message
-                # For now, broadcast to all management clients
-                for cid, c in self.clients.items():
-                    if c.capabilities and c.capabilities.get('management'):
-                        result_msg = {
-                            'type': 'command_result',
-                            'from_client': client.id,
-                            'command_id': command_id,
-                            'result': data.get('result'),
-                            'error': data.get('error'),
-                            'timestamp': data.get('timestamp')
-                        }
-                        await self._send_message(c, result_msg)
+                # Route the result to the client that forwarded the command,
+                # plus any clients that explicitly asked to observe everything
+                result_msg = {
+                    'type': 'command_result',
+                    'from_client': client.id,
+                    'command_id': command_id,
+                    'result': data.get('result'),
+                    'error': data.get('error'),
+                    'timestamp': data.get('timestamp')
+                }
+                recipients = [cid for cid in self.observers if cid != client.id]
+                requester_id = self.result_routes.pop(command_id, None) if command_id else None
+                if requester_id and requester_id not in recipients:
+                    recipients.append(requester_id)
+                
+                if recipients:
+                    # Serialize once per distinct codec among the recipients
+                    payloads = {}
+                    for cid in recipients:
+                        if cid in self.clients:
+                            target = self.clients[cid]
+                            key = (target.codec.name, target.codec.compression, target.codec.threshold)
+                            if key not in payloads:
+                                payloads[key] = target.codec.encode(result_msg)
+                            await self._send_raw(target, payloads[key])
+                elif command_id:
+                    logger.debug(f"No recipient for result of command {command_id}")
                     
+            elif msg_type == 'observe':
+                # Opt-in subscription to every command result (dashboards)
+                enabled = data.get('enabled', True)
+                if enabled:
+                    self.observers.add(client.id)
+                else:
+                    self.observers.discard(client.id)
+                await self._send_message(client, {'type': 'observe_ack', 'enabled': enabled})
+                logger.info(f"Client {client.id} {'now observes' if enabled else 'stopped observing'} all command results")
+                
             elif msg_type == 'status':
                 # Client status update
                 logger.info(f"Client {client.id} status: {data.get('status')}")
@@ -200,25 +360,20 @@ class CyberCorpServer:
                 # Handle client requests
                 command = data.get('command')
                 if command == 'list_clients':
-                    # Send list of all connected clients
-                    client_list = []
-                    for cid, c in self.clients.items():
-                        client_info = {
-                            'id': c.id,
-                            'ip': c.ip,
-                            'connected_at': c.connected_at.isoformat(),
-                            'user_session': c.user_session,
-                            'hostname': c.hostname,
-                            'platform': c.platform,
-                            'capabilities': c.capabilities or {},
-                            'client_start_time': c.client_start_time.isoformat() if c.client_start_time else None
-                        }
-                        client_list.append(client_info)
-                    
-                    await self._send_message(client, {
-                        'type': 'client_list',
-                        'clients': client_list
-                    })
+                    # Optional filter: {'hostname', 'user_session', 'capability'}
+                    filters = data.get('filter')
+                    if filters:
+                        client_list = [c.summary() for c in self.clients.find(
+                            hostname=filters.get('hostname'),
+                            user_session=filters.get('user_session'),
+                            capability=filters.get('capability'))]
+                        await self._send_message(client, {
+                            'type': 'client_list',
+                            'clients': client_list
+                        })
+                    else:
+                        client_list = self.clients.client_list()
+                        await self._send_raw(client, self._encoded_client_list(client.codec))
                     logger.info(f"Sent client list to {client.id}: {len(client_list)} clients")
                 
             elif msg_type == 'forward_command':
@@ -228,92 +383,218 @@ class CyberCorpServer:
                 
                 if target_client_id and command_data:
                     if target_client_id in self.clients:
-                        target_client = self.clients[target_client_id]
                         # Add source client info
                         command_data['from_client'] = client.id
-                        await self._send_message(target_client, command_data)
+                        command_data.setdefault('command_id', self._new_command_id())
+                        # Keep the route until the node's own timeout has had a chance to fire
+                        params = command_data.get('params') or {}
+                        try:
+                            node_timeout = float(params.get('timeout', 30.0) if isinstance(params, dict) else 30.0)
+                            if not math.isfinite(node_timeout):
+                                raise ValueError(node_timeout)
+                        except (TypeError, ValueError):
+                            await self._send_message(client, {
+                                'type': 'error',
+                                'command_id': command_data['command_id'],
+                                'message': f"Invalid timeout: {params.get('timeout')!r}"
+                            })
+                            return
+                        future = self._enqueue_command(
+                            target_client_id, command_data,
+                            timeout=max(self.command_timeout, node_timeout + 5.0)
+                        )
+                        if future.done() and future.exception():
+                            await self._send_message(client, {
+                                'type': 'error',
+                                'command_id': command_data['command_id'],
+                                'message': str(future.exception())
+                            })
+                            return
+                        # Nobody awaits forwarded futures; consume timeouts quietly
+                        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+                        self.result_routes[command_data['command_id']] = client.id
                         logger.info(f"Forwarded command from {client.id} to {target_client_id}")
                         
                         # Send acknowledgment
                         await self._send_message(client, {
                             'type': 'forward_ack',
                             'target_client': target_client_id,
+                            'command_id': command_data['command_id'],
                             'status': 'sent'
                         })
                     else:
                         await self._send_message(client, {
                             'type': 'error',
+                            'command_id': command_data.get('command_id'),
                             'message': f'Target client {target_client_id} not found'
                         })
                 
-        except json.JSONDecodeError:
-            logger.error(f"Invalid JSON from client {client.id}")
+        except ValueError as e:
+            logger.error(f"Invalid message from client {client.id}: {e}")
         except Exception as e:
             logger.error(f"Error handling message from {client.id}: {e}")
     
+    async def _relay_frame_chunk(self, client: Client, chunk: bytes):
+        """Pass a binary frame chunk through to whoever requested the command"""
+        try:
+            command_id = read_command_id(chunk)
+        except Exception as e:
+            logger.error(f"Invalid frame chunk from {client.id}: {e}")
+            return
+        
+        requester_id = self.result_routes.get(command_id)
+        if requester_id in self.clients:
+            await self._send_raw(self.clients[requester_id], chunk)
+        else:
+            logger.debug(f"Dropping frame chunk for unrouted command {command_id}")
+    
+    def _encoded_client_list(self, codec: WireCodec):
+        """Full client_list message, encoded once per registry change and codec"""
+        if self._client_list_version != self.clients.version:
+            self._client_list_payloads.clear()
+            self._client_list_version = self.clients.version
+        key = (codec.name, codec.compression, codec.threshold)
+        if key not in self._client_list_payloads:
+            self._client_list_payloads[key] = codec.encode({
+                'type': 'client_list',
+                'clients': self.clients.client_list()
+            })
+        return self._client_list_payloads[key]
+    
     async def _send_message(self, client: Client, message: dict):
         """Send message to client"""
         try:
-            await client.websocket.send(json.dumps(message))
+            payload = client.codec.encode(message)
+        except Exception as e:
+            logger.error(f"Error encoding message for {client.id}: {e}")
+            return
+        await self._send_raw(client, payload)
+    
+    async def _send_raw(self, client: Client, payload):
+        """Send an already serialized message to client"""
+        try:
+            await client.websocket.send(payload)
         except Exception as e:
             logger.error(f"Error sending message to {client.id}: {e}")
     
-    async def send_command(self, client_id: str, command: CommandType, params: dict = None):
-        """Send command to specific client"""
-        if client_id not in self.clients:
-            logger.error(f"Client {client_id} not found")
-            return None
-            
-        client = self.clients[client_id]
-        command_id = f"cmd_{int(time.time() * 1000)}"
+    def _new_command_id(self) -> str:
+        """Generate a collision-free command ID"""
+        return f"cmd_{uuid.uuid4().hex}"
+    
+    def _enqueue_command(self, client_id: str, message: dict,
+                         timeout: Optional[float] = None) -> CommandFuture:
+        """Queue a command message for a client and return its result future"""
+        loop = asyncio.get_running_loop()
+        command_id = message['command_id']
+        future = CommandFuture(command_id, client_id, loop=loop)
+        
+        queue = self.command_queue.get(client_id)
+        if queue is None:
+            future.set_exception(KeyError(f"Client {client_id} not found"))
+            return future
+        
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            logger.warning(f"Command queue for {client_id} is full ({queue.maxsize}), rejecting {command_id}")
+            future.set_exception(CommandQueueFull(
+                f"Command queue for {client_id} is full ({queue.maxsize} pending)"
+            ))
+            return future
+        
+        self.pending_commands[command_id] = future
+        
+        # Expire the future if no result ever arrives
+        timeout = self.command_timeout if timeout is None else timeout
+        if timeout and timeout > 0:
+            handle = loop.call_later(timeout, self._expire_command, command_id, timeout)
+            future.add_done_callback(lambda _: handle.cancel())
+        
+        return future
+    
+    def _expire_command(self, command_id: str, timeout: float):
+        """Fail a pending command whose result did not arrive in time"""
+        self.result_routes.pop(command_id, None)
+        future = self.pending_commands.pop(command_id, None)
+        if future and not future.done():
+            future.set_exception(asyncio.TimeoutError(
+                f"No result for command {command_id} after {timeout} seconds"
+            ))
+    
+    def _fail_pending(self, client_id: str, error: Exception) -> Dict[str, str]:
+        """Fail all pending commands addressed to a client
+        
+        Returns the dropped result routes as {command_id: requester_id}.
+        """
+        orphaned = {}
+        for command_id, future in list(self.pending_commands.items()):
+            if future.client_id == client_id:
+                del self.pending_commands[command_id]
+                requester_id = self.result_routes.pop(command_id, None)
+                if requester_id:
+                    orphaned[command_id] = requester_id
+                if not future.done():
+                    future.set_exception(error)
+        return orphaned
+    
+    async def send_command(self, client_id: str, command: Union[CommandType, str],
+                           params: dict = None, timeout: Optional[float] = None) -> CommandFuture:
+        """Send command to specific client
+        
+        Returns a future that resolves with the command result. The future
+        fails with KeyError for unknown clients, CommandQueueFull when the
+        client's queue is at its depth limit and asyncio.TimeoutError when
+        no result arrives within the timeout.
+        """
+        command_name = command.value if isinstance(command, CommandType) else command
+        command_id = self._new_command_id()
         
         message = {
             'type': 'command',
             'command_id': command_id,
-            'command': command.value,
+            'command': command_name,
             'params': params or {}
         }
         
-        await self._send_message(client, message)
-        logger.info(f"Sent command {command.value} to {client_id}")
+        future = self._enqueue_command(client_id, message, timeout)
+        if future.done() and future.exception():
+            logger.error(f"Failed to queue {command_name} for {client_id}: {future.exception()}")
+        else:
+            logger.info(f"Queued command {command_name} for {client_id}")
         
-        return command_id
+        return future
     
-    async def _heartbeat_monitor(self):
-        """Monitor client heartbeats"""
+    async def _command_dispatcher(self, client: Client):
+        """Deliver queued commands to a client in order"""
+        queue = self.command_queue[client.id]
         while True:
+            message = await queue.get()
             try:
-                now = datetime.now()
-                disconnected = []
-                
-                for client_id, client in self.clients.items():
-                    if (now - client.last_heartbeat).total_seconds() > 60:
-                        logger.warning(f"Client {client_id} heartbeat timeout")
-                        disconnected.append(client_id)
-                
-                # Close timed out connections
-                for client_id in disconnected:
-                    if client_id in self.clients:
-                        await self.clients[client_id].websocket.close()
-                        
+                await self._send_message(client, message)
             except Exception as e:
-                logger.error(f"Heartbeat monitor error: {e}")
-                
-            await asyncio.sleep(30)
+                logger.error(f"Command dispatcher error for {client.id}: {e}")
+            finally:
+                queue.task_done()
     
-    async def _command_processor(self):
-        """Process queued commands"""
+    async def _heartbeat_monitor(self):
+        """Close connections whose heartbeat deadline passed
+        
+        Deadlines live in the registry's timing wheel, so each tick only
+        looks at the clients that are actually due.
+        """
         while True:
             try:
-                for client_id, queue in self.command_queue.items():
-                    if queue and client_id in self.clients:
-                        command = queue.pop(0)
-                        await self.send_command(client_id, command['type'], command.get('params'))
+                for client_id in self.clients.expired():
+                    logger.warning(f"Client {client_id} heartbeat timeout")
+                    # Close in the background; the handler's cleanup unregisters it
+                    asyncio.create_task(self.clients[client_id].websocket.close())
+                
+                self.command_results.purge_expired()
                         
             except Exception as e:
-                logger.error(f"Command processor error: {e}")
+                logger.error(f"Heartbeat monitor error: {e}")
                 
-            await asyncio.sleep(0.1)
+            await asyncio.sleep(self.clients.wheel.tick)
     
     async def _console_interface(self):
         """Interactive console for server control"""
@@ -376,8 +657,8 @@ class CyberCorpServer:
                     
                     try:
                         command_type = CommandType(command_name)
-                        cmd_id = await self.send_command(client_id, command_type, {'data': params})
-                        print(f"Command sent with ID: {cmd_id}")
+                        future = await self.send_command(client_id, command_type, {'data': params})
+                        print(f"Command sent with ID: {future.command_id}")
                     except ValueError:
                         print(f"Unknown command: {command_name}")
                         
@@ -0,0 +1,93 @@
+"""
+Startup profiling for the node client
+
+StartupTimer records when each startup phase finishes. profile_imports runs
+`python -X importtime` on a module in a fresh interpreter and reports which
+imports the time goes to.
+"""
+
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)')
+
+
+class StartupTimer:
+    """Phase marks relative to when the timer was created"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.marks: Dict[str, float] = {}
+
+    def mark(self, phase: str) -> float:
+        """Record a phase the first time it completes; returns its offset"""
+        if phase not in self.marks:
+            self.marks[phase] = time.perf_counter() - self.start
+        return self.marks[phase]
+
+    def elapsed(self, phase: Optional[str] = None) -> Optional[float]:
+        if phase is None:
+            return time.perf_counter() - self.start
+        return self.marks.get(phase)
+
+    def report(self) -> str:
+        lines = ['Startup phases:']
+        previous = 0.0
+        for phase, at in self.marks.items():
+            lines.append(f"  {phase:<12} {at * 1000:9.1f} ms  (+{(at - previous) * 1000:.1f} ms)")
+            previous = at
+        return '\n'.join(lines)
+
+
+def parse_importtime(output: str) -> List[Dict]:
+    """Parse `-X importtime` output into entries with times in milliseconds"""
+    entries = []
+    for line in output.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append({
+                'module': module,
+                'self_ms': int(self_us) / 1000,
+                'cumulative_ms': int(cumulative_us) / 1000,
+                'depth': (len(indent) - 1) // 2
+            })
+    return entries
+
+
+def profile_imports(module: str, cwd: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+    """Import `module` in a fresh interpreter under -X importtime
+
+    Returns (entries, error), where error is the tail of the traceback if the
+    import failed.
+    """
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=cwd or os.getcwd(),
+        capture_output=True,
+        text=True
+    )
+    entries = parse_importtime(proc.stderr)
+    error = None
+    if proc.returncode != 0:
+        traceback_lines = [l for l in proc.stderr.splitlines() if not l.startswith('import time:')]
+        error = '\n'.join(traceback_lines[-3:])
+    return entries, error
+
+
+def format_import_report(entries: List[Dict], top: int = 25) -> str:
+    """Slowest imports by cumulative time, plus their own (self) time"""
+    if not entries:
+        return 'No import timings recorded'
+    # Every import at depth 0 was triggered directly by the profiled module
+    total = sum(e['cumulative_ms'] for e in entries if e['depth'] == 0)
+    lines = [f"Imports: {len(entries)} modules, {total:.1f} ms",
+             f"  {'cumulative':>10} {'self':>8}  module"]
+    for entry in sorted(entries, key=lambda e: e['cumulative_ms'], reverse=True)[:top]:
+        lines.append(f"  {entry['cumulative_ms']:8.1f}ms {entry['self_ms']:6.1f}ms  "
+                     f"{'  ' * entry['depth']}{entry['module']}")
+    return '\n'.join(lines)
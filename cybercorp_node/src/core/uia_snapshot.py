@@ -0,0 +1,423 @@
+"""
+UIA snapshot service: cached, lazily expanded automation trees with diffs
+
+Walking a whole Cursor/VSCode automation tree takes seconds and yields
+megabytes of JSON. The service keeps the tree it has read so far per hwnd
+and only walks what is asked for:
+
+- `path` + `depth` expand one subtree; nodes at the depth limit are left
+  unexpanded (no 'Children', only 'ChildCount') and can be expanded later.
+- Every change to a cached tree produces a new version. Callers that hold a
+  version pass it as `since` and get back only a structural diff.
+
+Trees use the same node layout as get_window_uia_structure ('ControlType',
+'Name', ..., 'Children'), but child keys are stable across sibling
+insertions: '<ControlType>_<AutomationId or Name>' with a '#n' suffix for
+repeats, instead of a positional index. A path is the list of child keys from
+the root.
+
+Stored trees are never mutated. Merging a walk copies only the nodes along
+the path and shares everything else, so keeping several versions is cheap and
+diffing skips shared subtrees by identity.
+"""
+
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+CHILDREN = 'Children'
+CHILD_COUNT = 'ChildCount'
+
+DEFAULT_DEPTH = 3
+DEFAULT_MAX_NODES = 5000
+DEFAULT_HISTORY = 8
+
+_MISSING = object()
+
+
+def child_key(props: Dict[str, Any], seen: Dict[str, int]) -> str:
+    """Stable key for a child, given the keys already used by its siblings"""
+    control_type = props.get('ControlType') or 'Unknown'
+    automation_id = props.get('AutomationId') or ''
+    name = props.get('Name') or ''
+    if automation_id:
+        base = f"{control_type}_{automation_id}"
+    elif name:
+        base = f"{control_type}_{''.join(c if c.isalnum() else '_' for c in name[:20])}"
+    else:
+        base = control_type
+
+    count = seen.get(base, 0)
+    seen[base] = count + 1
+    return base if count == 0 else f"{base}#{count}"
+
+
+def node_props(node: Dict[str, Any]) -> Dict[str, Any]:
+    """A node without its children"""
+    return {k: v for k, v in node.items() if k != CHILDREN}
+
+
+def get_subtree(tree: Dict[str, Any], path: Sequence[str]) -> Optional[Dict[str, Any]]:
+    """Node at path, or None if it is not in the (expanded part of the) tree"""
+    node = tree
+    for key in path:
+        children = node.get(CHILDREN)
+        if not children or key not in children:
+            return None
+        node = children[key]
+    return node
+
+
+def expanded_to(node: Dict[str, Any], depth: int) -> bool:
+    """Whether node is expanded at least `depth` levels down everywhere"""
+    if depth <= 0:
+        return True
+    if CHILDREN not in node:
+        return node.get(CHILD_COUNT) == 0
+    return all(expanded_to(child, depth - 1) for child in node[CHILDREN].values())
+
+
+def replace_subtree(tree: Dict[str, Any], path: Sequence[str],
+                    subtree: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of tree with the node at path replaced, sharing everything else"""
+    if not path:
+        return subtree
+    key = path[0]
+    children = dict(tree.get(CHILDREN) or {})
+    if key not in children:
+        raise KeyError(f"Path element not found: {key}")
+    children[key] = replace_subtree(children[key], path[1:], subtree)
+    updated = dict(tree)
+    updated[CHILDREN] = children
+    return updated
+
+
+def graft_unexpanded(fresh: Dict[str, Any], cached: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Keep cached children below the limit of a fresh walk
+
+    Where the fresh walk stopped (no 'Children') but the cached node with the
+    same key was expanded and still has the same number of children, the
+    cached descendants are kept instead of collapsing what the caller already
+    expanded.
+    """
+    if cached is None:
+        return fresh
+    if CHILDREN not in fresh:
+        if CHILDREN in cached and cached.get(CHILD_COUNT) == fresh.get(CHILD_COUNT):
+            grafted = dict(fresh)
+            grafted[CHILDREN] = cached[CHILDREN]
+            return grafted
+        return fresh
+
+    cached_children = cached.get(CHILDREN) or {}
+    children = {key: graft_unexpanded(child, cached_children.get(key))
+                for key, child in fresh[CHILDREN].items()}
+    grafted = dict(fresh)
+    grafted[CHILDREN] = children
+    return grafted
+
+
+def diff_trees(old: Optional[Dict[str, Any]], new: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+    """Structural diff turning `old` into `new`
+
+    Returns:
+        {'added': [{'path', 'node'}], 'removed': [{'path'}],
+         'changed': [{'path', 'set': {field: value}, 'unset': [field]}]}
+        Only the top-most added/removed nodes are listed. Children of a node
+        that is unexpanded in `new` are not compared.
+    """
+    diff = {'added': [], 'removed': [], 'changed': []}
+    if old is None:
+        diff['added'].append({'path': [], 'node': new})
+        return diff
+    _diff_node(old, new, [], diff)
+    return diff
+
+
+def _diff_node(old, new, path, diff):
+    if old is new:
+        return
+
+    old_props = node_props(old)
+    new_props = node_props(new)
+    if old_props != new_props:
+        changed = {'path': list(path),
+                   'set': {k: v for k, v in new_props.items() if old_props.get(k, _MISSING) != v},
+                   'unset': [k for k in old_props if k not in new_props]}
+        if CHILDREN in old and CHILDREN not in new:
+            changed['unset'].append(CHILDREN)
+        diff['changed'].append(changed)
+    elif CHILDREN in old and CHILDREN not in new:
+        diff['changed'].append({'path': list(path), 'set': {}, 'unset': [CHILDREN]})
+
+    if CHILDREN not in new:
+        return
+
+    old_children = old.get(CHILDREN)
+    new_children = new[CHILDREN]
+    if old_children is new_children:
+        return
+    if old_children is None:
+        # Newly expanded: everything below is new to the caller
+        if not new_children:
+            diff['changed'].append({'path': list(path), 'set': {CHILDREN: {}}, 'unset': []})
+        for key, child in new_children.items():
+            diff['added'].append({'path': path + [key], 'node': child})
+        return
+
+    for key in old_children:
+        if key not in new_children:
+            diff['removed'].append({'path': path + [key]})
+    for key, child in new_children.items():
+        if key not in old_children:
+            diff['added'].append({'path': path + [key], 'node': child})
+        else:
+            _diff_node(old_children[key], child, path + [key], diff)
+
+
+def diff_is_empty(diff: Dict[str, List[Any]]) -> bool:
+    return not (diff['added'] or diff['removed'] or diff['changed'])
+
+
+def diff_size(diff: Dict[str, List[Any]]) -> int:
+    return len(diff['added']) + len(diff['removed']) + len(diff['changed'])
+
+
+def apply_diff(tree: Optional[Dict[str, Any]], diff: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Apply a diff from diff_trees to a copy of tree (callers' mirror side)"""
+    for entry in diff.get('added', []):
+        if not entry['path']:
+            tree = entry['node']
+
+    def edit(node, path, change):
+        if not path:
+            return change(node)
+        node = dict(node)
+        children = dict(node.get(CHILDREN) or {})
+        children[path[0]] = edit(children[path[0]], path[1:], change)
+        node[CHILDREN] = children
+        return node
+
+    def edit_children(parent_path, change):
+        def apply(node):
+            node = dict(node)
+            children = dict(node.get(CHILDREN) or {})
+            change(children)
+            node[CHILDREN] = children
+            return node
+        return lambda t: edit(t, parent_path, apply)
+
+    for entry in diff.get('removed', []):
+        path = entry['path']
+        tree = edit_children(path[:-1], lambda c, k=path[-1]: c.pop(k, None))(tree)
+
+    for entry in diff.get('changed', []):
+        def change(node, entry=entry):
+            node = dict(node)
+            for field in entry.get('unset', []):
+                node.pop(field, None)
+            node.update(entry.get('set', {}))
+            return node
+        tree = edit(tree, entry['path'], change)
+
+    for entry in diff.get('added', []):
+        path = entry['path']
+        if path:
+            tree = edit_children(path[:-1], lambda c, k=path[-1], n=entry['node']: c.__setitem__(k, n))(tree)
+    return tree
+
+
+class RecordedWalker:
+    """Walk a recorded tree (get_window_uia_structure or snapshot output)
+
+    Lets the snapshot logic run without Windows, e.g. on trees recorded from
+    a live node. `trees` maps hwnd to its recorded root node; replace an
+    entry to simulate the window changing.
+    """
+
+    def __init__(self, trees: Dict[int, Dict[str, Any]]):
+        self.trees = trees
+
+    def root(self, hwnd: int) -> Dict[str, Any]:
+        if hwnd not in self.trees:
+            raise ValueError(f"No recorded tree for hwnd {hwnd}")
+        return self.trees[hwnd]
+
+    def children(self, element: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return list((element.get(CHILDREN) or {}).values())
+
+    def describe(self, element: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: v for k, v in element.items() if k not in (CHILDREN, CHILD_COUNT, 'Texts')}
+
+
+class PywinautoWalker:
+    """Walk live UIA elements through pywinauto (Windows only)
+
+    Reads element_info once per node; the previous extractor fetched it
+    again for every child just to build the child's key.
+    """
+
+    def root(self, hwnd: int):
+        from pywinauto import Application
+
+        app = Application(backend="uia").connect(handle=hwnd)
+        return app.window(handle=hwnd).wrapper_object()
+
+    def children(self, element) -> list:
+        return element.children()
+
+    def describe(self, element) -> Dict[str, Any]:
+        info = element.element_info
+        props = {
+            'ControlType': info.control_type,
+            'Name': info.name or '',
+            'AutomationId': getattr(info, 'automation_id', '') or '',
+            'ClassName': info.class_name or '',
+            'IsEnabled': info.enabled,
+            'IsVisible': info.visible,
+            'Rectangle': str(info.rectangle)
+        }
+        if info.control_type in ('Edit', 'ComboBox'):
+            try:
+                props['Value'] = element.get_value() if hasattr(element, 'get_value') else ''
+            except Exception:
+                props['Value'] = ''
+        return props
+
+
+class _WindowCache:
+    def __init__(self):
+        self.version = 0
+        self.tree: Optional[Dict[str, Any]] = None
+        self.history: 'OrderedDict[int, Dict[str, Any]]' = OrderedDict()
+        self.walked_at = 0.0
+
+
+class UIASnapshotService:
+    """Per-hwnd cache of lazily expanded automation trees
+
+    Args:
+        walker: Object with root(hwnd), children(element) and
+            describe(element); defaults to the pywinauto walker
+        history: Versions kept per hwnd for `since` diffs
+        max_nodes: Default cap on nodes read by one snapshot
+    """
+
+    def __init__(self, walker: Any = None, history: int = DEFAULT_HISTORY,
+                 max_nodes: int = DEFAULT_MAX_NODES):
+        self.walker = walker or PywinautoWalker()
+        self.history = max(1, history)
+        self.max_nodes = max_nodes
+        self._windows: Dict[int, _WindowCache] = {}
+        self._lock = threading.Lock()
+
+    def snapshot(self, hwnd: int, path: Optional[Sequence[str]] = None,
+                 depth: int = DEFAULT_DEPTH, since: Optional[int] = None,
+                 max_age: float = 0.0, max_nodes: Optional[int] = None) -> Dict[str, Any]:
+        """Read (part of) a window's tree and return it, or a diff against `since`
+
+        Args:
+            hwnd: Window handle
+            path: Child keys leading to the subtree to expand (default: root)
+            depth: Levels to read below the subtree root
+            since: Version the caller holds; if still in history only the
+                diff from it to the new version is returned
+            max_age: Serve from cache without walking if the cached subtree
+                is expanded deep enough and was read within this many seconds
+            max_nodes: Cap on nodes read; the rest stays unexpanded
+
+        Returns:
+            Dict with 'hwnd', 'version', 'path', 'nodes_read' and either
+            'tree' (the subtree at path) or 'base_version' + 'diff'
+        """
+        path = list(path or [])
+        with self._lock:
+            window = self._windows.setdefault(hwnd, _WindowCache())
+            cached = get_subtree(window.tree, path) if window.tree is not None else None
+
+            nodes_read = 0
+            fresh_enough = time.monotonic() - window.walked_at <= max_age
+            if not (cached is not None and fresh_enough and expanded_to(cached, depth)):
+                element = self._resolve(hwnd, path)
+                budget = [max_nodes or self.max_nodes]
+                subtree = self._walk(element, depth, budget)
+                nodes_read = (max_nodes or self.max_nodes) - budget[0]
+                subtree = graft_unexpanded(subtree, cached)
+                self._store(window, subtree, path)
+
+            response = {'hwnd': hwnd, 'version': window.version, 'path': path,
+                        'nodes_read': nodes_read}
+            base = window.history.get(since) if since is not None else None
+            if base is not None:
+                response['base_version'] = since
+                response['diff'] = diff_trees(base, window.tree)
+            else:
+                response['tree'] = get_subtree(window.tree, path)
+            return response
+
+    def invalidate(self, hwnd: Optional[int] = None):
+        """Forget the cached tree of one window, or of all windows"""
+        with self._lock:
+            if hwnd is None:
+                self._windows.clear()
+            else:
+                self._windows.pop(hwnd, None)
+
+    def versions(self, hwnd: int) -> List[int]:
+        """Versions of a window still available as `since`"""
+        window = self._windows.get(hwnd)
+        return list(window.history) if window else []
+
+    def _store(self, window: _WindowCache, subtree: Dict[str, Any], path: List[str]):
+        if window.tree is None:
+            if path:
+                raise ValueError("Cannot expand a path before the window root was read")
+            new_tree = subtree
+        else:
+            new_tree = replace_subtree(window.tree, path, subtree)
+
+        window.walked_at = time.monotonic()
+        if window.tree is not None and diff_is_empty(diff_trees(window.tree, new_tree)):
+            return
+
+        window.version += 1
+        window.tree = new_tree
+        window.history[window.version] = new_tree
+        while len(window.history) > self.history:
+            window.history.popitem(last=False)
+
+    def _resolve(self, hwnd: int, path: Sequence[str]):
+        """Find the live element at path by walking down from the root"""
+        element = self.walker.root(hwnd)
+        for depth, key in enumerate(path):
+            seen: Dict[str, int] = {}
+            for child in self.walker.children(element):
+                if child_key(self.walker.describe(child), seen) == key:
+                    element = child
+                    break
+            else:
+                raise ValueError(f"Element not found at {'/'.join(path[:depth + 1])}")
+        return element
+
+    def _walk(self, element: Any, depth: int, budget: List[int]) -> Dict[str, Any]:
+        node = self.walker.describe(element)
+        budget[0] -= 1
+        children = self.walker.children(element)
+        node[CHILD_COUNT] = len(children)
+        if depth <= 0 or budget[0] <= 0:
+            return node
+
+        node[CHILDREN] = {}
+        seen: Dict[str, int] = {}
+        for child in children:
+            if budget[0] <= 0:
+                # Out of budget: leave this node unexpanded rather than partial
+                del node[CHILDREN]
+                break
+            child_node = self._walk(child, depth - 1, budget)
+            node[CHILDREN][child_key(child_node, seen)] = child_node
+        return node
@@ -0,0 +1,172 @@
+"""
+Wire codecs for the node protocol
+
+Clients that understand codec negotiation add a `wire` offer to their
+`register` message. The server answers with a `wire_ack` naming the codec and
+compression it picked, and from then on both sides send binary envelopes:
+
+    1 byte header (format | FLAG_DEFLATE) + encoded (optionally deflated) body
+
+Envelopes are self-describing, so a receiver can always decode whatever
+arrives: text frames are plain JSON (the legacy format), binary envelopes say
+how they were encoded. Clients that never send an offer keep getting JSON text.
+"""
+
+import json
+import zlib
+import logging
+from typing import Any, Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Envelope header byte
+FORMAT_JSON = 0x01      # UTF-8 JSON body (json or orjson)
+FORMAT_MSGPACK = 0x02   # MessagePack body
+FLAG_DEFLATE = 0x10     # Body is zlib-compressed
+
+DEFAULT_COMPRESSION_THRESHOLD = 4096
+
+
+def _json_default(obj):
+    # Match json.dumps(default=str) behaviour for datetimes and the like
+    return str(obj)
+
+
+def available_codecs() -> List[str]:
+    """Codecs usable in this process, fastest first"""
+    codecs = []
+    if msgpack is not None:
+        codecs.append('msgpack')
+    if orjson is not None:
+        codecs.append('orjson')
+    codecs.append('json')
+    return codecs
+
+
+class WireCodec:
+    """Encode/decode protocol messages for one connection
+
+    Args:
+        name: 'json', 'orjson' or 'msgpack'
+        compression: 'deflate' or None
+        threshold: Only deflate bodies larger than this many bytes
+        level: zlib compression level
+    """
+
+    def __init__(self, name: str = 'json', compression: Optional[str] = None,
+                 threshold: int = DEFAULT_COMPRESSION_THRESHOLD, level: int = 1):
+        if name not in available_codecs():
+            raise ValueError(f"Codec not available: {name}")
+        self.name = name
+        self.compression = compression
+        self.threshold = threshold
+        self.level = level
+
+    @property
+    def legacy(self) -> bool:
+        """Plain JSON text frames, as understood by clients that never negotiated"""
+        return self.name == 'json' and not self.compression
+
+    def encode(self, message: Dict[str, Any]) -> Union[str, bytes]:
+        """Encode a message for sending"""
+        if self.legacy:
+            return json.dumps(message)
+
+        if self.name == 'msgpack':
+            header = FORMAT_MSGPACK
+            body = msgpack.packb(message, default=_json_default, use_bin_type=True)
+        elif self.name == 'orjson':
+            header = FORMAT_JSON
+            body = orjson.dumps(message, default=_json_default, option=orjson.OPT_NON_STR_KEYS)
+        else:
+            header = FORMAT_JSON
+            body = json.dumps(message).encode('utf-8')
+
+        if self.compression == 'deflate' and len(body) > self.threshold:
+            header |= FLAG_DEFLATE
+            body = zlib.compress(body, self.level)
+
+        return bytes((header,)) + body
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'codec': self.name, 'compression': self.compression, 'threshold': self.threshold}
+
+
+LEGACY_CODEC = WireCodec('json')
+
+
+def decode_message(message: Union[str, bytes]) -> Dict[str, Any]:
+    """Decode a message in any supported wire format"""
+    if isinstance(message, str):
+        return json.loads(message)
+
+    if not message:
+        raise ValueError("Empty message")
+    if message[:1] in (b'{', b'['):
+        # JSON sent as a binary frame by an older peer
+        return json.loads(message)
+
+    header = message[0]
+    body = message[1:]
+    if header & FLAG_DEFLATE:
+        body = zlib.decompress(body)
+
+    fmt = header & 0x0F
+    if fmt == FORMAT_MSGPACK:
+        if msgpack is None:
+            raise ValueError("Received MessagePack message but msgpack is not installed")
+        return msgpack.unpackb(body, raw=False, strict_map_key=False)
+    if fmt == FORMAT_JSON:
+        return orjson.loads(body) if orjson is not None else json.loads(body)
+    raise ValueError(f"Unknown wire format header: {header:#x}")
+
+
+def make_offer(compression: bool = True,
+               threshold: int = DEFAULT_COMPRESSION_THRESHOLD) -> Dict[str, Any]:
+    """Build the `wire` section a client adds to its register message"""
+    return {
+        'codecs': available_codecs(),
+        'compression': ['deflate'] if compression else [],
+        'compression_threshold': threshold
+    }
+
+
+def negotiate(offer: Optional[Dict[str, Any]], allowed: Optional[List[str]] = None,
+              allow_compression: bool = True) -> WireCodec:
+    """Pick the codec for a connection from a client's offer
+
+    The client's preference order wins among codecs both sides support.
+    Without an offer the legacy JSON text codec is returned.
+    """
+    if not offer:
+        return LEGACY_CODEC
+
+    supported = [c for c in available_codecs() if allowed is None or c in allowed]
+    name = next((c for c in offer.get('codecs', []) if c in supported), 'json')
+
+    compression = None
+    if allow_compression and 'deflate' in (offer.get('compression') or []):
+        compression = 'deflate'
+
+    threshold = int(offer.get('compression_threshold', DEFAULT_COMPRESSION_THRESHOLD))
+    return WireCodec(name, compression, threshold)
+
+
+def codec_from_ack(ack: Dict[str, Any]) -> WireCodec:
+    """Build the codec a server confirmed in its wire_ack"""
+    try:
+        return WireCodec(ack.get('codec', 'json'), ack.get('compression'),
+                         int(ack.get('threshold', DEFAULT_COMPRESSION_THRESHOLD)))
+    except ValueError as e:
+        logger.warning(f"Falling back to JSON: {e}")
+        return LEGACY_CODEC
@@ -0,0 +1,154 @@
+"""Content-addressed cache of vision detections
+
+Detections are keyed by a hash of the frame plus a signature of the model
+configuration, not by window and time: an unchanged window hits no matter
+how long ago it was analyzed, a changed one never gets a stale result, and
+identical dialogs in different windows share one entry. Entries are evicted
+least-recently-used once their estimated size passes a byte budget.
+"""
+
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def frame_hash(image: np.ndarray, perceptual: bool = False) -> str:
+    """Hash identifying a frame's content
+
+    Args:
+        perceptual: Use a 64-bit difference hash of a 9x8 thumbnail instead
+            of hashing every pixel. Survives re-encoding noise, but small
+            edits (a changed character) can collide.
+    """
+    if perceptual:
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        thumb = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+        bits = (thumb[:, 1:] > thumb[:, :-1]).ravel()
+        return 'p' + format(int(np.packbits(bits).view('>u8')[0]), '016x')
+    digest = hashlib.blake2b(np.ascontiguousarray(image).data, digest_size=16)
+    digest.update(repr((image.shape, image.dtype.str)).encode())
+    return 'x' + digest.hexdigest()
+
+
+def model_signature(model: Any) -> str:
+    """Short hash of a model's class and plain public configuration attributes"""
+    plain = (bool, int, float, str, tuple, list, dict, type(None))
+    config = sorted((k, repr(v)) for k, v in vars(model).items()
+                    if isinstance(v, plain) and not k.startswith('_'))
+    text = f"{type(model).__module__}.{type(model).__qualname__}:{config}"
+    return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+
+def estimate_size(value: Any) -> int:
+    """Rough deep size in bytes of nested dicts, lists and arrays"""
+    seen = set()
+    stack = [value]
+    total = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        if isinstance(obj, np.ndarray):
+            total += obj.nbytes
+            continue
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif hasattr(obj, '__dict__'):
+            stack.append(vars(obj))
+    return total
+
+
+class AnalysisCache:
+    """Byte-bounded LRU cache with hit/miss/eviction counters
+
+    Thread-safe; one instance can be shared by every analyzer in a process.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[Hashable, Tuple[Any, int]]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, size: Optional[int] = None):
+        """Store a value; values larger than the whole budget are not kept"""
+        size = estimate_size(value) if size is None else size
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Tuple[Any, bool]:
+        """(value, hit) for a key, computing and storing it on a miss"""
+        value = self.get(key)
+        if value is not None:
+            return value, True
+        value = compute()
+        self.put(key, value)
+        return value, False
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Drop one entry, or all of them"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self._bytes = 0
+            else:
+                entry = self._entries.pop(key, None)
+                if entry is not None:
+                    self._bytes -= entry[1]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+
+# Shared by all analyzers unless one is given its own
+shared_cache = AnalysisCache()
@@ -4,16 +4,22 @@ import asyncio
 import json
 import logging
 import time
-from typing import Dict, Any, List, Optional, Tuple
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Tuple
 from dataclasses import dataclass, asdict
 import numpy as np
 import cv2
 from datetime import datetime
 from pathlib import Path
 
-from .vision_model_optimized import UIVisionModelOptimized, UIElementOptimized
-from .window_cache import WindowCache
-from .remote_control import RemoteController
+from .vision_model import UIVisionModel, UIElement
+from .spatial_index import UIHierarchy
+from .incremental import IncrementalDetector
+from .analysis_cache import AnalysisCache, frame_hash, model_signature, shared_cache
+from .backends.ocr_backend import OCRBackend
+from .backends.ocr_pool import TEXT_ELEMENT_TYPES
+
+if TYPE_CHECKING:
+    from core.remote_control import RemoteController
 
 logger = logging.getLogger(__name__)
 
@@ -28,47 +34,61 @@ class WindowAnalysisResult:
     layout_structure: Dict[str, Any]
     content_summary: Dict[str, Any]
     interaction_points: List[Dict[str, Any]]
+    changes: Optional[Dict[str, Any]] = None  # Incremental mode: what changed since the last frame
     
 
 class VisionWindowAnalyzer:
     """Analyze window content using vision model"""
     
-    def __init__(self, controller: RemoteController = None):
+    def __init__(self, controller: 'RemoteController' = None, cache: Optional[AnalysisCache] = None,
+                 perceptual_hash: bool = False, ocr: Optional[OCRBackend] = None):
         self.controller = controller
-        self.vision_model = UIVisionModelOptimized()  # Use 100% accuracy optimized model
-        self.analysis_cache = {}  # Cache analysis results
-        self.cache_ttl = 60  # Cache time-to-live in seconds
-        
-    async def analyze_window(self, hwnd: int, save_visualization: bool = False) -> WindowAnalysisResult:
+        self.ocr = ocr  # Created on first read_window_text() unless given
+        self.vision_model = UIVisionModel()
+        # Detections keyed by frame content and model config, shared across
+        # windows and analyzers unless a separate cache is given
+        self.analysis_cache = cache if cache is not None else shared_cache
+        self.perceptual_hash = perceptual_hash
+        self.model_signature = model_signature(self.vision_model)
+        self.incremental = IncrementalDetector(self._detect_element_dicts)
+        
+    def _detect_element_dicts(self, image: np.ndarray) -> List[Dict[str, Any]]:
+        return [self._convert_element_to_dict(elem) for elem in self.vision_model.detect_ui_elements(image)]
+        
+    async def analyze_window(self, hwnd: int, save_visualization: bool = False,
+                             incremental: bool = False) -> WindowAnalysisResult:
         """Analyze window content and return structured data
         
         Args:
             hwnd: Window handle
             save_visualization: Whether to save visualization image
+            incremental: Diff against this window's previous frame and only
+                re-detect the changed regions; result.changes lists them
             
         Returns:
             WindowAnalysisResult with structured data
         """
         logger.info(f"Starting window analysis for hwnd: {hwnd}")
         
-        # Check cache first
-        cache_key = f"{hwnd}_{int(time.time() / self.cache_ttl)}"
-        if cache_key in self.analysis_cache:
-            logger.info("Returning cached analysis result")
-            return self.analysis_cache[cache_key]
-        
+        if incremental:
+            return await self._analyze_window_incremental(hwnd, save_visualization)
+            
         # Take screenshot directly to memory
         image = await self._capture_window_to_memory(hwnd)
         if image is None:
             logger.error(f"Failed to capture window {hwnd}")
             return None
             
-        # Run vision analysis with optimized model
-        elements = self.vision_model.detect_ui_elements(image)
-        
-        # Convert to expected format
+        # Run vision analysis with optimized model, unless this exact frame
+        # (in any window) was already analyzed with the same configuration
+        cache_key = (frame_hash(image, self.perceptual_hash), self.model_signature)
+        elements, hit = self.analysis_cache.get_or_compute(cache_key, lambda: self._detect_element_dicts(image))
+        if hit:
+            logger.info("Using cached detections for identical frame")
+        
+        # Convert to expected format (copies, so callers cannot alter the cache)
         ui_structure = {
-            'elements': [self._convert_element_to_dict(elem) for elem in elements]
+            'elements': [self._copy_element(elem) for elem in elements]
         }
         
         # Build analysis result
@@ -79,14 +99,48 @@ class VisionWindowAnalyzer:
             vis_path = self._save_visualization(image, ui_structure['elements'], hwnd)
             logger.info(f"Saved visualization: {vis_path}")
             
-        # Cache result
-        self.analysis_cache[cache_key] = result
+        return result
         
-        # Clean up old cache entries
-        self._cleanup_cache()
+    async def _analyze_window_incremental(self, hwnd: int, save_visualization: bool) -> Optional[WindowAnalysisResult]:
+        image = await self._capture_window_to_memory(hwnd)
+        if image is None:
+            logger.error(f"Failed to capture window {hwnd}")
+            return None
+            
+        update = self.incremental.update(hwnd, image)
+        # Copies: update.elements are the detector's state for the next frame
+        ui_structure = {'elements': [self._copy_element(elem) for elem in update.elements]}
+        result = self._build_analysis_result(hwnd, ui_structure, image)
+        result.changes = update.changes()
+        logger.info(f"Incremental analysis of {hwnd}: {len(update.regions)} regions "
+                    f"({update.dirty_fraction:.1%}), +{len(update.added)} -{len(update.removed)} "
+                    f"in {update.elapsed * 1000:.0f} ms")
         
+        if save_visualization:
+            vis_path = self._save_visualization(image, ui_structure['elements'], hwnd)
+            logger.info(f"Saved visualization: {vis_path}")
+            
         return result
         
+    async def watch_window(self, hwnd: int, interval: float = 0.2, max_frames: Optional[int] = None):
+        """Yield incremental results for a window whenever its elements change
+        
+        Args:
+            hwnd: Window handle
+            interval: Seconds between captures
+            max_frames: Stop after this many captures (None: run until cancelled)
+        """
+        frames = 0
+        try:
+            while max_frames is None or frames < max_frames:
+                frames += 1
+                result = await self.analyze_window(hwnd, incremental=True)
+                if result and (result.changes['added'] or result.changes['removed']):
+                    yield result
+                await asyncio.sleep(interval)
+        finally:
+            self.incremental.forget(hwnd)
+            
     async def analyze_active_window(self) -> Optional[WindowAnalysisResult]:
         """Analyze the currently active window"""
         if not self.controller:
@@ -108,9 +162,15 @@ class VisionWindowAnalyzer:
             
         return await self.analyze_window(active_window['hwnd'])
         
-    async def find_clickable_elements(self, hwnd: int) -> List[Dict[str, Any]]:
+    async def find_clickable_elements(self, hwnd: int, at: Optional[Tuple[int, int]] = None,
+                                      region: Optional[Tuple[int, int, int, int]] = None) -> List[Dict[str, Any]]:
         """Find all clickable elements in a window
         
+        Args:
+            hwnd: Window handle
+            at: Only elements containing this point, innermost first
+            region: Only elements inside this (x1, y1, x2, y2) rectangle
+        
         Returns:
             List of clickable elements with coordinates
         """
@@ -118,8 +178,17 @@ class VisionWindowAnalyzer:
         if not result:
             return []
             
+        elements = result.elements
+        if at is not None or region is not None:
+            hierarchy = UIHierarchy(elements)
+            if at is not None:
+                elements = hierarchy.path_at(*at)[::-1]
+            if region is not None:
+                inside = {id(e) for e in hierarchy.elements_in(region)}
+                elements = [e for e in elements if id(e) in inside]
+            
         clickable = []
-        for element in result.elements:
+        for element in elements:
             if element['type'] in ['button', 'input', 'menu_item']:
                 clickable.append({
                     'type': element['type'],
@@ -130,6 +199,13 @@ class VisionWindowAnalyzer:
                 
         return clickable
         
+    async def element_at(self, hwnd: int, x: int, y: int) -> Optional[Dict[str, Any]]:
+        """Innermost element of a window containing a point"""
+        result = await self.analyze_window(hwnd)
+        if not result:
+            return None
+        return UIHierarchy(result.elements).element_at(x, y)
+        
     async def find_text_regions(self, hwnd: int) -> List[Dict[str, Any]]:
         """Find all text regions in a window
         
@@ -151,6 +227,37 @@ class VisionWindowAnalyzer:
                 
         return text_regions
         
+    async def read_window_text(self, hwnd: int, types: Tuple[str, ...] = TEXT_ELEMENT_TYPES,
+                               engine: Optional[str] = None) -> List[Dict[str, Any]]:
+        """OCR only the detected text, button and input elements of a window
+        
+        The regions are read as one batch (on the OCR backend's warm pool if
+        one was started), instead of OCRing the whole window.
+        
+        Returns:
+            One entry per element read: the element dict plus 'text',
+            'detections' (window coordinates) and 'ocr_time'
+        """
+        image = await self._capture_window_to_memory(hwnd)
+        if image is None:
+            logger.error(f"Failed to capture window {hwnd}")
+            return []
+            
+        cache_key = (frame_hash(image, self.perceptual_hash), self.model_signature)
+        elements, _ = self.analysis_cache.get_or_compute(cache_key, lambda: self._detect_element_dicts(image))
+        elements = [self._copy_element(elem) for elem in elements if elem['type'] in types]
+        
+        if self.ocr is None:
+            self.ocr = OCRBackend()
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(
+            None, lambda: self.ocr.detect_text_in_regions(image, elements, types=None, engine=engine))
+        
+        return [
+            dict(elem, text=result.text, detections=result.detections, ocr_time=result.elapsed)
+            for elem, result in zip(elements, results)
+        ]
+        
     async def get_window_layout(self, hwnd: int) -> Dict[str, Any]:
         """Get structured layout information for a window
         
@@ -340,12 +447,17 @@ class VisionWindowAnalyzer:
         else:
             return 'mixed'
     
-    def _convert_element_to_dict(self, elem: UIElementOptimized) -> Dict[str, Any]:
-        """Convert UIElementOptimized to dictionary format"""
+    @staticmethod
+    def _copy_element(elem: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy a cached element dict, including its bbox and center lists"""
+        return dict(elem, bbox=list(elem['bbox']), center=list(elem['center']))
+            
+    def _convert_element_to_dict(self, elem: UIElement) -> Dict[str, Any]:
+        """Convert UIElement to dictionary format"""
         return {
             'type': elem.element_type,
             'bbox': list(elem.bbox),
-            'center': list(elem.center) if elem.center else [(elem.bbox[0] + elem.bbox[2])//2, (elem.bbox[1] + elem.bbox[3])//2],
+            'center': [(elem.bbox[0] + elem.bbox[2])//2, (elem.bbox[1] + elem.bbox[3])//2],
             'confidence': elem.confidence,
             'clickable': elem.clickable,
             'text': elem.text
@@ -354,20 +466,19 @@ class VisionWindowAnalyzer:
     def _save_visualization(self, image: np.ndarray, elements: List[Dict], 
                            hwnd: int) -> str:
         """Save visualization of detected elements"""
-        # Convert elements to UIElementOptimized objects for visualization
+        # Convert elements to UIElement objects for visualization
         ui_elements = []
         for elem in elements:
-            ui_elem = UIElementOptimized(
+            ui_elem = UIElement(
                 element_type=elem['type'],
                 bbox=tuple(elem['bbox']),
                 confidence=elem['confidence'],
-                clickable=elem['clickable'],
-                center=tuple(elem['center']) if elem['center'] else None,
-                area=(elem['bbox'][2] - elem['bbox'][0]) * (elem['bbox'][3] - elem['bbox'][1])
+                text=elem.get('text'),
+                clickable=elem['clickable']
             )
             ui_elements.append(ui_elem)
             
-        # Create visualization using simple drawing (optimized model doesn't have visualize_detection)
+        # Create visualization using simple drawing
         vis_image = self._create_visualization(image, ui_elements)
         
         # Save image
@@ -377,7 +488,7 @@ class VisionWindowAnalyzer:
         
         return filename
     
-    def _create_visualization(self, image: np.ndarray, elements: List[UIElementOptimized]) -> np.ndarray:
+    def _create_visualization(self, image: np.ndarray, elements: List[UIElement]) -> np.ndarray:
         """Create visualization of detected elements"""
         vis_img = image.copy()
         
@@ -394,28 +505,14 @@ class VisionWindowAnalyzer:
                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
             
             # Draw center point
-            if elem.center:
-                cv2.circle(vis_img, elem.center, 3, color, -1)
+            cv2.circle(vis_img, ((x1 + x2) // 2, (y1 + y2) // 2), 3, color, -1)
         
         return vis_img
         
-    def _cleanup_cache(self):
-        """Remove old cache entries"""
-        current_time = time.time()
-        keys_to_remove = []
-        
-        for key in self.analysis_cache:
-            # Extract timestamp from cache key
-            try:
-                hwnd, timestamp = key.split('_')
-                if current_time - float(timestamp) * self.cache_ttl > self.cache_ttl * 2:
-                    keys_to_remove.append(key)
-            except:
-                keys_to_remove.append(key)
-                
-        for key in keys_to_remove:
-            self.analysis_cache.pop(key, None)
-            
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters and size of the detection cache"""
+        return self.analysis_cache.stats()
+        
     def export_analysis(self, result: WindowAnalysisResult, format: str = 'json') -> str:
         """Export analysis result in specified format
         
@@ -462,14 +559,14 @@ Interaction Points: {len(result.interaction_points)}
 
 
 # Convenience functions
-async def analyze_window_quick(hwnd: int, controller: RemoteController) -> Dict[str, Any]:
+async def analyze_window_quick(hwnd: int, controller: 'RemoteController') -> Dict[str, Any]:
     """Quick window analysis function"""
     analyzer = VisionWindowAnalyzer(controller)
     result = await analyzer.analyze_window(hwnd)
     return asdict(result) if result else None
 
 
-async def find_ui_element(hwnd: int, element_type: str, controller: RemoteController) -> Optional[Dict[str, Any]]:
+async def find_ui_element(hwnd: int, element_type: str, controller: 'RemoteController') -> Optional[Dict[str, Any]]:
     """Find specific UI element in window"""
     analyzer = VisionWindowAnalyzer(controller)
     elements = await analyzer.find_clickable_elements(hwnd)
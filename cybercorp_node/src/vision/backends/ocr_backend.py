@@ -2,13 +2,21 @@
 
 import os
 import sys
-from typing import Optional, List, Dict, Any, Tuple, Union
+import tempfile
+import time
+from typing import Optional, List, Dict, Any, Sequence, Tuple, Union
 from abc import ABC, abstractmethod
 import numpy as np
 from PIL import Image
 import io
 import base64
 
+from ..box_ops import greedy_groups, iou
+from .ocr_pool import (DEFAULT_BATCH_SIZE, DEFAULT_PAD, TEXT_ELEMENT_TYPES, BatchStats, OCRResult,
+                       OCRWorkerPool, crop_regions, region_boxes, run_batches, run_chunk, shift_detection)
+from .ocr_router import (DEFAULT_PROFILE_PATH, OCRRouter, ProfileStore, RoutedResult, image_pixels,
+                         mean_confidence, size_class)
+
 
 class OCREngine(ABC):
     """Abstract base class for OCR engines"""
@@ -30,6 +38,18 @@ class OCREngine(ABC):
         """Check if this OCR engine is available"""
         pass
         
+    def warm_up(self) -> bool:
+        """Load models now instead of on the first request; returns availability"""
+        return self.is_available()
+        
+    def detect_text_batch(self, images: List[np.ndarray]) -> List[List[Dict[str, Any]]]:
+        """Detect text in several images, one detection list per image
+        
+        Engines with batch inference override this; the default runs the
+        images one by one.
+        """
+        return [self.detect_text(image) for image in images]
+        
 
 class WindowsOCREngine(OCREngine):
     """Windows native OCR API (Windows 10+)"""
@@ -118,16 +138,15 @@ class WindowsOCREngine(OCREngine):
         if not self.available:
             return []
             
-        # Convert to file path
+        # Convert to file path (unique, since pool workers OCR concurrently)
+        temp_path = None
         if isinstance(image, np.ndarray):
-            img = Image.fromarray(image)
-            temp_path = "temp_ocr_image.png"
-            img.save(temp_path)
-        elif isinstance(image, Image.Image):
-            temp_path = "temp_ocr_image.png"
+            image = Image.fromarray(image)
+        if isinstance(image, Image.Image):
+            fd, temp_path = tempfile.mkstemp(prefix='ocr_', suffix='.png')
+            os.close(fd)
             image.save(temp_path)
-        else:
-            temp_path = image
+        image_path = temp_path or image
             
         # Run async OCR
         import asyncio
@@ -135,12 +154,12 @@ class WindowsOCREngine(OCREngine):
         asyncio.set_event_loop(loop)
         
         try:
-            results = loop.run_until_complete(self._detect_text_async(temp_path))
+            results = loop.run_until_complete(self._detect_text_async(image_path))
             return results
         finally:
             loop.close()
             # Clean up temp file
-            if temp_path == "temp_ocr_image.png" and os.path.exists(temp_path):
+            if temp_path and os.path.exists(temp_path):
                 os.remove(temp_path)
                 
 
@@ -177,6 +196,59 @@ class EasyOCREngine(OCREngine):
                 except Exception:
                     self.available = False
                     
+    def warm_up(self) -> bool:
+        self._init_reader()
+        return self.reader is not None
+        
+    @staticmethod
+    def _format_results(results) -> List[Dict[str, Any]]:
+        detections = []
+        for bbox, text, confidence in results:
+            # Convert bbox format
+            x_coords = [p[0] for p in bbox]
+            y_coords = [p[1] for p in bbox]
+            
+            detections.append({
+                'text': text,
+                'confidence': confidence,
+                'bbox': [
+                    min(x_coords),
+                    min(y_coords),
+                    max(x_coords),
+                    max(y_coords)
+                ],
+                'polygon': bbox
+            })
+        return detections
+        
+    def detect_text_batch(self, images: List[np.ndarray]) -> List[List[Dict[str, Any]]]:
+        """Detect text in several images with one batched EasyOCR call
+        
+        readtext_batched needs equally sized inputs, so images are padded at
+        the right and bottom (coordinates stay valid) with their corner color.
+        """
+        if not self.available or not images:
+            return [[] for _ in images]
+            
+        self._init_reader()
+        if self.reader is None:
+            return [[] for _ in images]
+            
+        height = max(image.shape[0] for image in images)
+        width = max(image.shape[1] for image in images)
+        padded = []
+        for image in images:
+            canvas = np.empty((height, width) + image.shape[2:], dtype=image.dtype)
+            canvas[...] = image[0, 0]
+            canvas[:image.shape[0], :image.shape[1]] = image
+            padded.append(canvas)
+            
+        try:
+            return [self._format_results(r) for r in self.reader.readtext_batched(padded)]
+        except Exception as e:
+            print(f"EasyOCR batch error: {e}")
+            return super().detect_text_batch(images)
+            
     def detect_text(self, image: Union[np.ndarray, Image.Image, str]) -> List[Dict[str, Any]]:
         """Detect text using EasyOCR"""
         if not self.available:
@@ -197,25 +269,7 @@ class EasyOCREngine(OCREngine):
             results = self.reader.readtext(image)
             
             # Format results
-            detections = []
-            for bbox, text, confidence in results:
-                # Convert bbox format
-                x_coords = [p[0] for p in bbox]
-                y_coords = [p[1] for p in bbox]
-                
-                detections.append({
-                    'text': text,
-                    'confidence': confidence,
-                    'bbox': [
-                        min(x_coords),
-                        min(y_coords),
-                        max(x_coords),
-                        max(y_coords)
-                    ],
-                    'polygon': bbox
-                })
-                
-            return detections
+            return self._format_results(results)
             
         except Exception as e:
             print(f"EasyOCR error: {e}")
@@ -269,9 +323,10 @@ class TesseractEngine(OCREngine):
             
             for i in range(n_boxes):
                 if data['text'][i].strip():
+                    # Tesseract scores 0..100 (-1: unscored); the other engines 0..1
                     detections.append({
                         'text': data['text'][i],
-                        'confidence': data['conf'][i],
+                        'confidence': max(float(data['conf'][i]), 0.0) / 100,
                         'bbox': [
                             data['left'][i],
                             data['top'][i],
@@ -330,6 +385,12 @@ class PaddleOCREngine(OCREngine):
                 except Exception:
                     self.available = False
                     
+    def warm_up(self) -> bool:
+        # PaddleOCR.ocr with detection takes one image per call, so batches
+        # use the default loop; the win is loading the model up front
+        self._init_ocr()
+        return self.ocr is not None
+        
     def detect_text(self, image: Union[np.ndarray, Image.Image, str]) -> List[Dict[str, Any]]:
         """Detect text using PaddleOCR"""
         if not self.available:
@@ -379,17 +440,37 @@ class PaddleOCREngine(OCREngine):
             return []
             
 
+# Engine classes by name; pool workers build their own instance from these
+ENGINE_TYPES = {
+    'windows': WindowsOCREngine,
+    'easyocr': EasyOCREngine,
+    'tesseract': TesseractEngine,
+    'paddleocr': PaddleOCREngine
+}
+
+# Auto-select priority: Windows (fastest) > EasyOCR > PaddleOCR > Tesseract
+ENGINE_PRIORITY = ['windows', 'easyocr', 'paddleocr', 'tesseract']
+
+
+def _to_array(image: Union[np.ndarray, Image.Image, str]) -> np.ndarray:
+    if isinstance(image, np.ndarray):
+        return image
+    if isinstance(image, str):
+        image = Image.open(image)
+    return np.array(image)
+
+
 class OCRBackend:
     """Unified OCR backend with multiple engine support"""
     
-    def __init__(self):
-        """Initialize OCR backend with available engines"""
-        self.engines = {
-            'windows': WindowsOCREngine(),
-            'easyocr': EasyOCREngine(),
-            'tesseract': TesseractEngine(),
-            'paddleocr': PaddleOCREngine()
-        }
+    def __init__(self, profile_path: Optional[str] = DEFAULT_PROFILE_PATH):
+        """Initialize OCR backend with available engines
+        
+        Args:
+            profile_path: JSON file of measured engine profiles used for
+                routing (None: keep profiles in memory only)
+        """
+        self.engines = {name: engine_type() for name, engine_type in ENGINE_TYPES.items()}
         
         # Check which engines are available
         self.available_engines = {
@@ -399,15 +480,54 @@ class OCRBackend:
         
         print(f"Available OCR engines: {list(self.available_engines.keys())}")
         
+        # Warm worker pools by engine name, see warm_pool()
+        self.pools: Dict[str, OCRWorkerPool] = {}
+        self.last_batch_stats: Optional[BatchStats] = None
+        
+        # Engine choice from latency/confidence profiles of earlier calls
+        self.profiles = ProfileStore(profile_path)
+        self.router = OCRRouter(self.available_engines, self.profiles, ENGINE_PRIORITY)
+        self.last_route: Optional[RoutedResult] = None
+        
+    def _select_engine(self, engine: Optional[str] = None, sample: Optional[np.ndarray] = None) -> Optional[str]:
+        """Name of the requested engine if available, else the best available one
+        
+        With a sample image, the best engine is the fastest profiled one for
+        its size class; without, the first of ENGINE_PRIORITY.
+        """
+        if engine:
+            return engine if engine in self.available_engines else None
+        if sample is not None:
+            ranked = self.router.rank(sample)
+            if ranked:
+                return ranked[0]
+        for engine_name in ENGINE_PRIORITY:
+            if engine_name in self.available_engines:
+                return engine_name
+        return next(iter(self.available_engines), None)
+        
     def detect_text(self, image: Union[np.ndarray, Image.Image, str],
                    engine: Optional[str] = None,
-                   merge_results: bool = False) -> List[Dict[str, Any]]:
+                   merge_results: bool = False,
+                   language: Optional[str] = None,
+                   min_confidence: Optional[float] = None,
+                   max_latency: Optional[float] = None,
+                   hedge: bool = False) -> List[Dict[str, Any]]:
         """Detect text using specified or best available engine
         
+        Every call updates the engine's profile for the image size class and
+        language; auto-selection picks the fastest engine whose profile meets
+        the budgets. How the last call was routed is kept in last_route.
+        
         Args:
             image: Input image
             engine: Specific engine to use (None for auto-select)
             merge_results: Merge results from multiple engines
+            language: Profile key for the text's language (None: default)
+            min_confidence: Required mean detection confidence, 0..1
+            max_latency: Latency budget in seconds
+            hedge: If the chosen engine runs past its p95 latency, also
+                start the next best one and return whichever finishes first
             
         Returns:
             List of text detections
@@ -416,10 +536,15 @@ class OCRBackend:
             print("No OCR engines available!")
             return []
             
+        if isinstance(image, str):
+            image = _to_array(image)
+            
         if engine:
             # Use specific engine
             if engine in self.available_engines:
-                return self.available_engines[engine].detect_text(image)
+                detections, latency = self.router.run(engine, image, language)
+                self.last_route = RoutedResult(detections, engine, latency, candidates=[engine])
+                return detections
             else:
                 print(f"Engine '{engine}' not available")
                 return []
@@ -427,66 +552,152 @@ class OCRBackend:
         elif merge_results:
             # Merge results from all engines
             all_results = []
-            for engine_name, engine_obj in self.available_engines.items():
-                results = engine_obj.detect_text(image)
+            for engine_name in self.available_engines:
+                results, _ = self.router.run(engine_name, image, language)
                 for r in results:
                     r['engine'] = engine_name
                 all_results.extend(results)
             return self._merge_detections(all_results)
             
         else:
-            # Auto-select best available engine
-            # Priority: Windows (fastest) > EasyOCR > PaddleOCR > Tesseract
-            priority = ['windows', 'easyocr', 'paddleocr', 'tesseract']
+            # Auto-select by measured profiles
+            self.last_route = self.router.detect_text(image, language, min_confidence, max_latency, hedge)
+            return self.last_route.detections
+        
+    def warm_pool(self, engine: Optional[str] = None, processes: int = 2,
+                  batch_size: int = DEFAULT_BATCH_SIZE) -> Optional[OCRWorkerPool]:
+        """Start worker processes with a loaded engine for batch OCR
+        
+        Returns the pool, or None if the engine is not available. Batches
+        for this engine go through the pool until close() is called.
+        """
+        engine_name = self._select_engine(engine)
+        if engine_name is None:
+            print(f"Engine '{engine}' not available" if engine else "No OCR engines available!")
+            return None
+        pool = self.pools.get(engine_name)
+        if pool is None:
+            # Workers build their own instance of the same engine class
+            factory = type(self.available_engines[engine_name])
+            pool = OCRWorkerPool(factory, engine_name, processes, batch_size)
+            self.pools[engine_name] = pool
+        return pool.start()
+        
+    def close(self):
+        """Stop all worker pools and save engine profiles"""
+        for pool in self.pools.values():
+            pool.close()
+        self.pools.clear()
+        self.router.close()
+        self.profiles.save()
+        
+    def detect_text_batch(self, images: Sequence[Union[np.ndarray, Image.Image, str]],
+                          engine: Optional[str] = None,
+                          batch_size: Optional[int] = None) -> List[OCRResult]:
+        """OCR many images, batched, in input order
+        
+        Runs on the engine's warm pool if warm_pool() started one, otherwise
+        in this process. Totals of the run are kept in last_batch_stats.
+        
+        Args:
+            images: Images as numpy arrays, PIL Images, or file paths
+            engine: Specific engine to use (None for auto-select)
+            batch_size: Images per engine call (default: the pool's, or 8)
+        """
+        return self._run_batch([_to_array(image) for image in images], engine, batch_size)
+        
+    def detect_text_in_regions(self, image: Union[np.ndarray, Image.Image, str],
+                               regions: Sequence[Any],
+                               types: Optional[Sequence[str]] = TEXT_ELEMENT_TYPES,
+                               pad: int = DEFAULT_PAD,
+                               engine: Optional[str] = None,
+                               batch_size: Optional[int] = None) -> List[OCRResult]:
+        """OCR only the given regions of one frame
+        
+        Args:
+            image: The frame
+            regions: Boxes (x1, y1, x2, y2), or UIElements / element dicts
+                from UIVisionModel, filtered by types
+            types: Element types worth reading (None for all); plain boxes
+                are always read
+            pad: Pixels of context added around each region
             
-            for engine_name in priority:
-                if engine_name in self.available_engines:
-                    return self.available_engines[engine_name].detect_text(image)
-                    
-        return []
+        Returns:
+            One result per region read, in input order, with detections in
+            frame coordinates and the padded crop as region
+        """
+        frame = _to_array(image)
+        boxes = [tuple(int(v) for v in r) for r in regions if isinstance(r, (tuple, list, np.ndarray))]
+        if len(boxes) != len(regions):
+            boxes = region_boxes(regions, types)
+        crops = crop_regions(frame, boxes, pad)
+        results = self._run_batch([crop for crop, _ in crops], engine, batch_size)
+        for result, (_, box) in zip(results, crops):
+            result.region = box
+            result.detections = [shift_detection(d, box[0], box[1]) for d in result.detections]
+        return results
+        
+    def _run_batch(self, images: List[np.ndarray], engine: Optional[str],
+                   batch_size: Optional[int]) -> List[OCRResult]:
+        start = time.perf_counter()
+        engine_name = self._select_engine(engine, images[0] if images else None)
+        if engine_name is None:
+            print(f"Engine '{engine}' not available" if engine else "No OCR engines available!")
+            return [OCRResult(k, [], '', 0.0, error='engine not available') for k in range(len(images))]
+            
+        pool = self.pools.get(engine_name)
+        if pool is not None:
+            results, timings, stats = pool.run(images, batch_size)
+        else:
+            local = self.available_engines[engine_name]
+            results, timings, stats = run_batches(
+                lambda chunks: [run_chunk(local, chunk) for chunk in chunks],
+                images, batch_size or DEFAULT_BATCH_SIZE)
+        stats.elapsed = time.perf_counter() - start
+        self.last_batch_stats = stats
+        for chunk, elapsed in zip(stats.chunk_indices, stats.timings):
+            self._observe_chunk(engine_name, [images[k] for k in chunk], [results[k] for k in chunk], elapsed)
+        
+        return [
+            OCRResult(k, [], engine_name, elapsed, error=result) if isinstance(result, str)
+            else OCRResult(k, result, engine_name, elapsed)
+            for k, (result, elapsed) in enumerate(zip(results, timings))
+        ]
+        
+    def _observe_chunk(self, engine_name: str, images: List[np.ndarray], results: List[Any],
+                       elapsed: float):
+        """Record one engine call of a batch in the profiles, per size class
+        
+        Latency is the per-image share of the call, so batched and single
+        calls update the same profiles in the same units.
+        """
+        groups: Dict[str, List[int]] = {}
+        for k, image in enumerate(images):
+            groups.setdefault(size_class(image), []).append(k)
+        share = elapsed / len(images)
+        for size, members in groups.items():
+            detections = [d for k in members if not isinstance(results[k], str) for d in results[k]]
+            ok = not any(isinstance(results[k], str) for k in members)
+            pixels = sum(image_pixels(images[k]) for k in members) // len(members)
+            self.profiles.observe(engine_name, None, size, share, pixels, mean_confidence(detections), ok)
         
     def _merge_detections(self, detections: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Merge overlapping detections from multiple engines"""
-        # Simple implementation - can be improved with NMS
-        merged = []
-        used = set()
+        # Each detection takes the later ones overlapping it by IoU > 0.5
+        groups = greedy_groups([det['bbox'] for det in detections], iou_threshold=0.5)
         
-        for i, det1 in enumerate(detections):
-            if i in used:
-                continue
-                
-            # Find overlapping detections
-            overlapping = [det1]
-            for j, det2 in enumerate(detections[i+1:], i+1):
-                if j not in used and self._bbox_overlap(det1['bbox'], det2['bbox']) > 0.5:
-                    overlapping.append(det2)
-                    used.add(j)
-                    
-            # Merge overlapping detections
-            if len(overlapping) > 1:
-                merged_det = self._merge_detection_group(overlapping)
-                merged.append(merged_det)
+        merged = []
+        for group in groups:
+            if len(group) > 1:
+                merged.append(self._merge_detection_group([detections[i] for i in group]))
             else:
-                merged.append(det1)
+                merged.append(detections[group[0]])
                 
         return merged
         
     def _bbox_overlap(self, bbox1: List[float], bbox2: List[float]) -> float:
         """Calculate IoU overlap between two bounding boxes"""
-        x1 = max(bbox1[0], bbox2[0])
-        y1 = max(bbox1[1], bbox2[1])
-        x2 = min(bbox1[2], bbox2[2])
-        y2 = min(bbox1[3], bbox2[3])
-        
-        if x2 <= x1 or y2 <= y1:
-            return 0.0
-            
-        intersection = (x2 - x1) * (y2 - y1)
-        area1 = (bbox1[2] - bbox1[0]) * (bbox1[3] - bbox1[1])
-        area2 = (bbox2[2] - bbox2[0]) * (bbox2[3] - bbox2[1])
-        union = area1 + area2 - intersection
-        
-        return intersection / union if union > 0 else 0.0
+        return iou(bbox1, bbox2)
         
     def _merge_detection_group(self, detections: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Merge a group of overlapping detections"""
@@ -514,31 +725,41 @@ class OCRBackend:
             'num_detections': len(detections)
         }
         
-    def benchmark(self, image: Union[np.ndarray, Image.Image, str]) -> Dict[str, Any]:
+    def benchmark(self, image: Union[np.ndarray, Image.Image, str],
+                  language: Optional[str] = None, iterations: int = 1) -> Dict[str, Any]:
         """Benchmark all available engines
         
+        Timings go into the engine profiles (and are saved), so later
+        auto-selection for this size class and language uses them.
+        
         Args:
             image: Test image
+            language: Profile key for the image's language
+            iterations: Runs per engine
             
         Returns:
             Benchmark results
         """
-        import time
-        
+        if isinstance(image, str):
+            image = _to_array(image)
+        size = size_class(image)
         results = {}
         
-        for engine_name, engine in self.available_engines.items():
-            start_time = time.time()
-            
+        for engine_name in self.available_engines:
             try:
-                detections = engine.detect_text(image)
-                elapsed = time.time() - start_time
+                for _ in range(iterations):
+                    detections, elapsed = self.router.run(engine_name, image, language)
+                profile = self.profiles.get(engine_name, language, size)
                 
                 results[engine_name] = {
-                    'success': True,
+                    'success': profile.error_rate < 1.0,
                     'time': elapsed,
                     'detections': len(detections),
-                    'total_chars': sum(len(d['text']) for d in detections)
+                    'total_chars': sum(len(d['text']) for d in detections),
+                    'size_class': size,
+                    'ewma_latency': profile.latency,
+                    'p95_latency': profile.p95,
+                    'confidence': profile.confidence
                 }
             except Exception as e:
                 results[engine_name] = {
@@ -546,4 +767,5 @@ class OCRBackend:
                     'error': str(e)
                 }
                 
+        self.profiles.save()
         return results
\ No newline at end of file
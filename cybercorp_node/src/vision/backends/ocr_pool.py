@@ -0,0 +1,213 @@
+"""Batched OCR over many images or regions, on a pool of warm engine processes
+
+OCR models are slow to load and their inference is far cheaper per image in
+batches, so a batch is:
+
+    1. cut into items (whole images, or padded crops of the regions worth
+       reading, e.g. the text/button/input elements of a frame)
+    2. sorted by size and chunked, so each chunk holds similar crops that
+       batch well and pad little
+    3. run through OCREngine.detect_text_batch in worker processes whose
+       engine was built and warmed once, when the pool started
+    4. put back in input order, with crop detections moved to frame
+       coordinates
+
+OCR of a full IDE window then reads only its text regions instead of
+megapixels of background.
+"""
+
+import multiprocessing
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+Box = Tuple[int, int, int, int]
+
+# UIVisionModel element types that hold readable text
+TEXT_ELEMENT_TYPES = ('text', 'button', 'input')
+DEFAULT_PAD = 4
+DEFAULT_BATCH_SIZE = 8
+
+
+@dataclass
+class OCRResult:
+    """Detections for one batch item, in input order"""
+    index: int
+    detections: List[Dict[str, Any]]
+    engine: str
+    elapsed: float  # Share of its chunk's engine time, in seconds
+    region: Optional[Box] = None  # Crop in the source frame, for ROI items
+    error: Optional[str] = None
+
+    @property
+    def text(self) -> str:
+        return ' '.join(d['text'] for d in self.detections)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'index': self.index,
+            'text': self.text,
+            'detections': self.detections,
+            'engine': self.engine,
+            'elapsed': self.elapsed,
+            'region': list(self.region) if self.region else None,
+            'error': self.error
+        }
+
+
+@dataclass
+class BatchStats:
+    """Totals of one batch run"""
+    items: int = 0
+    chunks: int = 0
+    pixels: int = 0        # Pixels sent to the engine
+    engine_time: float = 0.0
+    elapsed: float = 0.0   # Wall time including cropping and transfer
+    timings: List[float] = field(default_factory=list)
+    chunk_indices: List[List[int]] = field(default_factory=list)  # Item indices of each chunk
+
+
+def region_boxes(elements: Sequence[Any], types: Sequence[str] = TEXT_ELEMENT_TYPES) -> List[Box]:
+    """Boxes of the elements (UIElement objects or dicts) whose type holds text"""
+    boxes = []
+    for element in elements:
+        if isinstance(element, dict):
+            element_type, bbox = element.get('type', element.get('element_type')), element['bbox']
+        else:
+            element_type, bbox = element.element_type, element.bbox
+        if types is None or element_type in types:
+            boxes.append(tuple(int(v) for v in bbox))
+    return boxes
+
+
+def crop_regions(image: np.ndarray, boxes: Sequence[Box], pad: int = DEFAULT_PAD
+                 ) -> List[Tuple[np.ndarray, Box]]:
+    """(crop, padded box) per region; the padding gives engines a margin around text"""
+    height, width = image.shape[:2]
+    crops = []
+    for x1, y1, x2, y2 in boxes:
+        box = (max(0, x1 - pad), max(0, y1 - pad), min(width, x2 + pad), min(height, y2 + pad))
+        crops.append((image[box[1]:box[3], box[0]:box[2]], box))
+    return crops
+
+
+def shift_detection(detection: Dict[str, Any], dx: int, dy: int) -> Dict[str, Any]:
+    """Copy of a detection moved from crop to frame coordinates"""
+    moved = dict(detection)
+    x1, y1, x2, y2 = detection['bbox']
+    moved['bbox'] = [x1 + dx, y1 + dy, x2 + dx, y2 + dy]
+    if detection.get('polygon') is not None:
+        moved['polygon'] = [[p[0] + dx, p[1] + dy] for p in detection['polygon']]
+    if detection.get('words'):
+        moved['words'] = [shift_detection(w, dx, dy) for w in detection['words']]
+    return moved
+
+
+def plan_chunks(images: Sequence[np.ndarray], batch_size: int) -> List[List[int]]:
+    """Item indices grouped into chunks of similarly sized images"""
+    order = sorted(range(len(images)), key=lambda k: (images[k].shape[0], images[k].shape[1], k))
+    return [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
+
+
+# Worker process state: one engine, built and warmed by the pool initializer
+_worker_engine = None
+_worker_engine_name = ''
+
+
+def _init_worker(factory: Callable[[], Any], name: str):
+    global _worker_engine, _worker_engine_name
+    _worker_engine = factory()
+    _worker_engine.warm_up()
+    _worker_engine_name = name
+
+
+def _worker_ready(_=None) -> bool:
+    return _worker_engine is not None and _worker_engine.is_available()
+
+
+def run_chunk(engine: Any, images: List[np.ndarray]) -> Tuple[List[Any], float]:
+    """(detections or error string per image, elapsed) for one engine call"""
+    start = time.perf_counter()
+    try:
+        results = engine.detect_text_batch(images)
+    except Exception as e:
+        results = [f"{type(e).__name__}: {e}"] * len(images)
+    return results, time.perf_counter() - start
+
+
+def _worker_run(images: List[np.ndarray]) -> Tuple[List[Any], float]:
+    return run_chunk(_worker_engine, images)
+
+
+class OCRWorkerPool:
+    """Processes that each hold one warm OCR engine
+
+    Args:
+        factory: Picklable callable returning an OCREngine (e.g. the class)
+        name: Engine name reported in results
+        processes: Worker processes; engines load when the pool starts, not
+            on the first request
+        batch_size: Images per engine call
+    """
+
+    def __init__(self, factory: Callable[[], Any], name: str, processes: int = 2,
+                 batch_size: int = DEFAULT_BATCH_SIZE):
+        self.factory = factory
+        self.name = name
+        self.processes = max(1, processes)
+        self.batch_size = batch_size
+        self._pool = None
+
+    def start(self) -> 'OCRWorkerPool':
+        """Start the workers and wait until every engine is loaded"""
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(self.processes, initializer=_init_worker,
+                                              initargs=(self.factory, self.name))
+            # One ping per worker only returns once its initializer finished
+            self._pool.map(_worker_ready, range(self.processes), chunksize=1)
+        return self
+
+    @property
+    def started(self) -> bool:
+        return self._pool is not None
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self) -> 'OCRWorkerPool':
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def run(self, images: Sequence[np.ndarray], batch_size: Optional[int] = None
+            ) -> Tuple[List[Any], List[float], BatchStats]:
+        """Per-image detections (or error strings) and time shares, in input order"""
+        self.start()
+        return run_batches(lambda chunk: self._pool.map(_worker_run, chunk, chunksize=1),
+                           images, batch_size or self.batch_size)
+
+
+def run_batches(map_chunks: Callable[[List[List[np.ndarray]]], List[Tuple[List[Any], float]]],
+                images: Sequence[np.ndarray], batch_size: int
+                ) -> Tuple[List[Any], List[float], BatchStats]:
+    """Chunk images by size, map the chunks, and restore input order"""
+    chunks = plan_chunks(images, batch_size)
+    outputs = map_chunks([[images[k] for k in chunk] for chunk in chunks]) if chunks else []
+    results: List[Any] = [None] * len(images)
+    timings = [0.0] * len(images)
+    stats = BatchStats(items=len(images), chunks=len(chunks),
+                       pixels=sum(int(image.shape[0]) * int(image.shape[1]) for image in images),
+                       chunk_indices=chunks)
+    for chunk, (chunk_results, elapsed) in zip(chunks, outputs):
+        stats.engine_time += elapsed
+        stats.timings.append(elapsed)
+        for k, result in zip(chunk, chunk_results):
+            results[k] = result
+            timings[k] = elapsed / len(chunk)
+    return results, timings, stats
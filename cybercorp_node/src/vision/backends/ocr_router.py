@@ -0,0 +1,343 @@
+"""Pick OCR engines from measured latency and confidence profiles
+
+Every OCR call updates an exponentially weighted profile for its engine,
+language and image size class: mean latency and its spread, throughput in
+pixels per second, and mean detection confidence. Profiles are saved as
+JSON in the user's cache directory, so routing starts from what earlier
+runs (and benchmarks) measured; each process merges what is on disk before
+writing.
+
+Routing takes the fastest engine whose profile meets the caller's budgets
+(minimum confidence, maximum latency, maximum error rate). Engines without a
+profile yet, and engines that have not read any text yet, are tried before
+ones known to miss a budget, so new engines get measured.
+
+Hedged calls start the chosen engine and, if it runs past its own p95 (and
+well past its mean), start the next healthy engine that fits the latency
+budget too and return whichever finishes first.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_ALPHA = 0.2
+DEFAULT_LANGUAGE = 'default'
+P95_Z = 1.645         # Normal quantile, until enough samples for an empirical p95
+P95_MIN_SAMPLES = 20
+RECENT_SAMPLES = 64
+SAVE_EVERY = 20       # Observations between automatic saves
+HEDGE_MIN_FACTOR = 1.5  # Hedge no earlier than this times the mean latency
+MAX_ERROR_RATE = 0.3  # Engines failing more often than this miss the budget
+
+# (upper bound in pixels, name); crops of single elements are 'roi'
+SIZE_CLASSES = [(256 * 256, 'roi'), (1024 * 512, 'small'), (1920 * 1280, 'medium'), (math.inf, 'large')]
+
+
+def _default_profile_path() -> str:
+    """ocr_profiles.json in the user's cache directory, or CYBERCORP_OCR_PROFILES"""
+    if os.environ.get('CYBERCORP_OCR_PROFILES'):
+        return os.environ['CYBERCORP_OCR_PROFILES']
+    base = (os.environ.get('LOCALAPPDATA') if os.name == 'nt' else os.environ.get('XDG_CACHE_HOME')) \
+        or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'cybercorp', 'ocr_profiles.json')
+
+
+DEFAULT_PROFILE_PATH = _default_profile_path()
+
+
+def image_pixels(image: Any) -> int:
+    """Pixel count of a numpy array or PIL image"""
+    if hasattr(image, 'shape'):
+        return int(image.shape[0]) * int(image.shape[1])
+    width, height = image.size
+    return width * height
+
+
+def size_class(image: Any) -> str:
+    """Size class of an image (array, PIL image) or a pixel count"""
+    pixels = image if isinstance(image, (int, float)) else image_pixels(image)
+    return next(name for bound, name in SIZE_CLASSES if pixels < bound)
+
+
+def mean_confidence(detections: Sequence[Dict[str, Any]]) -> Optional[float]:
+    """Mean detection confidence (every engine reports 0..1), None if nothing was read"""
+    values = [float(d['confidence']) for d in detections if d.get('confidence') is not None]
+    return sum(values) / len(values) if values else None
+
+
+@dataclass
+class EngineProfile:
+    """EWMA statistics of one engine on one language and size class"""
+    latency: float = 0.0        # Seconds
+    latency_var: float = 0.0
+    throughput: float = 0.0     # Pixels per second
+    confidence: Optional[float] = None
+    error_rate: float = 0.0
+    samples: int = 0
+    recent: deque = field(default_factory=lambda: deque(maxlen=RECENT_SAMPLES))
+
+    def update(self, latency: float, pixels: int, confidence: Optional[float], ok: bool = True,
+               alpha: float = DEFAULT_ALPHA):
+        if self.samples == 0:
+            self.latency, self.latency_var = latency, 0.0
+            self.throughput = pixels / max(latency, 1e-6)
+            self.error_rate = 0.0 if ok else 1.0
+        else:
+            delta = latency - self.latency
+            self.latency += alpha * delta
+            self.latency_var = (1 - alpha) * (self.latency_var + alpha * delta * delta)
+            self.throughput += alpha * (pixels / max(latency, 1e-6) - self.throughput)
+            self.error_rate += alpha * ((0.0 if ok else 1.0) - self.error_rate)
+        if confidence is not None:
+            self.confidence = confidence if self.confidence is None else \
+                self.confidence + alpha * (confidence - self.confidence)
+        self.recent.append(latency)
+        self.samples += 1
+
+    @property
+    def p95(self) -> float:
+        """95th percentile latency: empirical once there are enough samples"""
+        if len(self.recent) >= P95_MIN_SAMPLES:
+            return float(np.percentile(self.recent, 95))
+        return self.latency + P95_Z * math.sqrt(self.latency_var)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'latency': self.latency, 'latency_var': self.latency_var, 'throughput': self.throughput,
+                'confidence': self.confidence, 'error_rate': self.error_rate, 'samples': self.samples,
+                'recent': list(self.recent)}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'EngineProfile':
+        profile = cls(**{k: v for k, v in data.items() if k != 'recent'})
+        profile.recent.extend(data.get('recent', []))
+        return profile
+
+
+class ProfileStore:
+    """Engine profiles keyed by (engine, language, size class), saved as JSON
+
+    Several processes may share one file (the OCR process pool does): save()
+    re-reads it and keeps the profiles other processes wrote for keys this
+    store has not observed since its last save.
+
+    Args:
+        path: JSON file; None keeps profiles in memory only
+        alpha: EWMA weight of each new observation
+        save_every: Save after this many observations (0: only on save())
+    """
+
+    def __init__(self, path: Optional[str] = DEFAULT_PROFILE_PATH, alpha: float = DEFAULT_ALPHA,
+                 save_every: int = SAVE_EVERY):
+        self.path = path
+        self.alpha = alpha
+        self.save_every = save_every
+        self.profiles: Dict[Tuple[str, str, str], EngineProfile] = {}
+        self._unsaved = 0
+        self._observed = set()  # Keys updated since the last save
+        self._lock = threading.Lock()
+        self.load()
+
+    def get(self, engine: str, language: Optional[str], size: str) -> Optional[EngineProfile]:
+        return self.profiles.get((engine, language or DEFAULT_LANGUAGE, size))
+
+    def observe(self, engine: str, language: Optional[str], size: str, latency: float, pixels: int,
+                confidence: Optional[float], ok: bool = True):
+        key = (engine, language or DEFAULT_LANGUAGE, size)
+        with self._lock:
+            profile = self.profiles.setdefault(key, EngineProfile())
+            profile.update(latency, pixels, confidence, ok, self.alpha)
+            self._observed.add(key)
+            self._unsaved += 1
+            due = self.save_every and self._unsaved >= self.save_every
+        if due:
+            self.save()
+
+    def _read(self) -> Dict[Tuple[str, str, str], EngineProfile]:
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return {tuple(entry['key']): EngineProfile.from_dict(entry['profile'])
+                    for entry in data.get('profiles', [])}
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Ignoring unreadable OCR profiles {self.path}: {e}")
+            return {}
+
+    def load(self):
+        profiles = self._read()
+        with self._lock:
+            self.profiles.update(profiles)
+
+    def save(self):
+        """Merge with the file and write all profiles (atomically, via a temp file)"""
+        if not self.path:
+            return
+        on_disk = self._read()
+        with self._lock:
+            for key, profile in on_disk.items():
+                if key not in self._observed:
+                    self.profiles[key] = profile
+            data = {'version': 1, 'profiles': [{'key': list(key), 'profile': profile.to_dict()}
+                                               for key, profile in sorted(self.profiles.items())]}
+            self._observed.clear()
+            self._unsaved = 0
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        os.replace(temp_path, self.path)
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """One row per profile, for reports"""
+        with self._lock:
+            return [{'engine': engine, 'language': language, 'size': size, 'p95': profile.p95,
+                     **{k: v for k, v in profile.to_dict().items() if k != 'recent'}}
+                    for (engine, language, size), profile in sorted(self.profiles.items())]
+
+
+@dataclass
+class RoutedResult:
+    """Detections of a routed call and how they were obtained"""
+    detections: List[Dict[str, Any]]
+    engine: str
+    latency: float
+    hedged: bool = False     # A backup engine was started
+    candidates: List[str] = field(default_factory=list)
+
+
+class OCRRouter:
+    """Choose and run OCR engines by their measured profiles
+
+    Args:
+        engines: Available engines by name
+        store: Profiles to route by and to update with every call
+        priority: Order of engines that have no profile yet
+        max_error_rate: Engines whose calls fail more often miss the budget
+    """
+
+    def __init__(self, engines: Dict[str, Any], store: ProfileStore, priority: Sequence[str] = (),
+                 max_error_rate: float = MAX_ERROR_RATE):
+        self.engines = engines
+        self.store = store
+        self.priority = list(priority)
+        self.max_error_rate = max_error_rate
+        self._executor = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='ocr-hedge')
+        return self._executor
+
+    def rank(self, image: Any, language: Optional[str] = None, min_confidence: Optional[float] = None,
+             max_latency: Optional[float] = None) -> List[str]:
+        """Engine names, best first, for an image and budgets
+
+        Engines meeting every budget come first, fastest first; then engines
+        not profiled for this size class and language; then engines that
+        have not read any text yet, whose confidence is unknown; then the
+        rest by how many budgets they miss, and latency. Engines failing
+        more often than max_error_rate come last, so a broken engine cannot
+        stay first by failing fast.
+        """
+        size = size_class(image)
+        order = self.priority + [name for name in self.engines if name not in self.priority]
+        known, unknown = [], []
+        for position, name in enumerate(order):
+            if name not in self.engines:
+                continue
+            profile = self.store.get(name, language, size)
+            if profile is None or profile.samples == 0:
+                unknown.append(name)
+                continue
+            misses = 0
+            if min_confidence is not None and profile.confidence is not None \
+                    and profile.confidence < min_confidence:
+                misses += 1
+            if max_latency is not None and profile.latency > max_latency:
+                misses += 1
+            failing = profile.error_rate > self.max_error_rate
+            known.append((failing, misses, profile.latency, position, name, profile.confidence is None))
+        known.sort()
+        meeting = [name for failing, misses, _, _, name, unread in known if not (failing or misses or unread)]
+        unread = [name for failing, misses, _, _, name, unread in known if not (failing or misses) and unread]
+        missing = [name for failing, misses, _, _, name, _ in known if failing or misses]
+        return meeting + unknown + unread + missing
+
+    def run(self, name: str, image: Any, language: Optional[str] = None) -> Tuple[List[Dict[str, Any]], float]:
+        """Run one engine and record the call in its profile"""
+        pixels = image_pixels(image)
+        start = time.perf_counter()
+        ok = True
+        try:
+            detections = self.engines[name].detect_text(image)
+        except Exception as e:
+            print(f"OCR engine '{name}' failed: {e}")
+            detections, ok = [], False
+        latency = time.perf_counter() - start
+        self.store.observe(name, language, size_class(pixels), latency, pixels,
+                           mean_confidence(detections), ok)
+        return detections, latency
+
+    def _hedge_backup(self, candidates: Sequence[str], image: Any, language: Optional[str],
+                      max_latency: Optional[float]) -> Optional[str]:
+        """First profiled candidate that is not failing and fits the latency budget"""
+        size = size_class(image)
+        for name in candidates:
+            profile = self.store.get(name, language, size)
+            if profile is None or profile.samples == 0 or profile.error_rate > self.max_error_rate:
+                continue
+            if max_latency is not None and profile.latency > max_latency:
+                continue
+            return name
+        return None
+
+    def detect_text(self, image: Any, language: Optional[str] = None, min_confidence: Optional[float] = None,
+                    max_latency: Optional[float] = None, hedge: bool = False) -> RoutedResult:
+        """OCR with the best-ranked engine, optionally hedged by the next healthy candidate
+
+        There is no hedge when no other candidate is profiled, failing less
+        often than max_error_rate and within max_latency.
+        """
+        candidates = self.rank(image, language, min_confidence, max_latency)
+        if not candidates:
+            return RoutedResult([], '', 0.0, candidates=candidates)
+        primary = candidates[0]
+        profile = self.store.get(primary, language, size_class(image))
+        backup = self._hedge_backup(candidates[1:], image, language, max_latency) if hedge else None
+        if backup is None or profile is None or profile.samples < 2:
+            detections, latency = self.run(primary, image, language)
+            return RoutedResult(detections, primary, latency, candidates=candidates)
+
+        start = time.perf_counter()
+        executor = self._get_executor()
+        first = executor.submit(self.run, primary, image, language)
+        # Steady engines have a p95 close to their mean; do not hedge on jitter
+        done, _ = wait([first], timeout=max(profile.p95, HEDGE_MIN_FACTOR * profile.latency))
+        if done:
+            detections, latency = first.result()
+            return RoutedResult(detections, primary, latency, candidates=candidates)
+
+        # Primary is slower than usual: race the backup. The loser keeps
+        # running in the background and still updates its profile.
+        second = executor.submit(self.run, backup, image, language)
+        done, _ = wait([first, second], return_when=FIRST_COMPLETED)
+        winner = first if first in done else second
+        detections, _ = winner.result()
+        engine = primary if winner is first else backup
+        return RoutedResult(detections, engine, time.perf_counter() - start, hedged=True,
+                            candidates=candidates)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
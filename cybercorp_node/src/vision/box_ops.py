@@ -0,0 +1,276 @@
+"""NumPy box operations shared by the vision model and OCR backend
+
+Boxes are (x1, y1, x2, y2) rows. Pairwise work never builds a full n x n
+matrix: overlap_pairs sweeps boxes sorted by x1 in blocks and only compares
+each block with the boxes that can still reach it. The greedy passes (NMS,
+seed grouping) then walk that sparse overlap graph, so dense screenshots
+with thousands of contours cost O(n log n + overlapping pairs) instead of
+O(n^2) Python IoU calls.
+"""
+
+import heapq
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_BLOCK = 128
+
+
+def as_boxes(boxes) -> np.ndarray:
+    """(n, 4) float64 array from any sequence of boxes"""
+    arr = np.asarray(boxes, dtype=np.float64)
+    if arr.size == 0:
+        return arr.reshape(0, 4)
+    return arr.reshape(-1, 4)
+
+
+def areas(boxes) -> np.ndarray:
+    b = as_boxes(boxes)
+    return np.clip(b[:, 2] - b[:, 0], 0, None) * np.clip(b[:, 3] - b[:, 1], 0, None)
+
+
+def iou(box1: Sequence[float], box2: Sequence[float]) -> float:
+    """IoU of two boxes (0.0 when they only touch)"""
+    x1 = max(box1[0], box2[0])
+    y1 = max(box1[1], box2[1])
+    x2 = min(box1[2], box2[2])
+    y2 = min(box1[3], box2[3])
+    if x2 <= x1 or y2 <= y1:
+        return 0.0
+    intersection = (x2 - x1) * (y2 - y1)
+    union = ((box1[2] - box1[0]) * (box1[3] - box1[1]) +
+             (box2[2] - box2[0]) * (box2[3] - box2[1]) - intersection)
+    return intersection / union if union > 0 else 0.0
+
+
+def iou_matrix(a, b=None) -> np.ndarray:
+    """Dense IoU matrix between two box sets (a with itself if b is None)
+
+    Use for moderate sizes; overlap_pairs scales to large sets.
+    """
+    a = as_boxes(a)
+    b = a if b is None else as_boxes(b)
+    ix1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    iy1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    ix2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    iy2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(ix2 - ix1, 0, None) * np.clip(iy2 - iy1, 0, None)
+    union = areas(a)[:, None] + areas(b)[None, :] - inter
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(union > 0, inter / union, 0.0)
+
+
+def containment_matrix(outer, inner=None) -> np.ndarray:
+    """matrix[i, j] is True when outer[i] contains inner[j] (edges may touch)"""
+    outer = as_boxes(outer)
+    inner = outer if inner is None else as_boxes(inner)
+    return ((outer[:, None, 0] <= inner[None, :, 0]) & (outer[:, None, 1] <= inner[None, :, 1]) &
+            (outer[:, None, 2] >= inner[None, :, 2]) & (outer[:, None, 3] >= inner[None, :, 3]))
+
+
+def overlap_pairs(boxes, threshold: float = 0.0,
+                  block: int = DEFAULT_BLOCK) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """All pairs (i < j) whose IoU is above threshold
+
+    Returns (i, j, iou) arrays of original indices, ordered by i then j.
+    """
+    b = as_boxes(boxes)
+    n = len(b)
+    if n < 2:
+        empty = np.empty(0, dtype=np.intp)
+        return empty, empty, np.empty(0)
+
+    order = np.argsort(b[:, 0], kind='stable')
+    s = b[order]
+    x1 = s[:, 0]
+    s_areas = areas(s)
+    found_i, found_j, found_iou = [], [], []
+
+    for start in range(0, n, block):
+        end = min(start + block, n)
+        blk = s[start:end]
+        # Boxes starting at or right of the block's right edge cannot overlap it
+        stop = int(np.searchsorted(x1, blk[:, 2].max(), side='left'))
+        stop = max(stop, end)
+        cand = s[start:stop]
+
+        # Overlap extents on the dense block, IoU only on the overlapping pairs
+        iw = np.minimum(blk[:, None, 2], cand[None, :, 2]) - np.maximum(blk[:, None, 0], cand[None, :, 0])
+        ih = np.minimum(blk[:, None, 3], cand[None, :, 3]) - np.maximum(blk[:, None, 1], cand[None, :, 1])
+        rows, cols = np.nonzero((iw > 0) & (ih > 0))
+        upper = cols > rows  # Column offset 0 is the block's first box
+        rows, cols = rows[upper], cols[upper]
+        inter = iw[rows, cols] * ih[rows, cols]
+        values = inter / (s_areas[rows + start] + s_areas[cols + start] - inter)
+        hit = values > threshold
+        rows, cols, values = rows[hit], cols[hit], values[hit]
+        found_i.append(order[rows + start])
+        found_j.append(order[cols + start])
+        found_iou.append(values)
+
+    i = np.concatenate(found_i)
+    j = np.concatenate(found_j)
+    v = np.concatenate(found_iou)
+    swap = i > j
+    i[swap], j[swap] = j[swap], i[swap]
+    sort = np.lexsort((j, i))
+    return i[sort], j[sort], v[sort]
+
+
+def _neighbours(n: int, i: np.ndarray, j: np.ndarray) -> List[np.ndarray]:
+    """Adjacency lists of an undirected pair list"""
+    src = np.concatenate([i, j])
+    dst = np.concatenate([j, i])
+    sort = np.argsort(src, kind='stable')
+    src, dst = src[sort], dst[sort]
+    bounds = np.searchsorted(src, np.arange(n + 1))
+    return [dst[bounds[k]:bounds[k + 1]] for k in range(n)]
+
+
+def greedy_groups(boxes, iou_threshold: float = 0.5,
+                  order: Optional[Sequence[int]] = None) -> List[List[int]]:
+    """Group boxes around seeds, visiting them in order
+
+    Each box not yet taken becomes a seed and takes every later, untaken
+    box whose IoU with the seed is above the threshold. The seed comes
+    first in its group. Matches the vision model's and OCR backend's
+    original pairwise loops exactly.
+    """
+    b = as_boxes(boxes)
+    n = len(b)
+    order = np.arange(n) if order is None else np.asarray(order, dtype=np.intp)
+    rank = np.empty(n, dtype=np.intp)
+    rank[order] = np.arange(n)
+
+    i, j, _ = overlap_pairs(b, iou_threshold)
+    neighbours = _neighbours(n, i, j)
+    used = np.zeros(n, dtype=bool)
+    groups = []
+    for seed in order:
+        if used[seed]:
+            continue
+        later = neighbours[seed]
+        later = later[(rank[later] > rank[seed]) & ~used[later]]
+        later = later[np.argsort(rank[later], kind='stable')]
+        used[later] = True
+        groups.append([int(seed)] + later.tolist())
+    return groups
+
+
+def nms(boxes, scores, iou_threshold: float = 0.5) -> np.ndarray:
+    """Greedy non-maximum suppression; returns kept indices, best first
+
+    Ties in score keep input order.
+    """
+    b = as_boxes(boxes)
+    scores = np.asarray(scores, dtype=np.float64)
+    order = np.argsort(-scores, kind='stable')
+    i, j, _ = overlap_pairs(b, iou_threshold)
+    neighbours = _neighbours(len(b), i, j)
+    suppressed = np.zeros(len(b), dtype=bool)
+    keep = []
+    for idx in order:
+        if suppressed[idx]:
+            continue
+        keep.append(idx)
+        suppressed[neighbours[idx]] = True
+    return np.asarray(keep, dtype=np.intp)
+
+
+def soft_nms(boxes, scores, sigma: float = 0.5, iou_threshold: float = 0.3,
+             score_threshold: float = 0.001, method: str = 'gaussian') -> Tuple[np.ndarray, np.ndarray]:
+    """Soft-NMS: decay the scores of overlapping boxes instead of dropping them
+
+    Args:
+        method: 'gaussian' (score *= exp(-iou^2 / sigma)) or 'linear'
+            (score *= 1 - iou for iou above iou_threshold)
+
+    Returns:
+        (kept indices in selection order, their decayed scores)
+    """
+    b = as_boxes(boxes)
+    n = len(b)
+    current = np.asarray(scores, dtype=np.float64).copy()
+    i, j, v = overlap_pairs(b, 0.0)
+    neighbours = _neighbours(n, i, j)
+    overlaps = {}
+    for a, c, value in zip(i.tolist(), j.tolist(), v.tolist()):
+        overlaps[(a, c)] = value
+
+    heap = [(-current[k], k) for k in range(n)]
+    heapq.heapify(heap)
+    done = np.zeros(n, dtype=bool)
+    keep, kept_scores = [], []
+    while heap:
+        neg_score, idx = heapq.heappop(heap)
+        if done[idx] or -neg_score != current[idx]:
+            continue  # Already selected, or a stale entry from before a decay
+        if current[idx] < score_threshold:
+            break
+        done[idx] = True
+        keep.append(idx)
+        kept_scores.append(current[idx])
+        for other in neighbours[idx].tolist():
+            if done[other]:
+                continue
+            overlap = overlaps[(min(idx, other), max(idx, other))]
+            if method == 'linear':
+                if overlap <= iou_threshold:
+                    continue
+                current[other] *= 1.0 - overlap
+            else:
+                current[other] *= np.exp(-(overlap * overlap) / sigma)
+            heapq.heappush(heap, (-current[other], other))
+    return np.asarray(keep, dtype=np.intp), np.asarray(kept_scores)
+
+
+def cluster_labels(boxes, iou_threshold: float = 0.0) -> np.ndarray:
+    """Connected components of the overlap graph
+
+    Boxes are linked when their IoU is above the threshold; each box gets
+    the smallest index in its cluster as label.
+    """
+    n = len(as_boxes(boxes))
+    labels = np.arange(n)
+    i, j, _ = overlap_pairs(boxes, iou_threshold)
+    if len(i) == 0:
+        return labels
+    while True:
+        low = np.minimum(labels[i], labels[j])
+        changed = (labels[i] != low) | (labels[j] != low)
+        if not changed.any():
+            break
+        np.minimum.at(labels, i, low)
+        np.minimum.at(labels, j, low)
+        labels = labels[labels]  # Pointer jumping
+    return labels
+
+
+def union_boxes(boxes, labels) -> Tuple[np.ndarray, np.ndarray]:
+    """Bounding box of each label; returns (unique labels, boxes)"""
+    b = as_boxes(boxes)
+    labels = np.asarray(labels)
+    unique, inverse = np.unique(labels, return_inverse=True)
+    merged = np.empty((len(unique), 4))
+    merged[:, :2] = np.inf
+    merged[:, 2:] = -np.inf
+    np.minimum.at(merged[:, 0], inverse, b[:, 0])
+    np.minimum.at(merged[:, 1], inverse, b[:, 1])
+    np.maximum.at(merged[:, 2], inverse, b[:, 2])
+    np.maximum.at(merged[:, 3], inverse, b[:, 3])
+    return unique, merged
+
+
+def merge_overlapping(boxes, iou_threshold: float = 0.0) -> np.ndarray:
+    """Replace every overlap cluster by its union box"""
+    _, merged = union_boxes(boxes, cluster_labels(boxes, iou_threshold))
+    return merged
+
+
+def contained_in(boxes, point_or_box) -> np.ndarray:
+    """Mask of boxes containing a point (x, y) or a box (x1, y1, x2, y2)"""
+    b = as_boxes(boxes)
+    q = np.asarray(point_or_box, dtype=np.float64)
+    if q.shape == (2,):
+        q = np.array([q[0], q[1], q[0], q[1]])
+    return (b[:, 0] <= q[0]) & (b[:, 1] <= q[1]) & (b[:, 2] >= q[2]) & (b[:, 3] >= q[3])
@@ -0,0 +1,175 @@
+"""Per-frame feature cache for UI element detection and classification
+
+A frame is converted to grayscale, edge-detected and summed into integral
+images once. Mean, standard deviation and edge density of any box are then
+four lookups each, so classifying every element of a frame is a few array
+operations instead of a crop, mean, std and Canny call per element. When
+only a few small boxes are asked for (e.g. after pyramid detection), they
+are measured directly instead and the integral images are never built.
+"""
+
+import threading
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .box_ops import as_boxes
+
+CANNY_LOW = 50
+CANNY_HIGH = 150
+# Foreground mask: adaptive threshold, then a close to join glyphs and borders
+THRESHOLD_BLOCK = 11
+THRESHOLD_C = 2
+CLOSE_KERNEL = (5, 3)
+# Few or small boxes are cheaper to measure one by one than through
+# integral images, which cost about this many directly measured pixels per
+# frame pixel, plus a fixed overhead per box
+INTEGRAL_COST = 32
+DIRECT_BOX_COST = 4096
+
+
+class FrameFeatures:
+    """Grayscale, edges and integral images of one frame, built on first use
+
+    Args:
+        gray: Grayscale frame (uint8)
+        edges: Canny edge map of the frame, if the caller already has one
+    """
+
+    def __init__(self, gray: np.ndarray, edges: Optional[np.ndarray] = None):
+        self.gray = gray
+        self.height, self.width = gray.shape[:2]
+        self._edges = edges
+        self._foreground = None
+        self._sum = None
+        self._sqsum = None
+        self._edge_count = None
+        self._parent = None
+        # Detection strategies may share one instance across threads
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_image(cls, image: np.ndarray) -> 'FrameFeatures':
+        """Features of a BGR or grayscale frame"""
+        if image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        return cls(image)
+
+    def crop(self, x1: int, y1: int, x2: int, y2: int) -> 'FrameFeatures':
+        """Features of a sub-rectangle (e.g. a tile) sharing this frame's integral images"""
+        part = FrameFeatures(self.gray[y1:y2, x1:x2])
+        part._parent = (self, x1, y1)
+        return part
+
+    @property
+    def edges(self) -> np.ndarray:
+        if self._edges is None:
+            edges = cv2.Canny(self.gray, CANNY_LOW, CANNY_HIGH)
+            with self._lock:
+                if self._edges is None:
+                    self._edges = edges
+        return self._edges
+
+    @edges.setter
+    def edges(self, edges: np.ndarray):
+        """Use an edge map computed elsewhere (e.g. stitched from tiles)"""
+        self._edges = edges
+        self._edge_count = None
+
+    @property
+    def foreground(self) -> np.ndarray:
+        """Dark-on-light structure: adaptive threshold (inverted), closed"""
+        if self._foreground is None:
+            thresh = cv2.adaptiveThreshold(self.gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                           cv2.THRESH_BINARY_INV, THRESHOLD_BLOCK, THRESHOLD_C)
+            kernel = cv2.getStructuringElement(cv2.MORPH_RECT, CLOSE_KERNEL)
+            foreground = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
+            with self._lock:
+                if self._foreground is None:
+                    self._foreground = foreground
+        return self._foreground
+
+    @foreground.setter
+    def foreground(self, foreground: np.ndarray):
+        self._foreground = foreground
+
+    def warm_intensity(self):
+        """Build the intensity integral images now, e.g. on a worker thread"""
+        if self._sum is not None:
+            return
+        with self._lock:
+            if self._sum is not None:
+                return
+            if self._parent is None:
+                total, self._sqsum = cv2.integral2(self.gray, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F)
+            else:
+                # Box sums are differences of corners, so a slice of the
+                # parent's integral image works in crop coordinates
+                parent, x1, y1 = self._parent
+                parent.warm_intensity()
+                window = (slice(y1, y1 + self.height + 1), slice(x1, x1 + self.width + 1))
+                total, self._sqsum = parent._sum[window], parent._sqsum[window]
+            self._sum = total
+
+    def _edge_integral(self):
+        if self._edge_count is None:
+            self._edge_count = cv2.integral((self.edges > 0).astype(np.uint8), sdepth=cv2.CV_32S)
+
+    def clip(self, boxes) -> np.ndarray:
+        """Integer boxes clipped to the frame"""
+        b = np.rint(as_boxes(boxes)).astype(np.intp)
+        b[:, 0] = np.clip(b[:, 0], 0, self.width)
+        b[:, 2] = np.clip(b[:, 2], 0, self.width)
+        b[:, 1] = np.clip(b[:, 1], 0, self.height)
+        b[:, 3] = np.clip(b[:, 3], 0, self.height)
+        return b
+
+    @staticmethod
+    def _box_sums(integral: np.ndarray, b: np.ndarray) -> np.ndarray:
+        x1, y1, x2, y2 = b[:, 0], b[:, 1], b[:, 2], b[:, 3]
+        return (integral[y2, x2] - integral[y1, x2] - integral[y2, x1] + integral[y1, x1]).astype(np.float64)
+
+    def _measure_directly(self, b: np.ndarray) -> bool:
+        """Whether measuring boxes one by one beats building the integral images"""
+        if self._sum is not None:
+            return False
+        area = float(((b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])).sum())
+        return area + len(b) * DIRECT_BOX_COST < INTEGRAL_COST * self.width * self.height
+
+    def _direct_intensity(self, b: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        mean, std = np.zeros(len(b)), np.zeros(len(b))
+        for k, (x1, y1, x2, y2) in enumerate(b.tolist()):
+            if x2 > x1 and y2 > y1:
+                m, s = cv2.meanStdDev(self.gray[y1:y2, x1:x2])
+                mean[k], std[k] = m[0, 0], s[0, 0]
+        return mean, std
+
+    def region_intensity(self, boxes) -> Tuple[np.ndarray, np.ndarray]:
+        """Mean intensity and intensity std of each box (no edge map needed)"""
+        b = self.clip(boxes)
+        if self._measure_directly(b):
+            return self._direct_intensity(b)
+        self.warm_intensity()
+        safe = np.maximum((b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1]), 1).astype(np.float64)
+        mean = self._box_sums(self._sum, b) / safe
+        variance = self._box_sums(self._sqsum, b) / safe - mean * mean
+        return mean, np.sqrt(np.clip(variance, 0, None))
+
+    def region_stats(self, boxes) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Mean intensity, intensity std and edge density of each box
+
+        Boxes are clipped to the frame; empty boxes get zeros.
+        """
+        b = self.clip(boxes)
+        safe = np.maximum((b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1]), 1).astype(np.float64)
+        if self._measure_directly(b) and self._edge_count is None:
+            mean, std = self._direct_intensity(b)
+            edges = self.edges
+            counts = np.array([cv2.countNonZero(edges[y1:y2, x1:x2]) if x2 > x1 and y2 > y1 else 0
+                               for x1, y1, x2, y2 in b.tolist()], dtype=np.float64)
+            return mean, std, counts / safe
+        mean, std = self.region_intensity(boxes)
+        self._edge_integral()
+        edge_density = self._box_sums(self._edge_count, b) / safe
+        return mean, std, edge_density
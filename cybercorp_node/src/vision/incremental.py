@@ -0,0 +1,249 @@
+"""Incremental UI detection between consecutive frames of the same window
+
+Each new frame is diffed against the previous one of its window in tiles.
+Changed tiles are grouped into dirty regions, padded by a margin and grown
+to cover any previous element they cut through, and detection runs on those
+crops only. Elements outside the dirty regions (and the large containers
+that enclose them) are carried over from the previous frame.
+
+A chat pane that only changes at the bottom therefore costs one small crop
+per frame instead of a full-window detection.
+"""
+
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .box_ops import as_boxes, iou, merge_overlapping
+from .spatial_index import BoxIndex
+
+Box = Tuple[int, int, int, int]
+
+DEFAULT_TILE = 32
+DEFAULT_MARGIN = 16
+DEFAULT_TOLERANCE = 12  # Grayscale levels; absorbs JPEG noise between captures
+DEFAULT_MAX_DIRTY = 0.5
+
+
+def to_gray(image: np.ndarray) -> np.ndarray:
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+
+
+def changed_tiles(previous: np.ndarray, current: np.ndarray, tile: int = DEFAULT_TILE,
+                  tolerance: int = DEFAULT_TOLERANCE) -> np.ndarray:
+    """Grid of tiles where any pixel moved by more than tolerance"""
+    diff = cv2.absdiff(previous, current)
+    height, width = diff.shape
+    rows, cols = -(-height // tile), -(-width // tile)
+    padded = np.zeros((rows * tile, cols * tile), dtype=diff.dtype)
+    padded[:height, :width] = diff
+    return padded.reshape(rows, tile, cols, tile).max(axis=(1, 3)) > tolerance
+
+
+def dirty_regions(tiles: np.ndarray, tile: int, margin: int, shape: Tuple[int, int]) -> List[Box]:
+    """Pixel boxes around connected groups of changed tiles, padded and merged"""
+    count, _, stats, _ = cv2.connectedComponentsWithStats(tiles.astype(np.uint8), connectivity=8)
+    if count <= 1:
+        return []
+    height, width = shape
+    boxes = []
+    for x, y, w, h, _ in stats[1:]:
+        boxes.append((max(0, x * tile - margin), max(0, y * tile - margin),
+                      min(width, (x + w) * tile + margin), min(height, (y + h) * tile + margin)))
+    return [tuple(int(v) for v in b) for b in merge_overlapping(boxes)]
+
+
+def shift_element(element: Dict[str, Any], dx: int, dy: int) -> Dict[str, Any]:
+    """Copy of an element dict moved from crop to frame coordinates"""
+    moved = dict(element)
+    x1, y1, x2, y2 = element['bbox']
+    moved['bbox'] = [x1 + dx, y1 + dy, x2 + dx, y2 + dy]
+    if element.get('center'):
+        moved['center'] = [element['center'][0] + dx, element['center'][1] + dy]
+    return moved
+
+
+@dataclass
+class FrameUpdate:
+    """Elements of a frame and what changed since the previous one"""
+    elements: List[Dict[str, Any]]
+    full: bool  # Whole frame was detected (first frame, resize, or too much changed)
+    regions: List[Box] = field(default_factory=list)
+    added: List[Dict[str, Any]] = field(default_factory=list)
+    removed: List[Dict[str, Any]] = field(default_factory=list)
+    unchanged: int = 0
+    dirty_fraction: float = 1.0
+    elapsed: float = 0.0
+
+    def changes(self) -> Dict[str, Any]:
+        """JSON-friendly summary for analysis results"""
+        return {
+            'full': self.full,
+            'regions': [list(r) for r in self.regions],
+            'added': self.added,
+            'removed': self.removed,
+            'unchanged': self.unchanged,
+            'dirty_fraction': round(self.dirty_fraction, 4),
+            'elapsed': self.elapsed
+        }
+
+
+class _WindowState:
+    __slots__ = ('gray', 'elements')
+
+    def __init__(self, gray: np.ndarray, elements: List[Dict[str, Any]]):
+        self.gray = gray
+        self.elements = elements
+
+
+class IncrementalDetector:
+    """Keep the last frame and elements per window and re-detect only what changed
+
+    Args:
+        detect: Runs detection on a BGR image (the full frame or a crop) and
+            returns element dicts with 'bbox' (and optionally 'center')
+        tile: Tile size in pixels for the frame diff
+        margin: Pixels added around changed tiles before re-detecting
+        tolerance: Max grayscale difference still treated as unchanged
+        max_dirty_fraction: Above this share of re-detected area, detect
+            the whole frame instead
+    """
+
+    def __init__(self, detect: Callable[[np.ndarray], List[Dict[str, Any]]], tile: int = DEFAULT_TILE,
+                 margin: int = DEFAULT_MARGIN, tolerance: int = DEFAULT_TOLERANCE,
+                 max_dirty_fraction: float = DEFAULT_MAX_DIRTY):
+        self.detect = detect
+        self.tile = tile
+        self.margin = margin
+        self.tolerance = tolerance
+        self.max_dirty_fraction = max_dirty_fraction
+        self._windows: Dict[Hashable, _WindowState] = {}
+
+    def forget(self, key: Hashable):
+        self._windows.pop(key, None)
+
+    def update(self, key: Hashable, image: np.ndarray) -> FrameUpdate:
+        """Detect elements in the newest frame of a window"""
+        start = time.perf_counter()
+        gray = to_gray(image)
+        state = self._windows.get(key)
+
+        if state is None or state.gray.shape != gray.shape:
+            update = self._full(image, state)
+        else:
+            tiles = changed_tiles(state.gray, gray, self.tile, self.tolerance)
+            regions = dirty_regions(tiles, self.tile, self.margin, gray.shape)
+            regions = self._grow(regions, state.elements, gray.shape)
+            area = sum((r[2] - r[0]) * (r[3] - r[1]) for r in regions)
+            fraction = area / float(gray.shape[0] * gray.shape[1])
+            if fraction > self.max_dirty_fraction:
+                update = self._full(image, state)
+                update.dirty_fraction = fraction
+            else:
+                update = self._partial(image, state, regions)
+                update.dirty_fraction = fraction
+
+        self._windows[key] = _WindowState(gray, update.elements)
+        update.elapsed = time.perf_counter() - start
+        return update
+
+    def _full(self, image: np.ndarray, state: Optional[_WindowState]) -> FrameUpdate:
+        elements = self.detect(image)
+        previous = state.elements if state else []
+        added, removed, unchanged = self._diff(previous, elements)
+        height, width = image.shape[:2]
+        return FrameUpdate(elements=elements, full=True, regions=[(0, 0, width, height)],
+                           added=added, removed=removed, unchanged=unchanged)
+
+    def _grow(self, regions: List[Box], elements: List[Dict[str, Any]], shape: Tuple[int, int],
+              max_rounds: int = 5) -> List[Box]:
+        """Extend regions over previous elements they cut through
+
+        Elements enclosing a region are left alone: a change inside a panel
+        does not move the panel. Repeats until no element is cut, since a
+        grown region can cut new ones.
+        """
+        if not regions or not elements:
+            return regions
+        boxes = as_boxes([e['bbox'] for e in elements])
+        index = BoxIndex(boxes)
+        height, width = shape
+        current = as_boxes(regions)
+        for _ in range(max_rounds):
+            queries, hits = index.search(current, 'intersects')
+            hit_boxes, r = boxes[hits], current[queries]
+            encloses = ((hit_boxes[:, 0] <= r[:, 0]) & (hit_boxes[:, 1] <= r[:, 1]) &
+                        (hit_boxes[:, 2] >= r[:, 2]) & (hit_boxes[:, 3] >= r[:, 3]))
+            inside = ((hit_boxes[:, 0] >= r[:, 0]) & (hit_boxes[:, 1] >= r[:, 1]) &
+                      (hit_boxes[:, 2] <= r[:, 2]) & (hit_boxes[:, 3] <= r[:, 3]))
+            overlaps = ((np.minimum(hit_boxes[:, 2], r[:, 2]) > np.maximum(hit_boxes[:, 0], r[:, 0])) &
+                        (np.minimum(hit_boxes[:, 3], r[:, 3]) > np.maximum(hit_boxes[:, 1], r[:, 1])))
+            cut = overlaps & ~encloses & ~inside
+            if not cut.any():
+                break
+            grown = current.copy()
+            np.minimum.at(grown[:, 0], queries[cut], hit_boxes[cut, 0])
+            np.minimum.at(grown[:, 1], queries[cut], hit_boxes[cut, 1])
+            np.maximum.at(grown[:, 2], queries[cut], hit_boxes[cut, 2])
+            np.maximum.at(grown[:, 3], queries[cut], hit_boxes[cut, 3])
+            current = merge_overlapping(grown)
+        current[:, [0, 2]] = np.clip(current[:, [0, 2]], 0, width)
+        current[:, [1, 3]] = np.clip(current[:, [1, 3]], 0, height)
+        return [tuple(int(v) for v in b) for b in current]
+
+    def _partial(self, image: np.ndarray, state: _WindowState, regions: List[Box]) -> FrameUpdate:
+        if not regions:
+            return FrameUpdate(elements=state.elements, full=False, unchanged=len(state.elements),
+                               dirty_fraction=0.0)
+
+        region_boxes = as_boxes(regions)
+        kept, stale = [], []
+        for element in state.elements:
+            b = element['bbox']
+            inside = ((region_boxes[:, 0] <= b[0]) & (region_boxes[:, 1] <= b[1]) &
+                      (region_boxes[:, 2] >= b[2]) & (region_boxes[:, 3] >= b[3])).any()
+            (stale if inside else kept).append(element)
+
+        # Detect with a margin of context so elements ending at a region's
+        # edge are still seen whole, then keep only those inside the region
+        height, width = image.shape[:2]
+        fresh = []
+        for x1, y1, x2, y2 in regions:
+            cx1, cy1 = max(0, x1 - self.margin), max(0, y1 - self.margin)
+            cx2, cy2 = min(width, x2 + self.margin), min(height, y2 + self.margin)
+            for element in self.detect(image[cy1:cy2, cx1:cx2]):
+                element = shift_element(element, cx1, cy1)
+                b = element['bbox']
+                if b[0] >= x1 and b[1] >= y1 and b[2] <= x2 and b[3] <= y2:
+                    fresh.append(element)
+
+        added, removed, unchanged = self._diff(stale, fresh)
+        return FrameUpdate(elements=kept + fresh, full=False, regions=regions, added=added,
+                           removed=removed, unchanged=len(kept) + unchanged)
+
+    @staticmethod
+    def _diff(before: List[Dict[str, Any]], after: List[Dict[str, Any]],
+              threshold: float = 0.9) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], int]:
+        """(added, removed, unchanged count), matching same-type elements by IoU"""
+        if not before:
+            return list(after), [], 0
+        index = BoxIndex([e['bbox'] for e in before])
+        matched = np.zeros(len(before), dtype=bool)
+        added = []
+        for element in after:
+            match = None
+            for k in index.query(element['bbox'], 'intersects').tolist():
+                old = before[k]
+                if (not matched[k] and old.get('type') == element.get('type')
+                        and iou(old['bbox'], element['bbox']) >= threshold):
+                    match = k
+                    break
+            if match is None:
+                added.append(element)
+            else:
+                matched[match] = True
+        removed = [old for old, m in zip(before, matched) if not m]
+        return added, removed, len(after) - len(added)
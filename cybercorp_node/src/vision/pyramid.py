@@ -0,0 +1,153 @@
+"""Coarse-to-fine UI detection over an image pyramid
+
+Most UI elements of a 4K capture are still found at a quarter of its
+resolution, where edge detection and adaptive thresholding cost a
+sixteenth. Detection therefore runs in levels:
+
+    1. the coarsest level runs the detection strategies on the whole
+       (downscaled) frame and proposes boxes
+    2. each finer level, ending at full resolution, recomputes the edge and
+       foreground maps only in bands around the proposed boxes: margin
+       pixels (of the coarser level) either side of every border, or the
+       whole box when it is small. The strategies then run on these sparse
+       maps and find the same borders, now exact, for the next level
+
+Detection keeps outermost contours only, so an element is defined by its
+border and the band around a proposal is enough to rebuild it. What a
+pyramid misses: elements too small or too faint to survive downscaling,
+and contents of an element that is not closed by a border. Where the
+bands would cover most of the frame anyway (dense grids of controls), the
+finer level is computed whole and the pyramid only costs its coarse pass.
+"""
+
+import math
+from typing import List, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from .box_ops import as_boxes
+from .frame_features import THRESHOLD_BLOCK, FrameFeatures
+
+Box = Tuple[int, int, int, int]
+
+# Pixels of image around a band needed for its maps to match the full
+# frame's: the adaptive threshold window is the widest filter
+CONTEXT = THRESHOLD_BLOCK // 2 + 2
+# Bands (with context) covering more of the frame than this are computed as
+# one whole-frame pass: dense layouts gain nothing from a pyramid
+DENSE_COVERAGE = 0.5
+# Proposals narrower than this many pixels of the level that proposed them
+# are refined whole: downscaled, a label and the input next to it can merge
+# into one box whose inner borders a band would miss
+WHOLE_BELOW = 64
+
+
+def downscale(gray: np.ndarray, scale: float) -> np.ndarray:
+    """Frame at scale (area averaging, as a display at a lower resolution would be)"""
+    if scale >= 1.0:
+        return gray
+    height, width = gray.shape[:2]
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+
+
+def scale_boxes(boxes, factor: float) -> np.ndarray:
+    """Boxes scaled outward to whole pixels (x1, y1 down; x2, y2 up)"""
+    b = as_boxes(boxes) * factor
+    b[:, :2] = np.floor(b[:, :2])
+    b[:, 2:] = np.ceil(b[:, 2:])
+    return b.astype(int)
+
+
+def band_rects(boxes, margin: int, width: int, height: int, whole_below: int = 0) -> List[Box]:
+    """Rectangles covering margin pixels either side of every box border
+
+    A box is covered whole when its smaller side is at most whole_below, or
+    when its band would skip less of it than the band covers (one crop is
+    then cheaper than four strips).
+    """
+    rects = []
+    for x1, y1, x2, y2 in as_boxes(boxes).astype(int).tolist():
+        ox1, oy1 = max(0, x1 - margin), max(0, y1 - margin)
+        ox2, oy2 = min(width, x2 + margin), min(height, y2 + margin)
+        if ox2 <= ox1 or oy2 <= oy1:
+            continue
+        inner = max(0, x2 - x1 - 2 * margin) * max(0, y2 - y1 - 2 * margin)
+        if min(x2 - x1, y2 - y1) <= whole_below or 2 * inner <= (ox2 - ox1) * (oy2 - oy1):
+            rects.append((ox1, oy1, ox2, oy2))
+            continue
+        ix1, iy1, ix2, iy2 = x1 + margin, y1 + margin, x2 - margin, y2 - margin
+        rects.extend([(ox1, oy1, ox2, iy1), (ox1, iy2, ox2, oy2),    # Top, bottom
+                      (ox1, iy1, ix1, iy2), (ix2, iy1, ox2, iy2)])   # Left, right
+    return rects
+
+
+def band_features(gray: np.ndarray, rects: Sequence[Box]) -> FrameFeatures:
+    """Features of the frame whose edge and foreground maps are only computed in rects
+
+    Each rect is processed with CONTEXT pixels of surrounding image, so
+    inside the rects the maps match those of the whole frame (up to Canny
+    hysteresis across the context border). Elsewhere they are empty.
+    Dense rects are not worth it; the maps are then computed whole.
+    """
+    height, width = gray.shape[:2]
+    padded = sum((min(width, x2 + CONTEXT) - max(0, x1 - CONTEXT)) *
+                 (min(height, y2 + CONTEXT) - max(0, y1 - CONTEXT)) for x1, y1, x2, y2 in rects)
+    if padded > DENSE_COVERAGE * width * height:
+        return FrameFeatures(gray)
+    edges = np.zeros_like(gray)
+    foreground = np.zeros_like(gray)
+    for x1, y1, x2, y2 in rects:
+        cx1, cy1 = max(0, x1 - CONTEXT), max(0, y1 - CONTEXT)
+        cx2, cy2 = min(width, x2 + CONTEXT), min(height, y2 + CONTEXT)
+        part = FrameFeatures(gray[cy1:cy2, cx1:cx2])
+        inner = (slice(y1 - cy1, y2 - cy1), slice(x1 - cx1, x2 - cx1))
+        np.maximum(edges[y1:y2, x1:x2], part.edges[inner], out=edges[y1:y2, x1:x2])
+        np.maximum(foreground[y1:y2, x1:x2], part.foreground[inner], out=foreground[y1:y2, x1:x2])
+    features = FrameFeatures(gray, edges=edges)
+    features.foreground = foreground
+    return features
+
+
+class Pyramid:
+    """Scale levels of a coarse-to-fine detection
+
+    Args:
+        scales: Coarse levels (0 < scale < 1), in any order; detection
+            starts at the smallest and refines through the others to full
+            resolution
+        margin: Band half-width around each proposed border, in pixels of
+            the level that proposed it; covers the position error of a
+            border found at that level
+    """
+
+    def __init__(self, scales: Sequence[float] = (0.25,), margin: int = 2):
+        levels = sorted({float(s) for s in scales if 0 < s < 1})
+        if not levels:
+            raise ValueError(f"Pyramid needs at least one scale below 1, got {list(scales)}")
+        self.scales = levels + [1.0]
+        self.margin = margin
+
+    def steps(self) -> List[Tuple[float, float]]:
+        """(coarser scale, finer scale) of every refinement"""
+        return list(zip(self.scales[:-1], self.scales[1:]))
+
+    def refine_rects(self, boxes, coarse: float, fine: float, width: int, height: int) -> List[Box]:
+        """Band rectangles at the finer level around boxes found at the coarser one"""
+        if not len(boxes):
+            return []
+        factor = fine / coarse
+        return band_rects(scale_boxes(boxes, factor), self.refine_margin(coarse, fine), width, height,
+                          whole_below=int(WHOLE_BELOW * factor))
+
+    def refine_margin(self, coarse: float, fine: float) -> int:
+        """Band half-width at the finer level
+
+        One pixel more than the margin: edges sit a pixel either side of
+        the border they mark, at every level.
+        """
+        return math.ceil(self.margin * fine / coarse) + 1
+
+    def __repr__(self) -> str:
+        return f"Pyramid(scales={self.scales[:-1]}, margin={self.margin})"
@@ -0,0 +1,281 @@
+"""Synthetic UI scenes with ground truth, for benchmarking UI detection
+
+Each scene is drawn with OpenCV (no display needed) and lists every element
+it drew: its box, its type in UIVisionModel's vocabulary, and its nesting
+level. Level 0 elements sit on the window background; level 1 elements sit
+inside a container, panel or bar. Layouts keep their structure at every
+resolution and scale their sizes by height / 720, as a desktop's display
+scaling does (100% at 720p, 300% at 4K).
+
+    forms       a settings card of labelled inputs, checkboxes and buttons
+    dashboard   toolbar tabs, a sidebar menu and a grid of widget cards
+    ide         activity bar, file tree, editor tabs and code, terminal,
+                status bar
+
+Detections are scored against the ground truth by one-to-one matching at
+an IoU threshold.
+"""
+
+import random
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from .box_ops import iou_matrix
+
+Box = Tuple[int, int, int, int]
+
+RESOLUTIONS = {
+    '720p': (1280, 720),
+    '1080p': (1920, 1080),
+    '1440p': (2560, 1440),
+    '4k': (3840, 2160),
+}
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+
+@dataclass
+class GroundTruth:
+    """One element a scene drew"""
+    element_type: str
+    bbox: Box
+    level: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'type': self.element_type, 'bbox': list(self.bbox), 'level': self.level}
+
+
+@dataclass
+class Scene:
+    """A synthetic frame (BGR) and the elements drawn on it"""
+    name: str
+    image: np.ndarray
+    truth: List[GroundTruth] = field(default_factory=list)
+
+    @property
+    def size(self) -> str:
+        return f"{self.image.shape[1]}x{self.image.shape[0]}"
+
+
+class _Canvas:
+    """Draws UI elements in layout units (1 unit = 1 pixel at 720p) and records them"""
+
+    def __init__(self, width: int, height: int, background: int, seed: int):
+        self.image = np.full((height, width, 3), background, dtype=np.uint8)
+        self.width, self.height = width, height
+        self.scale = height / 720
+        self.rng = random.Random(seed)
+        self.truth: List[GroundTruth] = []
+
+    def px(self, units: float) -> int:
+        return int(round(units * self.scale))
+
+    def box(self, x1, y1, x2, y2, fill=None, border=None, element_type=None, level=0, thickness=1) -> Box:
+        """Filled and/or outlined rectangle; pixel coordinates, border thickness in units"""
+        box = (int(x1), int(y1), int(x2), int(y2))
+        if fill is not None:
+            cv2.rectangle(self.image, box[:2], (box[2] - 1, box[3] - 1), fill, -1)
+        if border is not None:
+            cv2.rectangle(self.image, box[:2], (box[2] - 1, box[3] - 1), border, max(1, self.px(thickness)))
+        if element_type:
+            self.truth.append(GroundTruth(element_type, box, level))
+        return box
+
+    def text(self, x, y, text, size=0.5, color=(20, 20, 20), level=0, element_type='text') -> Box:
+        """Text with its baseline at y; records the box the glyphs cover"""
+        scale = size * self.scale
+        thickness = max(1, self.px(1))
+        (w, h), baseline = cv2.getTextSize(text, FONT, scale, thickness)
+        cv2.putText(self.image, text, (int(x), int(y)), FONT, scale, color, thickness, cv2.LINE_AA)
+        box = (int(x), int(y) - h, int(x) + w, int(y) + baseline)
+        if element_type:
+            self.truth.append(GroundTruth(element_type, box, level))
+        return box
+
+    def button(self, x, y, w, h, label, fill=(200, 140, 60), level=1) -> Box:
+        box = self.box(x, y, x + w, y + h, fill=fill, element_type='button', level=level)
+        self.text(x + self.px(10), y + h - (h - self.px(10)) // 2, label, 0.45, (255, 255, 255),
+                  element_type=None)
+        return box
+
+
+def form_scene(width: int, height: int, seed: int = 0) -> Scene:
+    c = _Canvas(width, height, 240, seed)
+    px = c.px
+    c.box(0, 0, width, px(40), fill=(60, 60, 60), element_type='container')
+    c.text(px(16), px(27), 'Account settings', 0.6, (255, 255, 255), level=1)
+
+    card_w = min(width - px(80), px(640))
+    cx1 = (width - card_w) // 2
+    rows = max(3, (height - px(220)) // px(48))
+    card_h = px(80) + rows * px(48) + px(60)
+    c.box(cx1, px(70), cx1 + card_w, px(70) + card_h, fill=(255, 255, 255), border=(170, 170, 170),
+          element_type='panel')
+    y = px(110)
+    for k in range(rows):
+        if c.rng.random() < 0.75:
+            c.text(cx1 + px(24), y + px(20), f"Field {k + 1}:", 0.45, level=1)
+            c.box(cx1 + px(160), y, cx1 + card_w - px(24), y + px(30), fill=(255, 255, 255),
+                  border=(130, 130, 130), element_type='input', level=1)
+        else:
+            c.box(cx1 + px(24), y + px(8), cx1 + px(40), y + px(24), fill=(255, 255, 255),
+                  border=(90, 90, 90), element_type='button', level=1)  # Checkbox
+            c.text(cx1 + px(52), y + px(21), f"Enable option {k + 1}", 0.45, level=1)
+        y += px(48)
+    by = px(70) + card_h - px(50)
+    c.button(cx1 + card_w - px(220), by, px(90), px(32), 'Cancel', fill=(150, 150, 150))
+    c.button(cx1 + card_w - px(114), by, px(90), px(32), 'Save', fill=(60, 140, 60))
+    c.text(px(16), height - px(14), 'Changes are saved to your profile', 0.4, (90, 90, 90))
+    return Scene(f"forms@{width}x{height}", c.image, c.truth)
+
+
+def dashboard_scene(width: int, height: int, seed: int = 0) -> Scene:
+    c = _Canvas(width, height, 245, seed)
+    px = c.px
+    c.box(0, 0, width, px(56), fill=(200, 200, 200), element_type='container')
+    x = px(16)
+    for k in range(min(8, (width - px(32)) // px(100))):
+        c.button(x, px(12), px(84), px(32), f"Tab {k + 1}", fill=(120, 120, 120))
+        x += px(100)
+
+    side_w = px(220)
+    c.box(0, px(56), side_w, height, fill=(225, 225, 225), element_type='container')
+    y = px(76)
+    while y + px(36) < height - px(16):
+        c.box(px(16), y, side_w - px(16), y + px(36), fill=(205, 205, 205), element_type='menu_item', level=1)
+        c.text(px(28), y + px(24), f"Report {(y - px(76)) // px(48) + 1}", 0.45, level=2, element_type=None)
+        y += px(48)
+
+    card_w, card_h, gap = px(280), px(200), px(24)
+    y = px(80)
+    while y + card_h < height - px(16):
+        x = side_w + gap
+        while x + card_w < width - px(16):
+            c.box(x, y, x + card_w, y + card_h, fill=(255, 255, 255), border=(190, 190, 190),
+                  element_type='panel')
+            c.text(x + px(16), y + px(30), f"Metric {c.rng.randint(10, 99)}", 0.55, level=1)
+            bars = c.rng.randint(3, 6)
+            for b in range(bars):
+                bh = px(c.rng.randint(20, 90))
+                bx = x + px(16) + b * px(36)
+                c.box(bx, y + px(150) - bh, bx + px(24), y + px(150), fill=(200, 160, 90),
+                      element_type='container', level=1)  # Chart bar
+            c.button(x + card_w - px(96), y + card_h - px(40), px(80), px(28), 'Open',
+                     fill=(90, 130, 200))
+            x += card_w + gap
+        y += card_h + gap
+    return Scene(f"dashboard@{width}x{height}", c.image, c.truth)
+
+
+def ide_scene(width: int, height: int, seed: int = 0) -> Scene:
+    c = _Canvas(width, height, 30, seed)
+    px = c.px
+    status_h, tabs_h, bar_w, tree_w = px(22), px(34), px(48), px(240)
+    c.box(0, height - status_h, width, height, fill=(160, 100, 0), element_type='container')
+    c.text(px(12), height - px(6), 'main  Ln 42, Col 7  UTF-8', 0.4, (255, 255, 255), level=1)
+
+    c.box(0, 0, bar_w, height - status_h, fill=(50, 50, 50), element_type='container')
+    for k in range(5):
+        y = px(12) + k * px(48)
+        c.box(px(10), y, bar_w - px(10), y + px(28), fill=(140, 140, 140), element_type='button', level=1)
+
+    c.box(bar_w, 0, bar_w + tree_w, height - status_h, fill=(40, 40, 40), element_type='container')
+    y = px(16)
+    names = ['src', 'vision', 'box_ops.py', 'tiling.py', 'scenes.py', 'core', 'client.py', 'tests', 'README.md']
+    k = 0
+    while y + px(22) < height - status_h - px(8):
+        indent = px(12) + px(14) * (k % 3)
+        c.text(bar_w + indent, y + px(16), names[k % len(names)], 0.42, (200, 200, 200), level=1)
+        y += px(24)
+        k += 1
+
+    ex1 = bar_w + tree_w
+    term_h = (height - status_h) // 3
+    c.box(ex1, 0, width, tabs_h, fill=(45, 45, 45), element_type='container')
+    x = ex1
+    for name in ['client.py', 'scenes.py', 'tiling.py', 'README.md'][:max(1, (width - ex1) // px(140))]:
+        c.box(x, 0, x + px(130), tabs_h, fill=(70, 70, 70), element_type='button', level=1)
+        c.text(x + px(12), px(23), name, 0.42, (230, 230, 230), level=2, element_type=None)
+        x += px(136)
+
+    y = tabs_h + px(26)
+    while y < height - status_h - term_h - px(12):
+        indent = px(16) * c.rng.randint(0, 3)
+        words = ' '.join(c.rng.choice(['def', 'return', 'self', 'cv2', 'np', 'boxes', 'scale'])
+                         for _ in range(c.rng.randint(2, 7)))
+        c.text(ex1 + px(56) + indent, y, words, 0.45, (210, 210, 160))
+        y += px(22)
+
+    ty1 = height - status_h - term_h
+    c.box(ex1, ty1, width, height - status_h, fill=(20, 20, 20), border=(80, 80, 80), element_type='panel')
+    y = ty1 + px(28)
+    while y < height - status_h - px(10):
+        c.text(ex1 + px(14), y, f"$ pytest -q  {c.rng.randint(10, 99)} passed", 0.42, (180, 220, 180), level=1)
+        y += px(22)
+    return Scene(f"ide@{width}x{height}", c.image, c.truth)
+
+
+SCENE_KINDS: Dict[str, Callable[[int, int, int], Scene]] = {
+    'forms': form_scene,
+    'dashboard': dashboard_scene,
+    'ide': ide_scene,
+}
+
+
+def generate_scenes(kinds: Sequence[str] = tuple(SCENE_KINDS), resolutions: Sequence[str] = tuple(RESOLUTIONS),
+                    seed: int = 0) -> List[Scene]:
+    """Every kind at every resolution, named 'kind@resolution'"""
+    scenes = []
+    for kind in kinds:
+        for resolution in resolutions:
+            width, height = RESOLUTIONS[resolution]
+            scene = SCENE_KINDS[kind](width, height, seed)
+            scene.name = f"{kind}@{resolution}"
+            scenes.append(scene)
+    return scenes
+
+
+def match(detected: Sequence[Box], truth: Sequence[Box], iou_threshold: float = 0.5) -> List[Tuple[int, int]]:
+    """One-to-one (detected index, truth index) pairs, best IoU first"""
+    if not len(detected) or not len(truth):
+        return []
+    overlaps = iou_matrix(detected, truth)
+    pairs = np.argwhere(overlaps >= iou_threshold)
+    order = np.argsort(-overlaps[pairs[:, 0], pairs[:, 1]], kind='stable')
+    used_d, used_t, matched = set(), set(), []
+    for d, t in pairs[order].tolist():
+        if d not in used_d and t not in used_t:
+            used_d.add(d)
+            used_t.add(t)
+            matched.append((d, t))
+    return matched
+
+
+def score(elements: Sequence[Any], truth: Sequence[GroundTruth], iou_threshold: float = 0.5) -> Dict[str, float]:
+    """Precision, recall (all and level 0) and type accuracy of detections
+
+    Elements are UIElement objects or dicts with 'type' and 'bbox'.
+    """
+    boxes, types = [], []
+    for element in elements:
+        if isinstance(element, dict):
+            boxes.append(tuple(element['bbox']))
+            types.append(element.get('type'))
+        else:
+            boxes.append(tuple(element.bbox))
+            types.append(element.element_type)
+    pairs = match(boxes, [t.bbox for t in truth], iou_threshold)
+    top = [k for k, t in enumerate(truth) if t.level == 0]
+    found = {t for _, t in pairs}
+    return {
+        'detected': len(boxes),
+        'truth': len(truth),
+        'matched': len(pairs),
+        'precision': len(pairs) / len(boxes) if boxes else 1.0,
+        'recall': len(pairs) / len(truth) if truth else 1.0,
+        'recall_top': sum(k in found for k in top) / len(top) if top else 1.0,
+        'type_accuracy': sum(types[d] == truth[t].element_type for d, t in pairs) / len(pairs) if pairs else 0.0,
+    }
@@ -0,0 +1,220 @@
+"""Spatial index over UI element boxes and the containment hierarchy built on it
+
+BoxIndex is a static R-tree packed with Sort-Tile-Recursive: boxes are
+sorted into leaves of leaf_size by center x, then y, and each level above
+groups leaf_size nodes of the one below. Searches run many queries at once,
+carrying (query, node) pairs down the levels and filtering them with NumPy,
+so a whole frame's worth of lookups costs a handful of array operations per
+level.
+
+UIHierarchy uses it to give every element its tightest containing element
+as parent (O(n log n) for the bounded nesting depth of real UIs) and to
+answer point and rectangle queries.
+"""
+
+import math
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .box_ops import areas, as_boxes
+
+DEFAULT_LEAF_SIZE = 16
+
+
+def _intersects(b: np.ndarray, q: np.ndarray) -> np.ndarray:
+    return (b[:, 0] <= q[:, 2]) & (b[:, 2] >= q[:, 0]) & (b[:, 1] <= q[:, 3]) & (b[:, 3] >= q[:, 1])
+
+
+def _contains(b: np.ndarray, q: np.ndarray) -> np.ndarray:
+    return (b[:, 0] <= q[:, 0]) & (b[:, 1] <= q[:, 1]) & (b[:, 2] >= q[:, 2]) & (b[:, 3] >= q[:, 3])
+
+
+def _inside(b: np.ndarray, q: np.ndarray) -> np.ndarray:
+    return (b[:, 0] >= q[:, 0]) & (b[:, 1] >= q[:, 1]) & (b[:, 2] <= q[:, 2]) & (b[:, 3] <= q[:, 3])
+
+
+# mode -> (test on node bounds, test on entries)
+_MODES = {
+    'intersects': (_intersects, _intersects),
+    'containing': (_contains, _contains),
+    'within': (_intersects, _inside),
+}
+
+
+class BoxIndex:
+    """Packed R-tree over a fixed set of boxes (edges are inclusive)"""
+
+    def __init__(self, boxes, leaf_size: int = DEFAULT_LEAF_SIZE):
+        self.boxes = as_boxes(boxes)
+        self.leaf_size = leaf_size
+        self.entries = self._str_order(self.boxes, leaf_size)
+
+        # levels[0] bounds the leaves; each next level bounds leaf_size nodes
+        # of the one below, up to a single root
+        self.levels: List[np.ndarray] = []
+        bounds = self.boxes[self.entries]
+        while len(bounds) > 0:
+            starts = np.arange(0, len(bounds), leaf_size)
+            level = np.empty((len(starts), 4))
+            level[:, 0] = np.minimum.reduceat(bounds[:, 0], starts)
+            level[:, 1] = np.minimum.reduceat(bounds[:, 1], starts)
+            level[:, 2] = np.maximum.reduceat(bounds[:, 2], starts)
+            level[:, 3] = np.maximum.reduceat(bounds[:, 3], starts)
+            self.levels.append(level)
+            if len(level) == 1:
+                break
+            bounds = level
+
+    def __len__(self) -> int:
+        return len(self.boxes)
+
+    @staticmethod
+    def _str_order(boxes: np.ndarray, leaf_size: int) -> np.ndarray:
+        n = len(boxes)
+        if n == 0:
+            return np.empty(0, dtype=np.intp)
+        cx = boxes[:, 0] + boxes[:, 2]
+        cy = boxes[:, 1] + boxes[:, 3]
+        slabs = math.ceil(math.sqrt(math.ceil(n / leaf_size)))
+        per_slab = slabs * leaf_size
+        by_x = np.argsort(cx, kind='stable')
+        slab = np.empty(n, dtype=np.intp)
+        slab[by_x] = np.arange(n) // per_slab
+        return np.lexsort((cy, slab))
+
+    def search(self, queries, mode: str = 'intersects') -> Tuple[np.ndarray, np.ndarray]:
+        """Match many query boxes at once
+
+        Args:
+            queries: (m, 4) boxes; a point is the box (x, y, x, y)
+            mode: 'intersects' (entry touches query), 'containing' (entry
+                contains query) or 'within' (entry lies inside query)
+
+        Returns:
+            (query index, box index) pairs, sorted by query then box
+        """
+        q = as_boxes(queries)
+        node_test, entry_test = _MODES[mode]
+        empty = np.empty(0, dtype=np.intp)
+        if len(q) == 0 or not self.levels:
+            return empty, empty
+
+        qi = np.arange(len(q))
+        nodes = np.zeros(len(q), dtype=np.intp)  # Every query starts at the root
+        for depth in range(len(self.levels) - 1, -1, -1):
+            hit = node_test(self.levels[depth][nodes], q[qi])
+            qi, nodes = qi[hit], nodes[hit]
+            below = len(self.levels[depth - 1]) if depth > 0 else len(self.entries)
+            children = (nodes[:, None] * self.leaf_size + np.arange(self.leaf_size)).ravel()
+            qi = np.repeat(qi, self.leaf_size)
+            valid = children < below
+            qi, nodes = qi[valid], children[valid]
+
+        found = self.entries[nodes]
+        hit = entry_test(self.boxes[found], q[qi])
+        qi, found = qi[hit], found[hit]
+        sort = np.lexsort((found, qi))
+        return qi[sort], found[sort]
+
+    def query(self, box, mode: str = 'intersects') -> np.ndarray:
+        """Indices of the boxes matching one query box, ascending"""
+        return self.search([box], mode)[1]
+
+    def query_point(self, x: float, y: float) -> np.ndarray:
+        """Indices of the boxes containing a point, ascending"""
+        return self.search([(x, y, x, y)], 'intersects')[1]
+
+
+def containment_parents(boxes, index: Optional[BoxIndex] = None) -> np.ndarray:
+    """Tightest containing box of every box, or -1 for top-level boxes
+
+    Boxes are ranked by area, largest first (ties keep input order), and a
+    box can only be the parent of boxes ranked after it, so identical boxes
+    nest instead of forming a cycle.
+    """
+    b = as_boxes(boxes)
+    n = len(b)
+    if index is None:
+        index = BoxIndex(b)
+    order = np.argsort(-areas(b), kind='stable')
+    rank = np.empty(n, dtype=np.intp)
+    rank[order] = np.arange(n)
+
+    child, parent = index.search(b, 'containing')
+    keep = rank[parent] < rank[child]
+    child, parent = child[keep], parent[keep]
+    # Tightest container = the last-ranked one
+    sort = np.lexsort((rank[parent], child))
+    child, parent = child[sort], parent[sort]
+    last = np.ones(len(child), dtype=bool)
+    last[:-1] = child[:-1] != child[1:]
+
+    parents = np.full(n, -1, dtype=np.intp)
+    parents[child[last]] = parent[last]
+    return parents
+
+
+class UIHierarchy:
+    """Containment tree over detected UI elements with spatial queries
+
+    Args:
+        elements: UIElement objects or element dicts with a 'bbox'
+            (x1, y1, x2, y2)
+    """
+
+    def __init__(self, elements: Sequence[Any], leaf_size: int = DEFAULT_LEAF_SIZE):
+        self.elements = list(elements)
+        boxes = as_boxes([self._bbox(e) for e in self.elements])
+        self.index = BoxIndex(boxes, leaf_size)
+        self.parents = containment_parents(boxes, self.index)
+
+        n = len(self.elements)
+        order = np.argsort(-areas(boxes), kind='stable')
+        self.depths = np.zeros(n, dtype=np.intp)
+        self.children: List[List[int]] = [[] for _ in range(n)]
+        self.roots: List[int] = []
+        for idx in order.tolist():  # Parents come before their children
+            parent = int(self.parents[idx])
+            if parent < 0:
+                self.roots.append(idx)
+            else:
+                self.depths[idx] = self.depths[parent] + 1
+                self.children[parent].append(idx)
+        self._areas = areas(boxes)
+
+    @staticmethod
+    def _bbox(element) -> Sequence[float]:
+        return element['bbox'] if isinstance(element, dict) else element.bbox
+
+    @staticmethod
+    def _describe(element) -> Dict[str, Any]:
+        if isinstance(element, dict):
+            return {'type': element.get('type'), 'bbox': element['bbox']}
+        return {'type': element.element_type, 'bbox': element.bbox}
+
+    def path_at(self, x: float, y: float) -> List[Any]:
+        """Elements containing a point, outermost first"""
+        hits = self.index.query_point(x, y)
+        hits = hits[np.lexsort((-self._areas[hits], self.depths[hits]))]
+        return [self.elements[i] for i in hits.tolist()]
+
+    def element_at(self, x: float, y: float) -> Optional[Any]:
+        """Innermost element containing a point, or None"""
+        path = self.path_at(x, y)
+        return path[-1] if path else None
+
+    def elements_in(self, rect: Sequence[float]) -> List[Any]:
+        """Elements lying entirely inside a rectangle, in input order"""
+        return [self.elements[i] for i in self.index.query(rect, 'within').tolist()]
+
+    def elements_overlapping(self, rect: Sequence[float]) -> List[Any]:
+        """Elements touching a rectangle, in input order"""
+        return [self.elements[i] for i in self.index.query(rect, 'intersects').tolist()]
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """Nested {'element', 'children'} nodes, larger elements first"""
+        nodes = [{'element': self._describe(e), 'children': []} for e in self.elements]
+        for parent, children in enumerate(self.children):
+            nodes[parent]['children'] = [nodes[c] for c in children]
+        return [nodes[r] for r in self.roots]
@@ -0,0 +1,216 @@
+"""Split large frames into overlapping tiles and stitch per-tile detections
+
+Every tile owns a core: the tile minus half of each overlap it shares with
+a neighbour, so the cores partition the frame. Stitching then works per
+detection:
+
+    complete box (clear of the tile's inner edges)  kept by the tile whose
+                                                    core holds its center
+    truncated box (touching an inner edge)          joined with the pieces of
+                                                    the same element from the
+                                                    neighbouring tiles
+
+and a final NMS removes what is still duplicated. Elements up to the
+overlap in size are always seen whole by the tile that owns them.
+"""
+
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from .box_ops import as_boxes, nms, overlap_pairs, union_boxes
+
+Box = Tuple[int, int, int, int]
+
+EDGE_SLACK = 1       # Pixels from an inner tile edge that count as touching it
+EXTENT_SLACK = 4     # Pixels two pieces of one element may disagree by
+
+
+def _spans(length: int, size: int, overlap: int) -> List[Tuple[int, int]]:
+    """Fewest spans of at most size covering length, spread evenly"""
+    if length <= size:
+        return [(0, length)]
+    count = -(-(length - overlap) // max(1, size - overlap))
+    size = -(-(length + (count - 1) * overlap) // count)
+    starts = np.linspace(0, length - size, count).round().astype(int).tolist()
+    return [(s, s + size) for s in starts]
+
+
+def _cores(spans: List[Tuple[int, int]]) -> List[Tuple[float, float]]:
+    cores = []
+    for k, (start, end) in enumerate(spans):
+        low = (start + spans[k - 1][1]) / 2 if k > 0 else start
+        high = (spans[k + 1][0] + end) / 2 if k + 1 < len(spans) else end
+        cores.append((low, high))
+    return cores
+
+
+class TileGrid:
+    """Overlapping tiles over a width x height frame, in row-major order"""
+
+    def __init__(self, width: int, height: int, tile_size: int, overlap: int):
+        self.width = width
+        self.height = height
+        x_spans, y_spans = _spans(width, tile_size, overlap), _spans(height, tile_size, overlap)
+        x_cores, y_cores = _cores(x_spans), _cores(y_spans)
+        self.tiles: List[Box] = []
+        self.cores: List[Tuple[float, float, float, float]] = []
+        for (y1, y2), (cy1, cy2) in zip(y_spans, y_cores):
+            for (x1, x2), (cx1, cx2) in zip(x_spans, x_cores):
+                self.tiles.append((x1, y1, x2, y2))
+                self.cores.append((cx1, cy1, cx2, cy2))
+
+    def __len__(self) -> int:
+        return len(self.tiles)
+
+    def stitch_image(self, parts: Sequence[np.ndarray]) -> np.ndarray:
+        """Reassemble a per-tile map (e.g. edges) from each tile's core"""
+        first = parts[0]
+        out = np.empty((self.height, self.width) + first.shape[2:], dtype=first.dtype)
+        for (x1, y1, _, _), core, part in zip(self.tiles, self.cores, parts):
+            cx1, cy1, cx2, cy2 = (int(np.ceil(v)) for v in core)
+            out[cy1:cy2, cx1:cx2] = part[cy1 - y1:cy2 - y1, cx1 - x1:cx2 - x1]
+        return out
+
+    def _bridge(self, b: np.ndarray, tile_ids: np.ndarray, cut_end: np.ndarray, cut_start: np.ndarray,
+                axis: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Pairs (end piece, start piece) of one element split along an axis
+
+        The end piece is cut at the far side of its tile, the start piece at
+        the near side of a tile that begins past that side (tiles that
+        overlap saw the element continue and are joined by overlap) and at
+        most one tile away, and both agree on their extent across the axis.
+        """
+        ends, starts = np.nonzero(cut_end)[0], np.nonzero(cut_start)[0]
+        if not len(ends) or not len(starts):
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+        other = 1 - axis
+        e, s = b[ends][:, None], b[starts][None, :]
+        gap = s[..., axis] - e[..., axis + 2]
+        span = self.height if axis else self.width
+        tile_span = max(t[axis + 2] - t[axis] for t in self.tiles) if span else 0
+        match = ((tile_ids[ends][:, None] != tile_ids[starts][None, :]) &
+                 (gap > 0) & (gap <= tile_span) &
+                 (np.abs(s[..., other] - e[..., other]) <= EXTENT_SLACK) &
+                 (np.abs(s[..., other + 2] - e[..., other + 2]) <= EXTENT_SLACK))
+        ei, si = np.nonzero(match)
+        ends, starts = ends[ei], starts[si]
+
+        # A box in the gap with the same extent is a sibling in the same row
+        # (or column), so the pieces belong to separate elements
+        keep = np.ones(len(ends), dtype=bool)
+        for k, (end, start) in enumerate(zip(ends, starts)):
+            low, high = b[end, axis + 2], b[start, axis]
+            sibling = ((b[:, axis + 2] > low) & (b[:, axis] < high) &
+                       (np.abs(b[:, other] - b[end, other]) <= EXTENT_SLACK) &
+                       (np.abs(b[:, other + 2] - b[end, other + 2]) <= EXTENT_SLACK))
+            keep[k] = not sibling.any()
+        return ends[keep], starts[keep]
+
+    def _enclosed(self, b: np.ndarray, spans_seam: np.ndarray) -> np.ndarray:
+        """Boxes strictly inside a closed element that crosses a seam
+
+        A seam opens the outline of every element it cuts, so a tile also
+        reports what that element encloses. An element clear of the frame
+        border is closed in the full frame, where an outermost-contour
+        detector reports nothing inside it.
+        """
+        enclosed = np.zeros(len(b), dtype=bool)
+        closed = (spans_seam & (b[:, 0] > EDGE_SLACK) & (b[:, 1] > EDGE_SLACK) &
+                  (b[:, 2] < self.width - EDGE_SLACK) & (b[:, 3] < self.height - EDGE_SLACK))
+        for k in np.nonzero(closed)[0]:
+            inside = ((b[:, 0] >= b[k, 0]) & (b[:, 1] >= b[k, 1]) &
+                      (b[:, 2] <= b[k, 2]) & (b[:, 3] <= b[k, 3]))
+            inside[k] = False
+            enclosed |= inside
+        return enclosed
+
+    def stitch_boxes(self, boxes, scores, tile_ids, nms_threshold: float = 0.7,
+                     outermost: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """Frame-coordinate boxes from all tiles -> deduplicated boxes and scores
+
+        Args:
+            outermost: Boxes come from an outermost-contour detector
+                (cv2.RETR_EXTERNAL); drop what seams exposed inside
+                elements that are closed in the full frame
+
+        Output order follows input order (a joined element takes the place
+        of its first piece), so results do not depend on which tile
+        finished first.
+        """
+        b = as_boxes(boxes)
+        scores = np.asarray(scores, dtype=np.float64)
+        tile_ids = np.asarray(tile_ids, dtype=np.intp)
+        if len(b) == 0:
+            return b, scores
+        tiles = np.asarray(self.tiles, dtype=np.float64)[tile_ids]
+        cores = np.asarray(self.cores, dtype=np.float64)[tile_ids]
+
+        # Which inner tile edges each box touches
+        cut_left = (tiles[:, 0] > 0) & (b[:, 0] <= tiles[:, 0] + EDGE_SLACK)
+        cut_top = (tiles[:, 1] > 0) & (b[:, 1] <= tiles[:, 1] + EDGE_SLACK)
+        cut_right = (tiles[:, 2] < self.width) & (b[:, 2] >= tiles[:, 2] - EDGE_SLACK)
+        cut_bottom = (tiles[:, 3] < self.height) & (b[:, 3] >= tiles[:, 3] - EDGE_SLACK)
+        cut_x = cut_left | cut_right
+        cut_y = cut_top | cut_bottom
+        truncated = cut_x | cut_y
+
+        cx = (b[:, 0] + b[:, 2]) / 2
+        cy = (b[:, 1] + b[:, 3]) / 2
+        owned = (cx >= cores[:, 0]) & (cx < cores[:, 2]) & (cy >= cores[:, 1]) & (cy < cores[:, 3])
+        # Centers on the frame's far edges belong to the last tile
+        owned |= ((cx == self.width) & (cores[:, 2] == self.width) & (cy >= cores[:, 1]) & (cy < cores[:, 3]))
+        owned |= ((cy == self.height) & (cores[:, 3] == self.height) & (cx >= cores[:, 0]) & (cx < cores[:, 2]))
+
+        # Join pieces of one element: overlapping, from different tiles, cut
+        # by a seam, and agreeing on their extent along that seam. A whole
+        # copy seen by a neighbouring tile completes the piece.
+        labels = np.arange(len(b))
+        i, j, _ = overlap_pairs(b, 0.0)
+        same_y = (np.abs(b[i, 1] - b[j, 1]) <= EXTENT_SLACK) & (np.abs(b[i, 3] - b[j, 3]) <= EXTENT_SLACK)
+        same_x = (np.abs(b[i, 0] - b[j, 0]) <= EXTENT_SLACK) & (np.abs(b[i, 2] - b[j, 2]) <= EXTENT_SLACK)
+        linked = ((tile_ids[i] != tile_ids[j]) & (truncated[i] | truncated[j]) &
+                  (((cut_x[i] | cut_x[j]) & same_y) | ((cut_y[i] | cut_y[j]) & same_x)))
+        i, j = i[linked], j[linked]
+
+        # Elements larger than a tile leave only their sides in the tiles
+        # between their ends; bridge pieces cut on facing sides
+        bridges = [self._bridge(b, tile_ids, cut_bottom, cut_top, axis=1),
+                   self._bridge(b, tile_ids, cut_right, cut_left, axis=0)]
+        i = np.concatenate([i] + [pair[0] for pair in bridges])
+        j = np.concatenate([j] + [pair[1] for pair in bridges])
+        while len(i):
+            low = np.minimum(labels[i], labels[j])
+            if np.array_equal(labels[i], low) and np.array_equal(labels[j], low):
+                break
+            np.minimum.at(labels, i, low)
+            np.minimum.at(labels, j, low)
+            labels = labels[labels]
+
+        roots, merged = union_boxes(b, labels)
+        group = np.searchsorted(roots, labels)
+        best = np.full(len(roots), -np.inf)
+        np.maximum.at(best, group, scores)
+        sizes = np.bincount(group, minlength=len(roots))
+        joined = {root: (box, score) for root, box, score, size in zip(roots.tolist(), merged, best, sizes)
+                  if size > 1 or truncated[root]}
+
+        out_boxes, out_scores, spans_seam = [], [], []
+        for k in range(len(b)):
+            if k in joined:
+                box, score = joined[k]  # Joined element, at the place of its first piece
+            elif owned[k] and not truncated[k] and labels[k] == k:
+                box, score = b[k], scores[k]
+            else:
+                continue
+            out_boxes.append(box)
+            out_scores.append(score)
+            spans_seam.append(k in joined)
+
+        out_boxes = as_boxes(out_boxes)
+        out_scores = np.asarray(out_scores)
+        if outermost:
+            keep = ~self._enclosed(out_boxes, np.asarray(spans_seam, dtype=bool))
+            out_boxes, out_scores = out_boxes[keep], out_scores[keep]
+        keep = np.sort(nms(out_boxes, out_scores, nms_threshold))
+        return out_boxes[keep], out_scores[keep]
@@ -2,12 +2,20 @@
 
 import cv2
 import numpy as np
-from typing import List, Dict, Any, Tuple, Optional
+from typing import List, Dict, Any, Tuple, Optional, Sequence
+import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from PIL import Image
 import json
 
+from .box_ops import greedy_groups, iou, merge_overlapping
+from .frame_features import FrameFeatures
+from .pyramid import Pyramid, band_features, downscale
+from .spatial_index import UIHierarchy
+from .tiling import TileGrid
+
 # Try to import YOLO for object detection (optional)
 try:
     from ultralytics import YOLO
@@ -28,16 +36,60 @@ class UIElement:
     attributes: Dict[str, Any] = None
 
 
+class StageTimer:
+    """Wall time of consecutive stages, from perf_counter laps"""
+    
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+        self._mark = time.perf_counter()
+        
+    def lap(self, stage: str):
+        """Charge the time since the previous lap (or creation) to stage"""
+        now = time.perf_counter()
+        self.timings[stage] = self.timings.get(stage, 0.0) + now - self._mark
+        self._mark = now
+        
+    @property
+    def total(self) -> float:
+        return sum(self.timings.values())
+
+
 class UIVisionModel:
     """Lightweight vision model for UI understanding"""
     
-    def __init__(self, use_yolo: bool = False):
+    def __init__(self, use_yolo: bool = False, workers: int = 1, tile_size: int = 1024,
+                 tile_overlap: int = 128, tile_above: int = 2560 * 1600,
+                 pyramid_scales: Sequence[float] = (), pyramid_margin: int = 2,
+                 pyramid_above: int = 2560 * 1600):
         """Initialize vision model
         
         Args:
             use_yolo: Whether to use YOLO for object detection
+            workers: Threads running detection strategies (and tiles)
+                concurrently; 1 keeps the serial path, 0 uses one per core
+            tile_size: Tile edge in pixels for large frames
+            tile_overlap: Pixels shared by neighbouring tiles; elements up
+                to this size are always seen whole by one tile
+            tile_above: Frames with more pixels than this (4K, multi-monitor
+                captures) are split into tiles when workers > 1
+            pyramid_scales: Coarse scales (e.g. (0.25,) or (0.25, 0.5)) for
+                coarse-to-fine detection; empty detects at full resolution
+            pyramid_margin: Pixels of a coarse level either side of each
+                proposed border that are searched at the next level
+            pyramid_above: Frames with more pixels than this use the pyramid
+                (when scales are set) instead of tiles
         """
         self.use_yolo = use_yolo and YOLO_AVAILABLE
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap
+        self.tile_above = tile_above
+        self.pyramid_scales = tuple(pyramid_scales)
+        self.pyramid_margin = pyramid_margin
+        self.pyramid_above = pyramid_above
+        self._pyramid = Pyramid(pyramid_scales, pyramid_margin) if pyramid_scales else None
+        self._executor = None
+        self._last_timings: Dict[str, float] = {}
         
         if self.use_yolo:
             # Load YOLO model (you can train a custom one for UI elements)
@@ -77,45 +129,190 @@ class UIVisionModel:
         Returns:
             List of detected UI elements
         """
-        start_time = time.time()
+        timer = StageTimer()
+        
+        # Convert to grayscale for processing; edges and integral images
+        # are computed once and shared by every strategy below
+        features = FrameFeatures.from_image(image)
+        gray = features.gray
+        timer.lap('grayscale')
+        
+        pyramid = self.uses_pyramid(features.width, features.height)
+        if pyramid:
+            # Sparse full-resolution maps for the strategies below
+            self._refine_pyramid(features)
+            timer.lap('pyramid')
+        
+        if self.workers > 1 and not pyramid:
+            elements = self._detect_parallel(image, features)
+            timer.lap('detect')
+        else:
+            # Detect elements using multiple strategies
+            elements = []
+            
+            # Strategy 1: Edge-based detection
+            edge_elements = self._detect_by_edges(gray, features)
+            elements.extend(edge_elements)
+            timer.lap('edges')
+            
+            # Strategy 2: Contour-based detection
+            contour_elements = self._detect_by_contours(gray, features)
+            elements.extend(contour_elements)
+            timer.lap('contours')
+            
+            # Strategy 3: YOLO detection (if available)
+            if self.use_yolo:
+                yolo_elements = self._detect_by_yolo(image)
+                elements.extend(yolo_elements)
+                timer.lap('yolo')
         
-        # Convert to grayscale for processing
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        # Remove duplicates and merge overlapping elements
+        elements = self._merge_elements(elements)
+        timer.lap('merge')
         
-        # Detect elements using multiple strategies
-        elements = []
+        # Classify elements
+        for element, element_type in zip(elements, self._classify_elements(elements, features)):
+            element.element_type = element_type
+        timer.lap('classify')
+            
+        self._last_timings = timer.timings
+        print(f"UI detection took {timer.total:.3f}s, found {len(elements)} elements")
         
-        # Strategy 1: Edge-based detection
-        edge_elements = self._detect_by_edges(gray)
-        elements.extend(edge_elements)
+        return elements
         
-        # Strategy 2: Contour-based detection
-        contour_elements = self._detect_by_contours(gray)
-        elements.extend(contour_elements)
+    @property
+    def last_timings(self) -> Dict[str, float]:
+        """Seconds per stage of the last detect_ui_elements call
         
-        # Strategy 3: YOLO detection (if available)
-        if self.use_yolo:
-            yolo_elements = self._detect_by_yolo(image)
-            elements.extend(yolo_elements)
+        Stages: grayscale, then edges and contours (serial), detect
+        (workers > 1) or pyramid, edges and contours (coarse-to-fine), then
+        yolo, merge and classify; extract_ui_structure adds hierarchy.
+        Kept off the public attributes, which key the analysis cache.
+        """
+        return self._last_timings
+        
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                thread_name_prefix='ui-vision')
+        return self._executor
+        
+    def close(self):
+        """Shut down the worker threads (started again if detection runs later)"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+            
+    def __enter__(self):
+        return self
         
-        # Remove duplicates and merge overlapping elements
-        elements = self._merge_elements(elements)
+    def __exit__(self, *exc_info):
+        self.close()
         
-        # Classify elements
-        for element in elements:
-            element.element_type = self._classify_element(element, gray)
-            
-        elapsed = time.time() - start_time
-        print(f"UI detection took {elapsed:.3f}s, found {len(elements)} elements")
+    def tile_grid(self, width: int, height: int) -> Optional[TileGrid]:
+        """Tiles for a frame of this size, or None if it is detected whole"""
+        if width * height <= self.tile_above:
+            return None
+        return TileGrid(width, height, self.tile_size, self.tile_overlap)
+        
+    def uses_pyramid(self, width: int, height: int) -> bool:
+        """Whether a frame of this size is detected coarse-to-fine"""
+        return self._pyramid is not None and width * height > self.pyramid_above
+        
+    def _refine_pyramid(self, features: FrameFeatures):
+        """Propose elements at the coarsest scale, refine their borders up to full resolution
+        
+        Every level after the first computes edges and foreground only in
+        bands around the boxes of the level before; see vision.pyramid.
+        The full-resolution bands replace the maps of features, for the
+        strategies and for classification.
+        """
+        pyramid = self._pyramid
+        scales = pyramid.scales
+        boxes = self._propose(FrameFeatures(downscale(features.gray, scales[0])), scales[0])
+        
+        for coarse, fine in pyramid.steps():
+            level_gray = downscale(features.gray, fine)
+            height, width = level_gray.shape[:2]
+            level = band_features(level_gray, pyramid.refine_rects(boxes, coarse, fine, width, height))
+            if fine < 1.0:
+                boxes = self._propose(level, fine)
+            else:
+                features.edges = level.edges
+                features.foreground = level.foreground
+        
+    def _propose(self, features: FrameFeatures, scale: float) -> List[Tuple[int, int, int, int]]:
+        """Boxes found by the strategies on a downscaled frame, in its pixels"""
+        min_size = max(2, int(self.min_element_size * scale))
+        found = self._detect_by_edges(features.gray, features, min_size=min_size)
+        found.extend(self._detect_by_contours(features.gray, features, min_size=min_size))
+        if not found:
+            return []
+        # Both strategies find most borders; refine each once
+        return [tuple(box) for box in merge_overlapping([e.bbox for e in found], 0.5).astype(int).tolist()]
         
+    def _detect_parallel(self, image: np.ndarray, features: FrameFeatures) -> List[UIElement]:
+        """Run every strategy (per tile, on large frames) in the thread pool
+        
+        OpenCV releases the GIL, so strategies and tiles overlap on separate
+        cores. Futures are collected in submission order and tile results
+        are stitched in tile order, so the output does not depend on which
+        thread finishes first and matches the serial element order.
+        """
+        executor = self._get_executor()
+        height, width = features.gray.shape[:2]
+        grid = self.tile_grid(width, height)
+        
+        if grid is None:
+            tiles = [(0, 0, width, height)]
+            tile_features = [features]
+        else:
+            tiles = grid.tiles
+            tile_features = [features.crop(*tile) for tile in tiles]
+            # Tiles share the frame's integral images; start them first
+            executor.submit(features.warm_intensity)
+        
+        strategies = [self._detect_by_edges, self._detect_by_contours]
+        jobs = [[executor.submit(detect, tf.gray, tf) for tf in tile_features] for detect in strategies]
+        yolo_job = executor.submit(self._detect_by_yolo, image) if self.use_yolo else None
+        
+        elements = []
+        for futures in jobs:
+            per_tile = [future.result() for future in futures]
+            if grid is None:
+                elements.extend(per_tile[0])
+                continue
+            boxes, scores, tile_ids = [], [], []
+            for tile_id, ((x1, y1, _, _), found) in enumerate(zip(tiles, per_tile)):
+                for e in found:
+                    bx1, by1, bx2, by2 = e.bbox
+                    boxes.append((bx1 + x1, by1 + y1, bx2 + x1, by2 + y1))
+                    scores.append(e.confidence)
+                    tile_ids.append(tile_id)
+            # Both strategies keep only outermost contours (RETR_EXTERNAL)
+            boxes, scores = grid.stitch_boxes(boxes, scores, tile_ids, outermost=True)
+            elements.extend(
+                UIElement(element_type='unknown', bbox=tuple(box), confidence=score)
+                for box, score in zip(boxes.astype(int).tolist(), scores.tolist())
+            )
+        
+        if grid is not None:
+            # Classification reuses the tiles' edge maps instead of running
+            # Canny over the whole frame again
+            features.edges = grid.stitch_image([tf.edges for tf in tile_features])
+        
+        if yolo_job is not None:
+            elements.extend(yolo_job.result())
         return elements
         
-    def _detect_by_edges(self, gray: np.ndarray) -> List[UIElement]:
+    def _detect_by_edges(self, gray: np.ndarray, features: Optional[FrameFeatures] = None,
+                         min_size: Optional[int] = None) -> List[UIElement]:
         """Detect UI elements using edge detection"""
         elements = []
+        min_size = min_size or self.min_element_size
         
         # Apply Canny edge detection
-        edges = cv2.Canny(gray, 50, 150)
+        edges = (features or FrameFeatures(gray)).edges
         
         # Find contours from edges
         contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
@@ -125,7 +322,7 @@ class UIVisionModel:
             x, y, w, h = cv2.boundingRect(contour)
             
             # Filter by size
-            if w < self.min_element_size or h < self.min_element_size:
+            if w < min_size or h < min_size:
                 continue
                 
             # Create UI element
@@ -138,19 +335,16 @@ class UIVisionModel:
             
         return elements
         
-    def _detect_by_contours(self, gray: np.ndarray) -> List[UIElement]:
+    def _detect_by_contours(self, gray: np.ndarray, features: Optional[FrameFeatures] = None,
+                            min_size: Optional[int] = None) -> List[UIElement]:
         """Detect UI elements using adaptive thresholding and contours"""
-        elements = []
+        features = features or FrameFeatures(gray)
+        min_size = min_size or self.min_element_size
+        boxes = []
         
-        # Adaptive threshold to handle varying lighting
-        thresh = cv2.adaptiveThreshold(
-            gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-            cv2.THRESH_BINARY_INV, 11, 2
-        )
-        
-        # Morphological operations to connect components
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (5, 3))
-        morph = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
+        # Adaptive threshold to handle varying lighting, closed to connect
+        # components
+        morph = features.foreground
         
         # Find contours
         contours, _ = cv2.findContours(morph, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
@@ -160,29 +354,30 @@ class UIVisionModel:
             x, y, w, h = cv2.boundingRect(contour)
             
             # Filter by size and aspect ratio
-            if w < self.min_element_size or h < self.min_element_size:
+            if w < min_size or h < min_size:
                 continue
                 
             aspect_ratio = w / h
             if aspect_ratio < 0.1 or aspect_ratio > 50:
                 continue
                 
-            # Check if it's a filled rectangle (likely a button or input)
-            roi = gray[y:y+h, x:x+w]
-            mean_val = np.mean(roi)
-            std_val = np.std(roi)
+            boxes.append((x, y, x + w, y + h))
             
-            # Low std suggests uniform color (button/input)
-            confidence = 0.7 if std_val < 30 else 0.5
+        if not boxes:
+            return []
             
-            element = UIElement(
+        # Check if it's a filled rectangle (likely a button or input):
+        # low std suggests uniform color (button/input)
+        _, std_vals = features.region_intensity(boxes)
+        
+        return [
+            UIElement(
                 element_type='unknown',
-                bbox=(x, y, x + w, y + h),
-                confidence=confidence
+                bbox=bbox,
+                confidence=0.7 if std_val < 30 else 0.5
             )
-            elements.append(element)
-            
-        return elements
+            for bbox, std_val in zip(boxes, std_vals.tolist())
+        ]
         
     def _detect_by_yolo(self, image: np.ndarray) -> List[UIElement]:
         """Detect UI elements using YOLO (if available)"""
@@ -222,45 +417,21 @@ class UIVisionModel:
         # Sort by area (larger first)
         elements.sort(key=lambda e: (e.bbox[2] - e.bbox[0]) * (e.bbox[3] - e.bbox[1]), reverse=True)
         
-        merged = []
-        used = set()
+        # Each element takes the smaller ones overlapping it by IoU > 0.5
+        groups = greedy_groups([e.bbox for e in elements], iou_threshold=0.5)
         
-        for i, elem1 in enumerate(elements):
-            if i in used:
-                continue
-                
-            # Check for overlaps with other elements
-            overlapping = [elem1]
-            for j, elem2 in enumerate(elements[i+1:], i+1):
-                if j not in used and self._iou(elem1.bbox, elem2.bbox) > 0.5:
-                    overlapping.append(elem2)
-                    used.add(j)
-                    
-            # Merge overlapping elements
-            if len(overlapping) > 1:
-                merged_elem = self._merge_group(overlapping)
-                merged.append(merged_elem)
+        merged = []
+        for group in groups:
+            if len(group) > 1:
+                merged.append(self._merge_group([elements[i] for i in group]))
             else:
-                merged.append(elem1)
+                merged.append(elements[group[0]])
                 
         return merged
         
     def _iou(self, box1: Tuple, box2: Tuple) -> float:
         """Calculate Intersection over Union"""
-        x1 = max(box1[0], box2[0])
-        y1 = max(box1[1], box2[1])
-        x2 = min(box1[2], box2[2])
-        y2 = min(box1[3], box2[3])
-        
-        if x2 <= x1 or y2 <= y1:
-            return 0.0
-            
-        intersection = (x2 - x1) * (y2 - y1)
-        area1 = (box1[2] - box1[0]) * (box1[3] - box1[1])
-        area2 = (box2[2] - box2[0]) * (box2[3] - box2[1])
-        union = area1 + area2 - intersection
-        
-        return intersection / union if union > 0 else 0.0
+        return iou(box1, box2)
         
     def _merge_group(self, elements: List[UIElement]) -> UIElement:
         """Merge a group of overlapping elements"""
@@ -282,36 +453,37 @@ class UIVisionModel:
     def _classify_element(self, element: UIElement, gray_image: np.ndarray) -> str:
         """Classify UI element type based on visual features"""
         x1, y1, x2, y2 = element.bbox
-        width = x2 - x1
-        height = y2 - y1
-        area = width * height
-        aspect_ratio = width / height
-        
-        # Extract ROI
-        roi = gray_image[y1:y2, x1:x2]
-        
-        # Calculate features
-        mean_intensity = np.mean(roi)
-        std_intensity = np.std(roi)
-        
-        # Edge density (indicates text or icons)
-        edges = cv2.Canny(roi, 50, 150)
-        edge_density = np.sum(edges > 0) / area
-        
-        # Classification rules (can be improved with ML)
-        if aspect_ratio > 3 and height < 50 and std_intensity < 20:
-            return 'input'
-        elif aspect_ratio > 1.5 and aspect_ratio < 8 and std_intensity < 30:
-            return 'button'
-        elif edge_density > 0.3:
-            return 'text'
-        elif aspect_ratio < 1.5 and area > 10000:
-            return 'panel'
-        elif height < 30 and width > 100:
-            return 'menu_item'
-        else:
-            return 'container'
+        roi = FrameFeatures(gray_image[y1:y2, x1:x2])
+        roi_element = UIElement(element.element_type, (0, 0, x2 - x1, y2 - y1), element.confidence)
+        return self._classify_elements([roi_element], roi)[0]
+        
+    def _classify_elements(self, elements: List[UIElement], features: FrameFeatures) -> List[str]:
+        """Classify all elements of a frame at once from its feature cache"""
+        if not elements:
+            return []
             
+        boxes = np.array([e.bbox for e in elements], dtype=np.float64)
+        width = boxes[:, 2] - boxes[:, 0]
+        height = boxes[:, 3] - boxes[:, 1]
+        area = width * height
+        with np.errstate(divide='ignore', invalid='ignore'):
+            aspect_ratio = width / height
+        
+        # Calculate features; edge density indicates text or icons
+        mean_intensity, std_intensity, edge_density = features.region_stats(boxes)
+        
+        # Classification rules (can be improved with ML), first match wins
+        rules = [
+            ((aspect_ratio > 3) & (height < 50) & (std_intensity < 20), 'input'),
+            ((aspect_ratio > 1.5) & (aspect_ratio < 8) & (std_intensity < 30), 'button'),
+            (edge_density > 0.3, 'text'),
+            ((aspect_ratio < 1.5) & (area > 10000), 'panel'),
+            ((height < 30) & (width > 100), 'menu_item'),
+        ]
+        labels = np.select([condition for condition, _ in rules],
+                           [label for _, label in rules], default='container')
+        return labels.tolist()
+        
     def extract_ui_structure(self, image: np.ndarray, 
                            include_ocr: bool = True) -> Dict[str, Any]:
         """Extract complete UI structure from image
@@ -325,6 +497,7 @@ class UIVisionModel:
         """
         # Detect UI elements
         elements = self.detect_ui_elements(image)
+        timer = StageTimer()
         
         # Convert to serializable format
         ui_structure = {
@@ -350,44 +523,18 @@ class UIVisionModel:
             
         # Build element hierarchy (optional)
         ui_structure['hierarchy'] = self._build_hierarchy(elements)
+        timer.lap('hierarchy')
+        self._last_timings.update(timer.timings)
         
         return ui_structure
         
     def _build_hierarchy(self, elements: List[UIElement]) -> List[Dict]:
-        """Build hierarchical structure of UI elements"""
-        # Simple containment-based hierarchy
-        hierarchy = []
-        
-        # Sort by area (larger first)
-        sorted_elements = sorted(
-            elements, 
-            key=lambda e: (e.bbox[2] - e.bbox[0]) * (e.bbox[3] - e.bbox[1]), 
-            reverse=True
-        )
+        """Build hierarchical structure of UI elements
         
-        for i, parent in enumerate(sorted_elements):
-            node = {
-                'element': {
-                    'type': parent.element_type,
-                    'bbox': parent.bbox
-                },
-                'children': []
-            }
-            
-            # Find children (elements contained within)
-            for j, child in enumerate(sorted_elements[i+1:]):
-                if self._contains(parent.bbox, child.bbox):
-                    node['children'].append({
-                        'type': child.element_type,
-                        'bbox': child.bbox
-                    })
-                    
-            if not any(self._contains(other.bbox, parent.bbox) 
-                      for other in sorted_elements[:i]):
-                # Top-level element
-                hierarchy.append(node)
-                
-        return hierarchy
+        Each element is nested under the smallest element containing it,
+        to any depth.
+        """
+        return UIHierarchy(elements).to_dicts()
         
     def _contains(self, parent_bbox: Tuple, child_bbox: Tuple) -> bool:
         """Check if parent bbox contains child bbox"""
@@ -452,6 +599,7 @@ class UIVisionModel:
         
         times = []
         element_counts = []
+        stage_times: Dict[str, List[float]] = {}
         
         for _ in range(iterations):
             start = time.time()
@@ -460,6 +608,8 @@ class UIVisionModel:
             
             times.append(elapsed)
             element_counts.append(len(elements))
+            for stage, seconds in self.last_timings.items():
+                stage_times.setdefault(stage, []).append(seconds)
             
         return {
             'avg_time': statistics.mean(times),
@@ -467,5 +617,7 @@ class UIVisionModel:
             'min_time': min(times),
             'max_time': max(times),
             'fps': 1 / statistics.mean(times),
-            'avg_elements': statistics.mean(element_counts)
+            'avg_elements': statistics.mean(element_counts),
+            # Per stage, e.g. avg_contours_time
+            **{f'avg_{stage}_time': statistics.mean(seconds) for stage, seconds in stage_times.items()}
         }
\ No newline at end of file
@@ -4,15 +4,17 @@ import json
 import time
 import numpy as np
 import cv2
-from .vision_model_enhanced import UIVisionModelEnhanced
 
 class VisionValidator:
     """Validates vision model output by comparing with expected UI elements"""
     
     def __init__(self):
+        # Imported here so the test interface can be built without the model
+        from .vision_model_enhanced import UIVisionModelEnhanced
         self.model = UIVisionModelEnhanced(use_yolo=False, enable_ocr=False)
     
-    def create_test_interface(self):
+    @staticmethod
+    def create_test_interface():
         """Create standardized test UI for validation"""
         img = np.ones((600, 900, 3), dtype=np.uint8) * 250
         
@@ -0,0 +1,117 @@
+"""
+Benchmark box merging: shared NumPy box ops vs the original pairwise loops
+
+Generates UI-like boxes (many small controls, some stacked duplicates from
+different detectors) and times, per size:
+
+    merge   greedy IoU > 0.5 grouping used by _merge_elements / _merge_detections
+    nms     greedy non-maximum suppression
+    pairs   all overlapping pairs
+
+The pure-Python reference is what UIVisionModel and OCRBackend ran before
+they used vision.box_ops; its output is checked against the new one.
+
+    python benchmark_box_ops.py --sizes 100 1000 10000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from vision.box_ops import iou, greedy_groups, nms, overlap_pairs  # noqa: E402
+
+
+def ui_boxes(n, seed=0, width=3840, height=2160):
+    """Controls spread over a 4K screen, a third duplicated with jitter"""
+    rng = random.Random(seed)
+    boxes, scores = [], []
+    while len(boxes) < n:
+        w, h = rng.randint(16, 240), rng.randint(12, 48)
+        x, y = rng.randint(0, width - w), rng.randint(0, height - h)
+        boxes.append((x, y, x + w, y + h))
+        scores.append(rng.random())
+        if rng.random() < 0.33 and len(boxes) < n:
+            dx, dy = rng.randint(-4, 4), rng.randint(-4, 4)
+            boxes.append((x + dx, y + dy, x + w + dx, y + h + dy))
+            scores.append(rng.random())
+    return boxes, scores
+
+
+def legacy_groups(boxes, threshold=0.5):
+    groups, used = [], set()
+    for i, box in enumerate(boxes):
+        if i in used:
+            continue
+        group = [i]
+        for j in range(i + 1, len(boxes)):
+            if j not in used and iou(box, boxes[j]) > threshold:
+                group.append(j)
+                used.add(j)
+        groups.append(group)
+    return groups
+
+
+def legacy_nms(boxes, scores, threshold=0.5):
+    order = sorted(range(len(boxes)), key=lambda k: -scores[k])
+    keep, suppressed = [], set()
+    for i in order:
+        if i in suppressed:
+            continue
+        keep.append(i)
+        for j in range(len(boxes)):
+            if j not in suppressed and j != i and iou(boxes[i], boxes[j]) > threshold:
+                suppressed.add(j)
+    return keep
+
+
+def legacy_pairs(boxes):
+    return [(i, j) for i in range(len(boxes)) for j in range(i + 1, len(boxes)) if iou(boxes[i], boxes[j]) > 0]
+
+
+def timed(func, *args, repeat=1):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark shared box ops against pairwise loops')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--legacy-max', type=int, default=10000,
+                        help='Skip the pure-Python reference above this many boxes (it is O(n^2))')
+    parser.add_argument('--repeat', type=int, default=3, help='Best of this many NumPy runs')
+    args = parser.parse_args()
+
+    print(f"{'boxes':>7} {'op':<6} {'python':>12} {'numpy':>12} {'speed-up':>10}")
+    for n in args.sizes:
+        boxes, scores = ui_boxes(n)
+        cases = [
+            ('merge', legacy_groups, (boxes,), lambda: greedy_groups(boxes, 0.5), lambda a, b: a == b),
+            ('nms', legacy_nms, (boxes, scores), lambda: nms(boxes, scores, 0.5).tolist(), lambda a, b: a == b),
+            ('pairs', legacy_pairs, (boxes,), lambda: overlap_pairs(boxes),
+             lambda a, b: set(a) == set(zip(b[0].tolist(), b[1].tolist()))),
+        ]
+        for name, legacy, legacy_args, new, same in cases:
+            new_time, new_result = timed(new, repeat=args.repeat)
+            if n <= args.legacy_max:
+                old_time, old_result = timed(legacy, *legacy_args)
+                if not same(old_result, new_result):
+                    print(f"FAIL: {name} results differ at {n} boxes")
+                    sys.exit(1)
+                print(f"{n:>7} {name:<6} {old_time * 1000:>10.1f}ms {new_time * 1000:>10.1f}ms "
+                      f"{old_time / new_time:>9.0f}x")
+            else:
+                print(f"{n:>7} {name:<6} {'skipped':>12} {new_time * 1000:>10.1f}ms {'':>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark node client startup: time from process launch to registered
+
+Starts an in-process server, launches client.py against it several times and
+measures how long each launch takes to register. Exits non-zero when the
+median goes over the budget, so it can gate changes that add startup imports:
+
+    python benchmark_startup.py --runs 5 --budget 2.0
+
+Add --imports to also list the slowest imports of client.py.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from local_server import local_server
+from startup_profile import profile_imports, format_import_report
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('BenchmarkStartup')
+logging.getLogger().setLevel(logging.WARNING)  # Keep the server's per-client logs out of the report
+
+CORE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src', 'core')
+
+
+async def time_to_registered(server, url, timeout):
+    """Launch one client and return seconds until the server sees it registered"""
+    known = set(server.clients)
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, 'client.py', '--server', url],
+        cwd=CORE_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            for client_id in set(server.clients) - known:
+                if server.clients[client_id].user_session is not None:
+                    return time.perf_counter() - start
+            if process.poll() is not None:
+                error = process.stderr.read().strip().splitlines()
+                raise RuntimeError(f"client exited with {process.returncode}: "
+                                   f"{error[-1] if error else 'no output'}")
+            await asyncio.sleep(0.005)
+        raise TimeoutError(f"client did not register within {timeout}s")
+    finally:
+        if process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        # Let the server notice the disconnect before the next launch
+        await asyncio.sleep(0.1)
+
+
+async def run(runs, timeout):
+    times = []
+    async with local_server() as (server, url):
+        for i in range(runs):
+            elapsed = await time_to_registered(server, url, timeout)
+            times.append(elapsed)
+            print(f"run {i + 1}: {elapsed * 1000:.0f} ms")
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark node client startup')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=2.0, help='Max median seconds to registered')
+    parser.add_argument('--timeout', type=float, default=30.0, help='Give up on a launch after this long')
+    parser.add_argument('--imports', action='store_true', help='Also list the slowest imports')
+    args = parser.parse_args()
+
+    if args.imports:
+        entries, error = profile_imports('client', cwd=CORE_DIR)
+        print(format_import_report(entries, top=15))
+        if error:
+            print(f"Import failed:\n{error}")
+
+    try:
+        times = asyncio.run(run(args.runs, args.timeout))
+    except (RuntimeError, TimeoutError) as e:
+        print(f"FAIL: {e}")
+        sys.exit(2)
+
+    median = statistics.median(times)
+    print(f"\n{'time to registered, median':<32}{median * 1000:>10.0f} ms")
+    print(f"{'time to registered, max':<32}{max(times) * 1000:>10.0f} ms")
+    print(f"{'budget':<32}{args.budget * 1000:>10.0f} ms")
+    if median > args.budget:
+        print("FAIL: startup over budget")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark parallel UI detection: serial strategies vs the thread pool, with
+large frames split into tiles
+
+For each capture size the serial path (workers=1) is timed against every
+worker count, and the speed-up is reported next to the number of cores the
+process can use:
+
+    1080p      strategies run concurrently on the whole frame
+    4K         tiled and stitched
+    2x1440p    dual-monitor capture, tiled and stitched
+
+Threads only help as far as OpenCV releases the GIL and there are cores to
+run on, so efficiency is the speed-up divided by min(workers, cores).
+
+    python benchmark_vision_parallel.py --workers 1 2 4 8
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+import cv2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from vision.vision_model import UIVisionModel  # noqa: E402
+from test_tiling import desktop, same_elements  # noqa: E402
+
+SIZES = {'1080p': (1920, 1080), '4k': (3840, 2160), 'dual-1440p': (5120, 1440)}
+
+
+def usable_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def timed(model, image, repeat):
+    best, elements = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):  # Per-call timing prints
+            elements = model.detect_ui_elements(image)
+        best = min(best, time.perf_counter() - start)
+    return best, elements
+
+
+def main():
+    cores = usable_cores()
+    parser = argparse.ArgumentParser(description='Benchmark threaded and tiled UI detection')
+    parser.add_argument('--sizes', nargs='+', choices=sorted(SIZES), default=list(SIZES))
+    parser.add_argument('--workers', type=int, nargs='+', default=sorted({2, 4, max(2, cores)}))
+    parser.add_argument('--tile-size', type=int, default=1024)
+    parser.add_argument('--repeat', type=int, default=5, help='Best of this many runs')
+    args = parser.parse_args()
+
+    print(f"cores: {cores} usable, {os.cpu_count()} total; OpenCV threads: {cv2.getNumThreads()}")
+    print(f"{'size':<11} {'workers':>7} {'tiles':>5} {'time':>10} {'speed-up':>9} {'efficiency':>10}")
+    for name in args.sizes:
+        width, height = SIZES[name]
+        image = desktop(width, height)
+        serial_time, expected = timed(UIVisionModel(), image, args.repeat)
+        print(f"{name:<11} {'serial':>7} {1:>5} {serial_time * 1000:>8.1f}ms {1:>8.2f}x {'':>10}")
+        for workers in args.workers:
+            with UIVisionModel(workers=workers, tile_size=args.tile_size) as model:
+                grid = model.tile_grid(width, height)
+                elapsed, elements = timed(model, image, args.repeat)
+            if workers > 1 and not same_elements(elements, expected):
+                print(f"FAIL: {name} with {workers} workers differs from serial")
+                sys.exit(1)
+            speed_up = serial_time / elapsed
+            efficiency = speed_up / min(workers, cores)
+            tiles = len(grid) if grid and workers > 1 else 1
+            print(f"{name:<11} {workers:>7} {tiles:>5} {elapsed * 1000:>8.1f}ms {speed_up:>8.2f}x "
+                  f"{efficiency:>9.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Accuracy vs latency of pyramid (coarse-to-fine) UI detection
+
+Every scene is detected at full resolution, which is the reference, and
+then with each pyramid configuration. Elements of the reference found again
+(IoU above --iou) give the recall, pyramid elements matching one give the
+precision, and 'types' counts recalled elements that were also classified
+the same way.
+
+Scenes are the synthetic interfaces of vision_validator.py and
+analyze_vision_performance.py, scaled by --upscale the way a HiDPI display
+scales a window (pixel doubling), plus the 4K desktop of test_tiling.py:
+
+    python benchmark_vision_pyramid.py --upscale 1 2 4 --scales 0.5 0.25 0.25,0.5 --margins 1 2 3
+    python benchmark_vision_pyramid.py --json pyramid_report.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+import cv2
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+sys.path.insert(1, ROOT)
+
+from vision.box_ops import iou_matrix  # noqa: E402
+from vision.vision_model import UIVisionModel  # noqa: E402
+from vision.vision_validator import VisionValidator  # noqa: E402
+from analyze_vision_performance import create_test_scenarios  # noqa: E402
+from test_tiling import desktop  # noqa: E402
+
+
+def scenes(upscales):
+    base = [('Settings Window', VisionValidator.create_test_interface())]
+    with contextlib.redirect_stdout(io.StringIO()):
+        base.extend(create_test_scenarios())
+    for factor in upscales:
+        for name, image in base:
+            if factor != 1:
+                image = cv2.resize(image, None, fx=factor, fy=factor, interpolation=cv2.INTER_NEAREST)
+            yield f"{name} x{factor}", image
+    yield 'Desktop 4K', desktop(3840, 2160)
+
+
+def timed(model, image, repeat):
+    best, elements = float('inf'), []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):  # Per-call timing prints
+            elements = model.detect_ui_elements(image)
+        best = min(best, time.perf_counter() - start)
+    return best, elements
+
+
+def score(found, reference, threshold):
+    """(recall, precision, share of the reference recalled with the same type)"""
+    if not found or not reference:
+        same = float(len(found) == len(reference))
+        return same, same, same
+    matches = iou_matrix([e.bbox for e in reference], [e.bbox for e in found]) > threshold
+    recall = matches.any(axis=1).mean()
+    precision = matches.any(axis=0).mean()
+    typed = sum(any(matches[i, j] and f.element_type == e.element_type for j, f in enumerate(found))
+                for i, e in enumerate(reference)) / len(reference)
+    return float(recall), float(precision), float(typed)
+
+
+def parse_scales(text):
+    return tuple(float(s) for s in text.split(','))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Accuracy vs latency of pyramid UI detection')
+    parser.add_argument('--upscale', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--scales', type=parse_scales, nargs='+', default=[(0.5,), (0.25,), (0.25, 0.5)],
+                        help='Pyramid levels, comma separated (e.g. 0.25,0.5)')
+    parser.add_argument('--margins', type=int, nargs='+', default=[1, 2, 3])
+    parser.add_argument('--iou', type=float, default=0.9)
+    parser.add_argument('--repeat', type=int, default=3, help='Best of this many runs')
+    parser.add_argument('--json', help='Also write the rows to this file')
+    args = parser.parse_args()
+
+    rows = []
+    print(f"{'scene':<26} {'size':>10} {'pyramid':<16} {'elems':>5} {'time':>9} {'speed-up':>8} "
+          f"{'recall':>6} {'prec':>6} {'types':>6}")
+    for name, image in scenes(args.upscale):
+        size = f"{image.shape[1]}x{image.shape[0]}"
+        full_time, reference = timed(UIVisionModel(), image, args.repeat)
+        print(f"{name:<26} {size:>10} {'full':<16} {len(reference):>5} {full_time * 1000:>7.1f}ms")
+        for scales in args.scales:
+            for margin in args.margins:
+                model = UIVisionModel(pyramid_scales=scales, pyramid_margin=margin, pyramid_above=0)
+                elapsed, found = timed(model, image, args.repeat)
+                recall, precision, typed = score(found, reference, args.iou)
+                label = f"{','.join(str(s) for s in scales)} m{margin}"
+                print(f"{'':<26} {'':>10} {label:<16} {len(found):>5} {elapsed * 1000:>7.1f}ms "
+                      f"{full_time / elapsed:>7.2f}x {recall:>6.1%} {precision:>6.1%} {typed:>6.1%}")
+                rows.append({'scene': name, 'size': size, 'scales': list(scales), 'margin': margin,
+                             'elements': len(found), 'reference_elements': len(reference),
+                             'time': elapsed, 'full_time': full_time, 'recall': recall,
+                             'precision': precision, 'type_agreement': typed})
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'iou': args.iou, 'rows': rows}, f, indent=2)
+        print(f"Wrote {len(rows)} rows to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+"""
+Reproducible UI detection benchmark with a regression gate
+
+Runs UIVisionModel.extract_ui_structure on the synthetic scenes of
+vision.scenes (forms, dashboards, IDE layouts from 720p to 4K, drawn from a
+fixed seed) and reports for each scene:
+
+    time        median total of --repeat runs, and median per stage
+                (grayscale, edges, contours, merge, classify, hierarchy;
+                'detect' replaces edges/contours with --workers, 'pyramid'
+                is added with --pyramid-scales)
+    memory      peak traced allocation of one run (tracemalloc: Python
+                objects and numpy arrays, including OpenCV outputs)
+    accuracy    precision, recall (all / outermost) and type accuracy
+                against the ground-truth boxes, at IoU --iou
+
+The report is compared with a stored baseline and the script exits 1 on a
+regression: losing more than --max-accuracy-drop of any accuracy score,
+using more memory than --max-memory-growth or, with --strict, a scene slower
+by more than --max-slowdown. Accuracy is deterministic and always checked;
+memory when the baseline was recorded on the same environment (Python,
+numpy, OpenCV, machine, cores) or with --strict. Time is only gated with
+--strict, as the environment fingerprint cannot tell two hosts (or a busy
+and an idle one) apart; --strict also takes the median of more runs.
+Runs headless.
+
+    python benchmark_vision_suite.py
+    python benchmark_vision_suite.py --strict --kinds ide --resolutions 4k --json ide_4k.json
+    python benchmark_vision_suite.py --update-baseline
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from vision.scenes import RESOLUTIONS, SCENE_KINDS, generate_scenes, score  # noqa: E402
+from vision.vision_model import UIVisionModel  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'vision_suite.json')
+ACCURACY_KEYS = ('precision', 'recall', 'recall_top', 'type_accuracy')
+# Slowdowns smaller than this are jitter, whatever their ratio
+MIN_GATED_TIME = 0.002
+DEFAULT_REPEAT = 5
+STRICT_REPEAT = 11
+
+
+def environment():
+    """What resource use depends on; baselines from another environment only gate accuracy"""
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'machine': platform.machine(),
+        'system': platform.system(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def run_scene(model, scene, repeat, iou):
+    """Timing, memory and accuracy of one scene"""
+    totals, stages = [], {}
+    structure = None
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):  # Per-call timing prints
+            structure = model.extract_ui_structure(scene.image)
+        totals.append(sum(model.last_timings.values()))
+        for stage, seconds in model.last_timings.items():
+            stages.setdefault(stage, []).append(seconds)
+
+    # Separate pass: tracing slows allocation down and would skew the times
+    tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            model.extract_ui_structure(scene.image)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'size': scene.size,
+        'time': statistics.median(totals),
+        'stages': {stage: statistics.median(seconds) for stage, seconds in stages.items()},
+        'peak_memory': peak,
+        **score(structure['elements'], scene.truth, iou),
+    }
+
+
+def run_suite(kinds, resolutions, repeat=DEFAULT_REPEAT, seed=0, iou=0.5, **model_options):
+    """Report of every scene, with the settings and environment it was measured in"""
+    model = UIVisionModel(**model_options)
+    scenes = {}
+    for scene in generate_scenes(kinds, resolutions, seed):
+        scenes[scene.name] = run_scene(model, scene, repeat, iou)
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': environment(),
+        'settings': {'seed': seed, 'iou': iou, 'repeat': repeat,
+                     'model': {k: list(v) if isinstance(v, tuple) else v for k, v in model_options.items()}},
+        'scenes': scenes,
+    }
+
+
+def compare(report, baseline, max_slowdown=0.5, max_memory_growth=0.2, max_accuracy_drop=0.02,
+            check_time=False, check_memory=None):
+    """Regressions of report against baseline, one message each
+
+    Time is only compared with check_time. check_memory defaults to whether
+    both were measured in the same environment. Scenes missing from either
+    side are not compared.
+    """
+    if check_memory is None:
+        check_memory = report['environment'] == baseline['environment']
+    regressions = []
+    for name, current in report['scenes'].items():
+        base = baseline['scenes'].get(name)
+        if base is None:
+            continue
+        for key in ACCURACY_KEYS:
+            if current[key] < base[key] - max_accuracy_drop:
+                regressions.append(f"{name}: {key} {current[key]:.3f} < baseline {base[key]:.3f}")
+        now, before = current['time'], base['time']
+        if check_time and now > before * (1 + max_slowdown) and now - before > MIN_GATED_TIME:
+            # Gate on the total, which is steadier than its stages; name
+            # the stages that grew most
+            grown = sorted(((current['stages'][stage] - seconds, stage)
+                            for stage, seconds in base['stages'].items() if stage in current['stages']),
+                           reverse=True)
+            detail = ', '.join(f"{stage} +{delta * 1000:.1f}ms" for delta, stage in grown[:2] if delta > 0)
+            regressions.append(f"{name}: time {now * 1000:.1f}ms > baseline {before * 1000:.1f}ms "
+                               f"(+{now / before - 1:.0%}; {detail})")
+        if check_memory and current['peak_memory'] > base['peak_memory'] * (1 + max_memory_growth):
+            regressions.append(f"{name}: peak memory {current['peak_memory'] / 2**20:.1f}MiB > baseline "
+                               f"{base['peak_memory'] / 2**20:.1f}MiB")
+    return regressions
+
+
+def print_report(report):
+    stages = sorted({stage for row in report['scenes'].values() for stage in row['stages']},
+                    key=['grayscale', 'pyramid', 'edges', 'contours', 'detect', 'yolo', 'merge',
+                         'classify', 'hierarchy'].index)
+    print(f"{'scene':<16} {'size':>9} {'time':>8} " + ' '.join(f"{s[:9]:>9}" for s in stages) +
+          f" {'memory':>8} {'found':>5} {'truth':>5} {'prec':>6} {'recall':>6} {'top':>6} {'types':>6}")
+    for name, row in report['scenes'].items():
+        print(f"{name:<16} {row['size']:>9} {row['time'] * 1000:>6.1f}ms " +
+              ' '.join(f"{row['stages'].get(s, 0) * 1000:>7.1f}ms" for s in stages) +
+              f" {row['peak_memory'] / 2**20:>5.1f}MiB {row['detected']:>5} {row['truth']:>5} "
+              f"{row['precision']:>6.1%} {row['recall']:>6.1%} {row['recall_top']:>6.1%} "
+              f"{row['type_accuracy']:>6.1%}")
+
+
+def parse_scales(text):
+    return tuple(float(s) for s in text.split(','))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='UI detection benchmark with a regression gate')
+    parser.add_argument('--kinds', nargs='+', choices=list(SCENE_KINDS), default=list(SCENE_KINDS))
+    parser.add_argument('--resolutions', nargs='+', choices=list(RESOLUTIONS), default=list(RESOLUTIONS))
+    parser.add_argument('--repeat', type=int,
+                        help=f'Median of this many runs (default {DEFAULT_REPEAT}, {STRICT_REPEAT} with --strict)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--iou', type=float, default=0.5)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--pyramid-scales', type=parse_scales, default=(),
+                        help='Pyramid levels, comma separated (e.g. 0.25,0.5)')
+    parser.add_argument('--json', help='Also write the report to this file')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--update-baseline', action='store_true', help='Write the report as the new baseline')
+    parser.add_argument('--max-slowdown', type=float, default=0.5, help='Only gated with --strict')
+    parser.add_argument('--max-memory-growth', type=float, default=0.2)
+    parser.add_argument('--max-accuracy-drop', type=float, default=0.02)
+    parser.add_argument('--strict', action='store_true',
+                        help='Gate time too, and memory even if the baseline environment differs')
+    args = parser.parse_args()
+    if args.repeat is None:
+        args.repeat = STRICT_REPEAT if args.strict else DEFAULT_REPEAT
+
+    model_options = {'workers': args.workers}
+    if args.pyramid_scales:
+        model_options['pyramid_scales'] = args.pyramid_scales
+    report = run_suite(args.kinds, args.resolutions, args.repeat, args.seed, args.iou, **model_options)
+    print_report(report)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote report to {args.json}")
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote baseline {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; create one with --update-baseline")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if {k: v for k, v in baseline['settings'].items() if k != 'repeat'} != \
+            {k: v for k, v in report['settings'].items() if k != 'repeat'}:
+        print(f"Baseline {args.baseline} was recorded with other settings "
+              f"({baseline['settings']}); not comparing")
+        return 0
+
+    same_environment = baseline['environment'] == report['environment']
+    if not same_environment and not args.strict:
+        print(f"Baseline environment differs ({baseline['environment']}); checking accuracy only")
+    elif not args.strict:
+        print("Checking accuracy and memory; time is only gated with --strict")
+    regressions = compare(report, baseline, args.max_slowdown, args.max_memory_growth,
+                          args.max_accuracy_drop, check_time=args.strict,
+                          check_memory=same_environment or args.strict)
+    if regressions:
+        print(f"{len(regressions)} regression(s) against {args.baseline}:")
+        for message in regressions:
+            print(f"  {message}")
+        return 1
+    print(f"No regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""
+Benchmark wire codecs: bytes on the wire and encode/decode CPU per payload
+
+Payloads come from a directory of recorded messages (one JSON file each).
+Record real ones from a running node with:
+
+    python benchmark_wire_codec.py --record payloads --target client_1 --hwnd 123456
+
+Without --payload-dir, representative synthetic payloads shaped like the
+node's heartbeat, get_windows, UIA tree and OCR results are used.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src', 'core'))
+
+from wire_codec import WireCodec, available_codecs, decode_message
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('BenchmarkWireCodec')
+
+RECORD_COMMANDS = [
+    ('get_windows', {}),
+    ('get_processes', {}),
+    ('get_system_info', {}),
+    ('ocr_screen', {}),
+]
+
+
+def _uia_tree(depth, fanout, rng):
+    node = {
+        'ControlType': rng.choice(['Pane', 'Group', 'Button', 'Edit', 'Text', 'Document']),
+        'Name': ' '.join(rng.choice(['Explorer', 'Chat', 'Run', 'Terminal', 'main.py', 'Send'])
+                         for _ in range(rng.randint(0, 4))),
+        'AutomationId': f"id_{rng.randint(0, 99999)}",
+        'ClassName': 'Chrome_RenderWidgetHostHWND',
+        'IsEnabled': True,
+        'IsVisible': True,
+        'Rectangle': f"(L{rng.randint(0, 1900)}, T{rng.randint(0, 1000)}, R{rng.randint(0, 1920)}, B{rng.randint(0, 1080)})",
+        'Children': {}
+    }
+    if depth > 0:
+        for i in range(fanout):
+            node['Children'][f"{node['ControlType']}_{i}"] = _uia_tree(depth - 1, fanout, rng)
+    return node
+
+
+def synthetic_payloads():
+    """Messages shaped like what a node actually sends"""
+    rng = random.Random(42)
+    result = lambda data: {'type': 'command_result', 'command_id': 'cmd_0',
+                           'result': {'success': True, 'timestamp': '2024-01-01T12:00:00',
+                                      'error': None, 'data': data}}
+    return {
+        'heartbeat': {'type': 'heartbeat', 'timestamp': time.time()},
+        'get_windows': result({'windows': [
+            {'hwnd': rng.randint(1, 10**7), 'title': f'file_{i}.py - project - Cursor',
+             'class': 'Chrome_WidgetWin_1'} for i in range(150)], 'count': 150}),
+        'uia_tree': result(_uia_tree(5, 5, rng)),
+        'ocr_result': result({'detections': [
+            {'text': ' '.join(rng.choice(['def', 'return', 'self', 'import', 'async', 'await'])
+                              for _ in range(rng.randint(1, 8))),
+             'bbox': [rng.randint(0, 1900), rng.randint(0, 1000), rng.randint(0, 1900), rng.randint(0, 1000)],
+             'confidence': round(rng.random(), 3), 'engine': 'easyocr'} for _ in range(800)]}),
+    }
+
+
+def load_payloads(payload_dir):
+    payloads = {}
+    for name in sorted(os.listdir(payload_dir)):
+        if name.endswith('.json'):
+            with open(os.path.join(payload_dir, name), encoding='utf-8') as f:
+                payloads[name[:-5]] = json.load(f)
+    return payloads
+
+
+def benchmark(payloads, iterations=50, threshold=4096):
+    """Return rows of (payload, codec, bytes, encode_us, decode_us)"""
+    rows = []
+    configs = [(name, None) for name in available_codecs()] + \
+              [(name, 'deflate') for name in available_codecs()]
+
+    for payload_name, message in payloads.items():
+        for name, compression in configs:
+            codec = WireCodec(name, compression, threshold)
+            encoded = codec.encode(message)
+
+            start = time.perf_counter()
+            for _ in range(iterations):
+                codec.encode(message)
+            encode_us = (time.perf_counter() - start) / iterations * 1e6
+
+            start = time.perf_counter()
+            for _ in range(iterations):
+                decode_message(encoded)
+            decode_us = (time.perf_counter() - start) / iterations * 1e6
+
+            label = name + ('+deflate' if compression else '')
+            rows.append((payload_name, label, len(encoded), encode_us, decode_us))
+    return rows
+
+
+def print_report(rows):
+    print(f"\n{'payload':<16}{'codec':<18}{'bytes':>10}{'vs json':>9}{'encode us':>12}{'decode us':>12}")
+    print('-' * 77)
+    baseline = {p: size for p, label, size, _, _ in rows if label == 'json'}
+    for payload, label, size, enc, dec in rows:
+        ratio = size / baseline[payload] if baseline.get(payload) else 1.0
+        print(f"{payload:<16}{label:<18}{size:>10}{ratio:>8.0%}{enc:>12.1f}{dec:>12.1f}")
+
+
+async def record(url, target, out_dir, hwnd=None):
+    """Record real command results from a node into out_dir"""
+    import websockets
+
+    os.makedirs(out_dir, exist_ok=True)
+    commands = list(RECORD_COMMANDS)
+    if hwnd:
+        commands.append(('get_window_uia_structure', {'hwnd': hwnd}))
+
+    async with websockets.connect(url, max_size=None) as ws:
+        await ws.recv()  # welcome
+        await ws.send(json.dumps({'type': 'register', 'user_session': 'codec_benchmark',
+                                  'capabilities': {'management': True}}))
+        for command, params in commands:
+            await ws.send(json.dumps({'type': 'forward_command', 'target_client': target,
+                                      'command': {'type': 'command', 'command': command,
+                                                  'params': params}}))
+            while True:
+                data = decode_message(await asyncio.wait_for(ws.recv(), timeout=60))
+                if data.get('type') == 'command_result':
+                    break
+            with open(os.path.join(out_dir, f'{command}.json'), 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            logger.info(f"Recorded {command}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark node wire codecs')
+    parser.add_argument('--payload-dir', help='Directory of recorded JSON messages')
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--threshold', type=int, default=4096, help='Compression threshold in bytes')
+    parser.add_argument('--record', metavar='DIR', help='Record payloads from a live node into DIR')
+    parser.add_argument('--target', help='Client ID to record from')
+    parser.add_argument('--hwnd', type=int, help='Window for get_window_uia_structure when recording')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=9998)
+    args = parser.parse_args()
+
+    if args.record:
+        asyncio.run(record(f'ws://{args.host}:{args.port}', args.target, args.record, args.hwnd))
+        return
+
+    payloads = load_payloads(args.payload_dir) if args.payload_dir else synthetic_payloads()
+    print_report(benchmark(payloads, args.iterations, args.threshold))
+
+
+if __name__ == '__main__':
+    main()
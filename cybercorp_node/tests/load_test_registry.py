@@ -0,0 +1,143 @@
+"""
+Load test the server's connection registry with thousands of synthetic clients
+
+Opens --clients websocket connections (5,000 by default), registers them with
+a spread of hostnames, sessions and capabilities, then measures list_clients
+(full and filtered), heartbeat handling and the heartbeat expiry tick.
+
+By default an in-process server is started; point --host/--port at a running
+server to load test that instead. Each connection needs a file descriptor on
+both ends, so raise `ulimit -n` first if needed.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import time
+
+import websockets
+
+from local_server import local_server
+from client_registry import ClientRegistry
+
+# The server logs every connection at INFO; keep the report readable
+logging.getLogger().setLevel(logging.WARNING)
+logger = logging.getLogger('LoadTestRegistry')
+
+
+async def open_client(url, index, hosts):
+    ws = await websockets.connect(url, max_size=None, ping_interval=None)
+    await ws.recv()  # welcome
+    await ws.send(json.dumps({
+        'type': 'register',
+        'user_session': f'user_{index}',
+        'system_info': {'hostname': f'host_{index % hosts}', 'platform': 'Windows'},
+        'capabilities': {'vscode_control': index % 2 == 0, 'ocr': index % 10 == 0}
+    }))
+    return ws
+
+
+async def timed_request(ws, request, repeat=20):
+    """Median round trip of a request, in milliseconds"""
+    timings = []
+    response = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await ws.send(json.dumps(request))
+        response = json.loads(await ws.recv())
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), response
+
+
+def expiry_tick_cost(count, rounds=200):
+    """Per-tick cost of the wheel vs. walking every client, in microseconds"""
+    from datetime import datetime
+    from types import SimpleNamespace
+
+    registry = ClientRegistry(heartbeat_timeout=60)
+    for i in range(count):
+        client = SimpleNamespace(id=f'client_{i}', hostname=None, user_session=None,
+                                 capabilities=None, last_heartbeat=datetime.now())
+        client.summary = lambda: {}
+        registry.add(client)
+
+    now = time.monotonic()
+    start = time.perf_counter()
+    for i in range(rounds):
+        registry.expired(now + i)
+    wheel_us = (time.perf_counter() - start) / rounds * 1e6
+
+    # What the old monitor did every 30 s
+    start = time.perf_counter()
+    for _ in range(rounds):
+        current = datetime.now()
+        [cid for cid, c in registry.items() if (current - c.last_heartbeat).total_seconds() > 60]
+    scan_us = (time.perf_counter() - start) / rounds * 1e6
+    return wheel_us, scan_us
+
+
+async def run(url, count, hosts, batch):
+    print(f"Opening {count} clients against {url}")
+    start = time.perf_counter()
+    clients = []
+    for offset in range(0, count, batch):
+        clients.extend(await asyncio.gather(*(open_client(url, i, hosts)
+                                              for i in range(offset, min(count, offset + batch)))))
+    connect_s = time.perf_counter() - start
+    await asyncio.sleep(0.5)  # Let the last registrations land
+
+    probe = clients[0]
+    full_ms, listed = await timed_request(probe, {'type': 'request', 'command': 'list_clients'})
+    host_ms, by_host = await timed_request(probe, {'type': 'request', 'command': 'list_clients',
+                                                   'filter': {'hostname': 'host_3'}})
+    cap_ms, by_cap = await timed_request(probe, {'type': 'request', 'command': 'list_clients',
+                                                 'filter': {'capability': 'ocr', 'hostname': 'host_0'}})
+
+    start = time.perf_counter()
+    await asyncio.gather(*(ws.send(json.dumps({'type': 'heartbeat'})) for ws in clients))
+    await asyncio.gather(*(ws.recv() for ws in clients))
+    heartbeat_s = time.perf_counter() - start
+
+    wheel_us, scan_us = expiry_tick_cost(count)
+
+    print(f"\n{'metric':<40}{'value':>16}")
+    print('-' * 56)
+    print(f"{'connect + register':<40}{connect_s:>14.2f} s")
+    print(f"{'listed clients':<40}{len(listed['clients']):>16}")
+    print(f"{'list_clients (cached), median':<40}{full_ms:>13.2f} ms")
+    print(f"{'list_clients by hostname, median':<40}{host_ms:>13.2f} ms  ({len(by_host['clients'])} hits)")
+    print(f"{'list_clients by host+capability':<40}{cap_ms:>13.2f} ms  ({len(by_cap['clients'])} hits)")
+    print(f"{'heartbeat round (all clients)':<40}{heartbeat_s * 1000:>13.1f} ms")
+    print(f"{'expiry tick, timing wheel':<40}{wheel_us:>13.1f} us")
+    print(f"{'expiry tick, full scan (previous)':<40}{scan_us:>13.1f} us")
+
+    await asyncio.gather(*(ws.close() for ws in clients), return_exceptions=True)
+    return len(listed['clients'])
+
+
+async def run_local(count, hosts, batch):
+    async with local_server() as (server, url):
+        listed = await run(url, count, hosts, batch)
+        assert listed == count, f"listed {listed} of {count} clients"
+        assert len(server.clients) == count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the connection registry')
+    parser.add_argument('--clients', type=int, default=5000)
+    parser.add_argument('--hosts', type=int, default=50, help='Distinct hostnames to spread clients over')
+    parser.add_argument('--batch', type=int, default=250, help='Connections opened concurrently')
+    parser.add_argument('--host', help='Test a running server instead of an in-process one')
+    parser.add_argument('--port', type=int, default=9998)
+    args = parser.parse_args()
+
+    if args.host:
+        asyncio.run(run(f'ws://{args.host}:{args.port}', args.clients, args.hosts, args.batch))
+    else:
+        asyncio.run(run_local(args.clients, args.hosts, args.batch))
+
+
+if __name__ == '__main__':
+    main()
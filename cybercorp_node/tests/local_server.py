@@ -0,0 +1,65 @@
+"""
+In-process CyberCorp server for tests that should not need a running node
+"""
+
+import asyncio
+import json
+import os
+import sys
+from contextlib import asynccontextmanager
+
+import websockets
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src', 'core'))
+
+from server import CyberCorpServer
+
+
+@asynccontextmanager
+async def local_server(**overrides):
+    """Run a CyberCorpServer on a free local port without the console
+
+    Keyword arguments override server attributes before it starts serving.
+    Yields (server, url).
+    """
+    server = CyberCorpServer(host='127.0.0.1', port=0)
+    for name, value in overrides.items():
+        setattr(server, name, value)
+
+    async with websockets.serve(server.handle_client, '127.0.0.1', 0) as ws_server:
+        port = ws_server.sockets[0].getsockname()[1]
+        yield server, f'ws://127.0.0.1:{port}'
+
+
+async def connect_client(url, user_session, capabilities=None):
+    """Connect and register a raw websocket client, returns (ws, client_id)"""
+    ws = await websockets.connect(url)
+    welcome = json.loads(await ws.recv())
+    await ws.send(json.dumps({
+        'type': 'register',
+        'user_session': user_session,
+        'client_start_time': '2024-01-01T00:00:00',
+        'capabilities': capabilities or {}
+    }))
+    # Give the server a moment to process the registration
+    await asyncio.sleep(0.05)
+    return ws, welcome['client_id']
+
+
+async def echo_node(ws, delay=0.0):
+    """Answer every command with a command_result echoing its params"""
+    try:
+        async for message in ws:
+            data = json.loads(message)
+            if data.get('type') != 'command':
+                continue
+            if delay:
+                await asyncio.sleep(delay)
+            await ws.send(json.dumps({
+                'type': 'command_result',
+                'command_id': data.get('command_id'),
+                'result': {'success': True, 'data': {'command': data.get('command'),
+                                                      'params': data.get('params', {})}}
+            }))
+    except websockets.exceptions.ConnectionClosed:
+        pass
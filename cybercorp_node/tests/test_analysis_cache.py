@@ -0,0 +1,123 @@
+"""
+Test the content-addressed vision cache: frame and model keys, byte-bounded
+LRU eviction and hit/miss/eviction stats
+"""
+
+import logging
+import os
+import sys
+import threading
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from vision.analysis_cache import AnalysisCache, estimate_size, frame_hash, model_signature  # noqa: E402
+from vision.vision_model import UIVisionModel  # noqa: E402
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('TestAnalysisCache')
+
+
+def dialog(text='Save changes?', width=640, height=360):
+    image = np.full((height, width, 3), 240, dtype=np.uint8)
+    cv2.rectangle(image, (20, 20), (width - 20, height - 20), (90, 90, 90), 2)
+    cv2.putText(image, text, (60, 120), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 0, 0), 2)
+    cv2.rectangle(image, (width - 260, height - 90), (width - 150, height - 50), (200, 140, 60), -1)
+    return image
+
+
+def test_frame_hash():
+    a, b = dialog(), dialog()
+    assert frame_hash(a) == frame_hash(b)
+    assert frame_hash(a) != frame_hash(dialog('Save changes!'))
+    assert frame_hash(a) != frame_hash(a[:, :-1].copy())
+
+    # Perceptual hashes ignore re-encoding noise
+    noisy = cv2.imdecode(cv2.imencode('.jpg', a, [cv2.IMWRITE_JPEG_QUALITY, 70])[1], cv2.IMREAD_COLOR)
+    assert frame_hash(a) != frame_hash(noisy)
+    assert frame_hash(a, perceptual=True) == frame_hash(noisy, perceptual=True)
+    assert frame_hash(a, perceptual=True) != frame_hash(255 - a, perceptual=True)
+
+
+def test_model_signature():
+    first, second = UIVisionModel(), UIVisionModel()
+    assert model_signature(first) == model_signature(second)
+    second.min_element_size = 10
+    assert model_signature(first) != model_signature(second)
+
+
+def test_lru_bounded_by_bytes():
+    cache = AnalysisCache(max_bytes=1000)
+    cache.put('a', 'A', size=400)
+    cache.put('b', 'B', size=400)
+    assert cache.get('a') == 'A'        # 'b' is now least recently used
+    cache.put('c', 'C', size=400)
+    assert 'b' not in cache and 'a' in cache and 'c' in cache
+    assert cache.get('b') is None
+
+    cache.put('huge', 'H', size=5000)   # Larger than the budget: not kept
+    assert 'huge' not in cache
+
+    cache.put('a', 'A2', size=100)      # Replacing frees the old size
+    stats = cache.stats()
+    assert stats == {'entries': 2, 'bytes': 500, 'max_bytes': 1000, 'hits': 1, 'misses': 1,
+                     'evictions': 1, 'hit_rate': 0.5}
+
+    cache.invalidate('c')
+    assert cache.stats()['bytes'] == 100
+    cache.invalidate()
+    assert len(cache) == 0 and cache.stats()['bytes'] == 0
+
+
+def test_shared_across_windows():
+    """Identical dialogs in two windows detect once"""
+    model = UIVisionModel()
+    cache = AnalysisCache()
+    signature = model_signature(model)
+    calls = []
+
+    def detect(image):
+        calls.append(1)
+        return [{'type': e.element_type, 'bbox': list(e.bbox)} for e in model.detect_ui_elements(image)]
+
+    windows = {101: dialog(), 202: dialog(), 303: dialog('Discard?')}
+    results = {}
+    for hwnd, image in windows.items():
+        key = (frame_hash(image), signature)
+        results[hwnd], _ = cache.get_or_compute(key, lambda: detect(image))
+
+    assert len(calls) == 2
+    assert results[101] is results[202]
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 2
+    assert cache.stats()['bytes'] == sum(estimate_size(v) for v in (results[101], results[303]))
+
+
+def test_thread_safety():
+    cache = AnalysisCache(max_bytes=50 * 100)
+
+    def worker(offset):
+        for k in range(2000):
+            key = (offset + k) % 300
+            if cache.get(key) is None:
+                cache.put(key, key, size=100)
+
+    threads = [threading.Thread(target=worker, args=(n * 37,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = cache.stats()
+    assert stats['entries'] <= 50 and stats['bytes'] == stats['entries'] * 100
+    assert stats['hits'] + stats['misses'] == 16000
+
+
+if __name__ == '__main__':
+    test_frame_hash()
+    test_model_signature()
+    test_lru_bounded_by_bytes()
+    test_shared_across_windows()
+    test_thread_safety()
+    logger.info("All analysis cache tests passed")
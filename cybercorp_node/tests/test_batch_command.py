@@ -0,0 +1,172 @@
+"""
+Test batch commands: ordering, waits, stop-on-error, step timeouts and
+pipelined execution, plus one round trip through the server
+"""
+
+import asyncio
+import json
+import logging
+import time
+
+from local_server import local_server, connect_client
+from batch_runner import BatchRunner, batch_timeout, make_step, split_segments
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('TestBatchCommand')
+
+
+class FakeNode:
+    """Stands in for the node's _execute_command_impl"""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def execute(self, command, params, command_id=None):
+        self.calls.append(command)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(params.get('delay', self.delay))
+            if command == 'fail':
+                raise RuntimeError('step failed')
+            return {'command': command, 'params': params}
+        finally:
+            self.in_flight -= 1
+
+
+async def _sequential_with_wait():
+    node = FakeNode()
+    steps = [make_step('get_windows'), make_step('wait', {'seconds': 0.1}), make_step('send_keys', {'keys': 'a'})]
+    summary = await BatchRunner(node.execute).run(steps)
+
+    assert node.calls == ['get_windows', 'send_keys']
+    assert [r['command'] for r in summary['results']] == ['get_windows', 'wait', 'send_keys']
+    assert summary['results'][1]['result'] == {'waited': 0.1}
+    assert summary['completed'] == 3 and summary['failed'] == 0 and not summary['stopped']
+    assert summary['execution_time'] >= 0.2
+
+
+async def _stop_on_error():
+    node = FakeNode(delay=0)
+    steps = [make_step('get_windows'), make_step('fail'), make_step('send_keys')]
+
+    stopped = await BatchRunner(node.execute).run(steps, stop_on_error=True)
+    assert stopped['stopped'] and stopped['skipped'] == 1 and stopped['failed'] == 1
+    assert 'step failed' in stopped['results'][1]['result']['error']['message']
+
+    node = FakeNode(delay=0)
+    continued = await BatchRunner(node.execute).run(steps, stop_on_error=False)
+    assert node.calls == ['get_windows', 'fail', 'send_keys']
+    assert continued['completed'] == 2 and continued['skipped'] == 0
+
+
+async def _step_timeout():
+    node = FakeNode()
+    steps = [make_step('slow', {'delay': 1.0}, timeout=0.1), make_step('get_windows')]
+    start = time.perf_counter()
+    summary = await BatchRunner(node.execute).run(steps, stop_on_error=False)
+
+    assert time.perf_counter() - start < 0.5
+    assert not summary['results'][0]['success']
+    assert 'timed out' in summary['results'][0]['result']['error']['message']
+    assert summary['results'][1]['success']
+
+
+async def _pipelined():
+    steps = [make_step('ocr', {'n': i}) for i in range(8)]
+
+    node = FakeNode(delay=0.1)
+    start = time.perf_counter()
+    summary = await BatchRunner(node.execute, max_in_flight=4).run(steps, mode='pipelined')
+    elapsed = time.perf_counter() - start
+
+    assert node.max_in_flight == 4
+    assert elapsed < 0.4, f"pipelined batch took {elapsed:.2f}s"
+    assert [r['result']['data']['params']['n'] for r in summary['results']] == list(range(8))
+
+    # Barriers and waits run alone, in order
+    node = FakeNode(delay=0.02)
+    steps = [make_step('a'), make_step('b'), make_step('click', barrier=True),
+             make_step('c'), make_step('wait', {'seconds': 0.01}), make_step('d')]
+    assert split_segments(steps) == [[0, 1], [2], [3], [4], [5]]
+    await BatchRunner(node.execute).run(steps, mode='pipelined')
+    assert node.calls.index('click') == 2 and node.calls[-1] == 'd'
+
+
+def test_batch_timeout():
+    steps = [make_step('a', timeout=2), make_step('b', timeout=3), make_step('wait', {'seconds': 1}),
+             make_step('c')]
+    assert batch_timeout(steps, 'sequential', 5) == 11
+    assert batch_timeout(steps, 'pipelined', 5) == 9
+    assert batch_timeout('not a list') == 30.0
+
+
+async def _batch_round_trip():
+    """A batch reaches the node as a single command and comes back as one result"""
+    async with local_server() as (server, url):
+        node_ws, node_id = await connect_client(url, 'node')
+        ctrl_ws, _ = await connect_client(url, 'controller', {'management': True})
+        node = FakeNode(delay=0)
+        received = []
+
+        async def batch_node():
+            async for message in node_ws:
+                data = json.loads(message)
+                if data.get('type') != 'command':
+                    continue
+                received.append(data['command'])
+                summary = await BatchRunner(node.execute).run(data['params']['steps'],
+                                                              data['params'].get('stop_on_error', True))
+                await node_ws.send(json.dumps({'type': 'command_result', 'command_id': data['command_id'],
+                                               'result': {'success': True, 'data': summary}}))
+
+        responder = asyncio.create_task(batch_node())
+        steps = [make_step('send_keys', {'keys': str(i)}) for i in range(30)]
+        await ctrl_ws.send(json.dumps({'type': 'forward_command', 'target_client': node_id,
+                                       'command': {'type': 'command', 'command': 'batch',
+                                                   'params': {'steps': steps}}}))
+        while True:
+            data = json.loads(await asyncio.wait_for(ctrl_ws.recv(), timeout=5))
+            if data['type'] == 'command_result':
+                break
+
+        assert received == ['batch']
+        assert len(data['result']['data']['results']) == 30
+        assert node.calls == ['send_keys'] * 30
+
+        responder.cancel()
+        await node_ws.close()
+        await ctrl_ws.close()
+
+
+def test_sequential_with_wait():
+    asyncio.run(_sequential_with_wait())
+
+
+def test_stop_on_error():
+    asyncio.run(_stop_on_error())
+
+
+def test_step_timeout():
+    asyncio.run(_step_timeout())
+
+
+def test_pipelined():
+    asyncio.run(_pipelined())
+
+
+def test_batch_round_trip():
+    asyncio.run(_batch_round_trip())
+
+
+if __name__ == '__main__':
+    test_batch_timeout()
+    test_sequential_with_wait()
+    test_stop_on_error()
+    test_step_timeout()
+    test_pipelined()
+    test_batch_round_trip()
+    logger.info("All batch command tests passed")
@@ -0,0 +1,150 @@
+"""
+Test the shared box operations against plain pairwise reference loops, and
+the vision model / OCR merging that now uses them
+"""
+
+import logging
+import os
+import random
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from vision.box_ops import (iou, iou_matrix, overlap_pairs, greedy_groups, nms, soft_nms,  # noqa: E402
+                            cluster_labels, merge_overlapping, containment_matrix, contained_in)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('TestBoxOps')
+
+
+def random_boxes(n, seed=0, size=1000, max_side=120):
+    rng = random.Random(seed)
+    boxes = []
+    for _ in range(n):
+        x, y = rng.randint(0, size), rng.randint(0, size)
+        boxes.append((x, y, x + rng.randint(1, max_side), y + rng.randint(1, max_side)))
+    return boxes
+
+
+def reference_groups(boxes, threshold=0.5):
+    """The original pairwise loop of _merge_elements / _merge_detections"""
+    groups, used = [], set()
+    for i, box in enumerate(boxes):
+        if i in used:
+            continue
+        group = [i]
+        for j in range(i + 1, len(boxes)):
+            if j not in used and iou(box, boxes[j]) > threshold:
+                group.append(j)
+                used.add(j)
+        groups.append(group)
+    return groups
+
+
+def test_iou_matrix_and_pairs():
+    boxes = random_boxes(300)
+    dense = iou_matrix(boxes)
+    for a, b in [(0, 1), (5, 17), (42, 42)]:
+        assert abs(dense[a, b] - iou(boxes[a], boxes[b])) < 1e-12
+
+    # Small blocks make the sweep cross many block boundaries
+    i, j, values = overlap_pairs(boxes, 0.1, block=16)
+    expected = {(a, b) for a in range(len(boxes)) for b in range(a + 1, len(boxes)) if dense[a, b] > 0.1}
+    assert set(zip(i.tolist(), j.tolist())) == expected
+    assert np.allclose(values, dense[i, j])
+
+    # Touching edges do not overlap
+    assert iou((0, 0, 10, 10), (10, 0, 20, 10)) == 0.0
+    assert len(overlap_pairs([(0, 0, 10, 10), (10, 0, 20, 10)])[0]) == 0
+
+
+def test_greedy_groups_match_reference():
+    for seed in range(5):
+        boxes = random_boxes(400, seed=seed, size=400)
+        assert greedy_groups(boxes, 0.5) == reference_groups(boxes)
+        order = sorted(range(len(boxes)), key=lambda k: -(boxes[k][2] - boxes[k][0]) * (boxes[k][3] - boxes[k][1]))
+        ordered = [boxes[k] for k in order]
+        assert [[order[k] for k in g] for g in reference_groups(ordered)] == greedy_groups(boxes, 0.5, order)
+
+
+def test_nms():
+    boxes = random_boxes(500, seed=3, size=300)
+    scores = np.random.RandomState(3).rand(len(boxes))
+    dense = iou_matrix(boxes)
+
+    expected, suppressed = [], set()
+    for idx in np.argsort(-scores, kind='stable'):
+        if idx in suppressed:
+            continue
+        expected.append(idx)
+        suppressed.update(np.nonzero(dense[idx] > 0.4)[0].tolist())
+    assert nms(boxes, scores, 0.4).tolist() == expected
+
+
+def test_soft_nms():
+    boxes = [(0, 0, 100, 100), (5, 5, 105, 105), (500, 500, 600, 600)]
+    scores = [0.9, 0.8, 0.7]
+    keep, new_scores = soft_nms(boxes, scores, sigma=0.5)
+    # The overlapping box is kept but decayed below the isolated one
+    assert keep.tolist() == [0, 2, 1]
+    assert new_scores[0] == 0.9 and new_scores[1] == 0.7
+    assert new_scores[2] < 0.8
+
+    keep, _ = soft_nms(boxes, scores, iou_threshold=0.3, method='linear', score_threshold=0.5)
+    assert keep.tolist() == [0, 2]
+
+
+def test_clusters_and_containment():
+    boxes = [(0, 0, 10, 10), (5, 0, 15, 10), (12, 0, 22, 10), (100, 100, 110, 110)]
+    # 0-1 and 1-2 overlap, 0-2 do not: still one cluster
+    assert cluster_labels(boxes).tolist() == [0, 0, 0, 3]
+    assert merge_overlapping(boxes).tolist() == [[0, 0, 22, 10], [100, 100, 110, 110]]
+
+    outer = [(0, 0, 50, 50), (10, 10, 20, 20)]
+    matrix = containment_matrix(outer, [(10, 10, 20, 20), (40, 40, 60, 60)])
+    assert matrix.tolist() == [[True, False], [True, False]]
+    assert contained_in(outer, (15, 15)).tolist() == [True, True]
+    assert contained_in(outer, (5, 5, 30, 30)).tolist() == [True, False]
+
+
+def test_vision_model_merge():
+    from vision.vision_model import UIElement, UIVisionModel
+
+    model = UIVisionModel.__new__(UIVisionModel)
+    elements = [UIElement('button', box, 0.5 + k % 5 / 10) for k, box in enumerate(random_boxes(200, seed=7, size=300))]
+    merged = model._merge_elements(list(elements))
+
+    ordered = sorted(elements, key=lambda e: (e.bbox[2] - e.bbox[0]) * (e.bbox[3] - e.bbox[1]), reverse=True)
+    expected = [model._merge_group([ordered[k] for k in g]) if len(g) > 1 else ordered[g[0]]
+                for g in reference_groups([e.bbox for e in ordered])]
+    assert [(e.element_type, e.bbox, e.confidence) for e in merged] == \
+           [(e.element_type, e.bbox, e.confidence) for e in expected]
+
+
+def test_ocr_merge():
+    from vision.backends.ocr_backend import OCRBackend
+
+    backend = OCRBackend.__new__(OCRBackend)
+    detections = [
+        {'text': 'Save', 'confidence': 0.7, 'bbox': [10, 10, 60, 30], 'engine': 'tesseract'},
+        {'text': 'Open', 'confidence': 0.9, 'bbox': [200, 10, 250, 30], 'engine': 'tesseract'},
+        {'text': 'Save', 'confidence': 0.95, 'bbox': [12, 11, 61, 31], 'engine': 'easyocr'},
+    ]
+    merged = backend._merge_detections(detections)
+    assert len(merged) == 2
+    assert merged[0]['text'] == 'Save' and merged[0]['num_detections'] == 2
+    assert merged[0]['bbox'] == [10, 10, 61, 31]
+    assert merged[1] is detections[1]
+
+
+if __name__ == '__main__':
+    test_iou_matrix_and_pairs()
+    test_greedy_groups_match_reference()
+    test_nms()
+    test_soft_nms()
+    test_clusters_and_containment()
+    test_vision_model_merge()
+    test_ocr_merge()
+    logger.info("All box ops tests passed")
@@ -0,0 +1,157 @@
+"""
+Test the server's connection registry: timing wheel expiry, indexes and the
+cached client list
+"""
+
+import asyncio
+import json
+import logging
+from types import SimpleNamespace
+
+from local_server import local_server, connect_client
+from client_registry import ClientRegistry, TimingWheel
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('TestClientRegistry')
+
+
+def _client(client_id, hostname=None, user_session=None, capabilities=None):
+    client = SimpleNamespace(id=client_id, hostname=hostname, user_session=user_session,
+                             capabilities=capabilities)
+    client.summary = lambda: {'id': client.id, 'hostname': client.hostname,
+                              'user_session': client.user_session}
+    return client
+
+
+def test_timing_wheel_expiry():
+    wheel = TimingWheel(tick=1.0, slots=8)
+    wheel._current_tick = 100
+    wheel.schedule('a', 103.5)
+    wheel.schedule('b', 105.0)
+    wheel.schedule('c', 120.0)  # More than one round out
+
+    assert wheel.advance(103.0) == []
+    assert wheel.advance(104.0) == ['a']
+
+    # A heartbeat pushes b out without touching the wheel
+    wheel.schedule('b', 110.0)
+    assert wheel.advance(106.0) == []
+    assert wheel.advance(110.0) == ['b']
+
+    assert wheel.advance(119.0) == []
+    assert wheel.advance(121.0) == ['c']
+    assert len(wheel) == 0
+
+
+def test_timing_wheel_cancel_and_earlier_deadline():
+    wheel = TimingWheel(tick=1.0, slots=16)
+    wheel._current_tick = 0
+    wheel.schedule('a', 10.0)
+    wheel.schedule('b', 10.0)
+    wheel.cancel('a')
+    wheel.schedule('b', 3.0)
+
+    assert wheel.advance(4.0) == ['b']
+    assert wheel.advance(20.0) == []
+
+
+def test_timing_wheel_long_stall():
+    wheel = TimingWheel(tick=1.0, slots=4)
+    wheel._current_tick = 0
+    for i in range(10):
+        wheel.schedule(f'k{i}', float(i + 1))
+    assert sorted(wheel.advance(1000.0)) == sorted(f'k{i}' for i in range(10))
+
+
+def test_registry_indexes():
+    registry = ClientRegistry(heartbeat_timeout=60)
+    registry.add(_client('client_0', 'host-a', 'alice', {'vscode_control': True, 'ocr': False}))
+    registry.add(_client('client_1', 'host-a', 'bob', {'vscode_control': True}))
+    registry.add(_client('client_2', 'host-b', 'bob', {}))
+
+    assert {c.id for c in registry.find(hostname='host-a')} == {'client_0', 'client_1'}
+    assert {c.id for c in registry.find(user_session='bob', hostname='host-a')} == {'client_1'}
+    assert {c.id for c in registry.find(capability='vscode_control')} == {'client_0', 'client_1'}
+    assert registry.find(capability='ocr') == []
+    assert len(registry.find()) == 3
+
+    # Re-registration moves the client between index entries
+    client = registry['client_2']
+    client.hostname = 'host-a'
+    registry.update(client)
+    assert {c.id for c in registry.find(hostname='host-a')} == {'client_0', 'client_1', 'client_2'}
+    assert registry.find(hostname='host-b') == []
+
+    registry.remove('client_1')
+    assert {c.id for c in registry.find(user_session='bob')} == {'client_2'}
+    assert 'client_1' not in registry and len(registry) == 2
+
+
+def test_registry_client_list_cache():
+    registry = ClientRegistry()
+    registry.add(_client(registry.next_id(), 'host', 'alice'))
+    first = registry.client_list()
+    version = registry.version
+    assert registry.client_list() is first
+
+    registry.touch('client_0')  # Heartbeats do not change the list
+    assert registry.client_list() is first and registry.version == version
+
+    registry.add(_client(registry.next_id(), 'host', 'bob'))
+    assert registry.version > version
+    assert [c['user_session'] for c in registry.client_list()] == ['alice', 'bob']
+
+
+def test_registry_heartbeat_expiry():
+    registry = ClientRegistry(heartbeat_timeout=10, tick=1.0)
+    registry.add(_client('client_0'))
+    registry.add(_client('client_1'))
+    start = registry.wheel.deadline('client_0') - 10
+
+    registry.touch('client_1', now=start + 8)
+    assert registry.expired(now=start + 11) == ['client_0']
+    assert registry.expired(now=start + 17) == []
+    assert registry.expired(now=start + 19) == ['client_1']
+
+
+async def _server_registry():
+    async with local_server(clients=ClientRegistry(heartbeat_timeout=0.5, tick=0.1)) as (server, url):
+        monitor = asyncio.create_task(server._heartbeat_monitor())
+        alice, _ = await connect_client(url, 'alice', {'vscode_control': True})
+        bob, bob_id = await connect_client(url, 'bob')
+
+        await alice.send(json.dumps({'type': 'request', 'command': 'list_clients'}))
+        listed = json.loads(await alice.recv())
+        assert [c['user_session'] for c in listed['clients']] == ['alice', 'bob']
+
+        await alice.send(json.dumps({'type': 'request', 'command': 'list_clients',
+                                     'filter': {'capability': 'vscode_control'}}))
+        filtered = json.loads(await alice.recv())
+        assert [c['user_session'] for c in filtered['clients']] == ['alice']
+
+        # Alice keeps sending heartbeats, bob goes quiet and gets dropped
+        for _ in range(8):
+            await alice.send(json.dumps({'type': 'heartbeat'}))
+            await alice.recv()
+            await asyncio.sleep(0.1)
+        assert bob_id not in server.clients
+        assert len(server.clients) == 1
+
+        monitor.cancel()
+        await alice.close()
+        await bob.close()
+
+
+def test_server_registry():
+    asyncio.run(_server_registry())
+
+
+if __name__ == '__main__':
+    test_timing_wheel_expiry()
+    test_timing_wheel_cancel_and_earlier_deadline()
+    test_timing_wheel_long_stall()
+    test_registry_indexes()
+    test_registry_client_list_cache()
+    test_registry_heartbeat_expiry()
+    test_server_registry()
+    logger.info("All client registry tests passed")
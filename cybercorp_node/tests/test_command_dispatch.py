@@ -0,0 +1,115 @@
+"""
+Test server command dispatch: result futures, queue depth and result store
+"""
+
+import asyncio
+import configparser
+import logging
+import os
+import tempfile
+import time
+
+from local_server import local_server, connect_client, echo_node
+from server import CONFIG_PATH, CyberCorpServer, ResultStore, CommandQueueFull
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('TestCommandDispatch')
+
+
+async def _concurrent_commands(count=300):
+    async with local_server() as (server, url):
+        ws, node_id = await connect_client(url, 'node')
+        responder = asyncio.create_task(echo_node(ws))
+
+        futures = [await server.send_command(node_id, 'get_windows', {'n': i})
+                   for i in range(count)]
+        results = await asyncio.wait_for(asyncio.gather(*futures), timeout=10)
+
+        assert len({f.command_id for f in futures}) == count
+        assert [r['data']['params']['n'] for r in results] == list(range(count))
+        assert not server.pending_commands
+        assert len(server.command_results) == count
+
+        responder.cancel()
+        await ws.close()
+        logger.info(f"{count} concurrent commands resolved")
+
+
+async def _queue_depth_limit():
+    async with local_server(queue_depth=2) as (server, url):
+        ws, node_id = await connect_client(url, 'node')
+
+        # Queued without yielding, so the dispatcher cannot drain in between
+        first = await server.send_command(node_id, 'get_windows')
+        second = await server.send_command(node_id, 'get_windows')
+        third = await server.send_command(node_id, 'get_windows')
+
+        assert not first.done() and not second.done()
+        assert isinstance(third.exception(), CommandQueueFull)
+        await ws.close()
+
+
+async def _unknown_client_and_timeout():
+    async with local_server() as (server, url):
+        missing = await server.send_command('client_missing', 'get_windows')
+        assert isinstance(missing.exception(), KeyError)
+
+        ws, node_id = await connect_client(url, 'silent_node')
+        future = await server.send_command(node_id, 'get_windows', timeout=0.2)
+        try:
+            await future
+            raise AssertionError("Expected timeout")
+        except asyncio.TimeoutError:
+            pass
+        assert future.command_id not in server.pending_commands
+        await ws.close()
+
+
+def test_result_store_bounds():
+    store = ResultStore(ttl=0.05, max_entries=3)
+    for i in range(5):
+        store.put(f'cmd_{i}', i)
+    assert len(store) == 3
+    assert 'cmd_0' not in store and store.get('cmd_4') == 4
+
+    time.sleep(0.1)
+    assert store.get('cmd_4') is None
+    store.put('cmd_new', 'fresh')
+    assert len(store) == 1
+
+
+def test_config_file():
+    # The project's config.ini is the one read by default
+    project = configparser.ConfigParser()
+    project.read(CONFIG_PATH)
+    assert os.path.samefile(CONFIG_PATH, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                                      'config.ini'))
+    assert CyberCorpServer().queue_depth == project.getint('server', 'command_queue_depth')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'config.ini')
+        with open(path, 'w') as f:
+            f.write('[server]\ncommand_queue_depth = 7\nresult_ttl = 5\n')
+        server = CyberCorpServer(config_path=path)
+        assert server.queue_depth == 7 and server.command_results.ttl == 5
+
+
+def test_concurrent_commands():
+    asyncio.run(_concurrent_commands())
+
+
+def test_queue_depth_limit():
+    asyncio.run(_queue_depth_limit())
+
+
+def test_unknown_client_and_timeout():
+    asyncio.run(_unknown_client_and_timeout())
+
+
+if __name__ == '__main__':
+    test_result_store_bounds()
+    test_config_file()
+    test_concurrent_commands()
+    test_queue_depth_limit()
+    test_unknown_client_and_timeout()
+    logger.info("All command dispatch tests passed")
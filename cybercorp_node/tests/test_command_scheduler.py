@@ -0,0 +1,277 @@
+"""
+Test the node's command scheduler: per-class lanes, serialized input,
+concurrency limits, queue metrics and the CPU process pool
+"""
+
+import asyncio
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from local_server import local_server
+from command_scheduler import CommandRegistry, CommandScheduler, ResourceClass
+import cpu_jobs
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('TestCommandScheduler')
+
+
+def cpu_job(params):
+    """Module-level so it can be pickled into the process pool"""
+    deadline = time.perf_counter() + params.get('seconds', 0.0)
+    while time.perf_counter() < deadline:
+        pass
+    return {'pid': os.getpid(), 'n': params.get('n')}
+
+
+def ocr_engines(params):
+    """The OCR engines a pool worker finds, through cpu_jobs' own backend"""
+    return {'pid': os.getpid(), 'engines': list(cpu_jobs._get_ocr_backend().available_engines)}
+
+
+def _registry(log):
+    commands = CommandRegistry()
+
+    def slow_input(params):
+        log.append(('start', params['n']))
+        time.sleep(0.02)
+        log.append(('end', params['n']))
+        return params['n']
+
+    def io_query(params):
+        time.sleep(params.get('seconds', 0.01))
+        return threading.current_thread().name
+
+    def ocr(params):
+        time.sleep(params.get('seconds', 0.5))
+        return 'text'
+
+    commands.register('send_keys', slow_input, ResourceClass.INPUT)
+    commands.register('get_windows', io_query, ResourceClass.IO)
+    commands.register('ocr_screen', ocr, ResourceClass.CPU)
+    commands.register('cpu_job', cpu_job, ResourceClass.CPU, process_safe=True)
+    commands.register('health_status', lambda p: 'ok', ResourceClass.INLINE)
+    return commands
+
+
+async def _input_serialized():
+    log = []
+    commands = _registry(log)
+    scheduler = CommandScheduler()
+    spec = commands.get('send_keys')
+
+    results = await asyncio.gather(*[scheduler.run(spec, {'n': i}) for i in range(10)])
+    assert results == list(range(10))
+    # Never interleaved, and in arrival order
+    assert log == [(event, i) for i in range(10) for event in ('start', 'end')]
+
+    stats = scheduler.stats()['input']
+    assert stats['limit'] == 1 and stats['completed'] == 10 and stats['max_queued'] == 9
+    scheduler.shutdown()
+
+
+def test_input_serialized():
+    asyncio.run(_input_serialized())
+
+
+async def _slow_cpu_does_not_block_io():
+    commands = _registry([])
+    scheduler = CommandScheduler(cpu_workers=1, use_processes=False)
+
+    ocr = [asyncio.create_task(scheduler.run(commands.get('ocr_screen'), {'seconds': 0.5}))
+           for _ in range(2)]
+    await asyncio.sleep(0.05)
+
+    start = time.perf_counter()
+    thread = await scheduler.run(commands.get('get_windows'), {})
+    elapsed = time.perf_counter() - start
+    assert elapsed < 0.2, f"get_windows waited {elapsed:.3f}s behind OCR"
+    assert thread.startswith('node-io')
+
+    stats = scheduler.stats()
+    assert stats['cpu']['running'] == 1 and stats['cpu']['queued'] == 1
+    assert stats['io']['avg_wait_ms'] < 50
+
+    await asyncio.gather(*ocr)
+    assert scheduler.stats()['cpu']['running'] == 0
+    scheduler.shutdown()
+
+
+def test_slow_cpu_does_not_block_io():
+    asyncio.run(_slow_cpu_does_not_block_io())
+
+
+async def _lane_limit():
+    commands = _registry([])
+    scheduler = CommandScheduler(io_workers=3)
+    spec = commands.get('get_windows')
+    in_flight = []
+
+    async def sample():
+        while True:
+            in_flight.append(scheduler.lanes[ResourceClass.IO].running)
+            await asyncio.sleep(0.005)
+
+    sampler = asyncio.create_task(sample())
+    start = time.perf_counter()
+    await asyncio.gather(*[scheduler.run(spec, {'seconds': 0.05}) for _ in range(9)])
+    elapsed = time.perf_counter() - start
+    sampler.cancel()
+
+    assert max(in_flight) == 3
+    assert elapsed >= 0.15  # Three waves of three
+    stats = scheduler.stats()['io']
+    assert stats['max_queued'] == 6 and stats['submitted'] == 9 and stats['completed'] == 9
+    assert stats['avg_wait_ms'] > 0
+    scheduler.shutdown()
+
+
+def test_lane_limit():
+    asyncio.run(_lane_limit())
+
+
+async def _slot_held_after_timeout():
+    commands = _registry([])
+    scheduler = CommandScheduler(cpu_workers=1, use_processes=False)
+    spec = commands.get('ocr_screen')
+
+    try:
+        await asyncio.wait_for(scheduler.run(spec, {'seconds': 0.3}), timeout=0.05)
+        raise AssertionError("Expected timeout")
+    except asyncio.TimeoutError:
+        pass
+
+    # The worker is still busy, so the lane stays full until it finishes
+    lane = scheduler.lanes[ResourceClass.CPU]
+    assert lane.running == 1 and lane.failed == 1
+    await asyncio.sleep(0.4)
+    assert lane.running == 0
+    scheduler.shutdown()
+
+
+def test_slot_held_after_timeout():
+    asyncio.run(_slot_held_after_timeout())
+
+
+async def _process_pool_and_inline():
+    commands = _registry([])
+    scheduler = CommandScheduler(cpu_workers=2)
+
+    results = await asyncio.gather(*[scheduler.run(commands.get('cpu_job'), {'n': i, 'seconds': 0.05})
+                                     for i in range(4)])
+    assert [r['n'] for r in results] == [0, 1, 2, 3]
+    assert all(r['pid'] != os.getpid() for r in results)
+
+    assert await scheduler.run(commands.get('health_status'), {}) == 'ok'
+    assert scheduler.stats()['inline']['limit'] is None
+    scheduler.shutdown(wait=True)
+
+
+def test_process_pool_and_inline():
+    asyncio.run(_process_pool_and_inline())
+
+
+async def _cpu_jobs_in_pool():
+    commands = CommandRegistry()
+    commands.register('ocr_engines', ocr_engines, ResourceClass.CPU, process_safe=True)
+    commands.register('ocr_window', cpu_jobs.ocr_window, ResourceClass.CPU, process_safe=True)
+    scheduler = CommandScheduler(cpu_workers=1)
+
+    engines = await scheduler.run(commands.get('ocr_engines'), {})
+    assert engines['pid'] != os.getpid() and isinstance(engines['engines'], list)
+
+    # Fails cleanly without a window to capture, rather than on the imports
+    result = await scheduler.run(commands.get('ocr_window'), {'hwnd': 1})
+    assert result['success'] is False and 'utils' not in result['error']
+    assert await scheduler.run(commands.get('ocr_window'), {}) == {
+        'success': False, 'error': 'No window handle provided'}
+    scheduler.shutdown(wait=True)
+
+
+def test_cpu_jobs_in_pool():
+    asyncio.run(_cpu_jobs_in_pool())
+
+
+def _import_client():
+    """Import the node client without keeping the logging it sets up on import
+
+    The client's log files go to a temporary directory instead of src/logs.
+    """
+    import log_manager
+
+    root = logging.getLogger()
+    level, handlers = root.level, root.handlers[:]
+    setup_logging = log_manager.setup_logging
+    with tempfile.TemporaryDirectory() as log_dir:
+        log_manager.setup_logging = lambda log_dir_=None, app_name='CyberCorpClient': \
+            setup_logging(log_dir, app_name)
+        try:
+            from client import CyberCorpClient
+        finally:
+            log_manager.setup_logging = setup_logging
+            for handler in root.handlers:
+                if handler not in handlers:
+                    handler.close()
+            root.handlers[:] = handlers
+            root.setLevel(level)
+    return CyberCorpClient
+
+
+async def _client_runs_commands_concurrently():
+    CyberCorpClient = _import_client()
+
+    async with local_server() as (server, url):
+        client = CyberCorpClient(server_url=url)
+        client.enable_hot_reload = client.enable_health_monitor = False
+        client.scheduler.shutdown()
+        client.scheduler = CommandScheduler(cpu_workers=1, use_processes=False)
+        client.commands = _registry([])
+        connection = asyncio.create_task(client.connect())
+
+        while not any(c.user_session for c in server.clients.values()):
+            await asyncio.sleep(0.01)
+        node_id = next(iter(server.clients))
+
+        ocr = await server.send_command(node_id, 'ocr_screen', {'seconds': 0.5})
+        windows = await server.send_command(node_id, 'get_windows')
+        done, _ = await asyncio.wait([ocr, windows], return_when=asyncio.FIRST_COMPLETED)
+        assert done == {windows}, "get_windows waited behind OCR"
+        assert not ocr.done() and len(client._command_tasks) == 1
+
+        # Commands still running are cancelled when the client stops
+        slow = await server.send_command(node_id, 'ocr_screen', {'seconds': 0.5})
+        await asyncio.sleep(0.05)
+        await client.shutdown()
+        await asyncio.wait_for(connection, timeout=2)
+        assert not client._command_tasks
+        slow.cancel()
+        ocr.cancel()
+
+
+def test_client_runs_commands_concurrently():
+    asyncio.run(_client_runs_commands_concurrently())
+
+
+def test_registry():
+    commands = _registry([])
+    assert 'get_windows' in commands and 'missing' not in commands
+    assert commands.get('missing') is None
+    assert commands.names(ResourceClass.CPU) == ['ocr_screen', 'cpu_job']
+    try:
+        commands.register('get_windows', lambda p: None, ResourceClass.IO)
+        raise AssertionError("Expected duplicate registration to fail")
+    except ValueError:
+        pass
+
+
+if __name__ == '__main__':
+    test_input_serialized()
+    test_slow_cpu_does_not_block_io()
+    test_lane_limit()
+    test_slot_held_after_timeout()
+    test_process_pool_and_inline()
+    test_client_runs_commands_concurrently()
+    test_registry()
+    logger.info("All command scheduler tests passed")
@@ -0,0 +1,136 @@
+"""
+Test the per-frame feature cache: integral-image region stats against direct
+NumPy/OpenCV on crops, and vectorized element classification
+"""
+
+import logging
+import os
+import random
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from vision.frame_features import FrameFeatures  # noqa: E402
+from vision.vision_model import UIElement, UIVisionModel  # noqa: E402
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('TestFrameFeatures')
+
+
+def synthetic_screen(width=1280, height=720, controls=150, seed=0):
+    """Gray background with flat buttons, text-like stripes and noisy panels"""
+    rng = np.random.RandomState(seed)
+    image = np.full((height, width, 3), 235, dtype=np.uint8)
+    boxes = []
+    for k in range(controls):
+        w, h = rng.randint(20, 300), rng.randint(20, 120)
+        x, y = rng.randint(0, width - w), rng.randint(0, height - h)
+        kind = k % 3
+        if kind == 0:
+            cv2.rectangle(image, (x, y), (x + w, y + h), (200, 120, 60), -1)
+        elif kind == 1:
+            for row in range(y + 4, y + h - 4, 6):
+                cv2.line(image, (x + 2, row), (x + w - 2, row), (20, 20, 20), 1)
+        else:
+            image[y:y + h, x:x + w] = rng.randint(0, 255, (h, w, 3))
+        boxes.append((x, y, x + w, y + h))
+    return image, boxes
+
+
+def test_region_stats_match_crops():
+    image, boxes = synthetic_screen()
+    direct = FrameFeatures.from_image(image)
+    integral = FrameFeatures.from_image(image)
+    integral.warm_intensity()  # Integral images, once built, are always used
+
+    for features in (direct, integral):
+        mean, std, edge_density = features.region_stats(boxes)
+        for k, (x1, y1, x2, y2) in enumerate(boxes):
+            roi = features.gray[y1:y2, x1:x2]
+            assert abs(mean[k] - np.mean(roi)) < 1e-6
+            assert abs(std[k] - np.std(roi)) < 1e-4
+            assert abs(edge_density[k] - np.sum(features.edges[y1:y2, x1:x2] > 0) / roi.size) < 1e-9
+
+        # Boxes past the frame edge are clipped, empty ones are zero
+        mean, std, edge_density = features.region_stats([(-10, -10, 10, 10), (5, 5, 5, 40)])
+        assert abs(mean[0] - np.mean(features.gray[:10, :10])) < 1e-6
+        assert (mean[1], std[1], edge_density[1]) == (0.0, 0.0, 0.0)
+    assert direct._sum is None and direct._edge_count is None
+
+    # A box per pixel row costs more measured one by one
+    rows = [(0, y, direct.width, y + 1) for y in range(direct.height)] * 40
+    direct.region_intensity(rows)
+    assert direct._sum is not None
+
+
+def reference_classify(element, gray, edges):
+    """The original per-element rules on crops of the frame's edge map"""
+    x1, y1, x2, y2 = element.bbox
+    width, height = x2 - x1, y2 - y1
+    area = width * height
+    aspect_ratio = width / height
+    roi = gray[y1:y2, x1:x2]
+    std_intensity = np.std(roi)
+    edge_density = np.sum(edges[y1:y2, x1:x2] > 0) / area
+    if aspect_ratio > 3 and height < 50 and std_intensity < 20:
+        return 'input'
+    elif aspect_ratio > 1.5 and aspect_ratio < 8 and std_intensity < 30:
+        return 'button'
+    elif edge_density > 0.3:
+        return 'text'
+    elif aspect_ratio < 1.5 and area > 10000:
+        return 'panel'
+    elif height < 30 and width > 100:
+        return 'menu_item'
+    return 'container'
+
+
+def test_classify_elements():
+    image, boxes = synthetic_screen(controls=600, seed=1)
+    rng = random.Random(1)
+    boxes += [(x, y, x + rng.randint(20, 400), y + rng.randint(20, 40))
+              for x, y in ((rng.randint(0, 800), rng.randint(0, 600)) for _ in range(200))]
+    elements = [UIElement('unknown', box, 0.5) for box in boxes]
+    model = UIVisionModel.__new__(UIVisionModel)
+
+    start = time.perf_counter()
+    features = FrameFeatures.from_image(image)
+    labels = model._classify_elements(elements, features)
+    vectorized = time.perf_counter() - start
+
+    gray = features.gray
+    start = time.perf_counter()
+    for element in elements:
+        model._classify_element(element, gray)
+    per_element = time.perf_counter() - start
+
+    assert labels == [reference_classify(e, gray, features.edges) for e in elements]
+    assert len(set(labels)) >= 4
+    logger.info(f"{len(elements)} elements: per-element {per_element * 1000:.1f} ms, "
+                f"frame cache {vectorized * 1000:.1f} ms")
+
+    # The single-element path still runs Canny on the crop, as before
+    element = elements[0]
+    x1, y1, x2, y2 = element.bbox
+    roi_edges = np.zeros_like(gray)
+    roi_edges[y1:y2, x1:x2] = cv2.Canny(gray[y1:y2, x1:x2], 50, 150)
+    assert model._classify_element(element, gray) == reference_classify(element, gray, roi_edges)
+
+
+def test_detect_ui_elements():
+    image, _ = synthetic_screen(controls=60, seed=2)
+    model = UIVisionModel()
+    elements = model.detect_ui_elements(image)
+    assert elements
+    assert all(e.element_type in ('input', 'button', 'text', 'panel', 'menu_item', 'container') for e in elements)
+
+
+if __name__ == '__main__':
+    test_region_stats_match_crops()
+    test_classify_elements()
+    test_detect_ui_elements()
+    logger.info("All frame feature tests passed")
@@ -0,0 +1,118 @@
+"""
+Test binary, chunked screenshot transport with synthetic frames
+"""
+
+import asyncio
+import json
+import logging
+import random
+
+import numpy as np
+
+from local_server import local_server, connect_client
+from frame_transport import (
+    SyntheticFrameSource, FrameAssembler, encode_bitmap, split_frame,
+    decode_frame, is_frame_chunk
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('TestFrameTransport')
+
+
+def test_roundtrip_codecs():
+    bits, width, height = SyntheticFrameSource(320, 200).capture()
+    expected = np.frombuffer(bits, np.uint8).reshape(height, width, 4)[:, :, :3]
+
+    for codec in ('raw', 'png', 'jpeg'):
+        payload = encode_bitmap(bits, width, height, codec, quality=95)
+        chunks = split_frame('cmd_1', codec, width, height, payload, chunk_size=4096)
+        assert all(is_frame_chunk(c) for c in chunks)
+
+        # Chunks may arrive in any order
+        random.shuffle(chunks)
+        assembler = FrameAssembler()
+        frames = [f for f in map(assembler.feed, chunks) if f]
+        assert len(frames) == 1 and assembler.pending() == 0
+
+        image = decode_frame(frames[0])
+        assert image.shape == (height, width, 3)
+        error = np.abs(image.astype(int) - expected.astype(int)).mean()
+        assert error < (0.01 if codec != 'jpeg' else 3.0), (codec, error)
+        logger.info(f"{codec}: {len(payload)} bytes in {len(chunks)} chunks")
+
+
+def test_synthetic_frames_change():
+    source = SyntheticFrameSource(256, 128, block_size=32)
+    first, _, _ = source.capture()
+    second, _, _ = source.capture()
+    assert len(first) == len(second) == 256 * 128 * 4
+    assert first != second
+
+
+async def _fake_binary_node(ws, source):
+    async for message in ws:
+        data = json.loads(message)
+        if data.get('type') != 'command':
+            continue
+        params = data.get('params', {})
+        bits, width, height = source.capture()
+        payload = encode_bitmap(bits, width, height, params['codec'])
+        for chunk in split_frame(data['command_id'], params['codec'], width, height,
+                                 payload, chunk_size=params.get('chunk_size', 65536)):
+            await ws.send(chunk)
+        await ws.send(json.dumps({
+            'type': 'command_result',
+            'command_id': data['command_id'],
+            'result': {'success': True, 'data': {'width': width, 'height': height}}
+        }))
+
+
+async def _relay_through_server():
+    async with local_server() as (server, url):
+        node_ws, node_id = await connect_client(url, 'node')
+        node_task = asyncio.create_task(_fake_binary_node(node_ws, SyntheticFrameSource(640, 480)))
+
+        ctrl, _ = await connect_client(url, 'ctrl', {'management': True})
+        bystander, _ = await connect_client(url, 'bystander', {'management': True})
+
+        await ctrl.send(json.dumps({
+            'type': 'forward_command',
+            'target_client': node_id,
+            'command': {'type': 'command', 'command': 'screenshot',
+                        'params': {'transport': 'binary', 'codec': 'raw', 'chunk_size': 100000}}
+        }))
+        assert json.loads(await ctrl.recv())['type'] == 'forward_ack'
+
+        assembler = FrameAssembler()
+        frame, chunk_count = None, 0
+        while True:
+            message = await asyncio.wait_for(ctrl.recv(), timeout=5)
+            if is_frame_chunk(message):
+                chunk_count += 1
+                frame = assembler.feed(message) or frame
+            elif json.loads(message)['type'] == 'command_result':
+                break
+
+        assert frame is not None and chunk_count == 13
+        assert decode_frame(frame).shape == (480, 640, 3)
+
+        try:
+            await asyncio.wait_for(bystander.recv(), timeout=0.3)
+            raise AssertionError("Bystander received frame data")
+        except asyncio.TimeoutError:
+            pass
+
+        node_task.cancel()
+        for ws in (node_ws, ctrl, bystander):
+            await ws.close()
+        logger.info(f"Relayed {chunk_count} chunks to the requester only")
+
+
+def test_relay_through_server():
+    asyncio.run(_relay_through_server())
+
+
+if __name__ == '__main__':
+    test_roundtrip_codecs()
+    test_synthetic_frames_change()
+    test_relay_through_server()
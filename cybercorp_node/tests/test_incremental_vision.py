@@ -0,0 +1,125 @@
+"""
+Test incremental vision analysis: only the changed part of a window is
+re-detected and the result reports which elements changed
+"""
+
+import logging
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from vision.box_ops import iou  # noqa: E402
+from vision.incremental import IncrementalDetector, changed_tiles, dirty_regions  # noqa: E402
+from vision.vision_model import UIVisionModel  # noqa: E402
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('TestIncrementalVision')
+
+WIDTH, HEIGHT = 1920, 1080
+
+
+def chat_window(messages):
+    """Sidebar of buttons, header bar, and a chat pane of message bubbles"""
+    image = np.full((HEIGHT, WIDTH, 3), 245, dtype=np.uint8)
+    cv2.rectangle(image, (0, 0), (WIDTH, 60), (60, 60, 60), -1)
+    for k in range(12):
+        cv2.rectangle(image, (20, 90 + k * 70), (260, 140 + k * 70), (200, 140, 70), -1)
+        cv2.putText(image, f"Item {k}", (40, 122 + k * 70), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+    cv2.line(image, (300, 60), (300, HEIGHT), (180, 180, 180), 2)
+    y = HEIGHT - 150
+    for k in reversed(range(messages)):
+        cv2.rectangle(image, (340, y - 70), (1500, y), (230, 220, 250), -1)
+        cv2.putText(image, f"message number {k} with some text", (360, y - 28),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, (30, 30, 30), 2)
+        y -= 90
+        if y < 150:
+            break
+    cv2.rectangle(image, (340, HEIGHT - 110), (1860, HEIGHT - 40), (255, 255, 255), -1)
+    cv2.rectangle(image, (340, HEIGHT - 110), (1860, HEIGHT - 40), (120, 120, 120), 2)
+    return image
+
+
+def make_detector():
+    model = UIVisionModel()
+
+    def detect(image):
+        return [{'type': e.element_type, 'bbox': list(e.bbox), 'confidence': e.confidence,
+                 'center': [(e.bbox[0] + e.bbox[2]) // 2, (e.bbox[1] + e.bbox[3]) // 2]}
+                for e in model.detect_ui_elements(image)]
+
+    return IncrementalDetector(detect), detect
+
+
+def test_changed_tiles_and_regions():
+    before = np.zeros((100, 130), dtype=np.uint8)
+    after = before.copy()
+    after[70:75, 5:10] = 200   # One tile
+    after[10, 100] = 5         # Below tolerance
+    tiles = changed_tiles(before, after, tile=32, tolerance=12)
+    assert tiles.shape == (4, 5)
+    assert np.argwhere(tiles).tolist() == [[2, 0]]
+    assert dirty_regions(tiles, 32, 8, before.shape) == [(0, 56, 40, 100)]
+
+
+def test_new_message_redetects_bottom_only():
+    detector, detect = make_detector()
+    first = detector.update('cursor', chat_window(6))
+    assert first.full and first.elements
+
+    start = time.perf_counter()
+    full_elements = detect(chat_window(7))
+    full_time = time.perf_counter() - start
+
+    # A new message scrolls the chat pane; the sidebar and header stay put
+    update = detector.update('cursor', chat_window(7))
+    assert not update.full
+    assert update.dirty_fraction < 0.7
+    assert all(r[0] >= 280 for r in update.regions), update.regions
+    assert update.added
+    sidebar = [e for e in first.elements if e['bbox'][2] <= 280]
+    assert sidebar and all(any(e is kept for kept in update.elements) for e in sidebar)
+
+    # Same elements as detecting the whole frame again
+    matched = sum(1 for e in full_elements if any(iou(e['bbox'], u['bbox']) > 0.9 for u in update.elements))
+    assert matched >= 0.9 * len(full_elements), (matched, len(full_elements))
+    logger.info(f"Full detection {full_time * 1000:.0f} ms, incremental {update.elapsed * 1000:.0f} ms "
+                f"over {update.dirty_fraction:.0%} of the frame")
+
+    # Only the input box text changes: a small crop
+    typing = chat_window(7)
+    cv2.putText(typing, "hello", (360, HEIGHT - 65), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2)
+    update = detector.update('cursor', typing)
+    assert not update.full
+    assert update.dirty_fraction < 0.1
+    logger.info(f"Typing update {update.elapsed * 1000:.1f} ms over {update.dirty_fraction:.1%} of the frame")
+
+
+def test_unchanged_resized_and_repainted():
+    detector, _ = make_detector()
+    frame = chat_window(3)
+    first = detector.update(1, frame)
+
+    same = detector.update(1, frame.copy())
+    assert not same.full and same.regions == [] and same.elements is first.elements
+    assert same.unchanged == len(first.elements) and not same.added and not same.removed
+
+    # Windows are tracked separately
+    assert detector.update(2, frame).full
+
+    resized = detector.update(1, cv2.resize(frame, (1280, 720)))
+    assert resized.full
+
+    repainted = detector.update(1, 255 - cv2.resize(frame, (1280, 720)))
+    assert repainted.full and repainted.dirty_fraction > 0.5
+
+
+if __name__ == '__main__':
+    test_changed_tiles_and_regions()
+    test_new_message_redetects_bottom_only()
+    test_unchanged_resized_and_repainted()
+    logger.info("All incremental vision tests passed")
@@ -0,0 +1,146 @@
+"""
+Test batched OCR: region cropping, size-bucketed chunks, results in input
+order with frame coordinates, and warm worker processes
+"""
+
+import logging
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from vision.backends.ocr_backend import OCRBackend, OCREngine  # noqa: E402
+from vision.backends.ocr_pool import plan_chunks, region_boxes  # noqa: E402
+from vision.vision_model import UIElement  # noqa: E402
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('TestOCRBatch')
+
+LOAD_TIME = 0.3
+
+
+class InkEngine(OCREngine):
+    """Stand-in engine: 'reads' the box around dark pixels and reports its size
+
+    Loading takes LOAD_TIME, as real engines load models.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self.batches = []
+
+    def is_available(self):
+        return True
+
+    def warm_up(self):
+        if not self.loaded:
+            time.sleep(LOAD_TIME)
+            self.loaded = True
+        return True
+
+    def detect_text(self, image):
+        self.warm_up()
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        ys, xs = np.nonzero(gray < 100)
+        if not len(xs):
+            return []
+        x1, y1, x2, y2 = int(xs.min()), int(ys.min()), int(xs.max()) + 1, int(ys.max()) + 1
+        return [{'text': f"{x2 - x1}x{y2 - y1}", 'confidence': 0.9, 'bbox': [x1, y1, x2, y2],
+                 'pid': os.getpid()}]
+
+    def detect_text_batch(self, images):
+        self.batches.append(len(images))
+        return [self.detect_text(image) for image in images]
+
+
+def ide_window(width=1600, height=1000):
+    """Mostly background, with a few labels and buttons inside one panel"""
+    image = np.full((height, width, 3), 250, dtype=np.uint8)
+    elements = []
+    for k, (x, y, w) in enumerate([(40, 40, 120), (40, 400, 300), (900, 120, 60), (600, 860, 200)]):
+        image[y + 8:y + 22, x + 6:x + 6 + w] = 20  # A 'line of text'
+        elements.append(UIElement('text' if k % 2 else 'button', (x, y, x + w + 12, y + 30), 0.7))
+    elements.append(UIElement('container', (20, 20, 1580, 980), 0.5))
+    return image, elements
+
+
+def make_backend():
+    backend = OCRBackend(profile_path=None)
+    backend.available_engines.clear()
+    backend.available_engines['ink'] = InkEngine()
+    return backend
+
+
+def test_regions_and_chunks():
+    _, elements = ide_window()
+    assert len(region_boxes(elements)) == 4          # Container skipped
+    assert len(region_boxes(elements, types=None)) == 5
+    dicts = [{'type': e.element_type, 'bbox': list(e.bbox)} for e in elements]
+    assert region_boxes(dicts) == region_boxes(elements)
+
+    sizes = [(30, 200), (10, 10), (30, 190), (12, 10), (30, 210)]
+    images = [np.zeros(s, dtype=np.uint8) for s in sizes]
+    assert plan_chunks(images, 2) == [[1, 3], [2, 0], [4]]
+
+
+def test_region_ocr_in_input_order():
+    backend = make_backend()
+    image, elements = ide_window()
+    results = backend.detect_text_in_regions(image, elements)
+
+    assert [r.index for r in results] == [0, 1, 2, 3]
+    assert backend.available_engines['ink'].batches == [4]   # One engine call
+    assert [r.text for r in results] == ['120x14', '300x14', '60x14', '200x14']
+    for result, element in zip(results, [e for e in elements if e.element_type != 'container']):
+        x, y = element.bbox[:2]
+        assert result.detections[0]['bbox'] == [x + 6, y + 8, x + 6 + int(result.text.split('x')[0]), y + 22]
+        assert result.region[0] <= x and result.region[1] <= y
+        assert result.engine == 'ink' and result.elapsed >= 0 and result.error is None
+
+    # Four small crops instead of the whole frame
+    stats = backend.last_batch_stats
+    assert stats.items == 4 and stats.chunks == 1
+    assert stats.pixels < 0.02 * image.shape[0] * image.shape[1]
+
+    # The engine call is recorded in the routing profile of its size class
+    profile = backend.profiles.get('ink', None, 'roi')
+    assert profile.samples == 1 and profile.confidence == 0.9 and profile.error_rate == 0.0
+
+    # Plain boxes work too, and whole images batch the same way
+    boxes = [(40, 400, 352, 430), (40, 40, 172, 70)]
+    assert [r.text for r in backend.detect_text_in_regions(image, boxes)] == ['300x14', '120x14']
+    assert [r.text for r in backend.detect_text_batch([image, image[:500]])] == ['920x834', '920x374']
+
+
+def test_warm_pool():
+    backend = make_backend()
+    image, elements = ide_window()
+    try:
+        start = time.perf_counter()
+        pool = backend.warm_pool(processes=2, batch_size=2)
+        startup = time.perf_counter() - start
+        assert pool.started and startup >= LOAD_TIME
+
+        # Engines loaded at startup: the first batch pays no load time
+        start = time.perf_counter()
+        results = backend.detect_text_in_regions(image, elements)
+        first = time.perf_counter() - start
+        assert first < LOAD_TIME, first
+        assert [r.text for r in results] == ['120x14', '300x14', '60x14', '200x14']
+        assert all(r.detections[0]['pid'] != os.getpid() for r in results)
+        assert backend.last_batch_stats.chunks == 2
+        logger.info(f"Pool startup {startup * 1000:.0f} ms, first batch {first * 1000:.0f} ms")
+    finally:
+        backend.close()
+    assert not backend.pools
+
+
+if __name__ == '__main__':
+    test_regions_and_chunks()
+    test_region_ocr_in_input_order()
+    test_warm_pool()
+    logger.info("All OCR batch tests passed")
@@ -0,0 +1,231 @@
+"""
+Test adaptive OCR engine routing: EWMA profiles per size class and language,
+persistence, budget-based engine choice and hedged calls
+"""
+
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import types
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from vision.backends.ocr_backend import OCRBackend, OCREngine, TesseractEngine  # noqa: E402
+from vision.backends.ocr_router import (EngineProfile, OCRRouter, ProfileStore, mean_confidence,  # noqa: E402
+                                        size_class)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('TestOCRRouter')
+
+ROI = np.zeros((40, 200, 3), dtype=np.uint8)
+SCREEN = np.zeros((1080, 1920, 3), dtype=np.uint8)
+
+
+class TimedEngine(OCREngine):
+    """Stand-in engine with a set latency and confidence"""
+
+    def __init__(self, name, latency, confidence):
+        self.name = name
+        self.latency = latency
+        self.confidence = confidence
+        self.stall = threading.Event()  # While set, calls take a second
+
+    def is_available(self):
+        return True
+
+    def detect_text(self, image):
+        time.sleep(1.0 if self.stall.is_set() else self.latency)
+        return [{'text': self.name, 'confidence': self.confidence, 'bbox': [0, 0, 10, 10]}]
+
+
+class BrokenEngine(TimedEngine):
+    """Fails fast, by raising or by reading nothing"""
+
+    def __init__(self, name, raises):
+        super().__init__(name, 0.0, None)
+        self.raises = raises
+
+    def detect_text(self, image):
+        if self.raises:
+            raise RuntimeError('engine crashed')
+        return []
+
+
+def engines():
+    return {'fast': TimedEngine('fast', 0.005, 0.6), 'accurate': TimedEngine('accurate', 0.03, 0.95)}
+
+
+def test_profiles():
+    assert size_class(ROI) == 'roi' and size_class(SCREEN) == 'medium'
+    assert size_class(np.zeros((2160, 3840))) == 'large'
+    assert mean_confidence([{'confidence': 0.5}, {'confidence': 0.9}, {'confidence': None}]) == 0.7
+    assert mean_confidence([]) is None
+
+    profile = EngineProfile()
+    for latency in [0.010] * 10:
+        profile.update(latency, 8000, 0.9, alpha=0.2)
+    assert abs(profile.latency - 0.010) < 1e-9 and abs(profile.throughput - 800000) < 1e-3
+    assert abs(profile.p95 - 0.010) < 1e-9
+
+    # One slow call moves the mean by alpha and widens the p95
+    profile.update(0.110, 8000, None, alpha=0.2)
+    assert abs(profile.latency - 0.030) < 1e-9
+    assert profile.p95 > 0.060 and profile.confidence == 0.9
+
+    # Empirical p95 once there are enough samples
+    for k in range(100):
+        profile.update(0.001 * (k % 20 + 1), 8000, 0.9)
+    assert abs(profile.p95 - np.percentile(profile.recent, 95)) < 1e-12
+
+
+def test_tesseract_confidence_scale():
+    # pytesseract's image_to_data reports 0..100, and -1 for unscored boxes
+    data = {'level': [5, 5, 5], 'text': ['Save', 'as', ''], 'conf': ['96.5', -1, -1],
+            'left': [0, 50, 0], 'top': [0, 0, 0], 'width': [40, 20, 0], 'height': [12, 12, 0]}
+    fake = types.SimpleNamespace(image_to_data=lambda image, lang, output_type: data,
+                                 Output=types.SimpleNamespace(DICT='dict'))
+    engine = TesseractEngine.__new__(TesseractEngine)
+    engine.lang, engine.available = 'eng', True
+    real = sys.modules.get('pytesseract')
+    sys.modules['pytesseract'] = fake
+    try:
+        detections = engine.detect_text(ROI)
+    finally:
+        if real is None:
+            del sys.modules['pytesseract']
+        else:
+            sys.modules['pytesseract'] = real
+    assert [d['confidence'] for d in detections] == [0.965, 0.0]
+    assert abs(mean_confidence(detections) - 0.4825) < 1e-9
+
+
+def test_persistence():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'var', 'ocr_profiles.json')
+        store = ProfileStore(path, save_every=3)
+        store.observe('easyocr', 'en', 'roi', 0.05, 8000, 0.9)
+        store.observe('easyocr', 'en', 'roi', 0.07, 8000, 0.8)
+        assert not os.path.exists(path)
+        store.observe('tesseract', None, 'medium', 0.4, 2_000_000, 0.7)
+        assert os.path.exists(path)  # Saved automatically after 3 observations
+
+        loaded = ProfileStore(path)
+        assert set(loaded.profiles) == {('easyocr', 'en', 'roi'), ('tesseract', 'default', 'medium')}
+        before, after = store.get('easyocr', 'en', 'roi'), loaded.get('easyocr', 'en', 'roi')
+        assert after.to_dict() == before.to_dict() and after.p95 == before.p95
+
+        # Two processes sharing the file keep each other's profiles
+        loaded.observe('easyocr', 'en', 'roi', 0.5, 8000, 0.9)
+        store.observe('tesseract', 'en', 'small', 0.2, 100_000, 0.8)
+        store.save()
+        loaded.save()
+        merged = ProfileStore(path)
+        assert merged.get('tesseract', 'en', 'small').samples == 1
+        assert merged.get('easyocr', 'en', 'roi').to_dict() == loaded.get('easyocr', 'en', 'roi').to_dict()
+
+        with open(path, 'w') as f:
+            f.write('{not json')
+        assert ProfileStore(path).profiles == {}
+
+
+def test_routing_by_budget():
+    router = OCRRouter(engines(), ProfileStore(None), priority=['accurate', 'fast'])
+
+    # Nothing measured: priority order, and every call is profiled
+    assert router.rank(ROI) == ['accurate', 'fast']
+    assert router.detect_text(ROI).engine == 'accurate'
+    assert router.rank(ROI) == ['accurate', 'fast']      # 'fast' is not profiled yet
+    assert router.detect_text(ROI, min_confidence=0.99).engine == 'fast'   # Measure the unknown engine first
+    assert router.rank(ROI) == ['fast', 'accurate']
+
+    assert router.detect_text(ROI, min_confidence=0.9).engine == 'accurate'
+    assert router.detect_text(ROI, max_latency=0.02).engine == 'fast'
+    # No engine meets both: the one missing fewer budgets, then the faster
+    assert router.rank(ROI, min_confidence=0.9, max_latency=0.02) == ['fast', 'accurate']
+
+    # Profiles are per size class and language
+    assert router.store.get('fast', None, 'medium') is None
+    assert router.rank(SCREEN) == ['accurate', 'fast']
+    assert router.rank(ROI, language='ch_sim') == ['accurate', 'fast']
+
+
+def test_failing_engines_are_demoted():
+    for raises in (True, False):
+        available = {'broken': BrokenEngine('broken', raises), 'working': TimedEngine('working', 0.01, 0.8)}
+        router = OCRRouter(available, ProfileStore(None), priority=['broken', 'working'])
+
+        used = [router.detect_text(ROI).engine for _ in range(5)]
+        assert used == ['broken'] + ['working'] * 4, used
+        assert router.rank(ROI) == ['working', 'broken']
+        assert router.store.get('broken', None, 'roi').confidence is None
+
+        # Below the confidence budget, a working engine still beats a failing
+        # one; an engine that read nothing yet is unknown rather than a miss
+        low_budget = router.rank(ROI, min_confidence=0.9)
+        assert low_budget == (['working', 'broken'] if raises else ['broken', 'working'])
+
+
+def test_hedged_call():
+    available = {'fast': TimedEngine('fast', 0.02, 0.6), 'accurate': TimedEngine('accurate', 0.05, 0.95)}
+    router = OCRRouter(available, ProfileStore(None), priority=['fast', 'accurate'])
+    for _ in range(5):
+        router.run('fast', ROI)
+        router.run('accurate', ROI)
+    assert not router.detect_text(ROI, hedge=True).hedged
+
+    # The primary stalls: past its p95 the runner-up is started and wins
+    available['fast'].stall.set()
+    start = time.perf_counter()
+    result = router.detect_text(ROI, hedge=True)
+    elapsed = time.perf_counter() - start
+    assert result.hedged and result.engine == 'accurate'
+    assert result.detections[0]['text'] == 'accurate'
+    assert elapsed < 0.5, elapsed
+    available['fast'].stall.clear()
+    logger.info(f"Hedged call returned in {elapsed * 1000:.0f} ms instead of 1000 ms")
+
+    # The stalled call still finishes in the background and is profiled
+    time.sleep(1.1)
+    assert router.store.get('fast', None, 'roi').samples == 7
+
+    # No hedge with a backup that misses the latency budget or keeps failing
+    assert router._hedge_backup(['accurate'], ROI, None, max_latency=0.01) is None
+    available['broken'] = BrokenEngine('broken', raises=True)
+    for _ in range(3):
+        router.run('broken', ROI)
+    assert router._hedge_backup(['broken', 'accurate'], ROI, None, None) == 'accurate'
+    router.close()
+
+
+def test_backend_routing():
+    backend = OCRBackend(profile_path=None)
+    backend.available_engines.clear()
+    backend.available_engines.update(engines())
+
+    backend.detect_text(ROI, engine='accurate')
+    backend.detect_text(ROI, engine='fast')
+    assert backend.last_route.engine == 'fast'
+    backend.detect_text(ROI, min_confidence=0.9)
+    assert backend.last_route.engine == 'accurate'
+    backend.detect_text(ROI)
+    assert backend.last_route.engine == 'fast'
+
+    report = backend.benchmark(SCREEN, iterations=2)
+    assert report['fast']['size_class'] == 'medium' and report['fast']['p95_latency'] > 0
+    assert backend.profiles.get('accurate', None, 'medium').samples == 2
+    assert backend._select_engine(sample=SCREEN) == 'fast'
+
+
+if __name__ == '__main__':
+    test_profiles()
+    test_persistence()
+    test_routing_by_budget()
+    test_failing_engines_are_demoted()
+    test_hedged_call()
+    test_backend_routing()
+    logger.info("All OCR router tests passed")
@@ -0,0 +1,84 @@
+"""
+Test pyramid (coarse-to-fine) UI detection: scale levels, refinement bands,
+sparse edge and foreground maps, and results matching full resolution
+"""
+
+import logging
+import os
+import sys
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from vision.frame_features import FrameFeatures  # noqa: E402
+from vision.pyramid import Pyramid, band_features, band_rects, downscale, scale_boxes  # noqa: E402
+from vision.vision_model import UIVisionModel  # noqa: E402
+from vision.vision_validator import VisionValidator  # noqa: E402
+from test_tiling import button_grid, desktop, same_elements  # noqa: E402
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('TestPyramid')
+
+
+def test_levels_and_bands():
+    pyramid = Pyramid([0.5, 0.25, 1.0], margin=2)
+    assert pyramid.scales == [0.25, 0.5, 1.0]
+    assert pyramid.steps() == [(0.25, 0.5), (0.5, 1.0)]
+    assert pyramid.refine_margin(0.25, 1.0) == 9
+    try:
+        Pyramid([1.0])
+        assert False, "a pyramid needs a coarse level"
+    except ValueError:
+        pass
+
+    assert scale_boxes([(1.2, 2.5, 3.2, 4.5)], 2).tolist() == [[2, 5, 7, 9]]
+    assert downscale(np.zeros((2160, 3840), dtype=np.uint8), 0.25).shape == (540, 960)
+
+    # Small boxes are covered whole, large ones by four strips around the border
+    assert band_rects([(10, 10, 30, 30)], 4, 100, 100) == [(6, 6, 34, 34)]
+    assert band_rects([(2, 10, 90, 90)], 4, 100, 100) == [
+        (0, 6, 94, 14), (0, 86, 94, 94), (0, 14, 6, 86), (86, 14, 94, 86)]
+    assert len(band_rects([(2, 10, 90, 90)], 4, 100, 100, whole_below=80)) == 1
+
+
+def test_band_features():
+    gray = cv2.cvtColor(desktop(1920, 1080), cv2.COLOR_BGR2GRAY)
+    full = FrameFeatures(gray)
+    rects = [(0, 0, 400, 30), (500, 200, 560, 900)]
+    sparse = band_features(gray, rects)
+
+    inside = np.zeros(gray.shape, dtype=bool)
+    for x1, y1, x2, y2 in rects:
+        inside[y1:y2, x1:x2] = True
+    for name in ('edges', 'foreground'):
+        band, whole = getattr(sparse, name), getattr(full, name)
+        assert not band[~inside].any()
+        assert (band[inside] != whole[inside]).mean() < 0.001, name
+
+    # Bands covering most of the frame are computed whole
+    dense = band_features(gray, [(0, 0, 1920, 1000)])
+    assert (dense.edges == full.edges).all()
+
+
+def test_matches_full_resolution():
+    settings = cv2.resize(VisionValidator.create_test_interface(), None, fx=4, fy=4,
+                          interpolation=cv2.INTER_NEAREST)
+    for image in (desktop(3840, 2160), settings, button_grid(3840, 2160)):
+        expected = UIVisionModel().detect_ui_elements(image)
+        model = UIVisionModel(pyramid_scales=(0.25,), pyramid_margin=2)
+        assert model.uses_pyramid(image.shape[1], image.shape[0])
+        found = model.detect_ui_elements(image)
+        assert same_elements(found, expected), (len(found), len(expected))
+
+    # Small frames are detected at full resolution
+    assert not UIVisionModel(pyramid_scales=(0.25,)).uses_pyramid(1920, 1080)
+    assert not UIVisionModel().uses_pyramid(7680, 4320)
+
+
+if __name__ == '__main__':
+    test_levels_and_bands()
+    test_band_features()
+    test_matches_full_resolution()
+    logger.info("All pyramid tests passed")
@@ -0,0 +1,317 @@
+"""
+Test the controller-side reader: many forwarded commands in flight on one
+connection, matched by command ID, with interleaved unrelated messages
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+from local_server import local_server, connect_client, echo_node
+from frame_transport import chunk_command_id, split_frame
+from response_demux import ResponseDemux, ForwardError
+from wire_codec import decode_message
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+from core.cybercorp_client import CyberCorpClient  # noqa: E402
+from core import response_demux as client_demux  # noqa: E402
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('TestResponseDemux')
+logging.getLogger().setLevel(logging.WARNING)  # Keep per-command server logs out of the output
+
+
+class _FakeSocket:
+    """Delivers whatever the test puts on its queue, unparsed"""
+
+    def __init__(self):
+        self.queue = asyncio.Queue()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.queue.get()
+
+
+async def _controller(url, max_in_flight=32):
+    ws, _ = await connect_client(url, 'controller')
+    demux = ResponseDemux(ws, decode_message, chunk_command_id, max_in_flight=max_in_flight)
+    demux.start()
+
+    async def send(message):
+        await ws.send(json.dumps(message))
+
+    return ws, demux, send
+
+
+async def _broadcast_one_round_trip(nodes=50, delay=0.1):
+    async with local_server() as (server, url):
+        node_ids, responders = [], []
+        for i in range(nodes):
+            ws, node_id = await connect_client(url, f'node_{i}')
+            node_ids.append(node_id)
+            responders.append(asyncio.create_task(echo_node(ws, delay=delay)))
+        ws, demux, send = await _controller(url)
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(demux.forward(send, node_id, 'get_windows', {'node': node_id})
+                                         for node_id in node_ids))
+        elapsed = time.perf_counter() - start
+
+        assert [r['result']['data']['params']['node'] for r in results] == node_ids
+        assert [r['from_client'] for r in results] == node_ids
+        # Serial request/response would take nodes * delay
+        assert elapsed < delay * 3, f"{nodes} forwards took {elapsed:.2f}s"
+        assert demux.in_flight == 0
+        logger.info(f"{nodes} forwards with {delay * 1000:.0f} ms node delay took {elapsed * 1000:.0f} ms")
+
+        for task in responders:
+            task.cancel()
+        await demux.close()
+        await ws.close()
+
+
+def test_broadcast_one_round_trip():
+    asyncio.run(_broadcast_one_round_trip())
+
+
+async def _in_flight_limit():
+    async with local_server() as (server, url):
+        node_ws, node_id = await connect_client(url, 'node')
+        responder = asyncio.create_task(echo_node(node_ws, delay=0.05))
+        ws, demux, send = await _controller(url, max_in_flight=4)
+
+        peak = 0
+
+        async def sample():
+            nonlocal peak
+            while True:
+                peak = max(peak, demux.in_flight)
+                await asyncio.sleep(0.005)
+
+        sampler = asyncio.create_task(sample())
+        results = await asyncio.gather(*(demux.forward(send, node_id, 'get_windows', {'n': i})
+                                         for i in range(20)))
+        sampler.cancel()
+
+        assert [r['result']['data']['params']['n'] for r in results] == list(range(20))
+        assert peak == 4
+
+        responder.cancel()
+        await demux.close()
+        await ws.close()
+
+
+def test_in_flight_limit():
+    asyncio.run(_in_flight_limit())
+
+
+async def _interleaved_messages():
+    async with local_server() as (server, url):
+        node_ws, node_id = await connect_client(url, 'node')
+        responder = asyncio.create_task(echo_node(node_ws, delay=0.02))
+        ws, demux, send = await _controller(url)
+
+        async def heartbeats():
+            for _ in range(20):
+                await send({'type': 'heartbeat'})
+                await asyncio.sleep(0.005)
+
+        forwards = [demux.forward(send, node_id, 'get_windows', {'n': i}) for i in range(10)]
+        listed = demux.request(send, {'type': 'request', 'command': 'list_clients'}, 'client_list')
+        *results, _, client_list = await asyncio.gather(*forwards, heartbeats(), listed)
+
+        assert [r['result']['data']['params']['n'] for r in results] == list(range(10))
+        assert len(client_list['clients']) == 2
+
+        # Unrouted messages are still there for whoever reads them
+        acks = [await demux.receive(timeout=1) for _ in range(20)]
+        assert all(a['type'] == 'heartbeat_ack' for a in acks)
+
+        responder.cancel()
+        await demux.close()
+        await ws.close()
+
+
+def test_interleaved_messages():
+    asyncio.run(_interleaved_messages())
+
+
+async def _errors_and_timeouts():
+    async with local_server() as (server, url):
+        silent_ws, silent_id = await connect_client(url, 'silent_node')
+        ws, demux, send = await _controller(url)
+
+        try:
+            await demux.forward(send, 'client_missing', 'get_windows')
+            raise AssertionError("Expected ForwardError")
+        except ForwardError as e:
+            assert 'not found' in str(e)
+
+        try:
+            await demux.forward(send, silent_id, 'get_windows', timeout=0.2)
+            raise AssertionError("Expected timeout")
+        except asyncio.TimeoutError:
+            pass
+        assert demux.in_flight == 0
+
+        # Waiting commands fail once the connection drops
+        pending = asyncio.create_task(demux.forward(send, silent_id, 'get_windows', timeout=5))
+        await asyncio.sleep(0.05)
+        await ws.close()
+        await silent_ws.close()
+        try:
+            await pending
+            raise AssertionError("Expected ConnectionError")
+        except ConnectionError:
+            pass
+        await demux.close()
+
+
+def test_errors_and_timeouts():
+    asyncio.run(_errors_and_timeouts())
+
+
+async def _target_lost_after_ack():
+    async with local_server() as (server, url):
+        node_ws, node_id = await connect_client(url, 'node')
+        client = CyberCorpClient('controller', port=int(url.rsplit(':', 1)[1]), negotiate_wire=False)
+        await client.connect()
+
+        # The forward is acked, then the node drops before answering
+        pending = asyncio.create_task(client.forward(node_id, 'get_windows', timeout=5))
+        await asyncio.sleep(0.1)
+        await node_ws.close()
+        start = time.perf_counter()
+        try:
+            await pending
+            raise AssertionError("Expected ForwardError")
+        except client_demux.ForwardError as e:
+            assert 'disconnected' in str(e)
+        assert time.perf_counter() - start < 1
+        assert client.demux.in_flight == 0
+
+        # The error was consumed by the forward, not left for the next reader
+        try:
+            message = await client.receive_raw(timeout=0.2)
+            raise AssertionError(f"Unexpected message {message}")
+        except asyncio.TimeoutError:
+            pass
+        await client.disconnect()
+
+
+def test_target_lost_after_ack():
+    asyncio.run(_target_lost_after_ack())
+
+
+async def _ack_without_command_id():
+    """Older servers send errors without a command ID; match them in order"""
+    loop = asyncio.get_running_loop()
+
+    sock = _FakeSocket()
+    demux = ResponseDemux(sock, json.loads)
+    demux.start()
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    first = loop.create_task(demux.forward(send, 'a', 'get_windows', timeout=1))
+    second = loop.create_task(demux.forward(send, 'b', 'get_windows', timeout=1))
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    await sock.queue.put(json.dumps({'type': 'error', 'message': 'Target client a not found'}))
+    await sock.queue.put(json.dumps({'type': 'forward_ack', 'command_id': sent[1]['command']['command_id']}))
+    await sock.queue.put(json.dumps({'type': 'command_result', 'command_id': sent[1]['command']['command_id'],
+                                     'result': {'success': True}}))
+
+    try:
+        await first
+        raise AssertionError("Expected ForwardError")
+    except ForwardError:
+        pass
+    assert (await second)['result'] == {'success': True}
+    await demux.close()
+
+
+def test_ack_without_command_id():
+    asyncio.run(_ack_without_command_id())
+
+
+async def _frame_chunks_routed():
+    async with local_server() as (server, url):
+        node_ws, node_id = await connect_client(url, 'node')
+        ws, demux, send = await _controller(url)
+
+        async def frame_node():
+            command = json.loads(await node_ws.recv())
+            for chunk in split_frame(command['command_id'], 'raw', 4, 4, b'\x01' * 64, 16):
+                await node_ws.send(chunk)
+            await node_ws.send(json.dumps({'type': 'command_result', 'command_id': command['command_id'],
+                                           'result': {'success': True}}))
+
+        chunks = []
+        node = asyncio.create_task(frame_node())
+        result = await demux.forward(send, node_id, 'screenshot', {'transport': 'binary'},
+                                     on_chunk=chunks.append)
+        await node
+
+        assert result['result'] == {'success': True}
+        assert len(chunks) == 4
+
+        await demux.close()
+        await ws.close()
+        await node_ws.close()
+
+
+def test_frame_chunks_routed():
+    asyncio.run(_frame_chunks_routed())
+
+
+async def _malformed_frame_skipped():
+    """A frame that fails to parse costs that frame, not the reader"""
+    loop = asyncio.get_running_loop()
+
+    sock = _FakeSocket()
+    demux = ResponseDemux(sock, json.loads, chunk_command_id)
+    demux.start()
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    chunks = []
+    task = loop.create_task(demux.forward(send, 'node', 'screenshot', timeout=1, on_chunk=chunks.append))
+    await asyncio.sleep(0)
+    command_id = sent[0]['command']['command_id']
+    chunk = split_frame(command_id, 'raw', 4, 4, b'\x01' * 64, 16)[0]
+    await sock.queue.put(chunk[:8])  # Frame magic, truncated header
+    await sock.queue.put(chunk)
+    await sock.queue.put(json.dumps({'type': 'forward_ack', 'command_id': command_id}))
+    await sock.queue.put(json.dumps({'type': 'command_result', 'command_id': command_id,
+                                     'result': {'success': True}}))
+
+    assert (await task)['result'] == {'success': True}
+    assert len(chunks) == 1 and not demux.closed
+    await demux.close()
+
+
+def test_malformed_frame_skipped():
+    asyncio.run(_malformed_frame_skipped())
+
+
+if __name__ == '__main__':
+    logging.getLogger().setLevel(logging.INFO)
+    test_broadcast_one_round_trip()
+    test_in_flight_limit()
+    test_interleaved_messages()
+    test_errors_and_timeouts()
+    test_target_lost_after_ack()
+    test_ack_without_command_id()
+    test_frame_chunks_routed()
+    test_malformed_frame_skipped()
+    logger.info("All response demux tests passed")
@@ -0,0 +1,109 @@
+"""
+Test that command results go to the requesting controller and observers only
+"""
+
+import asyncio
+import json
+import logging
+
+from local_server import local_server, connect_client, echo_node
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('TestResultRouting')
+
+
+async def _forward(ws, target, command, tag):
+    await ws.send(json.dumps({
+        'type': 'forward_command',
+        'target_client': target,
+        'command': {'type': 'command', 'command': command, 'params': {'tag': tag}}
+    }))
+    ack = json.loads(await ws.recv())
+    assert ack['type'] == 'forward_ack', ack
+    return ack['command_id']
+
+
+async def _drain(ws, timeout=0.3):
+    """Collect messages until the socket goes quiet"""
+    messages = []
+    try:
+        while True:
+            messages.append(json.loads(await asyncio.wait_for(ws.recv(), timeout=timeout)))
+    except asyncio.TimeoutError:
+        return messages
+
+
+async def _targeted_routing():
+    async with local_server() as (server, url):
+        node_ws, node_id = await connect_client(url, 'node')
+        responder = asyncio.create_task(echo_node(node_ws))
+
+        ctrl_a, _ = await connect_client(url, 'ctrl_a', {'management': True})
+        ctrl_b, _ = await connect_client(url, 'ctrl_b', {'management': True})
+        dashboard, _ = await connect_client(url, 'dashboard', {'management': True})
+
+        await dashboard.send(json.dumps({'type': 'observe'}))
+        assert json.loads(await dashboard.recv())['type'] == 'observe_ack'
+
+        id_a = await _forward(ctrl_a, node_id, 'get_windows', 'a')
+        id_b = await _forward(ctrl_b, node_id, 'get_processes', 'b')
+
+        results_a = await _drain(ctrl_a)
+        results_b = await _drain(ctrl_b)
+        observed = await _drain(dashboard)
+
+        assert [m['command_id'] for m in results_a] == [id_a]
+        assert [m['command_id'] for m in results_b] == [id_b]
+        assert results_a[0]['result']['data']['params']['tag'] == 'a'
+        assert sorted(m['command_id'] for m in observed) == sorted([id_a, id_b])
+        assert not server.result_routes
+
+        # Unsubscribed dashboards see nothing further
+        await dashboard.send(json.dumps({'type': 'observe', 'enabled': False}))
+        await dashboard.recv()
+        await _forward(ctrl_a, node_id, 'get_windows', 'a2')
+        assert len(await _drain(ctrl_a)) == 1
+        assert await _drain(dashboard) == []
+
+        responder.cancel()
+        for ws in (node_ws, ctrl_a, ctrl_b, dashboard):
+            await ws.close()
+        logger.info("Results routed to requesters and observers only")
+
+
+async def _forward_errors():
+    async with local_server() as (server, url):
+        node_ws, node_id = await connect_client(url, 'node')
+        ctrl, _ = await connect_client(url, 'ctrl', {'management': True})
+
+        # A non-numeric timeout is rejected instead of breaking the handler
+        await ctrl.send(json.dumps({
+            'type': 'forward_command',
+            'target_client': node_id,
+            'command': {'type': 'command', 'command': 'get_windows', 'params': {'timeout': 'soon'}}
+        }))
+        error = json.loads(await ctrl.recv())
+        assert error['type'] == 'error' and 'timeout' in error['message'], error
+
+        # A node that disconnects mid-command fails its requesters right away
+        command_id = await _forward(ctrl, node_id, 'get_windows', 'lost')
+        await node_ws.close()
+        error = json.loads(await asyncio.wait_for(ctrl.recv(), timeout=2))
+        assert error['type'] == 'error' and error['command_id'] == command_id, error
+        assert not server.result_routes and not server.pending_commands
+
+        await ctrl.close()
+        logger.info("Forward errors reported to the requester")
+
+
+def test_targeted_routing():
+    asyncio.run(_targeted_routing())
+
+
+def test_forward_errors():
+    asyncio.run(_forward_errors())
+
+
+if __name__ == '__main__':
+    test_targeted_routing()
+    test_forward_errors()
@@ -0,0 +1,147 @@
+"""
+Test the packed R-tree and the UI containment hierarchy against brute force
+"""
+
+import logging
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from vision.box_ops import areas, containment_matrix  # noqa: E402
+from vision.spatial_index import BoxIndex, UIHierarchy, containment_parents  # noqa: E402
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('TestSpatialIndex')
+
+
+def nested_layout(seed=0, width=1920, height=1080, depth=5, fanout=4):
+    """Windows > panels > groups > ... > controls, with some loose overlaps"""
+    rng = random.Random(seed)
+    boxes = []
+
+    def split(box, level):
+        boxes.append(box)
+        if level == depth:
+            return
+        x1, y1, x2, y2 = box
+        if x2 - x1 < 8 or y2 - y1 < 8:
+            return
+        for _ in range(rng.randint(1, fanout)):
+            w = rng.randint(2, max(2, (x2 - x1) // 2))
+            h = rng.randint(2, max(2, (y2 - y1) // 2))
+            cx, cy = rng.randint(x1, x2 - w), rng.randint(y1, y2 - h)
+            split((cx, cy, cx + w, cy + h), level + 1)
+
+    split((0, 0, width, height), 0)
+    for _ in range(len(boxes) // 10):  # Overlapping, non-nested popups
+        x, y = rng.randint(0, width - 50), rng.randint(0, height - 50)
+        boxes.append((x, y, x + rng.randint(10, 300), y + rng.randint(10, 200)))
+    return boxes
+
+
+def brute_parents(boxes):
+    """The tightest container among the larger boxes, by the same ranking"""
+    n = len(boxes)
+    order = np.argsort(-areas(boxes), kind='stable')
+    rank = np.empty(n, dtype=np.intp)
+    rank[order] = np.arange(n)
+    contains = containment_matrix(boxes)
+    parents = np.full(n, -1)
+    for child in range(n):
+        candidates = [p for p in range(n) if contains[p, child] and rank[p] < rank[child]]
+        if candidates:
+            parents[child] = max(candidates, key=lambda p: rank[p])
+    return parents
+
+
+def test_queries_match_brute_force():
+    rng = random.Random(1)
+    boxes = np.array([(x, y, x + rng.randint(1, 200), y + rng.randint(1, 200))
+                      for x, y in ((rng.randint(0, 1000), rng.randint(0, 1000)) for _ in range(700))])
+    index = BoxIndex(boxes, leaf_size=8)
+    assert len(index.levels) > 2
+
+    for _ in range(50):
+        x, y = rng.randint(0, 1200), rng.randint(0, 1200)
+        rect = (x, y, x + rng.randint(0, 300), y + rng.randint(0, 300))
+        expected_point = np.nonzero((boxes[:, 0] <= x) & (boxes[:, 2] >= x) & (boxes[:, 1] <= y) & (boxes[:, 3] >= y))[0]
+        assert index.query_point(x, y).tolist() == expected_point.tolist()
+        assert index.query(rect, 'within').tolist() == np.nonzero(containment_matrix([rect], boxes)[0])[0].tolist()
+        assert index.query(rect, 'containing').tolist() == np.nonzero(containment_matrix(boxes, [rect])[:, 0])[0].tolist()
+        touching = ((boxes[:, 0] <= rect[2]) & (boxes[:, 2] >= rect[0]) &
+                    (boxes[:, 1] <= rect[3]) & (boxes[:, 3] >= rect[1]))
+        assert index.query(rect, 'intersects').tolist() == np.nonzero(touching)[0].tolist()
+
+    empty = BoxIndex([])
+    assert empty.query_point(1, 1).tolist() == []
+
+
+def test_parents_match_brute_force():
+    for seed in range(3):
+        boxes = nested_layout(seed)
+        assert containment_parents(boxes).tolist() == brute_parents(boxes).tolist()
+
+    # Identical boxes nest in input order instead of forming a cycle
+    assert containment_parents([(0, 0, 10, 10), (0, 0, 10, 10), (2, 2, 4, 4)]).tolist() == [-1, 0, 1]
+
+
+def test_nested_tree_and_point_queries():
+    elements = [
+        {'type': 'panel', 'bbox': (0, 0, 800, 600)},
+        {'type': 'container', 'bbox': (10, 10, 400, 300)},
+        {'type': 'button', 'bbox': (20, 20, 120, 50)},
+        {'type': 'text', 'bbox': (30, 25, 60, 45)},
+        {'type': 'panel', 'bbox': (900, 0, 1000, 100)},
+    ]
+    hierarchy = UIHierarchy(elements)
+    tree = hierarchy.to_dicts()
+
+    assert [n['element']['type'] for n in tree] == ['panel', 'panel']
+    node = tree[0]
+    for expected in ('container', 'button', 'text'):
+        assert len(node['children']) == 1
+        node = node['children'][0]
+        assert node['element']['type'] == expected
+    assert hierarchy.depths.tolist() == [0, 1, 2, 3, 0]
+
+    assert hierarchy.element_at(40, 30)['type'] == 'text'
+    assert [e['type'] for e in hierarchy.path_at(100, 40)] == ['panel', 'container', 'button']
+    assert hierarchy.element_at(850, 50) is None
+    assert [e['type'] for e in hierarchy.elements_in((0, 0, 200, 200))] == ['button', 'text']
+    assert len(hierarchy.elements_overlapping((390, 50, 950, 400))) == 3
+
+
+def test_vision_model_hierarchy():
+    from vision.vision_model import UIElement, UIVisionModel
+
+    model = UIVisionModel.__new__(UIVisionModel)
+    boxes = nested_layout(4, depth=6, fanout=6)
+    elements = [UIElement('container', tuple(b), 0.9) for b in boxes]
+
+    start = time.perf_counter()
+    tree = model._build_hierarchy(elements)
+    elapsed = time.perf_counter() - start
+
+    # Every element appears exactly once, at the depth of its parent chain
+    seen, stack, max_depth = 0, [(node, 0) for node in tree], 0
+    while stack:
+        node, depth = stack.pop()
+        seen += 1
+        max_depth = max(max_depth, depth)
+        stack.extend((child, depth + 1) for child in node['children'])
+    assert seen == len(elements)
+    assert max_depth >= 4
+    logger.info(f"Hierarchy of {len(elements)} elements, depth {max_depth}, built in {elapsed * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    test_queries_match_brute_force()
+    test_parents_match_brute_force()
+    test_nested_tree_and_point_queries()
+    test_vision_model_hierarchy()
+    logger.info("All spatial index tests passed")
@@ -0,0 +1,97 @@
+"""
+Test startup helpers: lazy module loading, phase timing and -X importtime
+parsing
+"""
+
+import logging
+import os
+import sys
+import threading
+
+import local_server  # noqa: F401  (puts src/core on sys.path)
+from lazy_imports import lazy_import
+from startup_profile import StartupTimer, parse_importtime, format_import_report, profile_imports
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('TestStartup')
+
+CORE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src', 'core')
+
+IMPORTTIME_SAMPLE = """import time: self [us] | cumulative | imported package
+import time:       136 |        136 |   _io
+import time:       296 |        848 | _frozen_importlib_external
+import time:      2286 |      18464 | wire_codec
+import time:       179 |      24249 |   websockets.version
+"""
+
+
+def test_lazy_module_loads_on_first_use():
+    sys.modules.pop('colorsys', None)
+    loads = []
+    colorsys = lazy_import('colorsys', on_load=lambda m: loads.append(m.__name__))
+    assert not colorsys.loaded and 'colorsys' not in sys.modules
+
+    assert colorsys.rgb_to_hsv(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0)
+    assert colorsys.loaded and loads == ['colorsys']
+
+    colorsys.hsv_to_rgb(0.0, 1.0, 1.0)
+    assert loads == ['colorsys']
+
+
+def test_lazy_module_loads_once_across_threads():
+    sys.modules.pop('quopri', None)
+    loads = []
+    module = lazy_import('quopri', on_load=lambda m: loads.append(1))
+    threads = [threading.Thread(target=lambda: module.encodestring) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert loads == [1]
+
+
+def test_lazy_module_setattr_reaches_module():
+    sys.modules.pop('colorsys', None)
+    colorsys = lazy_import('colorsys')
+    colorsys.TEST_FLAG = True
+    assert sys.modules['colorsys'].TEST_FLAG is True
+
+
+def test_startup_timer():
+    timer = StartupTimer()
+    first = timer.mark('imports')
+    assert timer.mark('imports') == first  # Only the first completion counts
+    timer.mark('connected')
+    assert list(timer.marks) == ['imports', 'connected']
+    assert 'connected' in timer.report()
+    assert timer.elapsed('missing') is None
+
+
+def test_parse_importtime():
+    entries = parse_importtime(IMPORTTIME_SAMPLE)
+    assert [e['module'] for e in entries] == ['_io', '_frozen_importlib_external',
+                                               'wire_codec', 'websockets.version']
+    assert [e['depth'] for e in entries] == [1, 0, 0, 1]
+    assert entries[2]['self_ms'] == 2.286 and entries[2]['cumulative_ms'] == 18.464
+
+    report = format_import_report(entries, top=2)
+    assert report.splitlines()[2].endswith('websockets.version')
+
+
+def test_profile_imports():
+    entries, error = profile_imports('wire_codec', cwd=CORE_DIR)
+    assert error is None
+    assert any(e['module'] == 'wire_codec' and e['depth'] == 0 for e in entries)
+
+    _, error = profile_imports('no_such_module_here')
+    assert 'ModuleNotFoundError' in error
+
+
+if __name__ == '__main__':
+    test_lazy_module_loads_on_first_use()
+    test_lazy_module_loads_once_across_threads()
+    test_lazy_module_setattr_reaches_module()
+    test_startup_timer()
+    test_parse_importtime()
+    test_profile_imports()
+    logger.info("All startup tests passed")
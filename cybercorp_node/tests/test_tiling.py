@@ -0,0 +1,143 @@
+"""
+Test tiled, multi-threaded UI detection: tile layout, stitching of per-tile
+boxes, and parallel results matching the serial ones
+"""
+
+import logging
+import os
+import random
+import sys
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from vision.box_ops import iou  # noqa: E402
+from vision.tiling import TileGrid  # noqa: E402
+from vision.vision_model import UIVisionModel  # noqa: E402
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('TestTiling')
+
+
+def desktop(width, height, seed=0):
+    """Side-by-side panels taller than a tile, full of buttons, inputs and labels"""
+    rng = random.Random(seed)
+    image = np.full((height, width, 3), 235, dtype=np.uint8)
+    cv2.rectangle(image, (0, 0), (width, 48), (50, 50, 50), -1)
+    for px in range(0, width, 960):
+        cv2.rectangle(image, (px + 30, 90), (px + 900, height - 60), (120, 120, 120), 2)
+        y = 120
+        while y < height - 160:
+            kind, x = rng.random(), px + 60 + rng.randint(0, 300)
+            if kind < 0.4:
+                cv2.rectangle(image, (x, y), (x + rng.randint(90, 220), y + 36), (200, 140, 60), -1)
+                cv2.putText(image, "OK", (x + 15, y + 26), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+            elif kind < 0.7:
+                cv2.rectangle(image, (x, y), (x + rng.randint(200, 480), y + 32), (140, 140, 140), 1)
+            else:
+                cv2.putText(image, f"Label {y}", (x, y + 24), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (20, 20, 20), 2)
+            y += rng.randint(50, 90)
+    return image
+
+
+def button_grid(width, height):
+    """A wall of buttons, many of them cut by tile seams"""
+    image = np.full((height, width, 3), 240, dtype=np.uint8)
+    for y in range(0, height - 60, 90):
+        for x in range(0, width - 200, 260):
+            cv2.rectangle(image, (x + 20, y + 20), (x + 220, y + 70), (200, 140, 60), -1)
+            cv2.putText(image, "Btn", (x + 40, y + 55), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+    return image
+
+
+def same_elements(found, expected, threshold=0.9):
+    """Same count, and every expected element found with its type at IoU > threshold
+
+    Adaptive thresholding differs by a pixel near a crop border, so tiled
+    boxes can be a pixel off the serial ones.
+    """
+    return len(found) == len(expected) and all(
+        any(f.element_type == e.element_type and iou(f.bbox, e.bbox) > threshold for f in found)
+        for e in expected)
+
+
+def test_tile_grid():
+    grid = TileGrid(3840, 2160, 1024, 128)
+    assert len(grid) == 15
+    coverage = np.zeros((2160, 3840), dtype=np.int32)
+    for (x1, y1, x2, y2), core in zip(grid.tiles, grid.cores):
+        assert x2 - x1 <= 1024 and y2 - y1 <= 1024
+        cx1, cy1, cx2, cy2 = (int(np.ceil(v)) for v in core)
+        assert x1 <= cx1 and y1 <= cy1 and cx2 <= x2 and cy2 <= y2
+        coverage[cy1:cy2, cx1:cx2] += 1
+    assert (coverage == 1).all()  # Cores partition the frame
+
+    # Neighbouring tiles share at least the overlap
+    assert grid.tiles[0][2] - grid.tiles[1][0] >= 128
+    assert grid.tiles[0][3] - grid.tiles[5][1] >= 128
+
+    # Small frames are a single tile, and stitching an image round-trips
+    small = TileGrid(800, 600, 1024, 128)
+    assert small.tiles == [(0, 0, 800, 600)]
+    frame = np.arange(2160 * 3840, dtype=np.uint32).reshape(2160, 3840)
+    parts = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in grid.tiles]
+    assert np.array_equal(grid.stitch_image(parts), frame)
+
+
+def test_stitch_boxes():
+    grid = TileGrid(2000, 500, 1064, 128)
+    assert grid.tiles == [(0, 0, 1064, 500), (936, 0, 2000, 500)]
+
+    boxes = [
+        (20, 300, 60, 340),      # Tile 0 only
+        (950, 100, 1050, 150),   # In the overlap, seen whole by both tiles
+        (800, 200, 1064, 260),   # Left piece of an element crossing the seam
+        (850, 210, 900, 250),    # ...and what the cut exposed inside it
+        (950, 100, 1050, 150),
+        (936, 200, 1300, 260),   # Right piece
+    ]
+    scores = [0.5, 0.5, 0.7, 0.5, 0.6, 0.5]
+    tile_ids = [0, 0, 0, 0, 1, 1]
+
+    stitched, best = grid.stitch_boxes(boxes, scores, tile_ids, outermost=True)
+    assert stitched.tolist() == [[20, 300, 60, 340], [800, 200, 1300, 260], [950, 100, 1050, 150]]
+    assert best.tolist() == [0.5, 0.7, 0.6]
+
+    stitched, _ = grid.stitch_boxes(boxes, scores, tile_ids)
+    assert [850, 210, 900, 250] in stitched.tolist()
+
+    # Input order decides output order, not which tile finished first
+    again, _ = grid.stitch_boxes(boxes, scores, tile_ids, outermost=True)
+    assert np.array_equal(stitched[[0, 1, 3]], again)
+
+
+def test_parallel_matches_serial():
+    serial = UIVisionModel()
+    with UIVisionModel(workers=4) as parallel:
+        # Below the tiling threshold: same elements in the same order
+        image = desktop(1920, 1080)
+        assert parallel.tile_grid(1920, 1080) is None
+        assert [(e.element_type, e.bbox) for e in parallel.detect_ui_elements(image)] == \
+            [(e.element_type, e.bbox) for e in serial.detect_ui_elements(image)]
+
+        # 4K, dual-monitor and triple-monitor captures are tiled and stitched
+        for width, height, scene in ((3840, 2160, button_grid), (3840, 2160, desktop),
+                                     (5120, 1440, desktop), (7680, 2160, desktop)):
+            image = scene(width, height)
+            assert len(parallel.tile_grid(width, height)) > 1
+            expected = serial.detect_ui_elements(image)
+            first = parallel.detect_ui_elements(image)
+            assert same_elements(first, expected), (width, height, scene.__name__)
+            second = parallel.detect_ui_elements(image)
+            assert [e.bbox for e in first] == [e.bbox for e in second]
+            logger.info(f"{scene.__name__} {width}x{height}: {len(expected)} elements from "
+                        f"{len(parallel.tile_grid(width, height))} tiles")
+
+
+if __name__ == '__main__':
+    test_tile_grid()
+    test_stitch_boxes()
+    test_parallel_matches_serial()
+    logger.info("All tiling tests passed")
@@ -0,0 +1,238 @@
+"""
+Test the UIA snapshot service against recorded trees: lazy expansion,
+caching, versioning and structural diffs
+
+Runs without Windows. Pass recorded get_window_uia_structure outputs to also
+check diffs on real trees:
+
+    python test_uia_snapshot.py --tree cursor_before.json cursor_after.json
+"""
+
+import argparse
+import copy
+import json
+import logging
+import random
+
+import local_server  # noqa: F401  (puts src/core on sys.path)
+from uia_snapshot import (UIASnapshotService, RecordedWalker, apply_diff, diff_trees,
+                          diff_size, get_subtree, CHILDREN, CHILD_COUNT)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('TestUIASnapshot')
+
+HWND = 1001
+
+
+def recorded_tree(depth=4, fanout=4, seed=7):
+    """A tree in get_window_uia_structure's layout (positional child keys)"""
+    rng = random.Random(seed)
+
+    def node(level, index):
+        control_type = rng.choice(['Pane', 'Group', 'Button', 'Edit', 'Text', 'Document'])
+        result = {
+            'ControlType': control_type,
+            'Name': f"{control_type} {level}.{index}" if rng.random() < 0.7 else '',
+            'AutomationId': f"id_{level}_{index}" if rng.random() < 0.3 else '',
+            'ClassName': 'Chrome_RenderWidgetHostHWND',
+            'IsEnabled': True,
+            'IsVisible': True,
+            'Rectangle': f"(L{index * 10}, T{level * 10}, R{index * 10 + 50}, B{level * 10 + 20})",
+            'Children': {}
+        }
+        if level < depth:
+            for i in range(fanout):
+                child = node(level + 1, index * fanout + i)
+                result['Children'][f"{child['ControlType']}_{i}"] = child
+        return result
+
+    return node(0, 0)
+
+
+class CountingWalker(RecordedWalker):
+    def __init__(self, trees):
+        super().__init__(trees)
+        self.described = 0
+
+    def describe(self, element):
+        self.described += 1
+        return super().describe(element)
+
+
+def _first_child_key(tree):
+    return next(iter(tree[CHILDREN]))
+
+
+def test_lazy_expansion():
+    walker = CountingWalker({HWND: recorded_tree()})
+    service = UIASnapshotService(walker)
+
+    top = service.snapshot(HWND, depth=1)
+    tree = top['tree']
+    assert top['version'] == 1 and top['nodes_read'] == 5
+    child = tree[CHILDREN][_first_child_key(tree)]
+    assert CHILDREN not in child and child[CHILD_COUNT] == 4
+
+    # Expand one subtree two levels down
+    key = _first_child_key(tree)
+    sub = service.snapshot(HWND, path=[key], depth=2)
+    assert sub['version'] == 2
+    assert all(CHILDREN in c for c in sub['tree'][CHILDREN].values())
+
+    # Re-reading the root shallowly keeps what was already expanded
+    again = service.snapshot(HWND, depth=1)
+    assert again['version'] == 2
+    assert CHILDREN in again['tree'][CHILDREN][key]
+
+
+def test_cache_and_max_age():
+    walker = CountingWalker({HWND: recorded_tree()})
+    service = UIASnapshotService(walker)
+
+    service.snapshot(HWND, depth=2)
+    described = walker.described
+    cached = service.snapshot(HWND, depth=2, max_age=60)
+    assert walker.described == described and cached['nodes_read'] == 0
+
+    # Deeper than what is cached has to walk
+    service.snapshot(HWND, depth=3, max_age=60)
+    assert walker.described > described
+
+
+def test_max_nodes():
+    service = UIASnapshotService(RecordedWalker({HWND: recorded_tree()}), max_nodes=10)
+    result = service.snapshot(HWND, depth=4)
+    assert result['nodes_read'] <= 10
+
+
+def test_diff_since_version():
+    recorded = recorded_tree()
+    walker = RecordedWalker({HWND: recorded})
+    service = UIASnapshotService(walker)
+    first = service.snapshot(HWND, depth=4)
+
+    unchanged = service.snapshot(HWND, depth=4, since=first['version'])
+    assert unchanged['version'] == first['version'] and diff_size(unchanged['diff']) == 0
+
+    changed = copy.deepcopy(recorded)
+    keys = list(changed[CHILDREN])
+    # Keys come from AutomationId or Name, so a state change keeps the node's path
+    changed[CHILDREN][keys[0]]['IsEnabled'] = False
+    del changed[CHILDREN][keys[1]]
+    changed[CHILDREN]['Button_new'] = dict(recorded[CHILDREN][keys[2]], Name='New button',
+                                           AutomationId='', Children={})
+    walker.trees[HWND] = changed
+
+    second = service.snapshot(HWND, depth=4, since=first['version'])
+    diff = second['diff']
+    assert second['version'] == first['version'] + 1 and second['base_version'] == first['version']
+    assert len(diff['removed']) == 1 and len(diff['added']) == 1
+    assert [c['set'] for c in diff['changed']] == [{'IsEnabled': False}]
+
+    full = service.snapshot(HWND, depth=4)['tree']
+    assert apply_diff(first['tree'], diff) == full
+    # The diff is a small fraction of the full tree
+    assert len(json.dumps(diff)) < len(json.dumps(full)) / 3
+
+
+def test_stable_keys_on_insert():
+    recorded = recorded_tree(depth=1, fanout=6)
+    walker = RecordedWalker({HWND: recorded})
+    service = UIASnapshotService(walker)
+    first = service.snapshot(HWND, depth=1)
+
+    inserted = copy.deepcopy(recorded)
+    children = list(inserted[CHILDREN].items())
+    inserted[CHILDREN] = dict([('Text_0', {'ControlType': 'Text', 'Name': 'Banner', 'Children': {}})] + children)
+    walker.trees[HWND] = inserted
+
+    diff = service.snapshot(HWND, depth=1, since=first['version'])['diff']
+    assert len(diff['added']) == 1 and not diff['removed']
+
+
+def test_history_eviction():
+    recorded = recorded_tree(depth=2)
+    walker = RecordedWalker({HWND: recorded})
+    service = UIASnapshotService(walker, history=2)
+    first = service.snapshot(HWND, depth=2)
+    for i in range(3):
+        walker.trees[HWND] = dict(recorded, Name=f'title {i}')
+        service.snapshot(HWND, depth=2)
+
+    assert service.versions(HWND) == [3, 4]
+    stale = service.snapshot(HWND, depth=2, since=first['version'])
+    assert 'tree' in stale and 'diff' not in stale
+
+    service.invalidate(HWND)
+    assert service.versions(HWND) == []
+
+
+def test_apply_diff_random_mutations():
+    rng = random.Random(3)
+    service = UIASnapshotService(RecordedWalker({}))
+
+    for seed in range(20):
+        old = service._walk(recorded_tree(depth=3, fanout=3, seed=seed), 3, [10**6])
+        new = copy.deepcopy(old)
+        nodes = []
+
+        def collect(node, path):
+            nodes.append((node, path))
+            for key, child in node.get(CHILDREN, {}).items():
+                collect(child, path + [key])
+        collect(new, [])
+
+        for node, path in rng.sample(nodes, 5):
+            action = rng.choice(['rename', 'remove', 'add', 'collapse'])
+            if action == 'rename':
+                node['Name'] = f'changed {seed}'
+            elif action == 'remove' and path:
+                parent = get_subtree(new, path[:-1])
+                if parent is not None:
+                    parent[CHILDREN].pop(path[-1], None)
+            elif action == 'add' and CHILDREN in node:
+                node[CHILDREN][f'Button_added_{seed}'] = {'ControlType': 'Button', 'Name': 'added'}
+            elif action == 'collapse':
+                node.pop(CHILDREN, None)
+
+        assert apply_diff(old, diff_trees(old, new)) == new, f"seed {seed}"
+
+
+def check_recorded(paths):
+    """Diff consecutive recorded trees and check the diff reproduces them"""
+    trees = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        trees.append(data.get('data', data) if isinstance(data, dict) else data)
+
+    walker = RecordedWalker({HWND: trees[0]})
+    service = UIASnapshotService(walker, max_nodes=10**6)
+    previous = service.snapshot(HWND, depth=64)
+    logger.info(f"{paths[0]}: {previous['nodes_read']} nodes, {len(json.dumps(previous['tree']))} bytes")
+
+    for path, tree in zip(paths[1:], trees[1:]):
+        walker.trees[HWND] = tree
+        result = service.snapshot(HWND, depth=64, since=previous['version'])
+        full = service.snapshot(HWND, depth=64)['tree']
+        assert apply_diff(previous['tree'], result['diff']) == full
+        logger.info(f"{path}: diff has {diff_size(result['diff'])} entries, "
+                    f"{len(json.dumps(result['diff']))} bytes vs {len(json.dumps(full))} full")
+        previous = dict(result, tree=full)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Test UIA snapshots')
+    parser.add_argument('--tree', nargs='+', help='Recorded UIA trees (JSON), oldest first')
+    args = parser.parse_args()
+
+    test_lazy_expansion()
+    test_cache_and_max_age()
+    test_max_nodes()
+    test_diff_since_version()
+    test_stable_keys_on_insert()
+    test_history_eviction()
+    test_apply_diff_random_mutations()
+    if args.tree:
+        check_recorded(args.tree)
+    logger.info("All UIA snapshot tests passed")
@@ -0,0 +1,112 @@
+"""
+Test the window analyzer end to end with a stubbed capture: detection,
+result caching, point and region queries and incremental mode
+"""
+
+import asyncio
+import logging
+import os
+import sys
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from vision.analysis_cache import AnalysisCache  # noqa: E402
+from vision.analyzer import VisionWindowAnalyzer, WindowAnalysisResult  # noqa: E402
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('TestVisionAnalyzer')
+
+HWND = 0x1234
+
+
+def dialog(text='Save changes?', width=640, height=360):
+    image = np.full((height, width, 3), 240, dtype=np.uint8)
+    cv2.rectangle(image, (20, 20), (width - 20, height - 20), (90, 90, 90), 2)
+    cv2.putText(image, text, (60, 120), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 0, 0), 2)
+    cv2.rectangle(image, (width - 260, height - 90), (width - 150, height - 50), (200, 140, 60), -1)
+    cv2.rectangle(image, (width - 130, height - 90), (width - 40, height - 50), (200, 140, 60), -1)
+    return image
+
+
+class FakeController:
+    """Serves frames from memory instead of capturing a real window"""
+
+    def __init__(self, *frames):
+        self.frames = list(frames)
+        self.captures = 0
+
+    async def screenshot_to_memory(self, hwnd):
+        assert hwnd == HWND
+        frame = self.frames[min(self.captures, len(self.frames) - 1)]
+        self.captures += 1
+        return frame.copy()
+
+
+async def _analyze_window():
+    controller = FakeController(dialog())
+    analyzer = VisionWindowAnalyzer(controller, cache=AnalysisCache())
+
+    result = await analyzer.analyze_window(HWND)
+    assert isinstance(result, WindowAnalysisResult) and result.window_hwnd == HWND
+    assert result.elements and result.content_summary['total_elements'] == len(result.elements)
+    assert all(set(e) >= {'type', 'bbox', 'center', 'confidence', 'clickable'} for e in result.elements)
+
+    # The same frame again is served from the cache, as independent copies
+    result.elements[0]['bbox'][0] = -1
+    again = await analyzer.analyze_window(HWND)
+    assert analyzer.cache_stats()['hits'] == 1 and controller.captures == 2
+    assert again.elements[0]['bbox'][0] != -1
+
+    # Point and region queries over the same detections
+    inner = await analyzer.element_at(HWND, 500, 290)
+    assert inner is not None
+    x1, y1, x2, y2 = inner['bbox']
+    assert x1 <= 500 <= x2 and y1 <= 290 <= y2
+    region = (0, 240, 640, 360)
+    for element in await analyzer.find_clickable_elements(HWND, region=region):
+        assert element['bbox'][1] >= region[1]
+
+
+async def _no_capture():
+    analyzer = VisionWindowAnalyzer(None, cache=AnalysisCache())
+    assert await analyzer.analyze_window(HWND) is None
+    assert await analyzer.find_clickable_elements(HWND) == []
+
+
+async def _incremental():
+    controller = FakeController(dialog(), dialog(), dialog('Discard changes?'))
+    analyzer = VisionWindowAnalyzer(controller, cache=AnalysisCache())
+
+    first = await analyzer.analyze_window(HWND, incremental=True)
+    assert first.elements and first.changes is not None
+
+    # Editing a result must not edit the state the next frame is diffed against
+    first.elements[0]['bbox'][0] = -1
+    first.elements.clear()
+    unchanged = await analyzer.analyze_window(HWND, incremental=True)
+    assert not unchanged.changes['added'] and not unchanged.changes['removed']
+    assert unchanged.elements and all(e['bbox'][0] >= 0 for e in unchanged.elements)
+    edited = await analyzer.analyze_window(HWND, incremental=True)
+    assert edited.changes['regions']
+
+
+def test_analyze_window():
+    asyncio.run(_analyze_window())
+
+
+def test_no_capture():
+    asyncio.run(_no_capture())
+
+
+def test_incremental():
+    asyncio.run(_incremental())
+
+
+if __name__ == '__main__':
+    test_analyze_window()
+    test_no_capture()
+    test_incremental()
+    logger.info("All vision analyzer tests passed")
@@ -0,0 +1,108 @@
+"""
+Test the vision benchmark suite: synthetic scenes and their ground truth,
+scoring, per-stage timings and the baseline regression gate
+"""
+
+import copy
+import logging
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from vision.scenes import GroundTruth, form_scene, generate_scenes, match, score  # noqa: E402
+from vision.vision_model import UIVisionModel, UIElement  # noqa: E402
+from benchmark_vision_suite import compare, run_suite  # noqa: E402
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('TestVisionSuite')
+
+
+def test_scenes():
+    scenes = list(generate_scenes(['forms', 'ide'], ['720p', '4k'], seed=3))
+    assert [s.name for s in scenes] == ['forms@720p', 'forms@4k', 'ide@720p', 'ide@4k']
+    assert scenes[1].image.shape == (2160, 3840, 3) and scenes[1].size == '3840x2160'
+
+    # Same seed, same pixels; layouts keep their elements at every resolution
+    again = list(generate_scenes(['forms'], ['720p'], seed=3))[0]
+    assert (again.image == scenes[0].image).all()
+    assert len(scenes[0].truth) == len(scenes[1].truth)
+
+    for scene in scenes:
+        height, width = scene.image.shape[:2]
+        for truth in scene.truth:
+            x1, y1, x2, y2 = truth.bbox
+            assert 0 <= x1 < x2 <= width and 0 <= y1 < y2 <= height, truth
+            assert truth.level in (0, 1)
+            # Every element was drawn: it stands out from what surrounds it
+            around = scene.image[max(0, y1 - 1):y2 + 1, max(0, x1 - 1):x2 + 1]
+            assert np.ptp(around) > 0, truth
+
+
+def test_match_and_score():
+    truth = [GroundTruth('button', (0, 0, 100, 40), 0), GroundTruth('input', (0, 60, 200, 90), 1)]
+    # One-to-one: the better overlap wins, the duplicate is a false positive
+    assert match([(0, 0, 98, 40), (0, 0, 100, 40), (300, 300, 320, 320)], [t.bbox for t in truth]) == [(1, 0)]
+
+    found = [UIElement('button', (0, 0, 100, 40), 0.7), {'type': 'button', 'bbox': (0, 61, 200, 90)},
+             UIElement('text', (500, 500, 540, 520), 0.5)]
+    result = score(found, truth)
+    assert result['matched'] == 2 and result['detected'] == 3 and result['truth'] == 2
+    assert abs(result['precision'] - 2 / 3) < 1e-9
+    assert result['recall'] == 1.0 and result['recall_top'] == 1.0
+    assert result['type_accuracy'] == 0.5
+    assert score([], truth)['recall'] == 0.0
+
+
+def test_stage_timings():
+    scene = form_scene(1280, 720)
+    model = UIVisionModel()
+    model.detect_ui_elements(scene.image)
+    assert list(model.last_timings) == ['grayscale', 'edges', 'contours', 'merge', 'classify']
+    model.extract_ui_structure(scene.image)
+    assert list(model.last_timings)[-1] == 'hierarchy'
+    assert all(seconds >= 0 for seconds in model.last_timings.values())
+
+    pyramid = UIVisionModel(pyramid_scales=(0.5,), pyramid_above=0)
+    pyramid.detect_ui_elements(scene.image)
+    assert list(pyramid.last_timings)[:3] == ['grayscale', 'pyramid', 'edges']
+
+    with UIVisionModel(workers=2) as parallel:
+        parallel.detect_ui_elements(scene.image)
+        assert 'detect' in parallel.last_timings
+    assert parallel._executor is None
+
+    stats = model.benchmark(scene.image, iterations=2)
+    assert stats['avg_contours_time'] > 0
+
+
+def test_baseline_gate():
+    report = run_suite(['dashboard'], ['720p'], repeat=1)
+    row = report['scenes']['dashboard@720p']
+    assert set(row['stages']) >= {'grayscale', 'edges', 'contours', 'merge', 'classify', 'hierarchy'}
+    assert row['peak_memory'] > 0 and row['truth'] > 0
+    assert compare(report, report) == []
+
+    slower = copy.deepcopy(report)
+    slower['scenes']['dashboard@720p']['time'] = row['time'] * 2 + 0.01
+    slower['scenes']['dashboard@720p']['peak_memory'] = row['peak_memory'] * 2
+    slower['scenes']['dashboard@720p']['recall'] = row['recall'] - 0.1
+    # Time is too noisy to gate unless asked for
+    assert len(compare(slower, report)) == 2
+    assert 'recall' in compare(slower, report)[0]
+    assert len(compare(slower, report, check_time=True)) == 3
+
+    # Memory from another machine is not comparable; accuracy is
+    slower['environment'] = dict(report['environment'], cpus=-1)
+    assert len(compare(slower, report)) == 1
+    assert len(compare(slower, report, check_time=True, check_memory=True)) == 3
+
+
+if __name__ == '__main__':
+    test_scenes()
+    test_match_and_score()
+    test_stage_timings()
+    test_baseline_gate()
+    logger.info("All vision suite tests passed")
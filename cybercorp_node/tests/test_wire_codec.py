@@ -0,0 +1,108 @@
+"""
+Test wire codec negotiation, selective compression and legacy compatibility
+"""
+
+import asyncio
+import json
+import logging
+
+import websockets
+
+from local_server import local_server, connect_client, echo_node
+from wire_codec import (
+    WireCodec, LEGACY_CODEC, FLAG_DEFLATE, available_codecs, codec_from_ack,
+    decode_message, make_offer, negotiate
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('TestWireCodec')
+
+SAMPLE = {
+    'type': 'command_result',
+    'command_id': 'cmd_1',
+    'result': {'success': True, 'data': {'windows': [
+        {'hwnd': i, 'title': f'Window {i} - Visual Studio Code', 'class': 'Chrome_WidgetWin_1'}
+        for i in range(200)
+    ]}}
+}
+
+
+def test_codecs_roundtrip():
+    for name in available_codecs():
+        for compression in (None, 'deflate'):
+            codec = WireCodec(name, compression, threshold=1024)
+            encoded = codec.encode(SAMPLE)
+            assert decode_message(encoded) == SAMPLE, (name, compression)
+            if compression:
+                assert encoded[0] & FLAG_DEFLATE
+
+    assert isinstance(LEGACY_CODEC.encode(SAMPLE), str)
+
+
+def test_small_messages_stay_uncompressed():
+    codec = WireCodec('json', 'deflate', threshold=1024)
+    heartbeat = codec.encode({'type': 'heartbeat', 'timestamp': 1.0})
+    assert not heartbeat[0] & FLAG_DEFLATE
+    assert decode_message(heartbeat)['type'] == 'heartbeat'
+
+
+def test_negotiation():
+    assert negotiate(None) is LEGACY_CODEC
+
+    codec = negotiate({'codecs': ['nonexistent', 'json'], 'compression': ['deflate']})
+    assert codec.name == 'json' and codec.compression == 'deflate'
+
+    # Server-side restrictions win over the client's preference
+    codec = negotiate(make_offer(), allowed=['json'], allow_compression=False)
+    assert codec.legacy
+
+    codec = codec_from_ack({'codec': 'bogus'})
+    assert codec is LEGACY_CODEC
+
+
+async def _mixed_clients():
+    async with local_server() as (server, url):
+        # Node negotiates the best codec with compression
+        node_ws = await websockets.connect(url)
+        await node_ws.recv()  # welcome
+        await node_ws.send(json.dumps({
+            'type': 'register', 'user_session': 'node', 'wire': make_offer(threshold=256)
+        }))
+        ack = decode_message(await node_ws.recv())
+        assert ack['type'] == 'wire_ack' and ack['codec'] == available_codecs()[0]
+        node_codec = codec_from_ack(ack)
+        node_id = next(iter(server.clients))
+
+        # Old controller never offers and must keep receiving JSON text
+        ctrl, _ = await connect_client(url, 'ctrl', {'management': True})
+        await ctrl.send(json.dumps({
+            'type': 'forward_command', 'target_client': node_id,
+            'command': {'type': 'command', 'command': 'get_windows'}
+        }))
+        command = decode_message(await node_ws.recv())
+        assert command['command'] == 'get_windows'
+
+        reply = dict(SAMPLE, command_id=command['command_id'])
+        encoded = node_codec.encode(reply)
+        assert isinstance(encoded, bytes) and encoded[0] & FLAG_DEFLATE
+        await node_ws.send(encoded)
+
+        ack = json.loads(await ctrl.recv())
+        result = await asyncio.wait_for(ctrl.recv(), timeout=5)
+        assert isinstance(result, str)
+        assert json.loads(result)['result'] == SAMPLE['result']
+        logger.info(f"Node payload {len(encoded)} bytes vs {len(result)} bytes legacy JSON")
+
+        for ws in (node_ws, ctrl):
+            await ws.close()
+
+
+def test_mixed_clients():
+    asyncio.run(_mixed_clients())
+
+
+if __name__ == '__main__':
+    test_codecs_roundtrip()
+    test_small_messages_stay_uncompressed()
+    test_negotiation()
+    test_mixed_clients()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""认证热路径基准测试
+
+Two measurements against an AuthManager backed by an in-memory user store
+that takes --db-latency seconds per lookup, like a database round trip:
+
+    throughput  authenticated requests per second (get_current_user) from
+                --clients concurrent clients, with the token and user
+                caches disabled and enabled
+    login burst --logins concurrent logins while clients keep making
+                requests, with bcrypt run inline on the event loop (as
+                before) and in the hashing pool. Reports the event loop's
+                lag (how late a 5 ms heartbeat wakes), how long the burst
+                took and the request rate during it.
+
+Passwords are hashed with --rounds bcrypt rounds (the library default is 12).
+
+Usage:
+    python benchmark_auth.py [--clients 50] [--logins 20] [--rounds 10]
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+import bcrypt
+
+from src.auth import AuthManager
+from src.models.auth import User
+
+
+class MemoryUsers:
+    """User store whose lookups take latency seconds."""
+
+    def __init__(self, count, password, rounds, latency):
+        self.latency = latency
+        hashed = bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds)).decode()
+        self.users = {f"user{n}@example.com": User(id=str(n), username=f"user{n}@example.com")
+                      for n in range(count)}
+        self.passwords = {user.id: hashed for user in self.users.values()}
+
+    async def get_user_by_username(self, username):
+        await asyncio.sleep(self.latency)
+        return self.users.get(username)
+
+    async def get_user_password(self, user_id):
+        await asyncio.sleep(self.latency)
+        return self.passwords.get(user_id)
+
+
+class InlineHashing(AuthManager):
+    """bcrypt on the event loop, as before the hashing pool."""
+
+    async def verify_password_async(self, plain_password, hashed_password):
+        return self.verify_password(plain_password, hashed_password)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+async def request_load(auth, tokens, clients, stop):
+    """Authenticated requests from clients concurrent clients until stop is set; returns the count."""
+    done = 0
+
+    async def client(n):
+        nonlocal done
+        while not stop.is_set():
+            await auth.get_current_user(tokens[(n + done) % len(tokens)])
+            done += 1
+            await asyncio.sleep(0)
+
+    await asyncio.gather(*(client(n) for n in range(clients)))
+    return done
+
+
+async def throughput(auth, tokens, clients, seconds):
+    stop = asyncio.Event()
+    load = asyncio.create_task(request_load(auth, tokens, clients, stop))
+    await asyncio.sleep(seconds)
+    stop.set()
+    return round(await load / seconds)
+
+
+async def login_burst(auth, store, tokens, args):
+    gaps = []
+    stop = asyncio.Event()
+
+    async def heartbeat():
+        last = time.perf_counter()
+        while not stop.is_set():
+            await asyncio.sleep(0.005)
+            now = time.perf_counter()
+            gaps.append(now - last - 0.005)
+            last = now
+
+    ticker = asyncio.create_task(heartbeat())
+    load = asyncio.create_task(request_load(auth, tokens, args.clients, stop))
+    await asyncio.sleep(0.2)  # Warm the caches
+    served_before = auth.cache_stats()["tokens"]["hits"] + auth.cache_stats()["tokens"]["misses"]
+    start = time.perf_counter()
+    users = list(store.users)
+    results = await asyncio.gather(*(auth.authenticate_user(users[n % len(users)], args.password)
+                                     for n in range(args.logins)))
+    elapsed = time.perf_counter() - start
+    served = auth.cache_stats()["tokens"]["hits"] + auth.cache_stats()["tokens"]["misses"] - served_before
+    stop.set()
+    await asyncio.gather(ticker, load)
+    assert all(results), "login failed"
+    return {
+        "burst_seconds": round(elapsed, 2),
+        "requests_per_second_during_burst": round(served / elapsed),
+        "loop_lag_p50_ms": round(percentile(gaps, 0.5) * 1000, 1),
+        "loop_lag_p99_ms": round(percentile(gaps, 0.99) * 1000, 1),
+        "loop_lag_max_ms": round(max(gaps) * 1000, 1),
+    }
+
+
+async def run(args):
+    store = MemoryUsers(args.users, args.password, args.rounds, args.db_latency)
+
+    def manager(cls=AuthManager, cache_ttl=60):
+        return cls(database=store, cache_ttl=cache_ttl, cache_size=10000, hash_workers=args.hash_workers)
+
+    tokens = [manager().create_access_token({"sub": username}) for username in store.users]
+    report = {
+        "clients": args.clients,
+        "users": args.users,
+        "db_latency_ms": args.db_latency * 1000,
+        "throughput": {
+            "uncached": await throughput(manager(cache_ttl=0), tokens, args.clients, args.seconds),
+            "cached": await throughput(manager(), tokens, args.clients, args.seconds),
+        },
+        "login_burst": {
+            "logins": args.logins,
+            "bcrypt_rounds": args.rounds,
+            "inline": await login_burst(manager(InlineHashing), store, tokens, args),
+            "pool": await login_burst(manager(), store, tokens, args),
+        },
+    }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--db-latency", type=float, default=0.002, help="Seconds per user lookup")
+    parser.add_argument("--logins", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=10, help="bcrypt cost factor")
+    parser.add_argument("--hash-workers", type=int, default=2)
+    parser.add_argument("--password", default="benchmark-password")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
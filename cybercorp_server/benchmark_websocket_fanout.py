@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""WebSocket 扇出负载测试
+
+Connects CLIENTS local WebSocket clients to a ConnectionManager, a fraction
+of them artificially slow (every send to them takes --slow-delay), then
+broadcasts timestamped messages and reports the latency from broadcast to
+receipt: p50/p95/p99 for fast and slow clients, the time broadcast() takes
+to return, and what the overflow policy dropped.
+
+--sequential broadcasts the way the manager used to, awaiting send_text on
+each connection in turn, for comparison.
+
+The server side is a websockets server whose connections are adapted to the
+Starlette WebSocket methods the manager uses, so no ASGI server is needed.
+Slow links are emulated in that adapter rather than by clients reading
+slowly, since loopback sockets buffer megabytes before a send has to wait.
+Clients and server share one process and event loop; latencies include the
+clients' own receive work.
+
+Usage:
+    python benchmark_websocket_fanout.py [--clients 1000] [--slow 0.1] [--messages 80]
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+
+import websockets
+
+from src.config import OverflowPolicy
+from src.websocket import ConnectionManager
+
+
+class ServerSocket:
+    """A websockets server connection with the Starlette WebSocket methods the manager calls.
+
+    delay emulates a slow link: every send takes at least that long.
+    """
+
+    def __init__(self, connection, delay=0.0):
+        self.connection = connection
+        self.delay = delay
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        await self.connection.send(text)
+
+    async def close(self, code=1000, reason=""):
+        await self.connection.close(code, reason)
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summary(values):
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+        "max_ms": round(max(values, default=0.0) * 1000, 2),
+    }
+
+
+async def client(uri, latencies, ready):
+    """Receive until the end message, recording each message's latency."""
+    async with websockets.connect(uri, open_timeout=60, ping_interval=None) as connection:
+        ready.release()
+        try:
+            while True:
+                message = json.loads(await connection.recv())
+                if message["type"] == "end":
+                    return
+                latencies.append(time.perf_counter() - message["sent"])
+        except websockets.ConnectionClosed:
+            return
+
+
+async def run(args):
+    manager = ConnectionManager(max_queue=args.queue, overflow=OverflowPolicy(args.overflow))
+
+    async def handler(connection):
+        websocket = ServerSocket(connection, args.slow_delay if connection.path == "/slow" else 0.0)
+        await manager.connect(websocket)
+        try:
+            await connection.wait_closed()
+        finally:
+            manager.disconnect(websocket)
+
+    async def sequential(message):
+        text = json.dumps(message)
+        for websocket in manager.active_connections:
+            try:
+                await websocket.send_text(text)
+            except Exception:
+                pass
+
+    server = await websockets.serve(handler, "127.0.0.1", 0, ping_interval=None)
+    uri = f"ws://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+
+    slow_count = int(args.clients * args.slow)
+    fast_latencies, slow_latencies = [], []
+    ready = asyncio.Semaphore(0)
+    tasks = []
+    for n in range(args.clients):
+        slow = n < slow_count
+        tasks.append(asyncio.create_task(client(uri + ("/slow" if slow else "/"),
+                                                slow_latencies if slow else fast_latencies, ready)))
+        if n % 100 == 99:
+            await asyncio.sleep(0)
+    for _ in range(args.clients):
+        await ready.acquire()
+    while len(manager.channels) < args.clients:
+        await asyncio.sleep(0.01)
+
+    padding = "x" * args.size
+    broadcast_times = []
+    dropped = 0
+    start = time.perf_counter()
+    for seq in range(args.messages):
+        message = {"type": "tick", "seq": seq, "sent": time.perf_counter(), "data": padding}
+        began = time.perf_counter()
+        if args.sequential:
+            await sequential(message)
+        else:
+            dropped += (await manager.broadcast(message))["dropped"]
+        broadcast_times.append(time.perf_counter() - began)
+        await asyncio.sleep(max(0.0, start + (seq + 1) * args.period - time.perf_counter()))
+
+    # Let fast clients drain, then end everyone (slow ones may still be behind)
+    await asyncio.sleep(args.period * 5)
+    clients = await manager.get_clients() if not args.sequential else []
+    await manager.broadcast({"type": "end"}) if not args.sequential else await sequential({"type": "end"})
+    await asyncio.wait(tasks, timeout=30)
+    for task in tasks:
+        task.cancel()
+    server.close()
+    await server.wait_closed()
+
+    return {
+        "mode": "sequential" if args.sequential else f"queued/{args.overflow}",
+        "clients": args.clients,
+        "slow_clients": slow_count,
+        "messages": args.messages,
+        "message_bytes": len(json.dumps({"type": "tick", "seq": 0, "sent": 0.0, "data": padding})),
+        "broadcast_call": summary(broadcast_times),
+        "fast_latency": summary(fast_latencies),
+        "slow_latency": summary(slow_latencies),
+        "fast_delivered": len(fast_latencies) / max(1, (args.clients - slow_count) * args.messages),
+        "dropped": dropped,
+        "max_queued": max((c["max_queued"] for c in clients), default=0),
+        "max_lag_ms": max((c["max_lag_ms"] for c in clients), default=0.0),
+        "mean_lag_ms": round(statistics.mean(c["avg_lag_ms"] for c in clients), 2) if clients else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--slow", type=float, default=0.1, help="Fraction of slow clients")
+    parser.add_argument("--slow-delay", type=float, default=0.5, help="Seconds each send to a slow client takes")
+    parser.add_argument("--messages", type=int, default=80)
+    parser.add_argument("--period", type=float, default=0.25, help="Seconds between broadcasts")
+    parser.add_argument("--size", type=int, default=4096, help="Payload bytes per message")
+    parser.add_argument("--queue", type=int, default=16, help="Send queue length per connection")
+    parser.add_argument("--overflow", default=OverflowPolicy.DROP_OLDEST.value,
+                        choices=[policy.value for policy in OverflowPolicy])
+    parser.add_argument("--sequential", action="store_true", help="Await each send in turn (old behaviour)")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,35 @@
-"""Authentication and authorization module for CyberCorp Server."""
+"""Authentication and authorization module for CyberCorp Server.
 
+Every authenticated request and WebSocket connect goes through
+get_current_user. Verified token claims and user records are kept in
+bounded TTL caches, so a busy client does not cost a JWT decode and a
+database read per request. Logout revokes a token, and a password change
+revokes every token issued before it; deactivation, deletion and other
+user updates drop the cached record, so the next request reloads it.
+
+Revocations are kept in memory, per process: with several server workers
+a logout or password change only takes effect in the worker that handled
+it, and a restart forgets them. Revoked tokens then stay usable until
+they expire (security.access_token_expire_minutes).
+
+bcrypt takes hundreds of milliseconds per hash by design. It runs in a
+small dedicated thread pool (bcrypt releases the GIL), so a login burst
+queues there instead of stalling the event loop.
+"""
+
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import jwt
 import bcrypt
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, Union
+from typing import Optional, Dict, Any, Callable, Hashable, Tuple, Union
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
-from .models.auth import User, UserRole, PermissionScope
+from .models.auth import User, UserRole, UserUpdate, PermissionScope, TokenResponse
 from .database import database_manager
 from .config import get_config
 from .logging_config import get_logger
@@ -17,22 +39,95 @@ logger = get_logger(__name__)
 # Security scheme
 security = HTTPBearer()
 
+
+class TTLCache:
+    """Bounded cache whose entries expire; the least recently used entry is evicted first."""
+    
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Cached value, or None if missing or expired."""
+        entry = self._data.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            del self._data[key]
+        self.misses += 1
+        return None
+    
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Cache value for ttl seconds (at most the cache's ttl)."""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+    
+    def pop(self, key: Hashable):
+        """Drop an entry."""
+        self._data.pop(key, None)
+    
+    def clear(self):
+        """Drop every entry."""
+        self._data.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Size and hit counts."""
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
 class AuthManager:
-    """Authentication and authorization manager."""
+    """Authentication and authorization manager.
+    
+    Args:
+        database: User store; defaults to the global database manager
+        cache_ttl: Seconds verified tokens and users stay cached (0 disables)
+        cache_size: Tokens and users cached at most, each
+        hash_workers: Threads hashing and verifying passwords
+    
+    Cache and pool settings default to the auth config.
+    """
     
-    def __init__(self):
+    def __init__(self, database=None, cache_ttl: Optional[float] = None, cache_size: Optional[int] = None,
+                 hash_workers: Optional[int] = None):
         """Initialize auth manager."""
         self.config = get_config()
+        self.database = database or database_manager
         self.secret_key = self.config.security.secret_key
         self.algorithm = self.config.security.algorithm
         self.access_token_expire_minutes = self.config.security.access_token_expire_minutes
         
+        settings = self.config.security
+        cache_ttl = settings.token_cache_ttl_seconds if cache_ttl is None else cache_ttl
+        cache_size = settings.token_cache_size if cache_size is None else cache_size
+        self._claims = TTLCache(cache_size, cache_ttl)   # token -> verified payload
+        self._users = TTLCache(cache_size, cache_ttl)    # username -> User
+        self._user_generation = 0                        # Bumped whenever cached users go stale
+        self._revoked: Dict[str, float] = {}             # Logged-out token -> its expiry (epoch)
+        self._valid_after: Dict[str, float] = {}         # Username -> tokens issued earlier are revoked
+        self._hash_pool = ThreadPoolExecutor(
+            max_workers=max(1, settings.password_hash_workers if hash_workers is None else hash_workers),
+            thread_name_prefix="password-hash"
+        )
+        
     async def initialize(self):
         """Initialize authentication system."""
         logger.info("Initializing authentication system...")
         
         # Create default admin user if no users exist
-        users = await database_manager.get_users()
+        users = await self.database.get_users()
         if not users:
             await self.create_default_admin()
     
@@ -40,29 +135,19 @@ class AuthManager:
         """Create default admin user."""
         logger.info("Creating default admin user...")
         
+        # The admin role has every permission
         admin_user = User(
-            username="admin",
-            email="admin@cybercorp.local",
+            id=uuid.uuid4().hex,
+            username="admin@cybercorp.com",
             role=UserRole.ADMIN,
-            is_active=True,
-            permissions=[
-                PermissionScope.SYSTEM_READ,
-                PermissionScope.SYSTEM_WRITE,
-                PermissionScope.WINDOWS_READ,
-                PermissionScope.WINDOWS_WRITE,
-                PermissionScope.PROCESSES_READ,
-                PermissionScope.PROCESSES_WRITE,
-                PermissionScope.CONFIG_READ,
-                PermissionScope.CONFIG_WRITE,
-                PermissionScope.ADMIN,
-            ]
+            is_active=True
         )
         
         # Set default password
-        hashed_password = self.hash_password("admin123")
+        hashed_password = await self.hash_password_async("admin123")
         
-        await database_manager.create_user(admin_user, hashed_password)
-        logger.info("Default admin user created (username: admin, password: admin123)")
+        await self.database.create_user(admin_user, hashed_password)
+        logger.info("Default admin user created (username: admin@cybercorp.com, password: admin123)")
     
     def hash_password(self, password: str) -> str:
         """Hash password using bcrypt."""
@@ -75,45 +160,136 @@ class AuthManager:
             hashed_password.encode('utf-8')
         )
     
+    async def _run_hashing(self, func: Callable, *args):
+        """Run bcrypt work in the password hashing pool, off the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._hash_pool, func, *args)
+    
+    async def hash_password_async(self, password: str) -> str:
+        """Hash password in the password hashing pool."""
+        return await self._run_hashing(self.hash_password, password)
+    
+    async def verify_password_async(self, plain_password: str, hashed_password: str) -> bool:
+        """Verify password in the password hashing pool."""
+        return await self._run_hashing(self.verify_password, plain_password, hashed_password)
+    
     def create_access_token(self, data: Dict[str, Any]) -> str:
         """Create JWT access token."""
         to_encode = data.copy()
         expire = datetime.utcnow() + timedelta(minutes=self.access_token_expire_minutes)
-        to_encode.update({"exp": expire})
+        # Fractional iat, so a password change revokes tokens from the same second
+        to_encode.update({"exp": expire, "iat": time.time()})
         
         encoded_jwt = jwt.encode(to_encode, self.secret_key, algorithm=self.algorithm)
         return encoded_jwt
     
+    def create_refresh_token(self, username: str) -> str:
+        """Create JWT refresh token; it is not accepted as an access token."""
+        expire = datetime.utcnow() + timedelta(days=self.config.security.refresh_token_expire_days)
+        to_encode = {"sub": username, "type": "refresh", "exp": expire, "iat": time.time()}
+        return jwt.encode(to_encode, self.secret_key, algorithm=self.algorithm)
+    
     def decode_token(self, token: str) -> Dict[str, Any]:
-        """Decode JWT token."""
+        """Decode JWT token (verified claims are cached until the token expires)."""
+        payload = self._claims.get(token)
+        if payload is not None:
+            return payload
         try:
             payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
-            return payload
         except jwt.ExpiredSignatureError:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Token has expired"
             )
-        except jwt.JWTError:
+        except jwt.InvalidTokenError:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid token"
             )
+        expires = payload.get("exp")
+        self._claims.set(token, payload, None if expires is None else expires - time.time())
+        return payload
+    
+    def _check_revoked(self, token: str, payload: Dict[str, Any]):
+        """Reject logged-out tokens and tokens issued before a password change."""
+        if token in self._revoked:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token has been revoked"
+            )
+        valid_after = self._valid_after.get(payload.get("sub"))
+        if valid_after is not None and payload.get("iat", 0) < valid_after:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token has been revoked"
+            )
+    
+    async def invalidate_token(self, token: str):
+        """Revoke a token (logout) until it expires."""
+        now = time.time()
+        try:
+            expires = self.decode_token(token).get("exp", now)
+        except HTTPException:
+            return  # Invalid or expired already
+        self._claims.pop(token)
+        self._revoked = {t: e for t, e in self._revoked.items() if e > now}
+        self._revoked[token] = expires
+    
+    def invalidate_user(self, username: str, revoke_tokens: bool = False):
+        """Drop a cached user; with revoke_tokens, reject every token issued until now."""
+        self._users.pop(username)
+        self._user_generation += 1
+        if revoke_tokens:
+            self._valid_after[username] = time.time()
+    
+    async def change_password(self, user: User, new_password: str) -> bool:
+        """Set a user's password and revoke the user's existing tokens; False if the user is gone."""
+        hashed_password = await self.hash_password_async(new_password)
+        if not await self.database.set_user_password(user.id, hashed_password):
+            return False
+        self.invalidate_user(user.username, revoke_tokens=True)
+        return True
+    
+    def _invalidate_users(self):
+        """Drop every cached user record."""
+        self._users.clear()
+        self._user_generation += 1
+    
+    async def update_user(self, user_id: str, user_update: UserUpdate) -> Optional[User]:
+        """Update a user (role, username, deactivation) and drop cached user records."""
+        user = await self.database.update_user(user_id, user_update.dict(exclude_unset=True))
+        # The update may rename the user, so the old username is unknown here
+        self._invalidate_users()
+        return user
+    
+    async def delete_user(self, user_id: str) -> bool:
+        """Delete a user and drop cached user records; False if there is no such user."""
+        deleted = await self.database.delete_user(user_id)
+        self._invalidate_users()
+        return deleted
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Token and user cache statistics."""
+        return {
+            "tokens": self._claims.stats(),
+            "users": self._users.stats(),
+            "revoked_tokens": len(self._revoked),
+        }
     
     async def authenticate_user(self, username: str, password: str) -> Optional[User]:
         """Authenticate user with username and password."""
-        user = await database_manager.get_user_by_username(username)
+        user = await self.database.get_user_by_username(username)
         if not user:
             return None
         
         if not user.is_active:
             return None
         
-        stored_password = await database_manager.get_user_password(user.id)
+        stored_password = await self.database.get_user_password(user.id)
         if not stored_password:
             return None
         
-        if not self.verify_password(password, stored_password):
+        if not await self.verify_password_async(password, stored_password):
             return None
         
         return user
@@ -122,18 +298,50 @@ class AuthManager:
         """Get current user from token."""
         payload = self.decode_token(token)
         username = payload.get("sub")
-        if username is None:
+        if username is None or payload.get("type") == "refresh":
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid token"
             )
+        self._check_revoked(token, payload)
+        return await self._active_user(username)
+    
+    async def refresh_token(self, refresh_token: str) -> TokenResponse:
+        """Issue a new access token for a refresh token.
         
-        user = await database_manager.get_user_by_username(username)
-        if user is None:
+        The refresh token is subject to the same rules as access tokens: a
+        password change revokes it, and the user must still exist and be
+        active. It is returned as-is, not rotated.
+        """
+        payload = self.decode_token(refresh_token)
+        username = payload.get("sub")
+        if username is None or payload.get("type") != "refresh":
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="User not found"
+                detail="Invalid token"
             )
+        self._check_revoked(refresh_token, payload)
+        user = await self._active_user(username)
+        return TokenResponse(
+            access_token=self.create_access_token({"sub": user.username}),
+            refresh_token=refresh_token,
+            expires_in=self.access_token_expire_minutes * 60
+        )
+    
+    async def _active_user(self, username: str) -> User:
+        """Cached user record; 401 if the user is gone or inactive."""
+        user = self._users.get(username)
+        if user is None:
+            generation = self._user_generation
+            user = await self.database.get_user_by_username(username)
+            if user is None:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="User not found"
+                )
+            # Not if the user was invalidated while loading: the record may be stale
+            if generation == self._user_generation:
+                self._users.set(username, user)
         
         if not user.is_active:
             raise HTTPException(
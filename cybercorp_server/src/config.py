@@ -9,6 +9,13 @@ from pydantic import BaseModel, Field, validator
 from enum import Enum
 
 
+class OverflowPolicy(str, Enum):
+    """What a WebSocket connection does when its send queue is full."""
+    DROP_OLDEST = "drop_oldest"
+    COALESCE_LATEST = "coalesce_latest"
+    DISCONNECT = "disconnect"
+
+
 class LogLevel(str, Enum):
     """Log level enumeration."""
     DEBUG = "DEBUG"
@@ -59,6 +66,9 @@ class AuthConfig(BaseModel):
     password_min_length: int = Field(default=8, description="Minimum password length")
     max_login_attempts: int = Field(default=5, description="Maximum login attempts")
     lockout_duration_minutes: int = Field(default=15, description="Account lockout duration")
+    token_cache_ttl_seconds: int = Field(default=60, description="Verified token and user cache lifetime")
+    token_cache_size: int = Field(default=10000, description="Verified tokens and users cached at most")
+    password_hash_workers: int = Field(default=2, description="Threads hashing and verifying passwords")
 
 
 class MonitoringConfig(BaseModel):
@@ -84,6 +94,9 @@ class WebSocketConfig(BaseModel):
     ping_interval: int = Field(default=20, description="Ping interval in seconds")
     ping_timeout: int = Field(default=10, description="Ping timeout in seconds")
     message_queue_size: int = Field(default=1000, description="Message queue size per connection")
+    overflow_policy: OverflowPolicy = Field(
+        default=OverflowPolicy.DROP_OLDEST, description="What to do when a connection's send queue is full"
+    )
 
 
 class LoggingConfig(BaseModel):
@@ -2,10 +2,13 @@
 
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
-from sqlalchemy import text
+from sqlalchemy import JSON, Boolean, Column, DateTime, String, delete, select, text
+from typing import Any, Dict, List, Optional
 import asyncio
 import os
 
+from .models.auth import User
+
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./cybercorp.db")
 
 # Create async engine
@@ -17,12 +20,36 @@ AsyncSessionLocal = sessionmaker(
 # Create declarative base for ORM models
 Base = declarative_base()
 
+
+class UserRecord(Base):
+    """A user account and its password hash."""
+    __tablename__ = "users"
+    
+    id = Column(String, primary_key=True)
+    username = Column(String, unique=True, nullable=False, index=True)
+    role = Column(String, nullable=False)
+    is_active = Column(Boolean, nullable=False, default=True)
+    created_at = Column(DateTime, nullable=False)
+    last_login = Column(DateTime)
+    permissions = Column(JSON, nullable=False, default=list)
+    hashed_password = Column(String, nullable=False)
+    
+    def to_user(self) -> User:
+        return User(id=self.id, username=self.username, role=self.role, is_active=self.is_active,
+                    created_at=self.created_at, last_login=self.last_login,
+                    permissions=self.permissions or [])
+
+
 class DatabaseManager:
     """Database connection and session management."""
     
-    def __init__(self):
-        self._engine = engine
+    def __init__(self, database_engine=None):
+        """Use the given async engine, or the one configured by DATABASE_URL."""
+        self._engine = database_engine or engine
         self._base = Base
+        self._sessions = AsyncSessionLocal if database_engine is None else sessionmaker(
+            database_engine, class_=AsyncSession, expire_on_commit=False
+        )
     
     async def initialize(self):
         """Initialize database with required tables."""
@@ -31,7 +58,7 @@ class DatabaseManager:
     
     async def get_session(self) -> AsyncSession:
         """Async database session generator."""
-        async with AsyncSessionLocal() as session:
+        async with self._sessions() as session:
             try:
                 yield session
             except Exception:
@@ -43,11 +70,78 @@ class DatabaseManager:
     async def health_check(self) -> bool:
         """Check if database connection is alive."""
         try:
-            async with AsyncSessionLocal() as session:
+            async with self._sessions() as session:
                 await session.execute(text("SELECT 1"))
                 return True
         except Exception:
             return False
+    
+    async def close(self):
+        """Close all pooled connections."""
+        await self._engine.dispose()
+    
+    async def get_users(self) -> List[User]:
+        """All users."""
+        async with self._sessions() as session:
+            records = await session.scalars(select(UserRecord).order_by(UserRecord.created_at))
+            return [record.to_user() for record in records]
+    
+    async def get_user(self, user_id: str) -> Optional[User]:
+        """User by ID."""
+        async with self._sessions() as session:
+            record = await session.get(UserRecord, user_id)
+            return record.to_user() if record else None
+    
+    async def get_user_by_username(self, username: str) -> Optional[User]:
+        """User by username."""
+        async with self._sessions() as session:
+            record = await session.scalar(select(UserRecord).where(UserRecord.username == username))
+            return record.to_user() if record else None
+    
+    async def get_user_password(self, user_id: str) -> Optional[str]:
+        """Password hash of a user."""
+        async with self._sessions() as session:
+            return await session.scalar(select(UserRecord.hashed_password).where(UserRecord.id == user_id))
+    
+    async def create_user(self, user: User, hashed_password: str) -> User:
+        """Store a new user with its password hash."""
+        async with self._sessions() as session:
+            session.add(UserRecord(
+                id=user.id, username=user.username, role=user.role.value, is_active=user.is_active,
+                created_at=user.created_at, last_login=user.last_login,
+                permissions=[permission.value for permission in user.permissions],
+                hashed_password=hashed_password
+            ))
+            await session.commit()
+        return user
+    
+    async def set_user_password(self, user_id: str, hashed_password: str) -> bool:
+        """Replace a user's password hash; False if there is no such user."""
+        async with self._sessions() as session:
+            record = await session.get(UserRecord, user_id)
+            if record is None:
+                return False
+            record.hashed_password = hashed_password
+            await session.commit()
+            return True
+    
+    async def update_user(self, user_id: str, changes: Dict[str, Any]) -> Optional[User]:
+        """Apply changes (username, role, is_active, ...) to a user; None if there is no such user."""
+        async with self._sessions() as session:
+            record = await session.get(UserRecord, user_id)
+            if record is None:
+                return None
+            for name, value in changes.items():
+                setattr(record, name, getattr(value, "value", value))
+            await session.commit()
+            return record.to_user()
+    
+    async def delete_user(self, user_id: str) -> bool:
+        """Delete a user; False if there is no such user."""
+        async with self._sessions() as session:
+            result = await session.execute(delete(UserRecord).where(UserRecord.id == user_id))
+            await session.commit()
+            return result.rowcount > 0
 
 # Global database manager instance
 database_manager = DatabaseManager()
\ No newline at end of file
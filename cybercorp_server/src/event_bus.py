@@ -0,0 +1,263 @@
+"""In-process event bus with indexed subscriptions and batched delivery.
+
+Producers publish an Event once; the bus finds the subscriptions it matches
+and queues it for each of them. Matching goes through an index instead of
+evaluating every subscription's filter:
+
+    every subscription is registered under each (type, source, severity)
+    key its filter allows, None standing for "any" in a dimension it does
+    not constrain. An event's candidates are the subscriptions under the
+    eight keys formed from its own values and None, and that result is
+    cached per (type, source, severity) until the subscriptions change.
+
+So matching an event costs a dictionary lookup however many subscriptions
+there are. Filter fields the index does not cover (time range, user,
+session, tags) are checked for the candidates only.
+
+Subscribers receive EventBatch frames: a batch is delivered once it holds
+batch_size events, or window seconds after its first event, whichever comes
+first.
+"""
+
+import asyncio
+import inspect
+import itertools
+import logging
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from .models.events import Event, EventBatch, EventFilter, EventSubscription, EventType
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+BATCH_WINDOW = 0.05    # Seconds
+MATCH_CACHE_SIZE = 4096
+
+Deliver = Callable[[EventBatch], Optional[Awaitable[None]]]
+IndexKey = Tuple[Optional[EventType], Optional[str], Optional[str]]
+
+
+def _severity(event: Event) -> str:
+    return getattr(event.severity, "value", event.severity)
+
+
+class Subscriber:
+    """One subscription: its filter, its delivery callback and the batch being filled.
+
+    event_types of the subscription and types of its filter both restrict
+    the types; an empty list means every type.
+    """
+
+    def __init__(self, subscription: EventSubscription, deliver: Deliver,
+                 batch_size: int = BATCH_SIZE, window: float = BATCH_WINDOW):
+        self.subscription = subscription
+        self.deliver = deliver
+        self.batch_size = max(1, batch_size)
+        self.window = window
+        self.filter = subscription.filters or EventFilter()
+
+        types = set(subscription.event_types) or None
+        if self.filter.types:
+            types = set(self.filter.types) if types is None else types & set(self.filter.types)
+        self.types: Optional[Set[EventType]] = types
+        self.sources: Optional[Set[str]] = set(self.filter.sources) if self.filter.sources else None
+        self.severities: Optional[Set[str]] = ({getattr(s, "value", s) for s in self.filter.severities}
+                                               if self.filter.severities else None)
+        # Whether filter fields outside the index are set
+        self.residual = any(value is not None for value in (
+            self.filter.start_time, self.filter.end_time, self.filter.user_id,
+            self.filter.session_id, self.filter.tags))
+
+        self.pending: List[Event] = []
+        self.events_delivered = 0
+        self.batches_delivered = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def id(self) -> str:
+        return self.subscription.subscription_id
+
+    def keys(self) -> List[IndexKey]:
+        """Index keys this subscription is registered under."""
+        types = self.types if self.types is not None else {None}
+        sources = self.sources if self.sources is not None else {None}
+        severities = self.severities if self.severities is not None else {None}
+        return list(itertools.product(types, sources, severities))
+
+    def accepts(self, event: Event) -> bool:
+        """Check the filter fields the index does not cover."""
+        f = self.filter
+        if f.start_time is not None and event.timestamp < f.start_time:
+            return False
+        if f.end_time is not None and event.timestamp > f.end_time:
+            return False
+        if f.user_id is not None and event.user_id != f.user_id:
+            return False
+        if f.session_id is not None and event.session_id != f.session_id:
+            return False
+        if f.tags and not set(f.tags) & set(event.tags or ()):
+            return False
+        return True
+
+    def matches(self, event: Event) -> bool:
+        """Evaluate the whole filter (what the index saves doing per subscription)."""
+        return ((self.types is None or event.type in self.types)
+                and (self.sources is None or event.source in self.sources)
+                and (self.severities is None or _severity(event) in self.severities)
+                and self.accepts(event))
+
+    def add(self, event: Event):
+        """Queue an event, delivering the batch if it is full."""
+        self.pending.append(event)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self.flush)
+
+    def flush(self):
+        """Deliver the pending events as one batch."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self.pending:
+            return
+        events, self.pending = self.pending, []
+        batch = EventBatch(events=events, batch_id=uuid.uuid4().hex, total_count=len(events))
+        self.events_delivered += len(events)
+        self.batches_delivered += 1
+        try:
+            result = self.deliver(batch)
+            if inspect.isawaitable(result):
+                task = asyncio.ensure_future(result)
+                self._tasks.add(task)
+                task.add_done_callback(self._delivered)
+        except Exception as e:
+            logger.error(f"Event delivery to subscription {self.id} failed: {e}")
+
+    def _delivered(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Event delivery to subscription {self.id} failed: {task.exception()}")
+
+    def close(self):
+        """Drop pending events and stop the batch timer."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self.pending = []
+
+
+class EventBus:
+    """Publishes events to matching subscriptions, in batches.
+
+    Args:
+        batch_size: Default events per batch
+        window: Default seconds a batch waits for more events
+    """
+
+    def __init__(self, batch_size: int = BATCH_SIZE, window: float = BATCH_WINDOW):
+        self.batch_size = batch_size
+        self.window = window
+        self.events_published = 0
+        self.events_matched = 0
+        self._subscribers: Dict[str, Subscriber] = {}
+        self._index: Dict[IndexKey, List[Subscriber]] = {}
+        self._cache: Dict[Tuple[EventType, str, str], Tuple[Subscriber, ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def get(self, subscription_id: str) -> Optional[Subscriber]:
+        """Active subscription by id."""
+        return self._subscribers.get(subscription_id)
+
+    def subscribe(self, subscription: EventSubscription, deliver: Deliver,
+                  batch_size: Optional[int] = None, window: Optional[float] = None) -> Subscriber:
+        """Deliver batches of matching events to deliver, replacing any subscription with the same id.
+
+        deliver is called on the event loop with each EventBatch and may
+        return an awaitable, which is run as a task.
+        """
+        self.unsubscribe(subscription.subscription_id)
+        subscriber = Subscriber(subscription, deliver,
+                                self.batch_size if batch_size is None else batch_size,
+                                self.window if window is None else window)
+        if not subscription.is_active:
+            return subscriber
+        self._subscribers[subscriber.id] = subscriber
+        for key in subscriber.keys():
+            self._index.setdefault(key, []).append(subscriber)
+        self._cache.clear()
+        return subscriber
+
+    def unsubscribe(self, subscription_id: str, flush: bool = False) -> bool:
+        """Remove a subscription, delivering its pending events first if flush."""
+        subscriber = self._subscribers.pop(subscription_id, None)
+        if subscriber is None:
+            return False
+        for key in subscriber.keys():
+            entries = self._index.get(key)
+            if entries is not None:
+                entries.remove(subscriber)
+                if not entries:
+                    del self._index[key]
+        self._cache.clear()
+        if flush:
+            subscriber.flush()
+        subscriber.close()
+        return True
+
+    def match(self, event: Event) -> Tuple[Subscriber, ...]:
+        """Subscriptions whose type, source and severity filters an event passes."""
+        key = (event.type, event.source, _severity(event))
+        found = self._cache.get(key)
+        if found is None:
+            index = self._index
+            found = tuple(subscriber
+                          for event_type in (key[0], None)
+                          for source in (key[1], None)
+                          for severity in (key[2], None)
+                          for subscriber in index.get((event_type, source, severity), ()))
+            if len(self._cache) >= MATCH_CACHE_SIZE:
+                self._cache.clear()
+            self._cache[key] = found
+        return found
+
+    def publish(self, event: Event) -> int:
+        """Queue an event for every matching subscription (on the event loop); returns how many."""
+        self.events_published += 1
+        matched = 0
+        for subscriber in self.match(event):
+            if subscriber.residual and not subscriber.accepts(event):
+                continue
+            subscriber.add(event)
+            matched += 1
+        self.events_matched += matched
+        return matched
+
+    def flush(self):
+        """Deliver every pending batch now."""
+        for subscriber in list(self._subscribers.values()):
+            subscriber.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Subscription, index and delivery counts."""
+        return {
+            "subscriptions": len(self._subscribers),
+            "index_keys": len(self._index),
+            "events_published": self.events_published,
+            "events_matched": self.events_matched,
+            "batches_delivered": sum(s.batches_delivered for s in self._subscribers.values()),
+            "pending": sum(len(s.pending) for s in self._subscribers.values()),
+        }
+
+
+def events_of(prefix: str) -> List[EventType]:
+    """Event types in a category, e.g. events_of("window.")."""
+    return [event_type for event_type in EventType if event_type.value.startswith(prefix)]
+
+
+# Global bus shared by producers (monitoring, auth, ...) and WebSocket subscribers
+event_bus = EventBus()
@@ -0,0 +1,365 @@
+"""System metrics history: a raw ring buffer and SQLite rollups.
+
+Every snapshot of the shared sampler (see metrics_sampler) is recorded:
+
+    raw     the last RAW_CAPACITY samples (an hour at 1 s), kept in memory
+            as one array per metric
+    rollups 10 s, 1 min and 1 h buckets holding the mean and maximum of
+            each metric. Each level is built from the closed buckets of the
+            level below and written to the metric_rollups table through the
+            async database engine, in batches
+
+Range queries pick the coarsest resolution that still gives the requested
+number of points over the range, then average down to at most that many
+points in SQL. A 24 h chart at 300 points reads the 1 min rollups (1,440
+rows) and returns 288 points, instead of 86,400 raw samples.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Column, Float, Index, Integer, cast, delete, func, insert, select
+
+from .database import AsyncSessionLocal, Base
+from .metrics_sampler import MetricsSnapshot
+
+logger = logging.getLogger(__name__)
+
+# Snapshot attributes recorded, in column order
+FIELDS = ("cpu_percent", "memory_percent", "disk_percent",
+          "network_sent_rate", "network_recv_rate", "process_count")
+
+RAW_RESOLUTION = 1
+ROLLUP_RESOLUTIONS = (10, 60, 3600)   # Seconds per bucket, finest first
+RAW_CAPACITY = 3600
+FLUSH_INTERVAL = 10.0                 # Seconds between batched writes
+PRUNE_INTERVAL = 3600.0
+# Seconds each rollup resolution is kept; 1 h buckets follow the
+# monitoring config's history_retention_days
+RETENTION = {10: 86400, 60: 7 * 86400, 3600: 30 * 86400}
+
+
+class MetricRollupRecord(Base):
+    """One closed rollup bucket: mean and maximum of every metric."""
+    __tablename__ = "metric_rollups"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    resolution = Column(Integer, nullable=False)
+    bucket_start = Column(Float, nullable=False)   # Unix seconds, a multiple of resolution
+    samples = Column(Integer, nullable=False)
+    cpu_percent = Column(Float)
+    cpu_percent_max = Column(Float)
+    memory_percent = Column(Float)
+    memory_percent_max = Column(Float)
+    disk_percent = Column(Float)
+    disk_percent_max = Column(Float)
+    network_sent_rate = Column(Float)
+    network_sent_rate_max = Column(Float)
+    network_recv_rate = Column(Float)
+    network_recv_rate_max = Column(Float)
+    process_count = Column(Float)
+    process_count_max = Column(Float)
+
+    __table_args__ = (Index("ix_metric_rollups_resolution_start", "resolution", "bucket_start"),)
+
+
+def as_utc(moment: datetime) -> datetime:
+    """An aware UTC datetime; naive datetimes are UTC, as the sampler's are."""
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
+
+
+def epoch_seconds(moment: datetime) -> float:
+    """Unix time of a datetime; naive datetimes are UTC."""
+    return as_utc(moment).timestamp()
+
+
+class RingBuffer:
+    """The last capacity samples, one array per field; the oldest is overwritten first."""
+
+    def __init__(self, fields: Sequence[str] = FIELDS, capacity: int = RAW_CAPACITY):
+        self.fields = tuple(fields)
+        self.capacity = capacity
+        self._times = array('d', bytes(8 * capacity))
+        self._columns = {name: array('d', bytes(8 * capacity)) for name in self.fields}
+        self._next = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, timestamp: float, values: Dict[str, float]):
+        """Add a sample; timestamps must not decrease."""
+        i = self._next
+        self._times[i] = timestamp
+        for name in self.fields:
+            self._columns[name][i] = values[name]
+        self._next = (i + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def _ordered(self, column: array) -> array:
+        if self._size < self.capacity:
+            return column[:self._size]
+        return column[self._next:] + column[:self._next]
+
+    @property
+    def oldest(self) -> Optional[float]:
+        """Timestamp of the oldest sample kept."""
+        if not self._size:
+            return None
+        return self._times[0] if self._size < self.capacity else self._times[self._next]
+
+    def range(self, start: float, end: float) -> Tuple[array, Dict[str, array]]:
+        """Timestamps and columns of the samples with start <= timestamp <= end, oldest first."""
+        times = self._ordered(self._times)
+        lo, hi = bisect_left(times, start), bisect_right(times, end)
+        return times[lo:hi], {name: self._ordered(column)[lo:hi] for name, column in self._columns.items()}
+
+
+class Rollup:
+    """The open bucket of one resolution; adding past its end closes it."""
+
+    def __init__(self, resolution: int, fields: Sequence[str] = FIELDS):
+        self.resolution = resolution
+        self.fields = tuple(fields)
+        self.start: Optional[float] = None
+        self.samples = 0
+        self._sums: Dict[str, float] = {}
+        self._maxes: Dict[str, float] = {}
+
+    def add(self, timestamp: float, means: Dict[str, float], maxes: Dict[str, float],
+            samples: int = 1) -> Optional[Dict[str, Any]]:
+        """Add samples (a finer bucket's means and maxima); returns the bucket it closed, if any."""
+        bucket = math.floor(timestamp / self.resolution) * self.resolution
+        closed = None
+        if self.start is not None and bucket != self.start:
+            closed = self.close()
+        if self.start is None:
+            self.start, self.samples = bucket, 0
+            self._sums = dict.fromkeys(self.fields, 0.0)
+            self._maxes = dict.fromkeys(self.fields, -math.inf)
+        self.samples += samples
+        for name in self.fields:
+            self._sums[name] += means[name] * samples
+            self._maxes[name] = max(self._maxes[name], maxes[name])
+        return closed
+
+    def close(self) -> Optional[Dict[str, Any]]:
+        """Row of the open bucket (None if empty); the next add opens a new one."""
+        if self.start is None:
+            return None
+        row = {"resolution": self.resolution, "bucket_start": self.start, "samples": self.samples}
+        for name in self.fields:
+            row[name] = self._sums[name] / self.samples
+            row[f"{name}_max"] = self._maxes[name]
+        self.start = None
+        return row
+
+
+def choose_resolution(span: float, points: int, available: Callable[[int], bool]) -> int:
+    """Coarsest available resolution giving at least points buckets over span.
+
+    If none does, the finest available one (the chart then has fewer points).
+    """
+    resolutions = [RAW_RESOLUTION] + list(ROLLUP_RESOLUTIONS)
+    usable = [r for r in resolutions if available(r)] or [ROLLUP_RESOLUTIONS[0]]
+    for resolution in reversed(usable):
+        if span / resolution >= points:
+            return resolution
+    return usable[0]
+
+
+def downsample(times: Sequence[float], means: Dict[str, Sequence[float]], maxes: Dict[str, Sequence[float]],
+               weights: Sequence[int], start: float, step: float) -> List[Dict[str, Any]]:
+    """Average (weighted by sample count) and take the maximum per step-wide slot."""
+    slots: Dict[int, Dict[str, Any]] = {}
+    for i, timestamp in enumerate(times):
+        slot = int((timestamp - start) // step)
+        point = slots.get(slot)
+        if point is None:
+            point = slots[slot] = {"samples": 0, **{f"{name}_sum": 0.0 for name in means},
+                                   **{f"{name}_max": -math.inf for name in means}}
+        weight = weights[i]
+        point["samples"] += weight
+        for name in means:
+            point[f"{name}_sum"] += means[name][i] * weight
+            point[f"{name}_max"] = max(point[f"{name}_max"], maxes[name][i])
+    result = []
+    for slot in sorted(slots):
+        point = slots[slot]
+        row = {"timestamp": start + slot * step, "samples": point["samples"]}
+        for name in means:
+            row[name] = point[f"{name}_sum"] / point["samples"]
+            row[f"{name}_max"] = point[f"{name}_max"]
+        result.append(row)
+    return result
+
+
+class MetricsHistory:
+    """Records sampler snapshots and answers range queries.
+
+    Args:
+        session_factory: Async SQLAlchemy session factory for the rollups table
+        raw_capacity: Raw samples kept in memory
+        retention: Seconds kept per rollup resolution
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal, raw_capacity: int = RAW_CAPACITY,
+                 retention: Optional[Dict[int, float]] = None):
+        self.session_factory = session_factory
+        self.raw = RingBuffer(FIELDS, raw_capacity)
+        self.rollups = [Rollup(resolution) for resolution in ROLLUP_RESOLUTIONS]
+        self.retention = {**RETENTION, **(retention or {})}
+        self.rows_written = 0
+        self._pending: List[Dict[str, Any]] = []
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._last_prune = 0.0
+
+    def record(self, snapshot: MetricsSnapshot):
+        """Add a snapshot (sampler listener; cheap, no I/O)."""
+        values = {name: float(getattr(snapshot, name)) for name in FIELDS}
+        self.record_values(epoch_seconds(snapshot.timestamp), values)
+
+    def record_values(self, timestamp: float, values: Dict[str, float]):
+        """Add one raw sample and roll closed buckets up."""
+        self.raw.append(timestamp, values)
+        row = self.rollups[0].add(timestamp, values, values)
+        for coarser in self.rollups[1:]:
+            if row is None:
+                break
+            self._pending.append(row)
+            row = coarser.add(row["bucket_start"], row, {name: row[f"{name}_max"] for name in FIELDS},
+                              row["samples"])
+        if row is not None:
+            self._pending.append(row)
+
+    async def flush(self):
+        """Write closed buckets in one batch, and prune expired ones now and then."""
+        async with self._flush_lock:
+            rows, self._pending = self._pending, []
+            now = time.time()
+            prune = now - self._last_prune >= PRUNE_INTERVAL
+            if not rows and not prune:
+                return
+            try:
+                async with self.session_factory() as session:
+                    if rows:
+                        await session.execute(insert(MetricRollupRecord), rows)
+                    if prune:
+                        for resolution, seconds in self.retention.items():
+                            await session.execute(delete(MetricRollupRecord).where(
+                                MetricRollupRecord.resolution == resolution,
+                                MetricRollupRecord.bucket_start < now - seconds))
+                    await session.commit()
+            except Exception:
+                self._pending[:0] = rows  # Retry with the next flush
+                raise
+            self.rows_written += len(rows)
+            if prune:
+                self._last_prune = now
+
+    async def start(self, sampler, retention_days: Optional[float] = None):
+        """Record every snapshot of sampler and flush periodically."""
+        if retention_days is not None:
+            self.retention[ROLLUP_RESOLUTIONS[-1]] = retention_days * 86400
+        sampler.add_listener(self.record)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, sampler=None):
+        """Stop recording and write what has been rolled up so far."""
+        if sampler is not None:
+            sampler.remove_listener(self.record)
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Writing metrics rollups failed: {e}")
+
+    def _covers(self, resolution: int, start: float) -> bool:
+        """Whether resolution still holds data from start on."""
+        if resolution == RAW_RESOLUTION:
+            return self.raw.oldest is not None and self.raw.oldest <= start
+        return time.time() - self.retention[resolution] <= start
+
+    async def query(self, start: datetime, end: datetime, points: int = 300,
+                    fields: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """At most points points between start and end, at the coarsest sufficient resolution.
+
+        Each point has the mean and maximum ('<field>_max') of every field
+        over its step, and the number of raw samples behind it.
+        """
+        fields = [name for name in (fields or FIELDS) if name in FIELDS]
+        if not fields:
+            raise ValueError(f"Unknown metrics; choose from {', '.join(FIELDS)}")
+        points = max(1, points)
+        first, last = epoch_seconds(start), epoch_seconds(end)
+        span = max(0.0, last - first)
+        resolution = choose_resolution(span, points, lambda r: self._covers(r, first))
+        step = max(resolution, math.ceil(span / points / resolution) * resolution)
+        # Slots aligned to the resolution, so every bucket falls in exactly one
+        origin = math.floor(first / resolution) * resolution
+
+        if resolution == RAW_RESOLUTION:
+            times, columns = self.raw.range(first, last)
+            columns = {name: columns[name] for name in fields}
+            rows = downsample(times, columns, columns, [1] * len(times), origin, step)
+        else:
+            await self.flush()
+            rows = await self._query_rollups(resolution, first, last, origin, step, fields)
+
+        for row in rows:
+            row["timestamp"] = datetime.fromtimestamp(row["timestamp"], timezone.utc).isoformat()
+        return {
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "resolution": resolution,
+            "step": step,
+            "fields": fields,
+            "points": rows,
+        }
+
+    async def _query_rollups(self, resolution: int, first: float, last: float, origin: float, step: float,
+                             fields: Sequence[str]) -> List[Dict[str, Any]]:
+        """Rollup buckets in range, averaged per step in SQL."""
+        table = MetricRollupRecord
+        slot = cast((table.bucket_start - origin) / step, Integer).label("slot")
+        samples = func.sum(table.samples)
+        columns = [slot, samples.label("samples")]
+        for name in fields:
+            columns.append((func.sum(getattr(table, name) * table.samples) / samples).label(name))
+            columns.append(func.max(getattr(table, f"{name}_max")).label(f"{name}_max"))
+        statement = (select(*columns)
+                     .where(table.resolution == resolution,
+                            table.bucket_start >= origin,
+                            table.bucket_start <= last)
+                     .group_by(slot)
+                     .order_by(slot))
+        async with self.session_factory() as session:
+            result = await session.execute(statement)
+            return [{"timestamp": origin + row.slot * step, "samples": row.samples,
+                     **{key: getattr(row, key) for name in fields for key in (name, f"{name}_max")}}
+                    for row in result]
+
+
+# Global history fed by the shared metrics sampler
+metrics_history = MetricsHistory()
@@ -0,0 +1,282 @@
+"""Shared background sampler for system metrics.
+
+One task samples CPU, memory, disk, network and process counts on a fixed
+cadence and publishes each sample as an immutable MetricsSnapshot. SSE
+streams, WebSocket broadcasts and REST endpoints all read the latest
+snapshot or wait for the next one, so sampling costs the same for one
+viewer or five hundred and no request sleeps through a measuring interval.
+
+CPU usage is psutil's non-blocking delta since the previous sample
+(cpu_percent(interval=None)); network rates are deltas of the byte
+counters. Samples are collected in the default executor, off the event loop.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from functools import cached_property
+from types import MappingProxyType
+from typing import Any, AsyncIterator, Callable, Dict, List, Mapping, Optional, Tuple
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+GB = 1024 ** 3
+
+
+@dataclass(frozen=True)
+class MetricsSnapshot:
+    """One sample of system metrics, shared by every consumer."""
+    sequence: int
+    timestamp: datetime             # UTC
+    monotonic: float                # time.monotonic() when sampled
+    cpu_percent: float
+    cpu_count: int
+    per_cpu_percent: Tuple[float, ...]
+    memory_total: int
+    memory_available: int
+    memory_used: int
+    memory_percent: float
+    disk_total: int
+    disk_used: int
+    disk_free: int
+    disk_percent: float
+    network: Mapping[str, int]      # psutil.net_io_counters() fields
+    network_sent_rate: float        # Bytes per second since the previous sample
+    network_recv_rate: float
+    process_count: int
+    boot_time: float
+
+    @property
+    def uptime(self) -> float:
+        """Seconds since boot at sampling time."""
+        return self.timestamp.timestamp() - self.boot_time
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Metrics in the MonitoringService.get_system_metrics format."""
+        return {
+            "cpu": {
+                "percentage": self.cpu_percent,
+                "count": self.cpu_count
+            },
+            "memory": {
+                "used_gb": round(self.memory_used / GB, 2),
+                "total_gb": round(self.memory_total / GB, 2),
+                "percentage": self.memory_percent
+            },
+            "disk": {
+                "used_gb": round(self.disk_used / GB, 2),
+                "total_gb": round(self.disk_total / GB, 2),
+                "percentage": self.disk_percent
+            },
+            "network": {
+                "bytes_sent": self.network["bytes_sent"],
+                "bytes_recv": self.network["bytes_recv"],
+                "sent_per_sec": round(self.network_sent_rate, 1),
+                "recv_per_sec": round(self.network_recv_rate, 1)
+            },
+            "processes": {
+                "count": self.process_count
+            },
+            "timestamp": self.timestamp.isoformat()
+        }
+
+    @cached_property
+    def json(self) -> str:
+        """to_dict() serialized once, for every stream that sends it."""
+        return json.dumps(self.to_dict())
+
+
+class MetricsSampler:
+    """Samples system metrics in one background task and publishes snapshots.
+
+    Args:
+        interval: Seconds between samples
+        disk_path: Mount point whose usage is reported
+    """
+
+    def __init__(self, interval: float = 1.0, disk_path: str = '/'):
+        self.interval = interval
+        self.disk_path = disk_path
+        self.samples_taken = 0
+        self._latest: Optional[MetricsSnapshot] = None
+        self._published: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._on_demand: Optional[asyncio.Lock] = None
+        self._collect_lock = threading.Lock()
+        self._previous_network: Optional[Tuple[float, int, int]] = None
+        self._listeners: List[Callable[[MetricsSnapshot], None]] = []
+        # Prime psutil's CPU deltas: the first non-blocking call returns 0.0
+        psutil.cpu_percent(interval=None)
+        psutil.cpu_percent(interval=None, percpu=True)
+
+    @property
+    def latest(self) -> Optional[MetricsSnapshot]:
+        """Most recent snapshot, None before the first sample."""
+        return self._latest
+
+    def is_running(self) -> bool:
+        """Check if the sampling task is running."""
+        return self._task is not None and not self._task.done()
+
+    async def start(self, interval: Optional[float] = None):
+        """Start the sampling task (restarting it if the interval changes)."""
+        if interval is not None and interval != self.interval:
+            self.interval = interval
+            await self.stop()
+        if not self.is_running():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the sampling task."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def collect(self) -> MetricsSnapshot:
+        """Take one sample now (blocking; psutil reads /proc or system APIs)."""
+        with self._collect_lock:
+            now = time.monotonic()
+            memory = psutil.virtual_memory()
+            disk = psutil.disk_usage(self.disk_path)
+            network = psutil.net_io_counters()._asdict()
+
+            sent_rate = recv_rate = 0.0
+            if self._previous_network is not None:
+                then, sent, recv = self._previous_network
+                elapsed = now - then
+                if elapsed > 0:
+                    sent_rate = max(0, network["bytes_sent"] - sent) / elapsed
+                    recv_rate = max(0, network["bytes_recv"] - recv) / elapsed
+            self._previous_network = (now, network["bytes_sent"], network["bytes_recv"])
+
+            self.samples_taken += 1
+            return MetricsSnapshot(
+                sequence=self.samples_taken,
+                timestamp=datetime.utcnow(),
+                monotonic=now,
+                cpu_percent=psutil.cpu_percent(interval=None),
+                cpu_count=psutil.cpu_count(),
+                per_cpu_percent=tuple(psutil.cpu_percent(interval=None, percpu=True)),
+                memory_total=memory.total,
+                memory_available=memory.available,
+                memory_used=memory.used,
+                memory_percent=memory.percent,
+                disk_total=disk.total,
+                disk_used=disk.used,
+                disk_free=disk.free,
+                disk_percent=disk.percent,
+                network=MappingProxyType(network),
+                network_sent_rate=sent_rate,
+                network_recv_rate=recv_rate,
+                process_count=len(psutil.pids()),
+                boot_time=psutil.boot_time(),
+            )
+
+    def add_listener(self, callback: Callable[[MetricsSnapshot], None]):
+        """Call callback with every published snapshot, on the event loop.
+
+        Listeners run inline and must not block (e.g. record to memory).
+        """
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[MetricsSnapshot], None]):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _publish(self, snapshot: MetricsSnapshot):
+        """Make snapshot the latest and wake everyone waiting for it."""
+        if self._latest is not None and snapshot.sequence <= self._latest.sequence:
+            return
+        self._latest = snapshot
+        published, self._published = self._published, None
+        if published is not None:
+            published.set()
+        for callback in list(self._listeners):
+            try:
+                callback(snapshot)
+            except Exception as e:
+                logger.error(f"Metrics listener {callback!r} failed: {e}")
+
+    async def sample_now(self) -> MetricsSnapshot:
+        """Collect a snapshot in the executor and publish it."""
+        loop = asyncio.get_running_loop()
+        snapshot = await loop.run_in_executor(None, self.collect)
+        self._publish(snapshot)
+        return snapshot
+
+    async def _run(self):
+        """Sample at a fixed rate; a slow sample does not shift the cadence."""
+        due = time.monotonic()
+        while True:
+            try:
+                await self.sample_now()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Metrics sampling failed: {e}")
+            due += self.interval
+            delay = due - time.monotonic()
+            if delay < 0:  # Fell behind (suspended, overloaded): skip missed samples
+                due = time.monotonic()
+                delay = 0
+            await asyncio.sleep(delay)
+
+    async def current(self, max_age: Optional[float] = None) -> MetricsSnapshot:
+        """Latest snapshot, sampled on demand if older than max_age.
+
+        max_age defaults to two intervals. Concurrent callers that find the
+        snapshot stale share one on-demand sample.
+        """
+        max_age = 2 * self.interval if max_age is None else max_age
+        snapshot = self._latest
+        if snapshot is not None and time.monotonic() - snapshot.monotonic <= max_age:
+            return snapshot
+        if self._on_demand is None:
+            self._on_demand = asyncio.Lock()
+        async with self._on_demand:
+            snapshot = self._latest
+            if snapshot is not None and time.monotonic() - snapshot.monotonic <= max_age:
+                return snapshot
+            return await self.sample_now()
+
+    async def next_snapshot(self, after: int = 0) -> MetricsSnapshot:
+        """First snapshot with a sequence number above after, waiting for it."""
+        while self._latest is None or self._latest.sequence <= after:
+            if self._published is None:
+                self._published = asyncio.Event()
+            await self._published.wait()
+        return self._latest
+
+    async def stream(self, every: float = 0.0) -> AsyncIterator[MetricsSnapshot]:
+        """Snapshots as they are published, at most one per every seconds.
+
+        Starts the sampling task if nothing has. The first snapshot is the
+        current one; later ones are never repeated, and samples published
+        within every seconds of the last one yielded are skipped.
+        """
+        if not self.is_running():
+            await self.start()
+        snapshot = await self.current()
+        while True:
+            yield snapshot
+            sent = snapshot.monotonic
+            snapshot = await self.next_snapshot(snapshot.sequence)
+            # Half an interval of slack, so jitter does not skip a whole sample
+            while snapshot.monotonic - sent < every - 0.5 * self.interval:
+                snapshot = await self.next_snapshot(snapshot.sequence)
+
+
+# Global sampler shared by the monitoring service, dashboards and WebSockets
+metrics_sampler = MetricsSampler()
@@ -13,7 +13,7 @@ from .processes import (
     ProcessControlRequest, ProcessStatistics, ProcessTree
 )
 from .auth import (
-    User, UserCreate, UserUpdate, LoginRequest, Token, TokenRefresh,
+    User, UserCreate, UserUpdate, PasswordChange, LoginRequest, Token, TokenRefresh,
     TokenResponse, TokenPayload, AuthSession, UserRole, PermissionScope,
     Permission, RolePermissions
 )
@@ -56,6 +56,7 @@ __all__ = [
     "User",
     "UserCreate",
     "UserUpdate",
+    "PasswordChange",
     "LoginRequest",
     "Token",
     "TokenRefresh",
@@ -88,6 +88,12 @@ class UserUpdate(BaseModel):
     is_active: Optional[bool] = Field(None, description="Whether user is active")
 
 
+class PasswordChange(BaseModel):
+    """Password change request model."""
+    current_password: str = Field(..., description="Current password")
+    new_password: str = Field(..., min_length=8, description="New password")
+
+
 class LoginRequest(BaseModel):
     """Login request model."""
     username: EmailStr = Field(..., description="User email/username")
@@ -1,88 +1,68 @@
 """Monitoring service for CyberCorp server."""
-import asyncio
-from datetime import datetime
-from typing import Dict, Any, Optional
-import platform
-import psutil
+import math
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional
+
+from .config import get_config
+from .event_bus import EventBus, event_bus
+from .metrics_history import MetricsHistory, as_utc, metrics_history
+from .metrics_sampler import MetricsSampler, MetricsSnapshot, metrics_sampler
+from .models.events import EventType, SystemEvent
 
 
 class MonitoringService:
     """System monitoring and metrics service."""
     
-    def __init__(self):
+    def __init__(self, sampler: MetricsSampler = metrics_sampler, history: MetricsHistory = metrics_history,
+                 bus: EventBus = event_bus):
         """Initialize monitoring service."""
         self.is_monitoring = False
         self.metrics_cache = {}
-        self._collect_task = None
+        self.sampler = sampler
+        self.history = history
+        self.bus = bus
         
     def initialize(self):
         """Initialize monitoring."""
         self.is_monitoring = True
         
-    def start(self):
-        """Start the monitoring service."""
+    async def start(self):
+        """Start the monitoring service, its metrics sampler and history."""
         if not self.is_monitoring:
             self.initialize()
+        config = get_config().monitoring
+        await self.sampler.start(interval=config.interval / 1000)
+        await self.history.start(self.sampler, retention_days=config.history_retention_days)
+        self.sampler.add_listener(self._publish_metrics)
             
-    def stop(self):
+    async def stop(self):
         """Stop the monitoring service."""
         self.is_monitoring = False
-        if self._collect_task:
-            self._collect_task.cancel()
+        self.sampler.remove_listener(self._publish_metrics)
+        await self.sampler.stop()
+        await self.history.stop(self.sampler)
             
+    def _publish_metrics(self, snapshot: MetricsSnapshot):
+        """Publish each snapshot on the event bus, if anyone subscribes."""
+        if not len(self.bus):
+            return
+        self.bus.publish(SystemEvent(
+            id=f"metrics-{snapshot.sequence}",
+            type=EventType.SYSTEM_METRICS_UPDATE,
+            timestamp=snapshot.timestamp,
+            source="monitoring",
+            message="System metrics updated",
+            metrics=snapshot.to_dict()
+        ))
+        
     def is_running(self) -> bool:
         """Check if monitoring service is running."""
         return self.is_monitoring
         
     async def get_system_metrics(self) -> Dict[str, Any]:
-        """Get current system metrics."""
+        """Get current system metrics (the shared sampler's latest snapshot)."""
         try:
-            # CPU metrics
-            cpu_percent = psutil.cpu_percent(interval=1)
-            cpu_count = psutil.cpu_count()
-            
-            # Memory metrics
-            memory = psutil.virtual_memory()
-            memory_used = memory.used / (1024**3)  # GB
-            memory_total = memory.total / (1024**3)  # GB
-            memory_percent = memory.percent
-            
-            # Disk metrics
-            disk = psutil.disk_usage('/')
-            disk_used = disk.used / (1024**3)  # GB
-            disk_total = disk.total / (1024**3)  # GB
-            disk_percent = disk.percent
-            
-            # Network metrics
-            net_io = psutil.net_io_counters()
-            
-            # Process metrics
-            process_count = len(psutil.pids())
-            
-            metrics = {
-                "cpu": {
-                    "percentage": cpu_percent,
-                    "count": cpu_count
-                },
-                "memory": {
-                    "used_gb": round(memory_used, 2),
-                    "total_gb": round(memory_total, 2),
-                    "percentage": memory_percent
-                },
-                "disk": {
-                    "used_gb": round(disk_used, 2),
-                    "total_gb": round(disk_total, 2),
-                    "percentage": disk_percent
-                },
-                "network": {
-                    "bytes_sent": net_io.bytes_sent,
-                    "bytes_recv": net_io.bytes_recv
-                },
-                "processes": {
-                    "count": process_count
-                },
-                "timestamp": datetime.utcnow().isoformat()
-            }
+            metrics = (await self.sampler.current()).to_dict()
             
             # Cache metrics
             self.metrics_cache = metrics
@@ -94,9 +74,25 @@ class MonitoringService:
                 "timestamp": datetime.utcnow().isoformat()
             }
             
+    async def get_historical_data(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                                  interval: int = 60, metrics: Optional[List[str]] = None,
+                                  page: int = 1, per_page: int = 100) -> List[Dict[str, Any]]:
+        """Get metrics history, one point per interval seconds (or coarser).
+        
+        Defaults to the last 24 hours; page and per_page select a slice of
+        the points.
+        """
+        # Aware and naive (UTC) bounds may be mixed
+        end = as_utc(end) if end else datetime.now(timezone.utc)
+        start = as_utc(start) if start else end - timedelta(days=1)
+        points = max(1, math.ceil((end - start).total_seconds() / max(1, interval)))
+        history = await self.history.query(start, end, points=points, fields=metrics)
+        return history["points"][(page - 1) * per_page:page * per_page]
+        
     def get_cached_metrics(self) -> Optional[Dict[str, Any]]:
         """Get cached metrics if available."""
-        return self.metrics_cache
+        snapshot = self.sampler.latest
+        return snapshot.to_dict() if snapshot is not None else self.metrics_cache
 
 
 # Global monitoring service instance
@@ -8,7 +8,7 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 from ..models.auth import (
     LoginRequest, Token, TokenRefresh, TokenResponse, User, UserCreate,
-    UserUpdate, UserRole, PermissionScope
+    UserUpdate, UserRole, PermissionScope, PasswordChange
 )
 from ..auth import auth_manager, get_current_user, require_permission
 from ..logging_config import get_logger
@@ -25,15 +25,29 @@ async def login(login_request: LoginRequest) -> Token:
         logger.info(f"Login attempt for user: {login_request.username}")
         
         # Authenticate user
-        token = await auth_manager.authenticate_user(
+        user = await auth_manager.authenticate_user(
             username=login_request.username,
-            password=login_request.password,
-            client_id=login_request.client_id
+            password=login_request.password
+        )
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid credentials"
+            )
+        
+        token = Token(
+            access_token=auth_manager.create_access_token({"sub": user.username}),
+            refresh_token=auth_manager.create_refresh_token(user.username),
+            expires_in=auth_manager.access_token_expire_minutes * 60,
+            user=user
         )
         
         logger.info(f"User {login_request.username} logged in successfully")
         return token
         
+    except HTTPException:
+        logger.warning(f"Login failed for user {login_request.username}")
+        raise
     except Exception as e:
         logger.warning(f"Login failed for user {login_request.username}: {e}")
         raise HTTPException(
@@ -117,6 +131,41 @@ async def update_current_user(
         )
 
 
+@router.post("/me/password")
+async def change_password(
+    password_change: PasswordChange,
+    current_user: User = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """Change current user password; tokens issued before are revoked."""
+    logger.info(f"Password change request for: {current_user.username}")
+    
+    if not await auth_manager.authenticate_user(current_user.username, password_change.current_password):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Current password is incorrect"
+        )
+    
+    try:
+        # Change password
+        if not await auth_manager.change_password(current_user, password_change.new_password):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+        
+        logger.info(f"Password changed for user: {current_user.username}")
+        return {"success": True, "message": "Password changed, log in again"}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Password change error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Password change failed"
+        )
+
+
 @router.post("/users", response_model=User)
 async def create_user(
     user_create: UserCreate,
@@ -1,14 +1,15 @@
 """Real-time dashboard endpoints for CyberCorp System Monitor."""
 
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Query, Request
 from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
-import asyncio
 import json
+import socket
 from typing import Dict, Any
-from datetime import datetime
-import psutil
-from ..models.system import SystemMetrics
+from datetime import datetime, timedelta
+from ..metrics_history import metrics_history
+from ..metrics_sampler import MetricsSnapshot, metrics_sampler
+from ..models.system import CPUMetrics, DiskMetrics, MemoryMetrics, NetworkMetrics, SystemMetrics
 
 dashboard_router = APIRouter(prefix="/dashboard", tags=["dashboard"])
 
@@ -21,29 +22,38 @@ async def dashboard_home(request: Request):
     return templates.TemplateResponse("dashboard.html", {"request": request})
 
 
+# 每个快照只序列化一次，所有 SSE 连接共享 (sequence, event)
+_last_event = (0, "")
+
+
+def _sse_event(snapshot: MetricsSnapshot) -> str:
+    """快照对应的 SSE 事件文本"""
+    global _last_event
+    sequence, event = _last_event
+    if sequence == snapshot.sequence:
+        return event
+    data = {
+        "timestamp": snapshot.timestamp.isoformat(),
+        "cpu": snapshot.cpu_percent,
+        "memory_total": snapshot.memory_total,
+        "memory_used": snapshot.memory_used,
+        "memory_percent": snapshot.memory_percent,
+        "disk_total": snapshot.disk_total,
+        "disk_used": snapshot.disk_used,
+        "disk_free": snapshot.disk_free,
+        "network": dict(snapshot.network),
+        "processes": snapshot.process_count,
+        "uptime": snapshot.uptime
+    }
+    event = f"data: {json.dumps(data)}\n\n"
+    _last_event = (snapshot.sequence, event)
+    return event
+
+
 async def system_data_generator():
-    """实时系统数据生成器"""
-    while True:
-        cpu = psutil.cpu_percent(interval=1)
-        memory = psutil.virtual_memory()
-        disk = psutil.disk_usage('/')
-        
-        data = {
-            "timestamp": datetime.now().isoformat(),
-            "cpu": cpu,
-            "memory_total": memory.total,
-            "memory_used": memory.used,
-            "memory_percent": memory.percent,
-            "disk_total": disk.total,
-            "disk_used": disk.used,
-            "disk_free": disk.free,
-            "network": psutil.net_io_counters()._asdict(),
-            "processes": len(psutil.pids()),
-            "uptime": datetime.now().timestamp() - psutil.boot_time()
-        }
-        
-        yield f"data: {json.dumps(data)}\n\n"
-        await asyncio.sleep(2)
+    """实时系统数据生成器：读取共享采样器的快照，不自行采样"""
+    async for snapshot in metrics_sampler.stream(every=2):
+        yield _sse_event(snapshot)
 
 
 @dashboard_router.get("/events")
@@ -59,6 +69,16 @@ async def system_events():
     )
 
 
+@dashboard_router.get("/history")
+async def dashboard_history(
+    minutes: int = Query(default=60, ge=1, le=60 * 24 * 30, description="时间范围（分钟）"),
+    points: int = Query(default=300, ge=1, le=5000, description="图表最多点数")
+):
+    """REST API：最近一段时间的指标曲线"""
+    end = datetime.utcnow()
+    return await metrics_history.query(end - timedelta(minutes=minutes), end, points=points)
+
+
 @dashboard_router.get("/metrics")
 async def dashboard_metrics():
     """REST API：获取当前指标"""
@@ -67,13 +87,24 @@ async def dashboard_metrics():
 
 async def _generate_metrics():
     """生成系统指标"""
-    cpu = psutil.cpu_percent(interval=0.1)
-    memory = psutil.virtual_memory()
-    
+    snapshot = await metrics_sampler.current()
     return SystemMetrics(
-        cpu_usage=cpu,
-        memory_usage=memory.percent,
-        disk_usage=psutil.disk_usage('/').percent,
-        network_io=psutil.net_io_counters().bytes_sent + psutil.net_io_counters().bytes_recv,
-        uptime=datetime.now().timestamp() - psutil.boot_time()
-    )
\ No newline at end of file
+        timestamp=snapshot.timestamp,
+        hostname=socket.gethostname(),
+        cpu=CPUMetrics(usage_percent=snapshot.cpu_percent, per_cpu=list(snapshot.per_cpu_percent)),
+        memory=MemoryMetrics(
+            total=snapshot.memory_total,
+            available=snapshot.memory_available,
+            used=snapshot.memory_used,
+            percent=snapshot.memory_percent
+        ),
+        disk=DiskMetrics(
+            total=snapshot.disk_total,
+            used=snapshot.disk_used,
+            free=snapshot.disk_free,
+            percent=snapshot.disk_percent
+        ),
+        network=NetworkMetrics(**snapshot.network),
+        uptime=snapshot.uptime,
+        boot_time=datetime.fromtimestamp(snapshot.boot_time)
+    )
@@ -1,6 +1,6 @@
 """System router for CyberCorp Server."""
 
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from typing import Dict, Any, Optional, List
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
@@ -8,6 +8,7 @@ from fastapi import APIRouter, Depends, HTTPException, Query, status
 from ..models.system import SystemMetrics, SystemInfo, SystemAlert
 from ..models.auth import User, PermissionScope
 from ..auth import get_current_user, require_permission
+from ..metrics_history import as_utc, metrics_history
 from ..monitoring import monitoring_service
 from ..logging_config import get_logger
 
@@ -106,6 +107,41 @@ async def get_historical_data(
         )
 
 
+@router.get("/metrics/range")
+async def get_metrics_range(
+    start: Optional[datetime] = Query(None, description="Start time (ISO8601), default one hour before end"),
+    end: Optional[datetime] = Query(None, description="End time (ISO8601), default now"),
+    points: int = Query(default=300, ge=1, le=5000, description="Maximum points per chart"),
+    metrics: Optional[List[str]] = Query(None, description="Specific metrics to include"),
+    current_user: User = Depends(require_permission(PermissionScope.SYSTEM_READ))
+) -> Dict[str, Any]:
+    """Get metrics over a time range at the coarsest resolution giving enough points."""
+    try:
+        logger.info(f"Metrics range request by: {current_user.username}")
+        
+        # Aware and naive (UTC) bounds may be mixed
+        end = as_utc(end) if end else datetime.now(timezone.utc)
+        start = as_utc(start) if start else end - timedelta(hours=1)
+        if start >= end:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="start must be before end"
+            )
+        
+        return await metrics_history.query(start, end, points=points, fields=metrics)
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(f"Metrics range error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to retrieve metrics range"
+        )
+
+
 @router.get("/metrics/cpu")
 async def get_cpu_metrics(
     start: Optional[datetime] = Query(None, description="Start time (ISO8601)"),
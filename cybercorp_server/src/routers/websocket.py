@@ -1,21 +1,30 @@
 """WebSocket router for CyberCorp Server."""
 
 import json
-from typing import Dict, Any, Optional, Set
+from typing import Dict, Any, List, Optional, Set
 from datetime import datetime
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException, status, Query
 from pydantic import BaseModel
 
 from ..models.auth import User, PermissionScope
-from ..models.events import EventType, EventMessage
+from ..models.events import EventType, EventMessage, EventFilter, EventSubscription
 from ..auth import get_current_user, require_permission
+from ..event_bus import event_bus, events_of
 from ..websocket import websocket_manager
 from ..logging_config import get_logger
 
 router = APIRouter()
 logger = get_logger(__name__)
 
+# Permission needed to receive each event category; others need ADMIN
+EVENT_PERMISSIONS = {
+    "system.": PermissionScope.SYSTEM_READ,
+    "window.": PermissionScope.WINDOWS_READ,
+    "process.": PermissionScope.PROCESSES_READ,
+    "config.": PermissionScope.CONFIG_READ,
+}
+
 
 class WebSocketMessage(BaseModel):
     """WebSocket message model."""
@@ -30,385 +39,213 @@ class WebSocketSubscribe(BaseModel):
     filters: Optional[Dict[str, Any]] = None
 
 
-@router.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    """WebSocket endpoint for real-time communication."""
+async def _authenticate(websocket: WebSocket, permission: Optional[PermissionScope] = None) -> Optional[User]:
+    """Authenticate a WebSocket by its bearer token; closes it and returns None on failure."""
+    token = websocket.headers.get("Authorization", "").replace("Bearer ", "")
+    if not token:
+        await websocket.close(code=1008, reason="Missing authentication token")
+        return None
+    
+    try:
+        user = await get_current_user(token)
+    except Exception:
+        await websocket.close(code=1008, reason="Invalid authentication token")
+        return None
+    
+    if permission is not None and not user.has_permission(permission):
+        await websocket.close(code=1008, reason="Insufficient permissions")
+        return None
+    return user
+
+
+def _may_receive(user: User, event_type: EventType) -> bool:
+    """Whether a user has the permission for an event's category."""
+    category = event_type.value.split(".", 1)[0] + "."
+    return user.has_permission(EVENT_PERMISSIONS.get(category, PermissionScope.ADMIN))
+
+
+def _permitted_events(user: User) -> List[EventType]:
+    """Every event type the user may receive."""
+    return [event_type for event_type in EventType if _may_receive(user, event_type)]
+
+
+def _subscribe(websocket: WebSocket, client_id: str, event_types: List[EventType],
+               filters: Optional[EventFilter] = None):
+    """Subscribe a connection to the event bus (replacing its subscription).
+    
+    Matching events arrive as EventBatch frames through the connection's
+    send queue; an empty event_types list means every type.
+    """
+    subscription = EventSubscription(
+        subscription_id=client_id,
+        client_id=client_id,
+        connection_id=client_id,
+        event_types=event_types,
+        filters=filters
+    )
+    return event_bus.subscribe(
+        subscription, lambda batch: websocket_manager.send_personal_message(batch.json(), websocket)
+    )
+
+
+async def _event_stream(websocket: WebSocket, name: str, event_types: Optional[List[EventType]],
+                        permission: Optional[PermissionScope] = None, interactive: bool = False):
+    """Serve one WebSocket: authenticate, subscribe to the event bus, answer messages.
+    
+    event_types None subscribes to every type the user has the permission
+    for. Interactive connections may change their subscription (see
+    process_websocket_message); the others only answer pings.
+    """
     try:
         # Accept WebSocket connection
         await websocket.accept()
         
         # Authenticate user
-        token = websocket.headers.get("Authorization", "").replace("Bearer ", "")
-        if not token:
-            await websocket.close(code=1008, reason="Missing authentication token")
-            return
-        
-        try:
-            user = await get_current_user(token)
-        except Exception:
-            await websocket.close(code=1008, reason="Invalid authentication token")
+        user = await _authenticate(websocket, permission)
+        if user is None:
             return
         
-        # Add client to manager
-        client_id = await websocket_manager.add_client(websocket, user)
-        logger.info(f"WebSocket client connected: {client_id} ({user.username})")
+        client_id = await websocket_manager.connect(websocket)
+        if event_types is None:
+            event_types = _permitted_events(user)
+        if event_types:
+            _subscribe(websocket, client_id, event_types)
+        logger.info(f"{name.capitalize()} WebSocket client connected: {client_id} ({user.username})")
         
         try:
             # Send welcome message
             welcome_message = WebSocketMessage(
-                type="welcome",
+                type=f"{name}_welcome",
                 data={
                     "client_id": client_id,
                     "user": user.username,
-                    "timestamp": datetime.utcnow().isoformat()
+                    "subscribed_events": [t.value for t in event_types]
                 }
             )
-            await websocket.send_text(welcome_message.json())
+            await websocket_manager.send_personal_message(welcome_message.json(), websocket)
             
             # Handle messages
             while True:
+                data = await websocket.receive_text()
                 try:
-                    # Receive message
-                    data = await websocket.receive_text()
                     message = json.loads(data)
-                    
-                    # Process message
-                    await process_websocket_message(client_id, message, user)
-                    
                 except json.JSONDecodeError:
-                    error_message = WebSocketMessage(
-                        type="error",
-                        data={"message": "Invalid JSON format"}
-                    )
-                    await websocket.send_text(error_message.json())
-                    
-                except Exception as e:
-                    logger.error(f"WebSocket message processing error: {e}")
-                    error_message = WebSocketMessage(
-                        type="error",
-                        data={"message": str(e)}
+                    if interactive:
+                        error_message = WebSocketMessage(
+                            type="error",
+                            data={"message": "Invalid JSON format"}
+                        )
+                        await websocket_manager.send_personal_message(error_message.json(), websocket)
+                    continue
+                
+                if interactive:
+                    await process_websocket_message(websocket, client_id, message, user)
+                elif message.get("type") == "ping":
+                    pong_message = WebSocketMessage(
+                        type="pong",
+                        data={"timestamp": datetime.utcnow().isoformat()}
                     )
-                    await websocket.send_text(error_message.json())
+                    await websocket_manager.send_personal_message(pong_message.json(), websocket)
                     
         except WebSocketDisconnect:
-            logger.info(f"WebSocket client disconnected: {client_id}")
+            logger.info(f"{name.capitalize()} WebSocket client disconnected: {client_id}")
+        finally:
+            event_bus.unsubscribe(client_id)
+            websocket_manager.disconnect(websocket)
             
     except Exception as e:
-        logger.error(f"WebSocket connection error: {e}")
+        logger.error(f"{name.capitalize()} WebSocket connection error: {e}")
         try:
             await websocket.close(code=1011, reason="Internal server error")
         except:
             pass
 
 
+@router.websocket("/ws")
+async def websocket_endpoint(websocket: WebSocket):
+    """WebSocket endpoint for real-time communication."""
+    await _event_stream(websocket, "general", None, interactive=True)
+
+
 @router.websocket("/ws/system")
 async def websocket_system_endpoint(websocket: WebSocket):
     """WebSocket endpoint for system events."""
-    try:
-        # Accept WebSocket connection
-        await websocket.accept()
-        
-        # Authenticate user
-        token = websocket.headers.get("Authorization", "").replace("Bearer ", "")
-        if not token:
-            await websocket.close(code=1008, reason="Missing authentication token")
-            return
-        
-        try:
-            user = await get_current_user(token)
-            if not user.has_permission(PermissionScope.SYSTEM_READ):
-                await websocket.close(code=1008, reason="Insufficient permissions")
-                return
-        except Exception:
-            await websocket.close(code=1008, reason="Invalid authentication token")
-            return
-        
-        # Add client to system events
-        client_id = await websocket_manager.add_client(
-            websocket, user, event_types=[EventType.SYSTEM_METRICS]
-        )
-        logger.info(f"System WebSocket client connected: {client_id} ({user.username})")
-        
-        try:
-            # Send welcome message
-            welcome_message = WebSocketMessage(
-                type="system_welcome",
-                data={
-                    "client_id": client_id,
-                    "user": user.username,
-                    "subscribed_events": [EventType.SYSTEM_METRICS.value]
-                }
-            )
-            await websocket.send_text(welcome_message.json())
-            
-            # Keep connection alive
-            while True:
-                try:
-                    # Receive ping
-                    data = await websocket.receive_text()
-                    message = json.loads(data)
-                    
-                    if message.get("type") == "ping":
-                        pong_message = WebSocketMessage(
-                            type="pong",
-                            data={"timestamp": datetime.utcnow().isoformat()}
-                        )
-                        await websocket.send_text(pong_message.json())
-                        
-                except json.JSONDecodeError:
-                    pass
-                    
-        except WebSocketDisconnect:
-            logger.info(f"System WebSocket client disconnected: {client_id}")
-            
-    except Exception as e:
-        logger.error(f"System WebSocket connection error: {e}")
-        try:
-            await websocket.close(code=1011, reason="Internal server error")
-        except:
-            pass
+    await _event_stream(websocket, "system", events_of("system."), PermissionScope.SYSTEM_READ)
 
 
 @router.websocket("/ws/windows")
 async def websocket_windows_endpoint(websocket: WebSocket):
     """WebSocket endpoint for windows events."""
-    try:
-        # Accept WebSocket connection
-        await websocket.accept()
-        
-        # Authenticate user
-        token = websocket.headers.get("Authorization", "").replace("Bearer ", "")
-        if not token:
-            await websocket.close(code=1008, reason="Missing authentication token")
-            return
-        
-        try:
-            user = await get_current_user(token)
-            if not user.has_permission(PermissionScope.WINDOWS_READ):
-                await websocket.close(code=1008, reason="Insufficient permissions")
-                return
-        except Exception:
-            await websocket.close(code=1008, reason="Invalid authentication token")
-            return
-        
-        # Add client to windows events
-        client_id = await websocket_manager.add_client(
-            websocket, user, event_types=[EventType.WINDOWS_CHANGED]
-        )
-        logger.info(f"Windows WebSocket client connected: {client_id} ({user.username})")
-        
-        try:
-            # Send welcome message
-            welcome_message = WebSocketMessage(
-                type="windows_welcome",
-                data={
-                    "client_id": client_id,
-                    "user": user.username,
-                    "subscribed_events": [EventType.WINDOWS_CHANGED.value]
-                }
-            )
-            await websocket.send_text(welcome_message.json())
-            
-            # Keep connection alive
-            while True:
-                try:
-                    # Receive ping
-                    data = await websocket.receive_text()
-                    message = json.loads(data)
-                    
-                    if message.get("type") == "ping":
-                        pong_message = WebSocketMessage(
-                            type="pong",
-                            data={"timestamp": datetime.utcnow().isoformat()}
-                        )
-                        await websocket.send_text(pong_message.json())
-                        
-                except json.JSONDecodeError:
-                    pass
-                    
-        except WebSocketDisconnect:
-            logger.info(f"Windows WebSocket client disconnected: {client_id}")
-            
-    except Exception as e:
-        logger.error(f"Windows WebSocket connection error: {e}")
-        try:
-            await websocket.close(code=1011, reason="Internal server error")
-        except:
-            pass
+    await _event_stream(websocket, "windows", events_of("window."), PermissionScope.WINDOWS_READ)
 
 
 @router.websocket("/ws/processes")
 async def websocket_processes_endpoint(websocket: WebSocket):
     """WebSocket endpoint for processes events."""
-    try:
-        # Accept WebSocket connection
-        await websocket.accept()
-        
-        # Authenticate user
-        token = websocket.headers.get("Authorization", "").replace("Bearer ", "")
-        if not token:
-            await websocket.close(code=1008, reason="Missing authentication token")
-            return
-        
-        try:
-            user = await get_current_user(token)
-            if not user.has_permission(PermissionScope.PROCESSES_READ):
-                await websocket.close(code=1008, reason="Insufficient permissions")
-                return
-        except Exception:
-            await websocket.close(code=1008, reason="Invalid authentication token")
-            return
-        
-        # Add client to processes events
-        client_id = await websocket_manager.add_client(
-            websocket, user, event_types=[EventType.PROCESSES_CHANGED]
-        )
-        logger.info(f"Processes WebSocket client connected: {client_id} ({user.username})")
-        
-        try:
-            # Send welcome message
-            welcome_message = WebSocketMessage(
-                type="processes_welcome",
-                data={
-                    "client_id": client_id,
-                    "user": user.username,
-                    "subscribed_events": [EventType.PROCESSES_CHANGED.value]
-                }
-            )
-            await websocket.send_text(welcome_message.json())
-            
-            # Keep connection alive
-            while True:
-                try:
-                    # Receive ping
-                    data = await websocket.receive_text()
-                    message = json.loads(data)
-                    
-                    if message.get("type") == "ping":
-                        pong_message = WebSocketMessage(
-                            type="pong",
-                            data={"timestamp": datetime.utcnow().isoformat()}
-                        )
-                        await websocket.send_text(pong_message.json())
-                        
-                except json.JSONDecodeError:
-                    pass
-                    
-        except WebSocketDisconnect:
-            logger.info(f"Processes WebSocket client disconnected: {client_id}")
-            
-    except Exception as e:
-        logger.error(f"Processes WebSocket connection error: {e}")
-        try:
-            await websocket.close(code=1011, reason="Internal server error")
-        except:
-            pass
+    await _event_stream(websocket, "processes", events_of("process."), PermissionScope.PROCESSES_READ)
 
 
 @router.websocket("/ws/events")
 async def websocket_events_endpoint(websocket: WebSocket):
     """WebSocket endpoint for all events."""
-    try:
-        # Accept WebSocket connection
-        await websocket.accept()
-        
-        # Authenticate user
-        token = websocket.headers.get("Authorization", "").replace("Bearer ", "")
-        if not token:
-            await websocket.close(code=1008, reason="Missing authentication token")
-            return
-        
-        try:
-            user = await get_current_user(token)
-        except Exception:
-            await websocket.close(code=1008, reason="Invalid authentication token")
-            return
-        
-        # Add client to all events
-        client_id = await websocket_manager.add_client(websocket, user)
-        logger.info(f"Events WebSocket client connected: {client_id} ({user.username})")
-        
-        try:
-            # Send welcome message
-            welcome_message = WebSocketMessage(
-                type="events_welcome",
-                data={
-                    "client_id": client_id,
-                    "user": user.username,
-                    "subscribed_events": "all"
-                }
-            )
-            await websocket.send_text(welcome_message.json())
-            
-            # Handle messages
-            while True:
-                try:
-                    # Receive message
-                    data = await websocket.receive_text()
-                    message = json.loads(data)
-                    
-                    # Process message
-                    await process_websocket_message(client_id, message, user)
-                    
-                except json.JSONDecodeError:
-                    error_message = WebSocketMessage(
-                        type="error",
-                        data={"message": "Invalid JSON format"}
-                    )
-                    await websocket.send_text(error_message.json())
-                    
-                except Exception as e:
-                    logger.error(f"Events WebSocket message processing error: {e}")
-                    error_message = WebSocketMessage(
-                        type="error",
-                        data={"message": str(e)}
-                    )
-                    await websocket.send_text(error_message.json())
-                    
-        except WebSocketDisconnect:
-            logger.info(f"Events WebSocket client disconnected: {client_id}")
-            
-    except Exception as e:
-        logger.error(f"Events WebSocket connection error: {e}")
-        try:
-            await websocket.close(code=1011, reason="Internal server error")
-        except:
-            pass
+    await _event_stream(websocket, "events", None, interactive=True)
 
 
-async def process_websocket_message(client_id: str, message: Dict[str, Any], user: User):
+async def process_websocket_message(websocket: WebSocket, client_id: str, message: Dict[str, Any], user: User):
     """Process WebSocket message."""
     try:
         message_type = message.get("type")
         message_data = message.get("data", {})
         
         if message_type == "subscribe":
-            # Subscribe to events
-            event_types = message_data.get("event_types", [])
+            # Subscribe to events (replaces the current subscription);
+            # without event types, to every type the user may receive
+            event_types = [EventType(t) for t in message_data.get("event_types", [])]
             filters = message_data.get("filters", {})
             
-            await websocket_manager.subscribe_client(client_id, event_types, filters)
+            denied = [t.value for t in event_types if not _may_receive(user, t)]
+            if denied:
+                response = WebSocketMessage(
+                    type="error",
+                    data={"message": "Insufficient permissions", "event_types": denied}
+                )
+                await websocket_manager.send_personal_message(response.json(), websocket)
+                return
+            
+            event_types = event_types or _permitted_events(user)
+            if event_types:
+                _subscribe(websocket, client_id, event_types, EventFilter(**filters) if filters else None)
+            else:
+                event_bus.unsubscribe(client_id)
             
             response = WebSocketMessage(
                 type="subscribed",
                 data={
-                    "event_types": event_types,
+                    "event_types": [t.value for t in event_types],
                     "filters": filters
                 }
             )
-            await websocket_manager.send_to_client(client_id, response.json())
+            await websocket_manager.send_personal_message(response.json(), websocket)
             
         elif message_type == "unsubscribe":
-            # Unsubscribe from events
+            # Unsubscribe from events; without event types, from all of them
             event_types = message_data.get("event_types", [])
             
-            await websocket_manager.unsubscribe_client(client_id, event_types)
+            current = event_bus.get(client_id)
+            removed = {EventType(t) for t in event_types}
+            remaining = [t for t in (current.types if current and current.types is not None
+                                     else _permitted_events(user))
+                         if t not in removed]
+            if current is None or not removed or not remaining:
+                event_bus.unsubscribe(client_id)
+            else:
+                _subscribe(websocket, client_id, remaining, current.subscription.filters)
             
             response = WebSocketMessage(
                 type="unsubscribed",
                 data={"event_types": event_types}
             )
-            await websocket_manager.send_to_client(client_id, response.json())
+            await websocket_manager.send_personal_message(response.json(), websocket)
             
         elif message_type == "ping":
             # Respond to ping
@@ -416,7 +253,7 @@ async def process_websocket_message(client_id: str, message: Dict[str, Any], use
                 type="pong",
                 data={"timestamp": datetime.utcnow().isoformat()}
             )
-            await websocket_manager.send_to_client(client_id, response.json())
+            await websocket_manager.send_personal_message(response.json(), websocket)
             
         elif message_type == "get_clients":
             # Get connected clients (admin only)
@@ -426,13 +263,13 @@ async def process_websocket_message(client_id: str, message: Dict[str, Any], use
                     type="clients",
                     data={"clients": clients}
                 )
-                await websocket_manager.send_to_client(client_id, response.json())
+                await websocket_manager.send_personal_message(response.json(), websocket)
             else:
                 response = WebSocketMessage(
                     type="error",
                     data={"message": "Insufficient permissions"}
                 )
-                await websocket_manager.send_to_client(client_id, response.json())
+                await websocket_manager.send_personal_message(response.json(), websocket)
                 
         else:
             # Unknown message type
@@ -440,7 +277,7 @@ async def process_websocket_message(client_id: str, message: Dict[str, Any], use
                 type="error",
                 data={"message": f"Unknown message type: {message_type}"}
             )
-            await websocket_manager.send_to_client(client_id, response.json())
+            await websocket_manager.send_personal_message(response.json(), websocket)
             
     except Exception as e:
         logger.error(f"WebSocket message processing error: {e}")
@@ -448,7 +285,7 @@ async def process_websocket_message(client_id: str, message: Dict[str, Any], use
             type="error",
             data={"message": str(e)}
         )
-        await websocket_manager.send_to_client(client_id, response.json())
+        await websocket_manager.send_personal_message(response.json(), websocket)
 
 
 @router.get("/clients", response_model=Dict[str, Any])
@@ -488,7 +325,7 @@ async def disconnect_websocket_client(
         )
         
         # Disconnect client
-        result = await websocket_manager.disconnect_client(client_id)
+        result = await websocket_manager.disconnect_client(client_id, reason="Disconnected by administrator")
         
         if not result.get("success"):
             raise HTTPException(
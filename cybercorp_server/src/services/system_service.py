@@ -10,6 +10,8 @@ import json
 
 from ..logging_config import get_logger
 from ..config import get_settings
+from ..metrics_history import metrics_history
+from ..metrics_sampler import metrics_sampler
 
 logger = get_logger(__name__)
 
@@ -66,40 +68,28 @@ class SystemService:
     async def get_system_status(self) -> Dict[str, Any]:
         """Get current system status."""
         try:
-            # Get current system status
-            cpu_percent = psutil.cpu_percent(interval=0.1)
-            memory = psutil.virtual_memory()
-            disk = psutil.disk_usage('/')
-            network_io = psutil.net_io_counters()
+            # Latest snapshot of the shared sampler; no per-request sampling
+            snapshot = await metrics_sampler.current()
             
             status = {
                 "cpu": {
-                    "percent": cpu_percent,
-                    "per_cpu": psutil.cpu_percent(interval=0.1, percpu=True)
+                    "percent": snapshot.cpu_percent,
+                    "per_cpu": list(snapshot.per_cpu_percent)
                 },
                 "memory": {
-                    "total": memory.total,
-                    "available": memory.available,
-                    "used": memory.used,
-                    "percent": memory.percent
+                    "total": snapshot.memory_total,
+                    "available": snapshot.memory_available,
+                    "used": snapshot.memory_used,
+                    "percent": snapshot.memory_percent
                 },
                 "disk": {
-                    "total": disk.total,
-                    "used": disk.used,
-                    "free": disk.free,
-                    "percent": disk.percent
+                    "total": snapshot.disk_total,
+                    "used": snapshot.disk_used,
+                    "free": snapshot.disk_free,
+                    "percent": snapshot.disk_percent
                 },
-                "network": {
-                    "bytes_sent": network_io.bytes_sent,
-                    "bytes_recv": network_io.bytes_recv,
-                    "packets_sent": network_io.packets_sent,
-                    "packets_recv": network_io.packets_recv,
-                    "errin": network_io.errin,
-                    "errout": network_io.errout,
-                    "dropin": network_io.dropin,
-                    "dropout": network_io.dropout
-                },
-                "timestamp": datetime.utcnow().isoformat()
+                "network": dict(snapshot.network),
+                "timestamp": snapshot.timestamp.isoformat()
             }
             
             return status
@@ -292,38 +282,17 @@ class SystemService:
             "interval": self.monitoring_interval
         }
     
-    async def get_system_metrics(self, start_time: Optional[datetime] = None, end_time: Optional[datetime] = None, metric_type: Optional[str] = None) -> List[Dict[str, Any]]:
-        """Get historical system metrics."""
+    async def get_system_metrics(self, start_time: Optional[datetime] = None, end_time: Optional[datetime] = None, metric_type: Optional[str] = None, points: int = 300) -> List[Dict[str, Any]]:
+        """Get historical system metrics (at most points points, from the metrics history)."""
         try:
-            # This is a placeholder - actual implementation would retrieve metrics from a database
-            # For demonstration purposes only
-            
-            # Simulated metrics
             if not start_time:
                 start_time = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
             if not end_time:
                 end_time = datetime.utcnow()
             
-            metrics = []
-            current_time = start_time
-            
-            while current_time <= end_time:
-                # Generate simulated metric for this time point
-                metric = {
-                    "timestamp": current_time.isoformat(),
-                    "cpu_percent": 50.0,  # Simulated value
-                    "memory_percent": 60.0,  # Simulated value
-                    "disk_percent": 70.0,  # Simulated value
-                    "network_bytes_sent": 1000,  # Simulated value
-                    "network_bytes_recv": 2000  # Simulated value
-                }
-                
-                metrics.append(metric)
-                
-                # Move to next time point (hourly)
-                current_time = current_time.replace(hour=current_time.hour + 1)
-            
-            return metrics
+            fields = [metric_type] if metric_type else None
+            history = await metrics_history.query(start_time, end_time, points=points, fields=fields)
+            return history["points"]
         except Exception as e:
             logger.error(f"Error getting system metrics: {e}")
             raise
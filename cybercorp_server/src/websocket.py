@@ -1,45 +1,274 @@
-"""WebSocket manager for CyberCorp server."""
+"""WebSocket manager for CyberCorp server.
+
+Broadcasts fan out through per-connection send queues: a message is
+serialized once, appended to every connection's bounded queue without
+waiting, and each connection's own writer task sends from its queue. A slow
+client only grows (up to max_queue) its own queue; what happens when that is
+full is the overflow policy:
+
+    drop_oldest      discard the oldest queued message
+    coalesce_latest  discard everything queued, so only the newest is sent
+                     (for state such as metrics, where newer supersedes older)
+    disconnect       close the connection (code 1013, try again later)
+"""
 import asyncio
-from typing import List, Any, Optional
+import logging
+import time
+import uuid
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, Union
 from fastapi import WebSocket
+from starlette.websockets import WebSocketState
+from pydantic import BaseModel
 import json
 from datetime import datetime
 
+from .config import OverflowPolicy, get_config
+
+logger = logging.getLogger(__name__)
+
+# Close code for clients disconnected by the overflow policy
+CLOSE_TOO_SLOW = 1013
+
+
+def serialize(message: Union[str, Dict[str, Any], BaseModel]) -> str:
+    """Message text; strings are sent as they are."""
+    if isinstance(message, str):
+        return message
+    if isinstance(message, BaseModel):
+        return message.json()
+    return json.dumps(message, default=str)
+
+
+class ClientChannel:
+    """One connection's bounded send queue, drained by its own writer task.
+
+    Args:
+        websocket: Accepted connection
+        max_queue: Messages queued at most
+        overflow: What to do when the queue is full
+        on_closed: Called with the channel once it stops sending for good
+        client_id: Identifier of the connection; a random one by default
+    """
+
+    def __init__(self, websocket: WebSocket, max_queue: int = 1000,
+                 overflow: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+                 on_closed: Optional[Callable[['ClientChannel'], None]] = None,
+                 client_id: Optional[str] = None):
+        self.websocket = websocket
+        self.client_id = client_id or uuid.uuid4().hex
+        self.max_queue = max(1, max_queue)
+        self.overflow = OverflowPolicy(overflow)
+        self.closed = False
+        self.connected_at = time.monotonic()
+        self._on_closed = on_closed
+        self._queue: Deque[Tuple[str, float]] = deque()
+        self._wakeup = asyncio.Event()
+        self._closing: Optional[asyncio.Task] = None
+
+        # Lag metrics; lag is the time from queueing to send_text returning
+        self.sent = 0
+        self.dropped = 0
+        self.bytes_sent = 0
+        self.max_depth = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._total_lag = 0.0
+
+        self._writer = asyncio.create_task(self._write())
+
+    @property
+    def depth(self) -> int:
+        """Messages waiting to be sent."""
+        return len(self._queue)
+
+    def offer(self, payload: str, queued_at: Optional[float] = None) -> bool:
+        """Queue payload without waiting; False if the connection is closed or closing."""
+        if self.closed:
+            return False
+        if len(self._queue) >= self.max_queue:
+            if self.overflow is OverflowPolicy.DISCONNECT:
+                self.stop()
+                self._closing = asyncio.create_task(self._close_socket(CLOSE_TOO_SLOW, "Client too slow"))
+                return False
+            if self.overflow is OverflowPolicy.COALESCE_LATEST:
+                self.dropped += len(self._queue)
+                self._queue.clear()
+            else:
+                self._queue.popleft()
+                self.dropped += 1
+        self._queue.append((payload, time.monotonic() if queued_at is None else queued_at))
+        self.max_depth = max(self.max_depth, len(self._queue))
+        self._wakeup.set()
+        return True
+
+    async def _write(self):
+        """Send queued messages in order until closed or a send fails."""
+        try:
+            while True:
+                while not self._queue:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                payload, queued_at = self._queue.popleft()
+                await self.websocket.send_text(payload)
+                lag = time.monotonic() - queued_at
+                self.sent += 1
+                self.bytes_sent += len(payload)
+                self.last_lag = lag
+                self.max_lag = max(self.max_lag, lag)
+                self._total_lag += lag
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.debug(f"WebSocket send failed, dropping connection: {e}")
+            self._stopped()
+
+    def _stopped(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.dropped += len(self._queue)
+        self._queue.clear()
+        if self._on_closed is not None:
+            self._on_closed(self)
+
+    def stop(self):
+        """Stop sending (the connection is already gone or closed elsewhere)."""
+        self._stopped()
+        if asyncio.current_task() is not self._writer:
+            self._writer.cancel()
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        """Stop sending and close the connection."""
+        self.stop()
+        await self._close_socket(code, reason)
+
+    async def _close_socket(self, code: int, reason: str):
+        try:
+            await self.websocket.close(code=code, reason=reason)
+        except Exception:
+            pass  # Already closed by the client
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue and lag metrics of this connection."""
+        return {
+            "client_id": self.client_id,
+            "client": f"{self.websocket.client.host}:{self.websocket.client.port}"
+            if getattr(self.websocket, "client", None) else None,
+            "connected_seconds": round(time.monotonic() - self.connected_at, 1),
+            "queued": self.depth,
+            "max_queued": self.max_depth,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "bytes_sent": self.bytes_sent,
+            "last_lag_ms": round(self.last_lag * 1000, 2),
+            "max_lag_ms": round(self.max_lag * 1000, 2),
+            "avg_lag_ms": round(self._total_lag / self.sent * 1000, 2) if self.sent else 0.0,
+        }
+
 
 class ConnectionManager:
-    """WebSocket connection manager."""
-    
-    def __init__(self):
+    """WebSocket connection manager.
+
+    Args:
+        max_queue: Messages queued per connection; defaults to the websocket
+            config's message_queue_size
+        overflow: Overflow policy; defaults to the websocket config's
+    """
+
+    def __init__(self, max_queue: Optional[int] = None, overflow: Optional[OverflowPolicy] = None):
         """Initialize the manager."""
-        self.active_connections: List[WebSocket] = []
-        
-    async def connect(self, websocket: WebSocket):
-        """Accept a new WebSocket connection."""
-        await websocket.accept()
-        self.active_connections.append(websocket)
-        
+        if max_queue is None or overflow is None:
+            settings = get_config().websocket
+            max_queue = settings.message_queue_size if max_queue is None else max_queue
+            overflow = settings.overflow_policy if overflow is None else overflow
+        self.max_queue = max_queue
+        self.overflow = OverflowPolicy(overflow)
+        self.channels: Dict[str, ClientChannel] = {}  # By client ID
+        self._client_ids: Dict[WebSocket, str] = {}
+        self._running = False
+
+    @property
+    def active_connections(self) -> List[WebSocket]:
+        """Connected WebSockets."""
+        return [channel.websocket for channel in self.channels.values()]
+
+    async def connect(self, websocket: WebSocket, client_id: Optional[str] = None) -> str:
+        """Accept a new WebSocket connection (if not accepted yet) and start its writer.
+
+        Returns the connection's client ID (client_id, or a random one).
+        """
+        if getattr(websocket, "application_state", WebSocketState.CONNECTING) == WebSocketState.CONNECTING:
+            await websocket.accept()
+        channel = ClientChannel(websocket, self.max_queue, self.overflow, self._closed, client_id)
+        self.channels[channel.client_id] = channel
+        self._client_ids[websocket] = channel.client_id
+        return channel.client_id
+
+    def _channel(self, websocket: WebSocket) -> Optional[ClientChannel]:
+        return self.channels.get(self._client_ids.get(websocket))
+
+    def _closed(self, channel: ClientChannel):
+        if self.channels.get(channel.client_id) is channel:
+            del self.channels[channel.client_id]
+            self._client_ids.pop(channel.websocket, None)
+
     def disconnect(self, websocket: WebSocket):
         """Remove a WebSocket connection."""
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-            
-    async def send_personal_message(self, message: str, websocket: WebSocket):
-        """Send a message to a specific connection."""
-        await websocket.send_text(message)
-        
-    async def broadcast(self, message: str):
-        """Broadcast a message to all connections."""
-        disconnected = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except Exception:
-                disconnected.append(connection)
-                
-        # Clean up disconnected connections
-        for conn in disconnected:
-            if conn in self.active_connections:
-                self.active_connections.remove(conn)
+        channel = self._channel(websocket)
+        if channel is not None:
+            self._closed(channel)
+            channel.stop()
+
+    async def disconnect_client(self, client_id: str, code: int = 1000,
+                                reason: str = "Disconnected by server") -> Dict[str, Any]:
+        """Close a connection by its client ID."""
+        channel = self.channels.get(client_id)
+        if channel is None:
+            return {"success": False, "message": f"Client {client_id} not found"}
+        self._closed(channel)
+        await channel.close(code, reason)
+        return {"success": True, "message": f"Client {client_id} disconnected"}
+
+    async def send_personal_message(self, message: Union[str, Dict[str, Any], BaseModel], websocket: WebSocket):
+        """Send a message to a specific connection, after what is already queued for it."""
+        channel = self._channel(websocket)
+        if channel is None:
+            await websocket.send_text(serialize(message))
+        else:
+            channel.offer(serialize(message))
+
+    async def broadcast(self, message: Union[str, Dict[str, Any], BaseModel]) -> Dict[str, Any]:
+        """Queue a message for all connections; returns without waiting for any send."""
+        payload = serialize(message)
+        queued_at = time.monotonic()
+        channels = list(self.channels.values())
+        dropped = sum(channel.dropped for channel in channels)
+        queued = sum(channel.offer(payload, queued_at) for channel in channels)
+        return {
+            "success": True,
+            "recipients": queued,
+            "disconnected": len(channels) - queued,
+            "dropped": sum(channel.dropped for channel in channels) - dropped,
+            "bytes": len(payload),
+        }
+
+    async def get_clients(self) -> List[Dict[str, Any]]:
+        """Queue and lag metrics of every connection."""
+        return [channel.stats() for channel in self.channels.values()]
+
+    def is_running(self) -> bool:
+        """Check if the manager is serving connections."""
+        return self._running
+
+    async def start(self):
+        """Start serving connections."""
+        self._running = True
+
+    async def stop(self, code: int = 1001, reason: str = "Server shutting down"):
+        """Close every connection."""
+        self._running = False
+        await asyncio.gather(*(channel.close(code, reason) for channel in list(self.channels.values())))
 
 
 class DashboardManager:
@@ -47,7 +276,8 @@ class DashboardManager:
     
     def __init__(self):
         """Initialize dashboard manager."""
-        self.manager = ConnectionManager()
+        # Metrics supersede each other: a slow dashboard only needs the newest
+        self.manager = ConnectionManager(max_queue=1, overflow=OverflowPolicy.COALESCE_LATEST)
         self._update_task: Optional[asyncio.Task] = None
         
     def start(self):
@@ -63,27 +293,25 @@ class DashboardManager:
             
     async def _update_loop(self):
         """Update loop for dashboard data."""
+        # Import here to avoid circular dependency
+        from .metrics_sampler import metrics_sampler
+        
         try:
-            while True:
-                await asyncio.sleep(2)  # Update every 2 seconds
-                await self._broadcast_metrics()
+            async for snapshot in metrics_sampler.stream(every=2):  # Update every 2 seconds
+                await self._broadcast_metrics(snapshot)
         except asyncio.CancelledError:
             pass
             
-    async def _broadcast_metrics(self):
-        """Broadcast metrics to connected clients."""
+    async def _broadcast_metrics(self, snapshot):
+        """Broadcast a metrics snapshot to connected clients."""
         try:
-            # Import here to avoid circular dependency
-            from .monitoring import monitoring_service
-            
-            metrics = await monitoring_service.get_system_metrics()
             message = {
                 "type": "metrics",
-                "data": metrics,
+                "data": snapshot.to_dict(),
                 "timestamp": datetime.utcnow().isoformat()
             }
             
-            await self.manager.broadcast(json.dumps(message))
+            await self.manager.broadcast(message)
             
         except Exception as e:
             # Handle errors gracefully
@@ -92,7 +320,7 @@ class DashboardManager:
                 "data": {"error": str(e)},
                 "timestamp": datetime.utcnow().isoformat()
             }
-            await self.manager.broadcast(json.dumps(error_message))
+            await self.manager.broadcast(error_message)
 
 
 # Global WebSocket managers
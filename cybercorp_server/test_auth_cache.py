@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""认证热路径（令牌与用户缓存、密码哈希线程池）单元测试"""
+
+import asyncio
+import os
+import tempfile
+import time
+
+import bcrypt
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.auth import AuthManager, TTLCache
+from src.database import DatabaseManager
+from src.models.auth import User, UserUpdate
+
+
+class MemoryUsers:
+    """内存用户存储，记录读取次数"""
+
+    def __init__(self, rounds=4):
+        self.users = {}
+        self.passwords = {}
+        self.loads = 0
+        self.rounds = rounds
+
+    def add(self, username, password, **kwargs):
+        user = User(id=str(len(self.users) + 1), username=username, **kwargs)
+        self.users[user.id] = user
+        self.passwords[user.id] = bcrypt.hashpw(password.encode(), bcrypt.gensalt(self.rounds)).decode()
+        return user
+
+    async def get_user_by_username(self, username):
+        self.loads += 1
+        await asyncio.sleep(0)
+        return next((u for u in self.users.values() if u.username == username), None)
+
+    async def get_user_password(self, user_id):
+        return self.passwords.get(user_id)
+
+    async def set_user_password(self, user_id, hashed_password):
+        self.passwords[user_id] = hashed_password
+        return True
+
+    async def update_user(self, user_id, changes):
+        user = self.users[user_id] = self.users[user_id].copy(update=changes)
+        return user
+
+    async def delete_user(self, user_id):
+        return self.users.pop(user_id, None) is not None
+
+
+def manager(store, **kwargs):
+    return AuthManager(database=store, cache_ttl=kwargs.pop("cache_ttl", 60), cache_size=100, **kwargs)
+
+
+def token_for(auth, user):
+    return auth.create_access_token({"sub": user.username})
+
+
+async def rejection(auth, token):
+    with pytest.raises(HTTPException) as error:
+        await auth.get_current_user(token)
+    return error.value.detail
+
+
+class TestTTLCache:
+    """测试 TTL 缓存"""
+
+    def test_expiry_and_eviction(self):
+        """测试过期与按最近最少使用淘汰"""
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        assert cache.get("a") == 1
+        cache.set("c", 3)  # Evicts b, the least recently used
+        assert cache.get("b") is None and cache.get("a") == 1 and cache.get("c") == 3
+
+        cache.set("short", 4, ttl=0.01)
+        time.sleep(0.02)
+        assert cache.get("short") is None
+        assert cache.stats()["hits"] == 3
+
+
+class TestAuthCache:
+    """测试令牌与用户缓存及其失效"""
+
+    def test_requests_hit_the_cache(self):
+        """测试重复请求不再解码令牌或读取数据库"""
+        async def run():
+            store = MemoryUsers()
+            alice = store.add("alice@example.com", "secret-password")
+            auth = manager(store)
+            token = token_for(auth, alice)
+            for _ in range(100):
+                assert (await auth.get_current_user(token)).id == alice.id
+            assert store.loads == 1
+            assert auth.cache_stats()["tokens"]["hits"] == 99
+
+            assert await rejection(auth, token + "x") == "Invalid token"
+
+            # Disabled cache: every request reloads
+            uncached = manager(store, cache_ttl=0)
+            await uncached.get_current_user(token)
+            await uncached.get_current_user(token)
+            assert store.loads == 3
+
+        asyncio.run(run())
+
+    def test_logout_password_change_and_deactivation(self):
+        """测试注销、修改密码与停用后令牌立即失效"""
+        async def run():
+            store = MemoryUsers()
+            alice = store.add("alice@example.com", "secret-password")
+            bob = store.add("bob@example.com", "secret-password")
+            auth = manager(store)
+
+            first, second = token_for(auth, alice), token_for(auth, alice)
+            await auth.get_current_user(first)
+            await auth.invalidate_token(first)
+            assert await rejection(auth, first) == "Token has been revoked"
+            await auth.get_current_user(second)
+
+            await auth.change_password(alice, "another-password")
+            assert await rejection(auth, second) == "Token has been revoked"
+            assert await auth.authenticate_user(alice.username, "secret-password") is None
+            assert (await auth.authenticate_user(alice.username, "another-password")).id == alice.id
+            await auth.get_current_user(token_for(auth, alice))
+
+            token = token_for(auth, bob)
+            await auth.get_current_user(token)
+            await auth.update_user(bob.id, UserUpdate(is_active=False))
+            assert await rejection(auth, token) == "User is inactive"
+
+            token = token_for(auth, alice)
+            await auth.get_current_user(token)
+            assert await auth.delete_user(alice.id)
+            assert await rejection(auth, token) == "User not found"
+
+            # Refresh tokens are not access tokens
+            assert await rejection(auth, auth.create_refresh_token(bob.username)) == "Invalid token"
+
+        asyncio.run(run())
+
+    def test_refresh_token(self):
+        """测试刷新令牌换取访问令牌，并受注销与修改密码规则约束"""
+        async def run():
+            store = MemoryUsers()
+            alice = store.add("alice@example.com", "secret-password")
+            auth = manager(store)
+
+            refresh = auth.create_refresh_token(alice.username)
+            response = await auth.refresh_token(refresh)
+            assert response.refresh_token == refresh and response.expires_in == auth.access_token_expire_minutes * 60
+            assert (await auth.get_current_user(response.access_token)).id == alice.id
+
+            # Access tokens cannot be used to refresh
+            with pytest.raises(HTTPException) as error:
+                await auth.refresh_token(response.access_token)
+            assert error.value.detail == "Invalid token"
+
+            await auth.change_password(alice, "another-password")
+            with pytest.raises(HTTPException) as error:
+                await auth.refresh_token(refresh)
+            assert error.value.detail == "Token has been revoked"
+
+            refresh = auth.create_refresh_token(alice.username)
+            await auth.update_user(alice.id, UserUpdate(is_active=False))
+            with pytest.raises(HTTPException) as error:
+                await auth.refresh_token(refresh)
+            assert error.value.detail == "User is inactive"
+
+        asyncio.run(run())
+
+    def test_logins_do_not_block_the_loop(self):
+        """测试密码校验在线程池中进行，事件循环保持响应"""
+        async def run():
+            store = MemoryUsers(rounds=10)
+            alice = store.add("alice@example.com", "secret-password")
+            auth = manager(store, hash_workers=2)
+            gaps = []
+
+            async def heartbeat():
+                last = time.perf_counter()
+                while True:
+                    await asyncio.sleep(0.005)
+                    now = time.perf_counter()
+                    gaps.append(now - last)
+                    last = now
+
+            ticker = asyncio.create_task(heartbeat())
+            results = await asyncio.gather(*(auth.authenticate_user(alice.username, "secret-password")
+                                             for _ in range(4)))
+            ticker.cancel()
+            assert all(user.id == alice.id for user in results)
+            assert max(gaps) < 0.05, max(gaps)
+
+        asyncio.run(run())
+
+
+class TestUserStore:
+    """测试数据库用户存储与认证缓存失效"""
+
+    def test_database_users(self):
+        """测试默认管理员、修改密码、停用与删除用户"""
+        async def run():
+            with tempfile.TemporaryDirectory() as tmp:
+                engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(tmp, 'users.db')}")
+                database = DatabaseManager(engine)
+                await database.initialize()
+                auth = AuthManager(database=database, cache_ttl=60, cache_size=100)
+
+                await auth.initialize()
+                await auth.initialize()  # Only when there are no users
+                [admin] = await database.get_users()
+                assert await auth.authenticate_user(admin.username, "admin123") == admin
+                assert (await database.get_user(admin.id)).username == admin.username
+
+                token = token_for(auth, admin)
+                assert (await auth.get_current_user(token)).id == admin.id
+                assert await auth.change_password(admin, "another-password")
+                assert await rejection(auth, token) == "Token has been revoked"
+                assert await auth.authenticate_user(admin.username, "another-password") == admin
+
+                token = token_for(auth, admin)
+                await auth.get_current_user(token)
+                updated = await auth.update_user(admin.id, UserUpdate(is_active=False))
+                assert updated.is_active is False
+                assert await rejection(auth, token) == "User is inactive"
+                assert await auth.update_user("missing", UserUpdate(is_active=False)) is None
+
+                assert await auth.delete_user(admin.id) and not await auth.delete_user(admin.id)
+                assert await rejection(auth, token) == "User not found"
+                assert not await database.set_user_password(admin.id, "hash")
+                await database.close()
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""事件总线（索引订阅匹配与批量投递）单元测试"""
+
+import asyncio
+import random
+
+import pytest
+
+from src.event_bus import EventBus, events_of
+from src.models.events import Event, EventFilter, EventSeverity, EventSubscription, EventType
+
+SOURCES = ["monitoring", "auth", "windows", "processes"]
+
+
+def event(n, event_type=EventType.SYSTEM_METRICS_UPDATE, source="monitoring",
+          severity=EventSeverity.INFO, **kwargs):
+    return Event(id=str(n), type=event_type, source=source, severity=severity, message="test", **kwargs)
+
+
+def subscription(subscription_id, event_types=(), **filters):
+    return EventSubscription(subscription_id=subscription_id, client_id=subscription_id,
+                             connection_id=subscription_id, event_types=list(event_types),
+                             filters=EventFilter(**filters) if filters else None)
+
+
+class TestMatching:
+    """测试索引匹配"""
+
+    def test_index_agrees_with_filters(self):
+        """测试索引匹配结果与逐个评估过滤器一致"""
+        rng = random.Random(7)
+        types, severities = list(EventType), list(EventSeverity)
+        bus = EventBus()
+        for n in range(300):
+            filters = {}
+            if rng.random() < 0.5:
+                filters["sources"] = rng.sample(SOURCES, rng.randint(1, 2))
+            if rng.random() < 0.5:
+                filters["severities"] = rng.sample(severities, rng.randint(1, 3))
+            if rng.random() < 0.3:
+                filters["types"] = rng.sample(types, 4)
+            event_types = rng.sample(types, rng.randint(1, 5)) if rng.random() < 0.7 else ()
+            bus.subscribe(subscription(f"s{n}", event_types, **filters), lambda batch: None)
+        subscribers = list(bus._subscribers.values())
+
+        for n in range(500):
+            e = event(n, rng.choice(types), rng.choice(SOURCES), rng.choice(severities))
+            expected = {s.id for s in subscribers if s.matches(e)}
+            assert {s.id for s in bus.match(e)} == expected
+            assert len(bus.match(e)) == len(expected)  # No subscription twice
+
+    def test_residual_filters_and_unsubscribe(self):
+        """测试索引之外的过滤条件与取消订阅"""
+        async def run():
+            bus = EventBus(batch_size=1)
+            got = []
+            bus.subscribe(subscription("tagged", tags=["gpu"], user_id="u1"), got.append)
+            bus.subscribe(subscription("windows", events_of("window.")), got.append)
+            assert bus.publish(event(1, tags=["gpu"], user_id="u1")) == 1
+            assert bus.publish(event(2, tags=["cpu"], user_id="u1")) == 0
+            assert bus.publish(event(3, EventType.WINDOW_MOVED)) == 1
+            assert [batch.events[0].id for batch in got] == ["1", "3"]
+
+            assert bus.unsubscribe("windows") and not bus.unsubscribe("windows")
+            assert bus.publish(event(4, EventType.WINDOW_MOVED)) == 0
+            assert bus.get_stats()["index_keys"] == 1
+
+        asyncio.run(run())
+
+
+class TestBatching:
+    """测试批量投递"""
+
+    def test_batches_by_size_and_window(self):
+        """测试按数量或时间窗口成批投递"""
+        async def run():
+            bus = EventBus(batch_size=10, window=0.05)
+            batches = []
+            bus.subscribe(subscription("all"), batches.append)
+            for n in range(25):
+                bus.publish(event(n))
+            assert [batch.total_count for batch in batches] == [10, 10]
+            await asyncio.sleep(0.1)
+            assert [batch.total_count for batch in batches] == [10, 10, 5]
+            assert [e.id for batch in batches for e in batch.events] == [str(n) for n in range(25)]
+
+        asyncio.run(run())
+
+    def test_async_delivery_and_flush(self):
+        """测试异步投递回调与取消订阅时投递剩余事件"""
+        async def run():
+            bus = EventBus(batch_size=100, window=60)
+            delivered = []
+
+            async def deliver(batch):
+                await asyncio.sleep(0)
+                delivered.append(batch.total_count)
+
+            bus.subscribe(subscription("slow"), deliver)
+            for n in range(3):
+                bus.publish(event(n))
+            bus.unsubscribe("slow", flush=True)
+            await asyncio.sleep(0.01)
+            assert delivered == [3]
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""指标历史（环形缓冲与 SQLite 汇总）单元测试"""
+
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.metrics_history import (FIELDS, MetricRollupRecord, MetricsHistory, Rollup, RingBuffer,
+                                 choose_resolution)
+
+
+def values(value):
+    return {name: float(value) for name in FIELDS}
+
+
+class TestRingBuffer:
+    """测试环形缓冲"""
+
+    def test_wraps_and_ranges(self):
+        """测试覆盖最旧样本与区间查询"""
+        ring = RingBuffer(FIELDS, capacity=5)
+        for t in range(8):
+            ring.append(float(t), values(t))
+        assert len(ring) == 5 and ring.oldest == 3.0
+        times, columns = ring.range(4, 6)
+        assert list(times) == [4.0, 5.0, 6.0]
+        assert list(columns["cpu_percent"]) == [4.0, 5.0, 6.0]
+
+
+class TestRollups:
+    """测试逐级汇总"""
+
+    def test_rollup_closes_buckets(self):
+        """测试桶在越界时关闭，均值与最大值正确"""
+        rollup = Rollup(10)
+        closed = [rollup.add(t, values(t), values(t)) for t in range(25)]
+        rows = [row for row in closed if row]
+        assert [row["bucket_start"] for row in rows] == [0, 10]
+        assert rows[0]["samples"] == 10
+        assert rows[0]["cpu_percent"] == 4.5 and rows[0]["cpu_percent_max"] == 9
+
+    def test_choose_resolution(self):
+        """测试选择满足点数的最粗分辨率"""
+        everything = lambda resolution: True  # noqa: E731
+        assert choose_resolution(86400, 300, everything) == 60
+        assert choose_resolution(3600, 300, everything) == 10
+        assert choose_resolution(600, 300, everything) == 1
+        assert choose_resolution(86400, 20, everything) == 3600
+        # Ranges older than the raw buffer use the finest rollup
+        assert choose_resolution(600, 300, lambda resolution: resolution != 1) == 10
+
+
+class TestMetricsHistory:
+    """测试历史记录与区间查询"""
+
+    def test_day_of_samples(self):
+        """测试一天的秒级样本：查询行数有界且均值一致"""
+        async def run(path):
+            engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+            async with engine.begin() as conn:
+                await conn.run_sync(MetricRollupRecord.__table__.create)
+            history = MetricsHistory(sessionmaker(engine, class_=AsyncSession, expire_on_commit=False),
+                                     retention={10: 10 ** 10, 60: 10 ** 10, 3600: 10 ** 10})
+
+            start = float(int(time.time()) // 3600 * 3600 - 86400)
+            for t in range(86400 + 3600):
+                history.record_values(start + t, values(t % 100))
+            await history.flush()
+            # 25 h of 10 s, 1 min and 1 h buckets; the last of each is still open
+            assert history.rows_written == 8999 + 1499 + 24
+
+            def moment(seconds):
+                return datetime.fromtimestamp(start + seconds, timezone.utc)
+
+            day = await history.query(moment(0), moment(86400), points=300)
+            assert day["resolution"] == 60 and day["step"] == 300
+            assert len(day["points"]) <= 300
+            assert day["points"][0]["samples"] == 300
+            assert abs(day["points"][0]["cpu_percent"] - 49.5) < 1e-6
+            assert day["points"][0]["cpu_percent_max"] == 99
+
+            # Recent minutes come from the raw ring buffer
+            recent = await history.query(moment(86400 + 3000), moment(86400 + 3599), points=600,
+                                         fields=["cpu_percent"])
+            assert recent["resolution"] == 1 and recent["fields"] == ["cpu_percent"]
+            assert len(recent["points"]) == 600
+            assert "memory_percent" not in recent["points"][0]
+
+            with pytest.raises(ValueError):
+                await history.query(moment(0), moment(60), fields=["temperature"])
+
+            # Naive bounds are UTC, like aware ones
+            naive = await history.query(moment(0).replace(tzinfo=None), moment(86400), points=300)
+            assert naive["points"] == day["points"]
+            await engine.dispose()
+
+        with tempfile.TemporaryDirectory() as directory:
+            asyncio.run(run(os.path.join(directory, "history.db")))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""共享指标采样器单元测试"""
+
+import asyncio
+import time
+
+import pytest
+
+from src.metrics_sampler import MetricsSampler
+from src.monitoring import MonitoringService
+
+
+class TestMetricsSnapshot:
+    """测试指标快照"""
+
+    def test_snapshot_is_immutable(self):
+        """测试快照不可修改"""
+        snapshot = MetricsSampler().collect()
+        with pytest.raises(AttributeError):
+            snapshot.cpu_percent = 1.0
+        with pytest.raises(TypeError):
+            snapshot.network["bytes_sent"] = 0
+        assert isinstance(snapshot.per_cpu_percent, tuple)
+
+    def test_snapshot_format(self):
+        """测试快照格式与序列化缓存"""
+        sampler = MetricsSampler()
+        first, second = sampler.collect(), sampler.collect()
+        assert second.sequence == first.sequence + 1
+        assert second.network_sent_rate >= 0
+
+        metrics = second.to_dict()
+        assert set(metrics) == {"cpu", "memory", "disk", "network", "processes", "timestamp"}
+        assert metrics["processes"]["count"] > 0
+        assert second.json is second.json
+
+
+class TestMetricsSampler:
+    """测试后台采样与分发"""
+
+    def test_current_samples_on_demand(self):
+        """测试未启动时按需采样，且并发请求共享一次采样"""
+        async def run():
+            sampler = MetricsSampler(interval=60)
+            start = time.perf_counter()
+            snapshots = await asyncio.gather(*(sampler.current() for _ in range(20)))
+            assert time.perf_counter() - start < 1.0
+            assert sampler.samples_taken == 1
+            assert all(s is snapshots[0] for s in snapshots)
+            assert await sampler.current() is snapshots[0]
+
+        asyncio.run(run())
+
+    def test_one_sampler_many_viewers(self):
+        """测试采样次数与订阅者数量无关"""
+        async def run():
+            sampler = MetricsSampler(interval=0.05)
+            seen = {}
+
+            async def viewer(n):
+                async for snapshot in sampler.stream(every=0.1):
+                    seen.setdefault(n, []).append(snapshot.sequence)
+                    if len(seen[n]) == 3:
+                        break
+
+            await asyncio.gather(*(viewer(n) for n in range(200)))
+            await sampler.stop()
+            # 3 snapshots per viewer, about every other sample
+            assert sampler.samples_taken <= 8
+            for sequences in seen.values():
+                assert sequences == sorted(set(sequences))
+
+        asyncio.run(run())
+
+    def test_monitoring_service_uses_sampler(self):
+        """测试监控服务读取共享快照"""
+        async def run():
+            sampler = MetricsSampler(interval=60)
+            service = MonitoringService(sampler)
+            metrics = await service.get_system_metrics()
+            assert "error" not in metrics
+            assert service.get_cached_metrics() == metrics
+            assert sampler.samples_taken == 1
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""WebSocket 扇出（单次序列化与每连接有界发送队列）单元测试"""
+
+import asyncio
+
+import pytest
+
+from src.config import OverflowPolicy
+from src.websocket import CLOSE_TOO_SLOW, ConnectionManager, DashboardManager
+
+
+class FakeWebSocket:
+    """记录收到的消息；blocked 时 send_text 一直等待，模拟慢客户端"""
+
+    def __init__(self, blocked=False, fail=False):
+        self.messages = []
+        self.closed_with = None
+        self.fail = fail
+        self.unblocked = asyncio.Event()
+        if not blocked:
+            self.unblocked.set()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        if self.fail:
+            raise ConnectionError("gone")
+        await self.unblocked.wait()
+        self.messages.append(text)
+
+    async def close(self, code=1000, reason=""):
+        self.closed_with = code
+
+
+async def settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+async def connected(manager, **kwargs):
+    websocket = FakeWebSocket(**kwargs)
+    await manager.connect(websocket)
+    return websocket
+
+
+class TestFanOut:
+    """测试扇出"""
+
+    def test_serialized_once(self):
+        """测试每条消息只序列化一次，所有连接收到同一字符串"""
+        async def run():
+            manager = ConnectionManager(max_queue=10, overflow=OverflowPolicy.DROP_OLDEST)
+            sockets = [await connected(manager) for _ in range(5)]
+            result = await manager.broadcast({"type": "metrics", "data": {"cpu": 1.5}})
+            await settle()
+            assert result["recipients"] == 5 and result["dropped"] == 0
+            texts = [websocket.messages[0] for websocket in sockets]
+            assert texts[0] == '{"type": "metrics", "data": {"cpu": 1.5}}'
+            assert all(text is texts[0] for text in texts)
+
+        asyncio.run(run())
+
+    def test_slow_client_does_not_delay_others(self):
+        """测试慢客户端只积压自己的队列，按最旧优先丢弃"""
+        async def run():
+            manager = ConnectionManager(max_queue=3, overflow=OverflowPolicy.DROP_OLDEST)
+            fast = await connected(manager)
+            slow = await connected(manager, blocked=True)
+            for n in range(10):
+                await manager.broadcast(str(n))
+                await settle()
+            assert fast.messages == [str(n) for n in range(10)]
+
+            clients = await manager.get_clients()
+            assert clients[0]["sent"] == 10 and clients[0]["dropped"] == 0
+            # The writer holds "0"; "1".."6" were dropped for the newest three
+            assert clients[1]["queued"] == 3 and clients[1]["dropped"] == 6
+
+            slow.unblocked.set()
+            await settle()
+            assert slow.messages == ["0", "7", "8", "9"]
+            assert (await manager.get_clients())[1]["max_lag_ms"] > 0
+
+        asyncio.run(run())
+
+    def test_coalesce_latest(self):
+        """测试队列满时只保留最新消息"""
+        async def run():
+            manager = ConnectionManager(max_queue=2, overflow=OverflowPolicy.COALESCE_LATEST)
+            slow = await connected(manager, blocked=True)
+            for n in range(6):
+                await manager.broadcast(str(n))
+                await settle()
+            slow.unblocked.set()
+            await settle()
+            assert slow.messages == ["0", "5"]
+
+        asyncio.run(run())
+
+    def test_dashboard_keeps_only_latest(self):
+        """测试慢仪表盘只积压最新一条指标"""
+        async def run():
+            manager = DashboardManager().manager
+            slow = await connected(manager, blocked=True)
+            for n in range(6):
+                await manager.broadcast(str(n))
+                await settle()
+            slow.unblocked.set()
+            await settle()
+            assert slow.messages == ["0", "5"]
+
+        asyncio.run(run())
+
+    def test_disconnect_policy_and_failures(self):
+        """测试溢出断开慢客户端、发送失败移除连接"""
+        async def run():
+            manager = ConnectionManager(max_queue=2, overflow=OverflowPolicy.DISCONNECT)
+            fast = await connected(manager)
+            slow = await connected(manager, blocked=True)
+            broken = await connected(manager, fail=True)
+            results = []
+            for n in range(4):
+                results.append(await manager.broadcast(str(n)))
+                await settle()
+            assert slow.closed_with == CLOSE_TOO_SLOW
+            assert manager.active_connections == [fast]
+            assert results[-1]["recipients"] == 1
+            assert len(fast.messages) == 4 and broken.messages == []
+
+        asyncio.run(run())
+
+    def test_clients_by_id(self):
+        """测试按客户端 ID 列出与断开连接"""
+        async def run():
+            manager = ConnectionManager(max_queue=10, overflow=OverflowPolicy.DROP_OLDEST)
+            first, second = FakeWebSocket(), FakeWebSocket()
+            first_id = await manager.connect(first, "first")
+            second_id = await manager.connect(second)
+            assert first_id == "first" and second_id in manager.channels
+            assert {c["client_id"] for c in await manager.get_clients()} == {first_id, second_id}
+
+            result = await manager.disconnect_client(first_id)
+            assert result["success"] and first.closed_with == 1000
+            assert not (await manager.disconnect_client(first_id))["success"]
+            assert manager.active_connections == [second]
+
+            manager.disconnect(second)
+            assert manager.channels == {}
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -3,12 +3,12 @@
 
 import sys
 import os
-sys.path.append(os.path.join(os.path.dirname(__file__), 'cybercorp_node'))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cybercorp_node', 'src'))
 
 import cv2
 import numpy as np
 import json
-from utils.vision_model import UIVisionModel, UIElement
+from vision.vision_model import UIVisionModel, UIElement
 
 def test_vision_model():
     """Test the vision model with synthetic images"""
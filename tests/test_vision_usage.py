@@ -3,9 +3,9 @@
 
 import sys
 import os
-sys.path.append(os.path.join(os.path.dirname(__file__), 'cybercorp_node'))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cybercorp_node', 'src'))
 
-from utils.vision_model import UIVisionModel
+from vision.vision_model import UIVisionModel
 import json
 
 def main():